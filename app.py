@@ -13,11 +13,15 @@ from flask import Flask, request
 from flask_cors import CORS
 from api.routes import api
 from server.routes.agent import agent
+from config.ollama_config import KEEP_ALIVE
 from database import init_database
+from orchestrator.tools.catalog import get_tool_catalog
 from utils.classification_manager import ClassificationManager
+from utils.model_health import model_health_monitor
+from utils.ollama_client import ollama_client
+from utils.prometheus import instrument_app, registry
 import subprocess
 import time
-import requests
 import logging
 import os
 import re
@@ -28,8 +32,7 @@ def _ensure_ollama_running():
     """Ensure Ollama service is running, start it if necessary"""
     try:
         # Check if Ollama is already running
-        response = requests.get("http://localhost:11434/api/tags", timeout=2)
-        if response.status_code == 200:
+        if ollama_client.is_reachable(timeout=2):
             logger.info("✅ Ollama is already running")
             return
     except:
@@ -47,6 +50,8 @@ def _ensure_ollama_running():
         # Set GPU acceleration environment variable
         env = os.environ.copy()
         env['OLLAMA_GPU_LAYERS'] = '999'
+        # The agent's OpenAI-compatible /v1 calls can't pass keep_alive, so make it the server default
+        env.setdefault('OLLAMA_KEEP_ALIVE', KEEP_ALIVE)
         
         # Start Ollama in background with GPU configuration
         subprocess.Popen(['ollama', 'serve'], 
@@ -57,13 +62,9 @@ def _ensure_ollama_running():
         # Wait for Ollama to start (up to 10 seconds)
         for i in range(20):  # 20 * 0.5s = 10s max
             time.sleep(0.5)
-            try:
-                response = requests.get("http://localhost:11434/api/tags", timeout=1)
-                if response.status_code == 200:
-                    logger.info("✅ Ollama started successfully")
-                    return
-            except:
-                continue
+            if ollama_client.is_reachable(timeout=1):
+                logger.info("✅ Ollama started successfully")
+                return
         
         logger.warning("⚠️  Ollama failed to start within 10 seconds")
         
@@ -127,12 +128,21 @@ def after_request(response):
 app.register_blueprint(api)  # Clean API
 app.register_blueprint(agent, url_prefix='/api/agent')  # Agent orchestrator
 
+# Per-route request latency, and Prometheus metrics at /metrics
+instrument_app(app, registry)
+
 # Initialize database
 init_database()
 
+# Build the tool/prompt catalog once instead of on the first agent request
+get_tool_catalog()
+
 # Start Ollama service if available
 _ensure_ollama_running()
 
+# Track Ollama reachability and model residency in the background
+model_health_monitor.start()
+
 # Initialize classification manager
 classification_manager = ClassificationManager()
 classification_manager.start_background_processing()
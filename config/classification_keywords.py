@@ -0,0 +1,45 @@
+"""
+Keyword sets for the fallback task classifier used when Ollama is unavailable
+
+Keywords match on word boundaries and accept their regular inflections
+(see utils.keyword_classifier.inflections), so "run" also matches
+"running" and "runner" but "work" no longer matches "workout". Set GISKARD_CLASSIFICATION_KEYWORDS_FILE to
+a JSON file of {category: [keywords]} to override these defaults.
+"""
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLASSIFICATION_KEYWORDS = {
+    "health": [
+        "gym", "workout", "exercise", "run", "swim", "yoga",
+        "health", "fitness", "vitamin", "doctor", "therapy", "mental health", "wellness"
+    ],
+    "career": [
+        "job", "interview", "career", "work", "meeting", "networking", "application",
+        "resume", "linkedin", "professional", "business", "client", "project"
+    ],
+    "learning": [
+        "learn", "study", "course", "book", "read", "tutorial", "practice", "skill",
+        "education", "training", "certification", "research", "blog", "write"
+    ]
+}
+
+
+def load_classification_keywords() -> dict:
+    """Load keyword sets, preferring the JSON override file if configured"""
+    override_file = os.getenv("GISKARD_CLASSIFICATION_KEYWORDS_FILE")
+    if override_file:
+        try:
+            with open(override_file, 'r', encoding='utf-8') as f:
+                keywords = json.load(f)
+            logger.info(f"Loaded classification keywords from {override_file}")
+            return keywords
+        except Exception as e:
+            logger.warning(f"Failed to load classification keywords from {override_file}: {e}")
+    return DEFAULT_CLASSIFICATION_KEYWORDS
+
+
+CLASSIFICATION_KEYWORDS = load_classification_keywords()
@@ -7,6 +7,8 @@ from typing import Optional
 from langfuse import Langfuse, get_client
 from langfuse.langchain import CallbackHandler
 from dotenv import load_dotenv
+from config.trace_exporter import BackgroundSpanExporter, ExportByteCounter, create_langfuse_otlp_exporter
+from config.trace_sampling import TraceSampler
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,6 +20,8 @@ class LangfuseConfig:
     """Langfuse configuration manager"""
     
     def __init__(self):
+        self.exporter: Optional[BackgroundSpanExporter] = None
+        self.sampler = TraceSampler()
         self.public_key = os.getenv("LANGFUSE_PUBLIC_KEY")
         self.secret_key = os.getenv("LANGFUSE_SECRET_KEY")
         self.host = os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
@@ -29,12 +33,25 @@ class LangfuseConfig:
             logger.warning("Langfuse not configured - set LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY environment variables")
     
     def _initialize_client(self):
-        """Initialize the Langfuse client"""
+        """Initialize the Langfuse client
+
+        Spans are exported by a BackgroundSpanExporter, so neither requests
+        nor flush() wait on the Langfuse host. The sampler decides which
+        traces are exported and caps the size of every payload.
+        """
         try:
+            byte_counter = ExportByteCounter()
+            self.exporter = BackgroundSpanExporter(
+                create_langfuse_otlp_exporter(self.public_key, self.secret_key, self.host, byte_counter=byte_counter),
+                sampler=self.sampler,
+                byte_counter=byte_counter
+            )
             self.client = Langfuse(
                 public_key=self.public_key,
                 secret_key=self.secret_key,
-                host=self.host
+                host=self.host,
+                span_exporter=self.exporter,
+                mask=self.sampler.mask
             )
             logger.info("✅ Langfuse client initialized successfully")
         except Exception as e:
@@ -72,7 +89,8 @@ class LangfuseConfig:
             logger.error(f"Failed to create Langfuse callback handler: {e}")
             return None
     
-    def create_trace_context(self, name: str, trace_id: Optional[str] = None, user_id: Optional[str] = None, input_data: Optional[dict] = None):
+    def create_trace_context(self, name: str, trace_id: Optional[str] = None, user_id: Optional[str] = None,
+                             input_data: Optional[dict] = None, trace_type: str = "chat"):
         """
         Create a Langfuse trace context for the conversation
         
@@ -81,12 +99,15 @@ class LangfuseConfig:
             trace_id: Optional trace ID
             user_id: Optional user ID
             input_data: Optional input data for the trace
+            trace_type: Sampling policy to apply (chat, classification, warmup)
             
         Returns:
-            Langfuse trace context or None if disabled
+            Langfuse trace context, or None if disabled or the trace isn't sampled
         """
         if not self.enabled:
             return None
+        if trace_id and not self.sampler.start(trace_type, trace_id):
+            return None
         
         try:
             from langfuse.types import TraceContext
@@ -99,8 +120,13 @@ class LangfuseConfig:
             logger.error(f"Failed to create Langfuse trace context: {e}")
             return None
     
+    def finish_trace(self, trace_id: Optional[str], error: Optional[str] = None):
+        """Mark a trace finished so a tail-sampled one is exported if it failed or was slow"""
+        if self.enabled and trace_id:
+            self.sampler.finish(trace_id, error)
+
     def flush(self):
-        """Flush pending events to Langfuse"""
+        """Hand pending events to the background exporter (doesn't wait for the Langfuse host)"""
         if self.enabled:
             try:
                 client = get_client()
@@ -108,8 +134,19 @@ class LangfuseConfig:
             except Exception as e:
                 logger.error(f"Failed to flush Langfuse events: {e}")
     
+    def drain(self, timeout: float = 5.0) -> bool:
+        """Wait until pending events have reached Langfuse, e.g. before a script exits"""
+        self.flush()
+        return self.exporter.force_flush(int(timeout * 1000)) if self.exporter else True
+
+    def get_export_metrics(self) -> dict:
+        """Background exporter counts and bytes per minute, with sampling decisions per trace type"""
+        if not self.exporter:
+            return {}
+        return dict(self.exporter.get_metrics(), sampling=self.sampler.get_metrics())
+
     def shutdown(self):
-        """Shutdown the Langfuse client"""
+        """Shutdown the Langfuse client, draining the export queue"""
         if self.enabled:
             try:
                 client = get_client()
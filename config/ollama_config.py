@@ -5,9 +5,27 @@ Ollama configuration settings
 from .prompt_registry import prompt_registry
 
 # Default Ollama settings
-OLLAMA_BASE_URL = "http://localhost:11434/api/generate"
+OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_BASE_URL = f"{OLLAMA_HOST}/api/generate"
 DEFAULT_MODEL = "gemma3:4b"
 
+# How long Ollama keeps the model resident after the last request
+KEEP_ALIVE = "30m"
+
+# Categories the classifier may assign
+CLASSIFICATION_CATEGORIES = ["health", "career", "learning"]
+
+# JSON schema passed as Ollama's `format` so the model can only emit a category array
+CLASSIFICATION_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {"type": "string", "enum": CLASSIFICATION_CATEGORIES},
+    "uniqueItems": True,
+    "maxItems": len(CLASSIFICATION_CATEGORIES)
+}
+
+# Longest valid answer is ~15 tokens (["health", "career", "learning"])
+CLASSIFICATION_NUM_PREDICT = 24
+
 # Request timeout in seconds
 REQUEST_TIMEOUT = 100  # Reduced back to 30 seconds with better handling
 
@@ -24,6 +42,7 @@ def get_chat_config():
         return {
             "model": coaching_config["model"],
             "stream": True,  # Enable streaming for better UX
+            "keep_alive": KEEP_ALIVE,
             "options": {
                 "temperature": coaching_config["temperature"],
                 "top_p": coaching_config["top_p"],
@@ -35,6 +54,7 @@ def get_chat_config():
     return {
         "model": DEFAULT_MODEL,
         "stream": True,  # Enable streaming for better UX
+        "keep_alive": KEEP_ALIVE,
         "options": {
             "temperature": 0.7,
             "top_p": 0.9,
@@ -50,10 +70,12 @@ def get_classification_config():
         return {
             "model": classification_config["model"],
             "stream": False,
+            "keep_alive": KEEP_ALIVE,
+            "format": CLASSIFICATION_RESPONSE_SCHEMA,
             "options": {
                 "temperature": classification_config["temperature"],
                 "top_p": classification_config["top_p"],
-                "max_tokens": classification_config["token_limit"]
+                "num_predict": min(classification_config["token_limit"], CLASSIFICATION_NUM_PREDICT)
             }
         }
     
@@ -61,10 +83,12 @@ def get_classification_config():
     return {
         "model": DEFAULT_MODEL,
         "stream": False,
+        "keep_alive": KEEP_ALIVE,
+        "format": CLASSIFICATION_RESPONSE_SCHEMA,
         "options": {
             "temperature": 0.1,
             "top_p": 0.9,
-            "max_tokens": 100
+            "num_predict": CLASSIFICATION_NUM_PREDICT
         }
     }
 
@@ -2,14 +2,84 @@
 Enhanced prompt management with Langfuse integration and local fallback
 """
 import os
+import re
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from langfuse import Langfuse
 from config.langfuse_config import langfuse_config
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# Langfuse template variables: {{variable}}
+TEMPLATE_VAR_PATTERN = re.compile(r'\{\{([^}]+)\}\}')
+
+
+class CompiledPrompt:
+    """
+    A prompt template parsed once into literal text and variable slots
+
+    Variables given at compile time (e.g. tool descriptions) are baked into
+    the literal text; the remaining ones are filled by render() on each call.
+    Unknown variables are kept as-is, matching PromptManager.compile_prompt.
+    """
+
+    def __init__(self, prompt_data: Dict[str, Any], **baked_vars):
+        self.prompt_data = prompt_data
+        self.name = prompt_data["name"]
+        self.source = prompt_data.get("source")
+        self.version = prompt_data.get("version")
+        self.langfuse_prompt = prompt_data.get("langfuse_prompt")
+
+        # Alternating [literal, variable, literal, ...]; baked variables are merged into the literals
+        self._parts: List[str] = [""]
+        position = 0
+        text = prompt_data["text"]
+        for match in TEMPLATE_VAR_PATTERN.finditer(text):
+            var_name = match.group(1).strip()
+            self._parts[-1] += text[position:match.start()]
+            if var_name in baked_vars:
+                self._parts[-1] += str(baked_vars[var_name])
+            else:
+                self._parts.extend([var_name, ""])
+            position = match.end()
+        self._parts[-1] += text[position:]
+
+    @property
+    def variables(self) -> List[str]:
+        """Variables still to be filled by render()"""
+        return self._parts[1::2]
+
+    def render(self, **template_vars) -> str:
+        """Fill the remaining variables (current_datetime defaults to now)"""
+        return "".join(self.render_split(**template_vars))
+
+    def render_split(self, **template_vars) -> Tuple[str, str]:
+        """
+        Render as (static prefix, dynamic tail)
+
+        The prefix is every whole line before the first per-request variable,
+        so it is byte-identical across calls and Ollama can reuse its KV cache
+        for it; prefix + tail == render(). Templates should keep per-request
+        values (datetime, tool results) at the end to make the prefix long.
+        """
+        values = {"current_datetime": datetime.now().isoformat()}
+        values.update(template_vars)
+        rendered = []
+        for i, part in enumerate(self._parts):
+            if i % 2 == 0:
+                rendered.append(part)
+            elif part in values:
+                rendered.append(str(values[part]))
+            else:
+                rendered.append("{{" + part + "}}")
+
+        if len(self._parts) == 1:
+            return rendered[0], ""
+        split_at = self._parts[0].rfind("\n") + 1
+        return self._parts[0][:split_at], self._parts[0][split_at:] + "".join(rendered[1:])
+
 
 class PromptManager:
     """
@@ -20,6 +90,7 @@ class PromptManager:
         self.local_prompts_dir = local_prompts_dir
         self.langfuse_client = langfuse_config.client if langfuse_config.enabled else None
         
+    @traced("prompt.get")
     def get_prompt(self, name: str, label: str = "production", **kwargs) -> Dict[str, Any]:
         """
         Get a prompt from Langfuse or fall back to local file
@@ -53,6 +124,7 @@ class PromptManager:
         # Fallback to local file
         return self.load_local_prompt(name, **kwargs)
     
+    @traced("prompt.load_local")
     def load_local_prompt(self, name: str, **kwargs) -> Dict[str, Any]:
         """
         Load a prompt from local file system
@@ -105,9 +177,6 @@ class PromptManager:
         defaults.update(template_vars)
         
         try:
-            # Handle Langfuse template syntax {{variable}}
-            import re
-            
             # Replace {{variable}} patterns with actual values
             def replace_langfuse_var(match):
                 var_name = match.group(1).strip()
@@ -118,7 +187,7 @@ class PromptManager:
                     return match.group(0)
             
             # Replace Langfuse template variables {{variable}}
-            compiled = re.sub(r'\{\{([^}]+)\}\}', replace_langfuse_var, text)
+            compiled = TEMPLATE_VAR_PATTERN.sub(replace_langfuse_var, text)
             
             logger.debug(f"Compiled prompt '{prompt_data['name']}' with {len(defaults)} variables")
             return compiled
@@ -141,6 +210,18 @@ class PromptManager:
         prompt_data = self.get_prompt(name, label=label)
         return self.compile_prompt(prompt_data, **template_vars)
 
+    def precompile(self, name: str, label: Optional[str] = "production", **baked_vars) -> CompiledPrompt:
+        """
+        Load a prompt once and parse it for repeated rendering
+
+        Args:
+            name: Prompt name
+            label: Langfuse label, or None to load the local file only
+            **baked_vars: Variables that are fixed for the process (e.g. tool descriptions)
+        """
+        prompt_data = self.get_prompt(name, label=label) if label else self.load_local_prompt(name)
+        return CompiledPrompt(prompt_data, **baked_vars)
+
 
 # Global prompt manager instance
 prompt_manager = PromptManager()
@@ -0,0 +1,268 @@
+"""
+Background span exporter that keeps Langfuse network I/O off the request path
+
+The Langfuse SDK hands finished spans to its span exporter in batches, and
+a flush() makes the caller wait for that export. BackgroundSpanExporter
+only enqueues spans (dropping them, counted, when its bounded queue is
+full) and a worker thread ships them to Langfuse in batches, so neither a
+turn nor a flush waits for the Langfuse host. Shutdown drains the queue.
+
+With a TraceSampler, spans of traces awaiting a tail-sampling decision are
+held until the trace finishes, then queued or discarded (see
+config/trace_sampling.py). An ExportByteCounter reports the request bytes
+sent to Langfuse per minute.
+"""
+import base64
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import format_trace_id
+
+from config.trace_sampling import DROP, HOLD, TraceSampler
+
+logger = logging.getLogger(__name__)
+
+TRACE_QUEUE_SIZE = int(os.getenv("GISKARD_TRACE_QUEUE_SIZE", "2048"))
+TRACE_BATCH_SIZE = int(os.getenv("GISKARD_TRACE_BATCH_SIZE", "128"))
+TRACE_EXPORT_INTERVAL_SECONDS = float(os.getenv("GISKARD_TRACE_EXPORT_INTERVAL_SECONDS", "2"))
+TRACE_DRAIN_SECONDS = float(os.getenv("GISKARD_TRACE_DRAIN_SECONDS", "5"))
+# Spans held for tail-sampling decisions across all pending traces
+TRACE_MAX_HELD_SPANS = int(os.getenv("GISKARD_TRACE_MAX_HELD_SPANS", "4096"))
+
+
+class ExportByteCounter:
+    """Request bytes sent to the trace collector, in total and over the last minute"""
+
+    def __init__(self, window_seconds: float = 60.0):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._recent: deque = deque()
+        self.total = 0
+
+    def record(self, size: int):
+        with self._lock:
+            self._recent.append((time.monotonic(), size))
+            self.total += size
+
+    def response_hook(self, response, *args, **kwargs):
+        """requests response hook counting the body of each export request"""
+        self.record(len(response.request.body or b""))
+
+    def per_minute(self) -> int:
+        with self._lock:
+            cutoff = time.monotonic() - self.window_seconds
+            while self._recent and self._recent[0][0] < cutoff:
+                self._recent.popleft()
+            return sum(size for _, size in self._recent)
+
+
+def create_langfuse_otlp_exporter(public_key: str, secret_key: str, host: str, timeout: Optional[int] = None,
+                                  byte_counter: Optional[ExportByteCounter] = None) -> SpanExporter:
+    """OTLP exporter for the Langfuse traces endpoint, authenticated like the SDK's own"""
+    import requests
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    session = requests.Session()
+    if byte_counter:
+        session.hooks["response"].append(byte_counter.response_hook)
+    auth = base64.b64encode(f"{public_key}:{secret_key}".encode("utf-8")).decode("ascii")
+    return OTLPSpanExporter(
+        endpoint=f"{host.rstrip('/')}/api/public/otel/v1/traces",
+        headers={
+            "Authorization": f"Basic {auth}",
+            "x-langfuse-sdk-name": "python",
+            "x-langfuse-public-key": public_key,
+            "x-langfuse-ingestion-version": "4",
+        },
+        timeout=timeout,
+        session=session
+    )
+
+
+class BackgroundSpanExporter(SpanExporter):
+    """
+    Bounded queue in front of a span exporter, drained by a worker thread
+
+    Args:
+        exporter: Exporter that does the network I/O (e.g. OTLP to Langfuse)
+        max_queue_size: Spans waiting for export before new ones are dropped
+        max_batch_size: Spans per export call
+        export_interval: Seconds the worker waits to fill a batch
+        sampler: Tail-sampling decisions for spans of pending traces
+        byte_counter: Counter of bytes sent by the exporter, for metrics
+    """
+
+    def __init__(self, exporter: SpanExporter, max_queue_size: int = TRACE_QUEUE_SIZE,
+                 max_batch_size: int = TRACE_BATCH_SIZE, export_interval: float = TRACE_EXPORT_INTERVAL_SECONDS,
+                 sampler: Optional[TraceSampler] = None, byte_counter: Optional[ExportByteCounter] = None,
+                 max_held_spans: int = TRACE_MAX_HELD_SPANS):
+        self.exporter = exporter
+        self.sampler = sampler
+        self.byte_counter = byte_counter
+        self.max_held_spans = max_held_spans
+        # trace id -> spans waiting for the trace's tail-sampling decision
+        self._held: Dict[str, List[ReadableSpan]] = {}
+        self._held_count = 0
+        self.max_batch_size = max_batch_size
+        self.export_interval = export_interval
+        self._queue: "queue.Queue[ReadableSpan]" = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        # Spans queued or being exported
+        self._pending = 0
+        self._shutdown = False
+        self.reset_metrics()
+        self._thread = threading.Thread(target=self._export_loop, name="TraceExporter", daemon=True)
+        self._thread.start()
+        if sampler:
+            sampler.on_decision(self._release)
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        """Queue spans for export without waiting for the network"""
+        if self._shutdown:
+            return SpanExportResult.FAILURE
+        for span in spans:
+            decision = self.sampler.decision(format_trace_id(span.context.trace_id)) if self.sampler else None
+            if decision == HOLD:
+                self._hold(span)
+            elif decision == DROP:
+                with self._lock:
+                    self.sampled_out += 1
+            else:
+                self._enqueue(span)
+        return SpanExportResult.SUCCESS
+
+    def _enqueue(self, span: ReadableSpan):
+        try:
+            with self._lock:
+                self._queue.put_nowait(span)
+                self._pending += 1
+                self.queued += 1
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _hold(self, span: ReadableSpan):
+        trace_id = format_trace_id(span.context.trace_id)
+        with self._lock:
+            # The trace may have been decided since export() looked
+            decision = self.sampler.decision(trace_id)
+            if decision == HOLD:
+                if self._held_count >= self.max_held_spans:
+                    self.dropped += 1
+                else:
+                    self._held.setdefault(trace_id, []).append(span)
+                    self._held_count += 1
+                return
+            if decision == DROP:
+                self.sampled_out += 1
+                return
+        self._enqueue(span)
+
+    def _release(self, trace_id: str, keep: bool):
+        """Queue or discard the held spans of a trace once its tail-sampling decision is made"""
+        with self._lock:
+            spans = self._held.pop(trace_id, [])
+            self._held_count -= len(spans)
+            if not keep:
+                self.sampled_out += len(spans)
+        if keep:
+            for span in spans:
+                self._enqueue(span)
+
+    def _next_batch(self) -> List[ReadableSpan]:
+        """Wait up to export_interval for the first span, then take what is queued up to a batch"""
+        try:
+            batch = [self._queue.get(timeout=self.export_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export_batch(self, batch: List[ReadableSpan]):
+        started = time.perf_counter()
+        try:
+            result = self.exporter.export(batch)
+            ok = result == SpanExportResult.SUCCESS
+        except Exception as e:
+            logger.warning(f"Trace export of {len(batch)} spans failed: {e}")
+            ok = False
+        with self._lock:
+            self._pending -= len(batch)
+            self.batches += 1
+            self.export_ms_total += (time.perf_counter() - started) * 1000
+            if ok:
+                self.exported += len(batch)
+            else:
+                self.failed += len(batch)
+
+    def _export_loop(self):
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._export_batch(batch)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Wait until every queued span has been exported (or the timeout passes)"""
+        deadline = time.monotonic() + timeout_millis / 1000
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._pending == 0:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def shutdown(self, timeout: float = TRACE_DRAIN_SECONDS):
+        """Stop accepting spans, drain the queue within the timeout and shut the exporter down"""
+        if self._shutdown:
+            return
+        self._shutdown = True
+        drained = self.force_flush(int(timeout * 1000))
+        self._stop_event.set()
+        self._thread.join(timeout=self.export_interval + 1)
+        if not drained:
+            logger.warning(f"Trace exporter shut down with {self._queue.qsize()} spans not exported")
+        try:
+            self.exporter.shutdown()
+        except Exception as e:
+            logger.warning(f"Failed to shut down trace exporter: {e}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth, counts of queued, exported, failed, dropped and sampled-out spans, and bytes sent"""
+        with self._lock:
+            return {
+                'queue_size': self._queue.qsize(),
+                'max_queue_size': self._queue.maxsize,
+                'held': self._held_count,
+                'sampled_out': self.sampled_out,
+                'queued': self.queued,
+                'exported': self.exported,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'batches': self.batches,
+                'average_export_ms': round(self.export_ms_total / self.batches, 1) if self.batches else 0.0,
+                'bytes_per_minute': self.byte_counter.per_minute() if self.byte_counter else None,
+                'bytes_total': self.byte_counter.total if self.byte_counter else None
+            }
+
+    def reset_metrics(self):
+        """Reset all counters"""
+        with self._lock:
+            self.queued = 0
+            self.exported = 0
+            self.failed = 0
+            self.dropped = 0
+            self.sampled_out = 0
+            self.batches = 0
+            self.export_ms_total = 0.0
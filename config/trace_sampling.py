@@ -0,0 +1,237 @@
+"""
+Sampling, rate limits and payload caps that bound tracing overhead under load
+
+Each trace type (chat, classification, warmup) has a policy:
+
+- Head sampling: a share of traces is exported in full, decided when the
+  trace starts (by trace id, so the decision is stable).
+- Tail sampling: the other traces are still recorded, but their spans are
+  held by the exporter until the trace finishes and only exported if it
+  failed or was slower than the policy's threshold.
+- Rate limit: traces over max_per_minute aren't recorded at all.
+
+Every observation input, output and metadata payload is capped at
+GISKARD_TRACE_MAX_PAYLOAD_BYTES, with markers where it was truncated.
+Policies are overridden with GISKARD_TRACE_<TYPE>_SAMPLE_RATE,
+GISKARD_TRACE_<TYPE>_TAIL_SLOW_MS and GISKARD_TRACE_<TYPE>_MAX_PER_MINUTE.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_PAYLOAD_BYTES = int(os.getenv("GISKARD_TRACE_MAX_PAYLOAD_BYTES", "8192"))
+
+# Export decisions for a span of a trace
+EXPORT = "export"
+HOLD = "hold"
+DROP = "drop"
+
+# Traces awaiting a tail decision, and decisions remembered for spans that end after it
+MAX_PENDING_TRACES = 1000
+PENDING_TRACE_TTL_SECONDS = 600
+
+
+@dataclass
+class TracePolicy:
+    """How traces of one type are sampled"""
+    sample_rate: float
+    tail_errors: bool = True
+    tail_slow_ms: Optional[float] = None
+    max_per_minute: int = 0  # 0: unlimited
+
+
+DEFAULT_POLICIES = {
+    "chat": TracePolicy(sample_rate=1.0, tail_slow_ms=10000, max_per_minute=120),
+    "classification": TracePolicy(sample_rate=0.1, max_per_minute=30),
+    "warmup": TracePolicy(sample_rate=0.0, max_per_minute=10),
+}
+
+
+def _optional_float(value: Optional[str]) -> Optional[float]:
+    return float(value) if value not in (None, "") else None
+
+
+def load_policies() -> Dict[str, TracePolicy]:
+    """Default policies with GISKARD_TRACE_<TYPE>_* overrides"""
+    policies = {}
+    for trace_type, default in DEFAULT_POLICIES.items():
+        prefix = f"GISKARD_TRACE_{trace_type.upper()}_"
+        slow_ms = os.getenv(prefix + "TAIL_SLOW_MS")
+        policies[trace_type] = TracePolicy(
+            sample_rate=float(os.getenv(prefix + "SAMPLE_RATE", default.sample_rate)),
+            tail_errors=os.getenv(prefix + "TAIL_ERRORS", "1" if default.tail_errors else "0") not in ("0", "false"),
+            tail_slow_ms=_optional_float(slow_ms) if slow_ms is not None else default.tail_slow_ms,
+            max_per_minute=int(os.getenv(prefix + "MAX_PER_MINUTE", default.max_per_minute))
+        )
+    return policies
+
+
+def truncate_payload(data: Any, max_bytes: int = MAX_PAYLOAD_BYTES) -> Any:
+    """
+    Data whose JSON form fits max_bytes
+
+    Long strings keep their head and long lists their first items, each
+    with a marker saying how much was cut; anything still too large is cut
+    to a marked JSON string.
+    """
+    if data is None or isinstance(data, (bool, int, float)):
+        return data
+    encoded = json.dumps(data, default=str, ensure_ascii=False)
+    if len(encoded.encode()) <= max_bytes:
+        return data
+
+    max_string, max_items = max(64, max_bytes // 8), 20
+
+    def shrink(value):
+        if isinstance(value, str) and len(value) > max_string:
+            return f"{value[:max_string]}… [truncated {len(value) - max_string} chars]"
+        if isinstance(value, dict):
+            return {key: shrink(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            items = [shrink(item) for item in value[:max_items]]
+            if len(value) > max_items:
+                items.append(f"… [truncated {len(value) - max_items} items]")
+            return items
+        return value
+
+    shrunk = shrink(data)
+    encoded = json.dumps(shrunk, default=str, ensure_ascii=False)
+    if len(encoded.encode()) <= max_bytes:
+        return shrunk
+    head = encoded.encode()[:max(0, max_bytes - 64)].decode(errors="ignore")
+    return f"{head}… [truncated {len(encoded) - len(head)} chars]"
+
+
+def _unit_interval(trace_id: str) -> float:
+    """Stable pseudo-random number in [0, 1) for a trace id"""
+    return int(hashlib.sha256(trace_id.encode()).hexdigest()[:8], 16) / 0x100000000
+
+
+class TraceSampler:
+    """Head/tail sampling decisions, per-type rate limits and payload caps"""
+
+    def __init__(self, policies: Optional[Dict[str, TracePolicy]] = None, max_payload_bytes: int = MAX_PAYLOAD_BYTES):
+        self.policies = policies or load_policies()
+        self.max_payload_bytes = max_payload_bytes
+        self._lock = threading.Lock()
+        # trace id -> {"type", "started", "decision"}
+        self._traces: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._recent_starts: Dict[str, deque] = defaultdict(deque)
+        self._listeners: List[Callable[[str, bool], None]] = []
+        self.reset_metrics()
+
+    def on_decision(self, callback: Callable[[str, bool], None]):
+        """Call callback(trace_id, keep) when a held trace is decided"""
+        self._listeners.append(callback)
+
+    def start(self, trace_type: str, trace_id: str) -> bool:
+        """
+        Decide how to trace a new trace
+
+        Returns False if the trace shouldn't be recorded at all (rate limited,
+        or neither head- nor tail-sampled).
+        """
+        policy = self.policies.get(trace_type) or DEFAULT_POLICIES["chat"]
+        now = time.monotonic()
+        with self._lock:
+            stats = self.stats[trace_type]
+            starts = self._recent_starts[trace_type]
+            while starts and now - starts[0] > 60:
+                starts.popleft()
+            if policy.max_per_minute and len(starts) >= policy.max_per_minute:
+                stats['rate_limited'] += 1
+                return False
+            starts.append(now)
+
+            if _unit_interval(trace_id) < policy.sample_rate:
+                decision = EXPORT
+                stats['head_sampled'] += 1
+            elif policy.tail_errors or policy.tail_slow_ms is not None:
+                decision = HOLD
+                stats['tail_candidates'] += 1
+            else:
+                stats['not_sampled'] += 1
+                return False
+            abandoned = self._remember(trace_id, {"type": trace_type, "started": now, "decision": decision})
+        for abandoned_id in abandoned:
+            self._notify(abandoned_id, False)
+        return True
+
+    def finish(self, trace_id: str, error: Optional[str] = None):
+        """Make the tail decision for a held trace: keep it if it failed or was slow"""
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            if not trace or trace["decision"] != HOLD:
+                return
+            policy = self.policies.get(trace["type"]) or DEFAULT_POLICIES["chat"]
+            duration_ms = (time.monotonic() - trace["started"]) * 1000
+            keep = bool((error and policy.tail_errors) or
+                        (policy.tail_slow_ms is not None and duration_ms >= policy.tail_slow_ms))
+            trace["decision"] = EXPORT if keep else DROP
+            self.stats[trace["type"]]['tail_kept' if keep else 'tail_dropped'] += 1
+        self._notify(trace_id, keep)
+
+    def _notify(self, trace_id: str, keep: bool):
+        for callback in self._listeners:
+            try:
+                callback(trace_id, keep)
+            except Exception as e:
+                logger.warning(f"Trace sampling listener failed: {e}")
+
+    def decision(self, trace_id: str) -> str:
+        """What to do with a finished span of the trace (EXPORT for traces started elsewhere)"""
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            return trace["decision"] if trace else EXPORT
+
+    def _remember(self, trace_id: str, trace: Dict[str, Any]) -> List[str]:
+        """Track a trace, forgetting old ones; returns ids of held traces that never finished"""
+        abandoned = []
+        self._traces[trace_id] = trace
+        self._traces.move_to_end(trace_id)
+        now = trace["started"]
+        while self._traces:
+            oldest_id, oldest = next(iter(self._traces.items()))
+            if len(self._traces) <= MAX_PENDING_TRACES and now - oldest["started"] <= PENDING_TRACE_TTL_SECONDS:
+                break
+            del self._traces[oldest_id]
+            if oldest["decision"] == HOLD:
+                # Never finished (e.g. the client disconnected); its held spans are dropped
+                self.stats[oldest["type"]]['tail_dropped'] += 1
+                abandoned.append(oldest_id)
+        return abandoned
+
+    def mask(self, *, data: Any, **kwargs) -> Any:
+        """Langfuse mask function capping observation payloads"""
+        truncated = truncate_payload(data, self.max_payload_bytes)
+        if truncated is not data:
+            with self._lock:
+                self.payloads_truncated += 1
+        return truncated
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Sampling decisions per trace type and truncated payloads"""
+        with self._lock:
+            return {
+                'trace_types': {trace_type: dict(stats) for trace_type, stats in self.stats.items()},
+                'policies': {trace_type: vars(policy) for trace_type, policy in self.policies.items()},
+                'payloads_truncated': self.payloads_truncated,
+                'max_payload_bytes': self.max_payload_bytes,
+                'last_reset': self.last_reset
+            }
+
+    def reset_metrics(self):
+        """Reset all metrics"""
+        self.stats = defaultdict(lambda: {'head_sampled': 0, 'tail_candidates': 0, 'tail_kept': 0, 'tail_dropped': 0,
+                                          'not_sampled': 0, 'rate_limited': 0})
+        self.payloads_truncated = 0
+        self.last_reset = datetime.now().isoformat()
@@ -6,9 +6,13 @@ import os
 import time
 import threading
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Optional
 from contextlib import contextmanager
 
+from utils.agent_metrics import db_query_seconds
+from utils.prometheus import timed
+from utils.tracing import traced
+
 # Database configuration
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'giskard.db')
 
@@ -123,11 +127,50 @@ def init_database():
         CREATE INDEX IF NOT EXISTS idx_task_history_field_name ON task_history(field_name)
     ''')
 
+    create_classification_state_table(cursor)
+    create_idempotency_keys_table(cursor)
+
     conn.commit()
     conn.close()
     
     print(f"✅ Database initialized at {DATABASE_PATH}")
 
+def create_classification_state_table(cursor):
+    """Create the table recording which prompt version/model last classified each task"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_classification_state (
+            task_id INTEGER PRIMARY KEY,
+            prompt_version TEXT NOT NULL,
+            model TEXT NOT NULL,
+            classified_at TEXT NOT NULL,
+            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Stale tasks are found by a rowid probe on task_id per task, not limited to uncategorized ones
+    cursor.execute('DROP INDEX IF EXISTS idx_tasks_uncategorized')
+
+def create_idempotency_keys_table(cursor):
+    """Create the table of results recorded under idempotency keys (agent turns and tool calls)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            scope TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at)
+    ''')
+
+def db_operation(operation: str) -> Callable:
+    """Decorator timing a model method as a db.<operation> span and in the DB latency histogram"""
+    def decorator(func: Callable) -> Callable:
+        return traced(f"db.{operation}")(timed(db_query_seconds, operation=operation)(func))
+    return decorator
+
 @contextmanager
 def get_connection():
     """Get a database connection with proper error handling and retries"""
@@ -167,15 +210,5 @@ def get_connection():
         if conn:
             conn.close()
 
-def get_next_sort_key():
-    """Get the next available sort key for new tasks with gaps for efficient reordering"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT MAX(sort_key) FROM tasks')
-        result = cursor.fetchone()
-        max_sort_key = result[0] if result[0] is not None else 0
-        # Use gaps of 1000 for efficient reordering
-        return max_sort_key + 1000
-
 if __name__ == '__main__':
     init_database()
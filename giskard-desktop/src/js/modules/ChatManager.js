@@ -277,6 +277,7 @@ class ChatManager {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream'
                 },
                 body: JSON.stringify({
                     input_text: message,
@@ -287,21 +288,35 @@ class ChatManager {
                 signal: controller.signal
             });
 
-            clearTimeout(timeoutId);
-
             if (!response.ok) {
+                clearTimeout(timeoutId);
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
-            const data = await response.json();
+            // Render steps and synthesizer tokens as the server emits them
+            let data = null;
+            this._showTyping();
+            this._updateTypingMessage('Planner: thinking...');
+            await this._handleStreamingResponse(response, (event, payload) => {
+                if (event === 'step') {
+                    this._handleStreamedStep(payload);
+                } else if (event === 'token') {
+                    this._appendStreamedToken(payload.content);
+                } else if (event === 'done') {
+                    data = payload;
+                } else if (event === 'error') {
+                    throw new Error(payload.error || 'Conversation failed');
+                }
+            });
+
+            clearTimeout(timeoutId);
+            this._hideTyping();
+            this.currentStreamingMessage = null;
 
             // Debug logging
             console.log('🤖 Conversation response:', data);
 
-            if (data.success) {
-                // Display each step progressively
-                await this._displayConversationSteps(data.steps);
-
+            if (data) {
                 // Handle events from the orchestrator
                 if (data.events && data.events.length > 0) {
                     console.log('🔧 Events:', data.events);
@@ -322,11 +337,13 @@ class ChatManager {
 
                 console.log('✅ Conversation completed successfully');
             } else {
-                console.error('❌ Conversation failed:', data.error);
-                throw new Error(data.error || 'Conversation failed');
+                console.error('❌ Conversation stream ended without a result');
+                throw new Error('Conversation failed');
             }
         } catch (error) {
             clearTimeout(timeoutId);
+            this._hideTyping();
+            this.currentStreamingMessage = null;
             if (error.name === 'AbortError') {
                 throw new Error('Request timed out. The AI might be busy - please try again.');
             }
@@ -1207,36 +1224,99 @@ class ChatManager {
     }
 
     /**
-     * Handle streaming response from the agent
+     * Read a Server-Sent Events response, calling onEvent(event, payload) per event
      */
-    async _handleStreamingResponse(response, steps) {
-        if (!steps || steps.length === 0) return;
-
-        console.log('📡 Starting streaming response with', steps.length, 'steps');
-
-        for (let i = 0; i < steps.length; i++) {
-            const step = steps[i];
-
-            // Add a small delay between steps for better UX
-            if (i > 0) {
-                await new Promise(resolve => setTimeout(resolve, 800));
+    async _handleStreamingResponse(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) {
+                        event = line.slice(7);
+                    } else if (line.startsWith('data: ')) {
+                        data += line.slice(6);
+                    }
+                });
+                if (data) {
+                    onEvent(event, JSON.parse(data));
+                }
             }
+        }
+    }
 
-            // Show typing indicator for non-final steps
-            if (!step.details?.is_final) {
-                this._showTyping();
-                this._updateTypingMessage(this._getStepDisplayMessage(step));
+    /**
+     * Show a completed step from the stream and announce the next one
+     */
+    _handleStreamedStep(step) {
+        if (step.details?.is_final) {
+            // Replace the streamed text with the final message
+            if (this.currentStreamingMessage) {
+                this.currentStreamingMessage.message.content = step.content;
+                this.currentStreamingMessage.message.step = step;
+                if (this.currentStreamingMessage.contentEl) {
+                    this.currentStreamingMessage.contentEl.innerHTML = this._formatMessage(step.content);
+                }
+                this._saveChatHistory();
+            } else {
+                this._hideTyping();
+                this._addStepMessage(step);
             }
+            return;
+        }
 
-            // Wait a moment for the typing indicator to be visible
-            await new Promise(resolve => setTimeout(resolve, 500));
+        this._hideTyping();
+        this._addStepMessage(step);
 
-            // Hide typing and add the step as a bot message
+        // Keep the typing indicator below the newest message
+        if (this.typingIndicator) {
+            this.chatMessagesContainer.appendChild(this.typingIndicator);
+        }
+        this._showTyping();
+        this._updateTypingMessage(step.step_type === 'planner_llm' && step.details?.actions_count
+            ? 'Action: calling tools...'
+            : 'Synthesizer: thinking...');
+    }
+
+    /**
+     * Append a synthesizer token to the message being streamed
+     */
+    _appendStreamedToken(token) {
+        if (!token) return;
+
+        if (!this.currentStreamingMessage) {
             this._hideTyping();
+            const message = {
+                type: 'bot',
+                content: '',
+                timestamp: new Date().toISOString()
+            };
+            this.chatMessages.push(message);
+            const element = this._renderMessage(message);
+            this.currentStreamingMessage = {
+                message: message,
+                contentEl: element ? element.querySelector('.message-content') : null
+            };
+        }
 
-            // Add step as a bot message with special formatting
-            this._addStepMessage(step);
+        this.currentStreamingMessage.message.content += token;
+        if (this.currentStreamingMessage.contentEl) {
+            this.currentStreamingMessage.contentEl.innerHTML = this._formatMessage(this.currentStreamingMessage.message.content);
         }
+        this._scrollToBottom();
     }
 
     /**
@@ -6,7 +6,7 @@ from typing import Optional, List, Dict, Any
 import sqlite3
 import json
 import uuid
-from database import get_connection
+from database import db_operation, get_connection
 
 
 class SessionDB:
@@ -21,6 +21,7 @@ class SessionDB:
         self.updated_at = updated_at or datetime.now().isoformat()
         self.metadata = metadata or {}
     
+    @db_operation("sessions.save")
     def save(self) -> 'SessionDB':
         """Save session to database (create or update)"""
         with get_connection() as conn:
@@ -36,7 +37,25 @@ class SessionDB:
             
             conn.commit()
         return self
-    
+
+    @staticmethod
+    def set_metadata_value(session_id: str, key: str, value: Any) -> bool:
+        """
+        Set one metadata key in place
+
+        Unlike save(), this doesn't overwrite the rest of the row, so it is
+        safe to call from a background thread while requests update the session.
+        """
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE sessions SET metadata = json_set(COALESCE(metadata, '{}'), ?, json(?))
+                WHERE id=?
+            ''', (f'$.{key}', json.dumps(value), session_id))
+            updated = cursor.rowcount > 0
+            conn.commit()
+        return updated
+
     def delete(self) -> bool:
         """Delete session and all associated traces and steps"""
         with get_connection() as conn:
@@ -145,6 +164,7 @@ class TraceDB:
         self.status = status
         self.metadata = metadata or {}
     
+    @db_operation("traces.save")
     def save(self) -> 'TraceDB':
         """Save trace to database (create or update)"""
         with get_connection() as conn:
@@ -1,11 +1,51 @@
 """
 Database models for tasks and agent steps using SQLite
 """
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Callable
 import sqlite3
 import json
-from database import get_connection, get_next_sort_key
+import logging
+import threading
+from database import db_operation, get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class TaskChangeFeed:
+    """
+    In-process feed of committed task writes
+
+    Every TaskDB write bumps `version` and notifies subscribers once its
+    transaction has committed, so caches derived from task data (e.g. the
+    agent's response cache) know when they are stale.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        """Call callback(change) after every task write"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def publish(self, change_type: str, task_ids: List[int]):
+        """Record a committed write of the given kind to the given tasks"""
+        with self._lock:
+            self.version += 1
+            change = {"version": self.version, "change_type": change_type, "task_ids": list(task_ids)}
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(change)
+            except Exception as e:
+                logger.warning(f"Task change subscriber failed: {e}")
+
+
+# Global task change feed instance
+task_change_feed = TaskChangeFeed()
 
 
 class TaskDB:
@@ -28,6 +68,7 @@ class TaskDB:
         self.started_at = started_at
         self.completed_at = completed_at
     
+    @db_operation("tasks.save")
     def save(self) -> 'TaskDB':
         """Save task to database (create or update)"""
         with get_connection() as conn:
@@ -37,18 +78,21 @@ class TaskDB:
             self.updated_at = now
 
             if self.id is None:
-                # Create new task
-                if self.sort_key is None:
-                    self.sort_key = get_next_sort_key()
-
+                # Create new task; without a sort key, the next one (with a gap of 1000
+                # for reordering) is allocated in the INSERT itself, so concurrent
+                # creates can't read the same MAX(sort_key)
                 cursor.execute('''
                     INSERT INTO tasks (title, description, status, sort_key, project, categories,
                                      created_at, updated_at, started_at, completed_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    SELECT ?, ?, ?, COALESCE(?, (SELECT COALESCE(MAX(sort_key), 0) + 1000 FROM tasks)),
+                           ?, ?, ?, ?, ?, ?
                 ''', (self.title, self.description, self.status, self.sort_key, self.project,
                       json.dumps(self.categories), self.created_at, self.updated_at, self.started_at, self.completed_at))
 
                 self.id = cursor.lastrowid
+                if self.sort_key is None:
+                    cursor.execute('SELECT sort_key FROM tasks WHERE id = ?', (self.id,))
+                    self.sort_key = cursor.fetchone()[0]
 
                 # Log task creation to history
                 self._log_history(cursor, 'title', None, self.title, 'create', now)
@@ -102,6 +146,7 @@ class TaskDB:
                         self._log_history(cursor, field_name, old_value, new_value, change_type, now)
 
             conn.commit()
+        task_change_feed.publish('save', [self.id])
         return self
 
     def _log_history(self, cursor, field_name: str, old_value: Optional[str],
@@ -112,6 +157,7 @@ class TaskDB:
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (self.id, field_name, old_value, new_value, changed_at, change_type))
     
+    @db_operation("tasks.delete")
     def delete(self) -> bool:
         """Delete task from database"""
         if self.id is None:
@@ -128,6 +174,8 @@ class TaskDB:
             deleted = cursor.rowcount > 0
 
             conn.commit()
+        if deleted:
+            task_change_feed.publish('delete', [self.id])
         return deleted
     
     def mark_done(self) -> 'TaskDB':
@@ -168,6 +216,7 @@ class TaskDB:
         }
     
     @classmethod
+    @db_operation("tasks.get_by_id")
     def get_by_id(cls, task_id: int) -> Optional['TaskDB']:
         """Get task by ID"""
         with get_connection() as conn:
@@ -188,6 +237,7 @@ class TaskDB:
             return None
     
     @classmethod
+    @db_operation("tasks.get_all")
     def get_all(cls, status: Optional[str] = None) -> List['TaskDB']:
         """Get all tasks, optionally filtered by status"""
         with get_connection() as conn:
@@ -225,8 +275,94 @@ class TaskDB:
         done_tasks = cls.get_all('done')
         
         return open_tasks, in_progress_tasks, done_tasks
-    
+
+    @classmethod
+    def iter_needing_classification(cls, prompt_version: str, model: str,
+                                    chunk_size: int = 100) -> Iterator[List['TaskDB']]:
+        """Yield chunks of tasks not yet classified by this prompt version and model
+
+        That includes tasks holding keyword fallback categories (no state is
+        recorded for them) and tasks classified by an older prompt or model.
+        Uses keyset pagination over tasks.id with a primary-key probe into
+        task_classification_state per task, so each chunk is a separate short query.
+        """
+        last_id = 0
+        while True:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT t.id, t.title, t.description, t.status, t.sort_key, t.project, t.categories,
+                           t.created_at, t.updated_at, t.started_at, t.completed_at
+                    FROM tasks t
+                    WHERE t.id > ? AND NOT EXISTS (
+                        SELECT 1 FROM task_classification_state s
+                        WHERE s.task_id = t.id AND s.prompt_version = ? AND s.model = ?
+                    )
+                    ORDER BY t.id ASC
+                    LIMIT ?
+                ''', (last_id, prompt_version, model, chunk_size))
+                rows = cursor.fetchall()
+
+            if not rows:
+                return
+            yield [cls(row[0], row[1], row[2], row[3], row[4], row[5], json.loads(row[6]) if row[6] else [],
+                       row[7], row[8], row[9], row[10])
+                   for row in rows]
+            last_id = rows[-1][0]
+
+    @classmethod
+    @db_operation("tasks.bulk_update_categories")
+    def bulk_update_categories(cls, categories_by_id: Dict[int, List[str]], prompt_version: str, model: str,
+                               classified_ids: Optional[Iterable[int]] = None) -> int:
+        """Write classification results for many tasks in one transaction
+
+        Only tasks whose categories changed are updated (with history entries).
+        Tasks in classified_ids (default: all of them) are recorded in
+        task_classification_state so they aren't picked up again until the prompt
+        version or model changes; leave out fallback results so they are retried.
+
+        Returns:
+            Number of tasks whose categories changed
+        """
+        if not categories_by_id:
+            return 0
+
+        classified = set(categories_by_id if classified_ids is None else classified_ids)
+        now = datetime.now().isoformat()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            task_ids = list(categories_by_id)
+            placeholders = ','.join('?' * len(task_ids))
+            cursor.execute(f'SELECT id, categories FROM tasks WHERE id IN ({placeholders})', task_ids)
+            old_categories = dict(cursor.fetchall())
+
+            changed = []
+            for task_id, categories in categories_by_id.items():
+                new_json = json.dumps(categories)
+                if task_id in old_categories and new_json != old_categories[task_id]:
+                    changed.append((task_id, old_categories[task_id], new_json))
+
+            cursor.executemany('UPDATE tasks SET categories=?, updated_at=? WHERE id=?',
+                               [(new_json, now, task_id) for task_id, _, new_json in changed])
+            cursor.executemany('''
+                INSERT INTO task_history (task_id, field_name, old_value, new_value, changed_at, change_type)
+                VALUES (?, 'categories', ?, ?, ?, 'update')
+            ''', [(task_id, old_json, new_json, now) for task_id, old_json, new_json in changed])
+            cursor.executemany('''
+                INSERT INTO task_classification_state (task_id, prompt_version, model, classified_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(task_id) DO UPDATE SET
+                    prompt_version=excluded.prompt_version, model=excluded.model, classified_at=excluded.classified_at
+            ''', [(task_id, prompt_version, model, now) for task_id in old_categories if task_id in classified])
+
+            conn.commit()
+        if changed:
+            task_change_feed.publish('categories', [task_id for task_id, _, _ in changed])
+        return len(changed)
+
     @classmethod
+    @db_operation("tasks.reorder_tasks")
     def reorder_tasks(cls, task_ids: List[int]) -> bool:
         """Reorder tasks by updating their sort_key values with gaps for efficiency"""
         if not task_ids:
@@ -244,9 +380,10 @@ class TaskDB:
                         UPDATE tasks SET sort_key=?, updated_at=?
                         WHERE id=?
                     ''', (new_sort_key, datetime.now().isoformat(), task_id))
-                
+
                 conn.commit()
-                return True
+            task_change_feed.publish('reorder', task_ids)
+            return True
         except Exception as e:
             print(f"Error reordering tasks: {e}")
             return False
@@ -265,6 +402,7 @@ class TaskDB:
         return task.save()
 
     @classmethod
+    @db_operation("tasks.get_history")
     def get_history(cls, task_id: int) -> List[Dict[str, Any]]:
         """Get change history for a specific task"""
         with get_connection() as conn:
@@ -319,6 +457,7 @@ class AgentStepDB:
         self.llm_model = llm_model
         self.error = error
 
+    @db_operation("agent_steps.save")
     def save(self) -> 'AgentStepDB':
         """Save agent step to database (create or update)"""
         with get_connection() as conn:
@@ -416,6 +555,7 @@ class AgentStepDB:
             return None
 
     @classmethod
+    @db_operation("agent_steps.get_by_trace_id")
     def get_by_trace_id(cls, trace_id: str) -> List['AgentStepDB']:
         """Get all steps for a specific trace"""
         with get_connection() as conn:
@@ -448,6 +588,7 @@ class AgentStepDB:
             return steps
 
     @classmethod
+    @db_operation("agent_steps.get_next_step_number")
     def get_next_step_number(cls, trace_id: str) -> int:
         """Get the next step number for a trace"""
         with get_connection() as conn:
@@ -479,3 +620,43 @@ class AgentStepDB:
 
     def __repr__(self) -> str:
         return f"AgentStepDB(id={self.id}, trace_id='{self.trace_id}', step={self.step_number}, type='{self.step_type}')"
+
+
+class IdempotencyKeyDB:
+    """Results recorded under idempotency keys, so a retried agent turn or tool call returns the first result"""
+
+    # Keys older than this are pruned; retries happen within seconds or minutes
+    MAX_AGE_HOURS = 24
+
+    @staticmethod
+    @db_operation("idempotency_keys.get")
+    def get(key: str) -> Optional[Any]:
+        """Result recorded under the key, or None"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT result FROM idempotency_keys WHERE key=?', (key,))
+            row = cursor.fetchone()
+            return json.loads(row[0]) if row else None
+
+    @staticmethod
+    @db_operation("idempotency_keys.put")
+    def put(key: str, scope: str, result: Any) -> Any:
+        """
+        Record a result under the key unless one is already recorded
+
+        Returns:
+            The recorded result (the earlier one if the key was already used)
+        """
+        now = datetime.now()
+        cutoff = (now - timedelta(hours=IdempotencyKeyDB.MAX_AGE_HOURS)).isoformat()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM idempotency_keys WHERE created_at < ?', (cutoff,))
+            cursor.execute('''
+                INSERT OR IGNORE INTO idempotency_keys (key, scope, result, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (key, scope, json.dumps(result), now.isoformat()))
+            cursor.execute('SELECT result FROM idempotency_keys WHERE key=?', (key,))
+            row = cursor.fetchone()
+            conn.commit()
+        return json.loads(row[0])
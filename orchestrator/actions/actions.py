@@ -2,50 +2,52 @@
 Action wrappers for existing services
 """
 import logging
+import os
 from typing import Dict, Any, Optional, Tuple, List, Union
 from utils.http_client import APIClient
+from utils.tracing import span_tracer
 
 logger = logging.getLogger(__name__)
 
+# "inprocess" calls the task service directly; "http" goes through the REST API (remote deployments)
+DEFAULT_TRANSPORT = os.getenv("GISKARD_ACTION_TRANSPORT", "inprocess")
+
+
+def make_action_transport(transport: Optional[str] = None, base_url: str = "http://localhost:5001"):
+    """
+    Create the client actions are executed through
+
+    Both backends expose the APIClient interface and return the REST API's
+    response payloads; the in-process one shares validation with api/routes
+    via utils.task_service.
+
+    Args:
+        transport: "inprocess" or "http" (defaults to GISKARD_ACTION_TRANSPORT)
+        base_url: API base URL for the HTTP transport
+    """
+    transport = (transport or DEFAULT_TRANSPORT).lower()
+    if transport == "http":
+        return APIClient(base_url)
+    if transport == "inprocess":
+        from utils.task_service import task_service
+        return task_service
+    raise ValueError(f"Unknown action transport: {transport}. Valid options: inprocess, http")
+
 
 class ActionExecutor:
-    """Executes actions by calling existing services via HTTP API"""
+    """Executes actions through the task service, in-process or via HTTP API"""
 
-    def __init__(self, base_url: str = "http://localhost:5001"):
+    def __init__(self, base_url: str = "http://localhost:5001", transport: Optional[str] = None):
         self.base_url = base_url
-        self.api_client = APIClient(base_url)
+        self.api_client = make_action_transport(transport, base_url)
     
     def create_task(self, title: str, description: str = "", project: Optional[str] = None,
                    categories: Optional[List[str]] = None) -> Tuple[bool, Dict[str, Any]]:
         """Create a new task"""
         try:
-            # Use HTTP API call instead of direct DB access
+            # Classification is enqueued by the service (or by the API route over HTTP)
             response_data = self.api_client.create_task(title, description, project, categories or [])
-
-            # Enqueue for classification using the returned task data
-            task_data = response_data.get('task', {})
-            task_id = task_data.get('id')
-
-            if task_id:
-                # Create a temporary TaskDB instance for classification (this will be refactored later)
-                from models.task_db import TaskDB
-                task = TaskDB(
-                    id=task_id,
-                    title=task_data.get('title', title),
-                    description=task_data.get('description', description),
-                    project=task_data.get('project'),
-                    categories=task_data.get('categories', categories or []),
-                    status=task_data.get('status', 'open'),
-                    sort_key=task_data.get('sort_key'),
-                    created_at=task_data.get('created_at'),
-                    updated_at=task_data.get('updated_at'),
-                    started_at=task_data.get('started_at'),
-                    completed_at=task_data.get('completed_at')
-                )
-
-                # Enqueue for classification
-                from app import classification_manager
-                classification_manager.enqueue_classification(task)
+            task_id = response_data.get('task', {}).get('id')
 
             return True, {
                 "task_id": task_id,
@@ -59,7 +61,6 @@ class ActionExecutor:
     def update_task_status(self, task_id: int, status: str) -> Tuple[bool, Dict[str, Any]]:
         """Update task status"""
         try:
-            # Use HTTP API call instead of direct DB access
             response_data = self.api_client.update_task_status(task_id, status)
 
             return True, {
@@ -74,7 +75,6 @@ class ActionExecutor:
     def reorder_tasks(self, task_ids: List[int]) -> Tuple[bool, Dict[str, Any]]:
         """Reorder tasks"""
         try:
-            # Use HTTP API call instead of direct DB access
             response_data = self.api_client.reorder_tasks(task_ids)
 
             return True, {
@@ -99,7 +99,6 @@ class ActionExecutor:
             completed_at_period: Period string to filter tasks by completion period
         """
         try:
-            # Use HTTP API call instead of direct DB access
             response_data = self.api_client.get_tasks(status, completed_at_gte, completed_at_lt, completed_at_period)
 
             # Extract tasks from the response format
@@ -134,7 +133,6 @@ class ActionExecutor:
             started_at: ISO timestamp for start date (optional)
         """
         try:
-            # Use HTTP API call - now supports updating completion/start dates directly
             response_data = self.api_client.update_task(
                 task_id, title, description, project, categories, completed_at, started_at
             )
@@ -154,6 +152,12 @@ class ActionExecutor:
     
     def execute_action(self, action_name: str, args: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
         """Execute an action by name with arguments"""
+        with span_tracer.span(f"tool.{action_name}", transport=type(self.api_client).__name__) as span:
+            success, result = self._execute_action(action_name, args)
+            span.set_attribute("success", success)
+        return success, result
+
+    def _execute_action(self, action_name: str, args: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
         try:
             if action_name == "create_task":
                 return self.create_task(
@@ -0,0 +1,90 @@
+"""
+Speculative prefetch of read actions while the planner LLM runs
+"""
+import contextvars
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from .actions import ActionExecutor
+from utils.tracing import span_tracer
+
+logger = logging.getLogger(__name__)
+
+# Shared pool for prefetches; reads are short HTTP calls, so two workers suffice
+_prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="action-prefetch")
+
+
+class TaskPrefetch:
+    """
+    Fetches all tasks in the background so a planned fetch_tasks can reuse them
+
+    Started before the planner call on turns the router expects to read tasks.
+    A planned fetch_tasks is served from the prefetch when its arguments are
+    empty or only filter by status (filtered locally); any other arguments,
+    or a failed prefetch, fall back to executing the action normally.
+    """
+
+    def __init__(self, action_executor: ActionExecutor):
+        self.action_executor = action_executor
+        self.started_at = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.used = False
+        self._future: Future = _prefetch_pool.submit(contextvars.copy_context().run, self._fetch)
+
+    def _fetch(self) -> Tuple[bool, Dict[str, Any]]:
+        try:
+            with span_tracer.span("prefetch.fetch_tasks"):
+                return self.action_executor.fetch_tasks()
+        finally:
+            self.duration_ms = (time.perf_counter() - self.started_at) * 1000
+
+    def serves(self, action_name: str, args: Dict[str, Any]) -> bool:
+        """Whether the prefetched tasks can answer this action"""
+        if action_name != "fetch_tasks":
+            return False
+        return all(value in (None, "", []) for key, value in args.items() if key != "status")
+
+    def result(self, timeout: float = 10.0) -> Optional[Tuple[bool, Dict[str, Any]]]:
+        """All tasks as fetched, or None if the prefetch failed"""
+        try:
+            success, result = self._future.result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Task prefetch unusable, fetching normally: {e}")
+            return None
+        return (success, result) if success else None
+
+    def take(self, action_name: str, args: Dict[str, Any], timeout: float = 10.0) -> Optional[Tuple[bool, Dict[str, Any]]]:
+        """
+        Result for the action from the prefetch, or None to execute it normally
+
+        Args:
+            action_name: Planned action name
+            args: Planned action arguments
+            timeout: Seconds to wait for a prefetch that is still running
+        """
+        if not self.serves(action_name, args):
+            return None
+        prefetched = self.result(timeout)
+        if prefetched is None:
+            return None
+        success, result = prefetched
+
+        tasks = result.get("tasks", [])
+        status = args.get("status")
+        if status:
+            statuses = {status} if isinstance(status, str) else set(status)
+            tasks = [task for task in tasks if task.get("status") in statuses]
+
+        self.used = True
+        return True, {
+            "tasks": tasks,
+            "count": len(tasks),
+            "message": f"Fetched {len(tasks)} tasks"
+        }
+
+    def cancel(self):
+        """Drop the prefetch if it has not started yet"""
+        self._future.cancel()
+
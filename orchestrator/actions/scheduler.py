@@ -0,0 +1,154 @@
+"""
+Dependency-aware concurrent execution of planner actions
+"""
+import contextvars
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Access modes: appends create tasks, in planner order so ids and sort keys follow it
+READ, WRITE, APPEND = "read", "write", "append"
+
+# Actions that write one task, identified by their task_id argument
+SINGLE_TASK_WRITES = frozenset({"update_task", "update_task_status"})
+
+# Keys for the whole task list and for not-yet-existing tasks
+ALL_TASKS = "*"
+NEW_TASKS = "+"
+
+
+@dataclass
+class ActionOutcome:
+    """Result and timing of one scheduled action"""
+    index: int
+    name: str
+    args: Dict[str, Any]
+    success: bool = False
+    result: Dict[str, Any] = field(default_factory=dict)
+    depends_on: List[int] = field(default_factory=list)
+    started_ms: float = 0.0  # Offset from the start of the batch
+    duration_ms: float = 0.0
+
+    def timing(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "depends_on": self.depends_on,
+            "started_ms": round(self.started_ms, 1),
+            "duration_ms": round(self.duration_ms, 1)
+        }
+
+
+def _footprint(name: str, args: Dict[str, Any]) -> Tuple[str, Set[Any]]:
+    """(access mode, keys touched) for an action"""
+    if name == "no_op":
+        return READ, set()
+    if name == "fetch_tasks":
+        return READ, {ALL_TASKS}
+    if name == "create_task":
+        return APPEND, {NEW_TASKS}
+    if name in SINGLE_TASK_WRITES and args.get("task_id") is not None:
+        return WRITE, {args["task_id"]}
+    # reorder_tasks changes every sort key; anything unknown is assumed to touch everything
+    return WRITE, {ALL_TASKS}
+
+
+def is_read_action(name: str, args: Dict[str, Any]) -> bool:
+    """Whether an action only reads, so repeating it has no side effects"""
+    return _footprint(name, args)[0] == READ
+
+
+def _conflicts(a: Tuple[str, Set[Any]], b: Tuple[str, Set[Any]]) -> bool:
+    (mode_a, keys_a), (mode_b, keys_b) = a, b
+    if mode_a == mode_b == READ:
+        return False
+    if not keys_a or not keys_b:
+        return False
+    return bool(keys_a & keys_b) or ALL_TASKS in keys_a or ALL_TASKS in keys_b
+
+
+def plan_dependencies(actions: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Indexes of the earlier actions each action must wait for
+
+    Reads run together and updates to different tasks run together; a fetch
+    waits for earlier writes (and vice versa) so "create, then fetch" still
+    sees the new task, and writes to the same task keep planner order. Creates
+    run one after another, so new tasks get ids and sort keys in planner order.
+    """
+    footprints = [_footprint(a.get("name", "no_op"), a.get("args", {}) or {}) for a in actions]
+    return [[j for j in range(i) if _conflicts(footprints[i], footprints[j])] for i in range(len(actions))]
+
+
+class ActionScheduler:
+    """
+    Runs planner actions concurrently on a bounded pool, respecting dependencies
+
+    Actions start as soon as every earlier action they conflict with has
+    finished (see plan_dependencies), so reads and independent writes overlap
+    while writes to the same task keep planner order. Outcomes are returned in
+    planner order regardless of completion order.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="action")
+
+    def run(self, actions: List[Dict[str, Any]],
+            execute: Callable[[str, Dict[str, Any]], Tuple[bool, Dict[str, Any]]]) -> List[ActionOutcome]:
+        """
+        Execute the actions
+
+        Args:
+            actions: Planner actions ({"name": ..., "args": {...}})
+            execute: Called as execute(name, args) -> (success, result); exceptions
+                are turned into failed outcomes
+
+        Returns:
+            One ActionOutcome per action, in planner order
+        """
+        dependencies = plan_dependencies(actions)
+        outcomes = [
+            ActionOutcome(index=i, name=a.get("name", "no_op"), args=a.get("args", {}) or {}, depends_on=dependencies[i])
+            for i, a in enumerate(actions)
+        ]
+        batch_started = time.perf_counter()
+
+        def run_one(outcome: ActionOutcome) -> ActionOutcome:
+            started = time.perf_counter()
+            outcome.started_ms = (started - batch_started) * 1000
+            try:
+                outcome.success, outcome.result = execute(outcome.name, outcome.args)
+            except Exception as e:
+                logger.error(f"Action {outcome.name} failed: {str(e)}")
+                outcome.success, outcome.result = False, {"error": str(e)}
+            outcome.duration_ms = (time.perf_counter() - started) * 1000
+            return outcome
+
+        # Nothing to overlap: skip the thread hand-off
+        if len(actions) <= 1 or self.max_workers <= 1:
+            return [run_one(outcome) for outcome in outcomes]
+
+        done: Set[int] = set()
+        pending = {}
+        waiting = list(range(len(outcomes)))
+        while waiting or pending:
+            for i in [i for i in waiting if all(d in done for d in dependencies[i])]:
+                waiting.remove(i)
+                # In a copy of this thread's context, so spans started by the action nest under the turn's
+                pending[self._pool.submit(contextvars.copy_context().run, run_one, outcomes[i])] = i
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done.add(pending.pop(future))
+
+        total_ms = (time.perf_counter() - batch_started) * 1000
+        logger.info(f"Executed {len(actions)} actions in {total_ms:.0f}ms "
+                    f"(sequential would be ~{sum(o.duration_ms for o in outcomes):.0f}ms)")
+        return outcomes
+
+
+# Global action scheduler instance
+action_scheduler = ActionScheduler()
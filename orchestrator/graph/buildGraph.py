@@ -1,26 +1,41 @@
 """
 Build the LangGraph-style orchestrator graph
 """
+import uuid
 from typing import Dict, Any
-from .state import AgentState
-from .nodes import GraphNodes
+from .state import (AgentState, RunStartedEvent, LLMMessageEvent, ActionCallEvent, ActionResultEvent,
+                    FinalMessageEvent, RunCompletedEvent, AgentEventType)
+from ..langgraph_orchestrator import get_orchestrator
+from ..pipeline.engine import Pipeline, TurnContext, new_turn_state
+from ..pipeline.nodes import FALLBACK_RESPONSE, ActionNode, IngestNode, RouterPlannerNode, SynthesizerNode
 
 
 class OrchestratorGraph:
-    """LangGraph-style orchestrator with 4 nodes"""
-    
+    """
+    LangGraph-style orchestrator with 4 nodes
+
+    Runs the shared turn pipeline (ingest, router planner, scheduled
+    actions, synthesizer) and reports the turn as a list of agent events.
+    """
+
     def __init__(self):
-        self.nodes = GraphNodes()
-    
+        self.orchestrator = get_orchestrator()
+        self.pipeline = Pipeline("graph.run", [
+            IngestNode(),
+            RouterPlannerNode("planner_llm"),
+            ActionNode(),
+            SynthesizerNode(fallback_on_error=True)
+        ])
+
     def run(self, input_text: str, session_id: str = None, domain: str = None) -> Dict[str, Any]:
         """
         Run the orchestrator graph with the given input
-        
+
         Args:
             input_text: User input text
             session_id: Optional session ID
             domain: Optional domain context
-            
+
         Returns:
             Dictionary with events, final_message, and state_patch
         """
@@ -28,27 +43,54 @@ class OrchestratorGraph:
         state = AgentState(
             input_text=input_text,
             session_id=session_id,
-            domain=domain
+            domain=domain,
+            run_id=str(uuid.uuid4())
         )
-        
+        state.add_event(RunStartedEvent(type=AgentEventType.RUN_STARTED, run_id=state.run_id, input_text=input_text))
+
         try:
-            # Execute the 4 nodes in sequence
-            state = self.nodes.ingest_user_input(state)
-            state = self.nodes.planner_llm(state)
-            state = self.nodes.action_exec(state)
-            state = self.nodes.synthesizer_llm(state)
-            
+            turn_state = new_turn_state(input_text, session_id, domain, session_id or f"run-{state.run_id}", run_id=state.run_id)
+            final_state = self.pipeline.run(turn_state, TurnContext(self.orchestrator), self.orchestrator.workflow_timeout)
+            self._add_turn_events(state, final_state)
+
             # Return response
             return state.to_response_dict()
-            
+
         except Exception as e:
             # Handle any errors in the graph execution
-            from .state import RunCompletedEvent, AgentEventType
             error_event = RunCompletedEvent(type=AgentEventType.RUN_COMPLETED, status="error", error=str(e))
             state.add_event(error_event)
-            
+
             # Set fallback final message
             if not state.final_message:
-                state.final_message = "I'm sorry, I encountered an error processing your request. Please try again."
-            
+                state.final_message = FALLBACK_RESPONSE
+
             return state.to_response_dict()
+
+    @staticmethod
+    def _add_turn_events(state: AgentState, turn_state: Dict[str, Any]):
+        """Report a completed pipeline turn as agent events"""
+        state.planner_output = turn_state["planner_output"]
+        state.actions_to_execute = turn_state["actions_to_execute"]
+        state.action_results = turn_state["action_results"]
+        state.final_message = turn_state["final_message"]
+
+        state.add_event(LLMMessageEvent(
+            type=AgentEventType.LLM_MESSAGE,
+            node="planner",
+            content=f"Router selected tool: {(state.planner_output or {}).get('tool_name', 'unknown')}"
+        ))
+        for action in state.actions_to_execute:
+            state.add_event(ActionCallEvent(type=AgentEventType.ACTION_CALL, name=action.get("name", "no_op"), args=action.get("args", {})))
+        for result in state.action_results:
+            state.add_event(ActionResultEvent(type=AgentEventType.ACTION_RESULT, name=result["name"], ok=result["ok"],
+                                              result=result["result"], error=result["error"]))
+
+        if turn_state.get("error"):
+            state.add_event(FinalMessageEvent(type=AgentEventType.FINAL_MESSAGE, content=state.final_message))
+            state.add_event(RunCompletedEvent(type=AgentEventType.RUN_COMPLETED, status="error", error=turn_state["error"]))
+            return
+        state.synthesizer_output = state.final_message
+        state.add_event(LLMMessageEvent(type=AgentEventType.LLM_MESSAGE, node="synthesizer", content=state.final_message))
+        state.add_event(FinalMessageEvent(type=AgentEventType.FINAL_MESSAGE, content=state.final_message))
+        state.add_event(RunCompletedEvent(type=AgentEventType.RUN_COMPLETED, status="ok"))
@@ -1,383 +1,176 @@
 """
 LangGraph-based orchestrator for Giskard agent
 """
-from typing import Dict, Any, List, Optional, TypedDict, Annotated
-from langgraph.graph import StateGraph, END
-from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
-from langchain_openai import ChatOpenAI
-import json
+from typing import Dict, Any, Iterator, Tuple
+import hashlib
 import logging
-from datetime import datetime
+import threading
 from .actions.actions import ActionExecutor
 from .tools.router import Router
-from .tools.tool_registry import ToolRegistry
-from models.task_db import AgentStepDB
+from .tools.catalog import get_tool_catalog
+from .pipeline.engine import Pipeline, TurnContext, TurnState, end_root_span, new_turn_state, record_step, start_root_span
+from .pipeline.llm import create_agent_llm
+from .pipeline.nodes import IngestNode, RouterPlannerNode, SynthesizerNode, ToolNode
+from .runtime.turn_runner import TURN_TIMEOUT_SECONDS, TurnRejected, TurnTimeout
+from models.task_db import IdempotencyKeyDB
 from config.langfuse_config import langfuse_config
+from utils.agent_metrics import orchestrator_run_seconds
+from utils.prometheus import timed
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
 
-class AgentState(TypedDict):
-    """State for the LangGraph agent"""
-    messages: Annotated[List[BaseMessage], add_messages]
-    input_text: str
-    session_id: Optional[str]
-    domain: Optional[str]
-    trace_id: Optional[str]
-    current_step: int
-    router_output: Optional[Dict[str, Any]]
-    tool_name: Optional[str]
-    tool_args: Optional[Dict[str, Any]]
-    tool_result: Optional[str]
-    final_message: Optional[str]
-
-
 class LangGraphOrchestrator:
-    """LangGraph-based orchestrator with proper state management"""
+    """
+    Agent services (LLM, router, actions) and the /step entry point
+
+    /step turns run the step pipeline: ingest, single-tool router, tool
+    execution and the streaming synthesizer (see orchestrator.pipeline).
+    """
     
     def __init__(self):
-        # Use OpenAI-compatible format for proper Langfuse token counting
-        self.llm = ChatOpenAI(
-            model="gemma3:4b",
-            base_url="http://localhost:11434/v1",  # OpenAI-compatible endpoint
-            api_key="ollama"  # Dummy key for Ollama
-        )
+        self.llm = create_agent_llm()
         self.action_executor = ActionExecutor()
         self.router = Router()
-        self.tool_registry = ToolRegistry()
+        self.tool_registry = get_tool_catalog().tool_registry
         self.tools = self.tool_registry.get_tools()
-        self.tool_node = ToolNode(self.tools)
-        self.graph = self._build_graph()
-        # Set a reasonable timeout for the entire workflow (90 seconds)
-        self.workflow_timeout = 90
-    
-    def _log_node(self, state: AgentState, step_type: str, input_data: Dict[str, Any],
-                  output_data: Dict[str, Any] = None, rendered_prompt: str = None,
-                  llm_input: Dict[str, Any] = None, llm_output: str = None, error: str = None):
-        """Log each node execution to database"""
-        # Ensure trace_id and step_number are set
-        trace_id = state.get("trace_id") or state.get("session_id") or "default-trace"
-        step_number = state.get("current_step", 1)
-
-        # Create database entry
-        AgentStepDB.create(
-            trace_id=trace_id,
-            step_number=step_number,
-            step_type=step_type,
-            input_data=input_data,
-            output_data=output_data or {},
-            rendered_prompt=rendered_prompt,
-            llm_input=llm_input or {},
-            llm_output=llm_output,
-            error=error
-        )
-
-        # Also log to console for debugging
-        logger.info(f"[{step_type}] Trace: {trace_id}, Step: {step_number}")
-        if output_data:
-            logger.info(f"[{step_type}] Output: {json.dumps(output_data, indent=2)}")
-        if error:
-            logger.error(f"[{step_type}] Error: {error}")
-    
-    def _build_graph(self) -> StateGraph:
-        """Build the LangGraph workflow"""
-        # Create the state graph
-        workflow = StateGraph(AgentState)
-        
-        # Add nodes
-        workflow.add_node("ingest_user_input", self._ingest_user_input)
-        workflow.add_node("router_llm", self._router_llm)
-        workflow.add_node("tool_exec", self._tool_exec)
-        workflow.add_node("synthesizer_llm", self._synthesizer_llm)
-        
-        # Define the flow
-        workflow.set_entry_point("ingest_user_input")
-        workflow.add_edge("ingest_user_input", "router_llm")
-        workflow.add_edge("router_llm", "tool_exec")
-        workflow.add_edge("tool_exec", "synthesizer_llm")
-        workflow.add_edge("synthesizer_llm", END)
-        
-        return workflow.compile()
-    
-    def _ingest_user_input(self, state: AgentState) -> AgentState:
-        """Node 1: Ingest user input"""
-        input_data = {
-            "input_text": state["input_text"],
-            "session_id": state.get("session_id"),
-            "domain": state.get("domain")
-        }
-
-        logger.info(f"Processing input: {state['input_text']}")
-
-        # Add user message to conversation
-        state["messages"].append(HumanMessage(content=state["input_text"]))
-
-        output_data = {
-            "messages_count": len(state["messages"]),
-            "user_message_added": True
-        }
+        self.step_pipeline = Pipeline("agent.step", [
+            IngestNode(),
+            RouterPlannerNode("router_llm"),
+            ToolNode(),
+            SynthesizerNode(fallback_on_error=True)
+        ])
+        # Total budget for a turn; nodes get a share of it (see NODE_BUDGET_SHARES)
+        self.workflow_timeout = TURN_TIMEOUT_SECONDS
+
+    @staticmethod
+    def _turn_idempotency_key(idempotency_key: str) -> str:
+        return f"{idempotency_key}:turn"
+
+    def _start_workflow(self, input_text: str, session_id: str = None, domain: str = None,
+                        idempotency_key: str = None) -> Tuple[TurnState, TurnContext]:
+        """Build the initial state and context for a run and log the workflow start"""
+        import time
 
-        self._log_node(state, "ingest_user_input", input_data, output_data)
-        return state
-    
-    def _router_llm(self, state: AgentState) -> AgentState:
-        """Node 2: Route to appropriate tool using structured router"""
-        # Increment step counter
-        state["current_step"] += 1
+        # Generate trace_id if not provided
+        trace_id = session_id or f"chat-{int(time.time())}"
+        initial_state = new_turn_state(input_text, session_id, domain, trace_id, idempotency_key=idempotency_key)
+        record_step(initial_state, "workflow_start", input_data={
+            "input_text": input_text,
+            "session_id": session_id,
+            "domain": domain,
+            "idempotency_key": idempotency_key
+        })
 
-        input_data = {
-            "input_text": state["input_text"],
-            "messages_count": len(state["messages"])
-        }
+        # Langfuse needs 32 hex chars for a trace id
+        trace_context = langfuse_config.create_trace_context(
+            name="agent.step",
+            trace_id=hashlib.md5(trace_id.encode()).hexdigest(),
+            user_id=session_id,
+            input_data={"input_text": input_text, "session_id": session_id, "domain": domain}
+        )
+        root_span = start_root_span("agent.step", trace_context, {"input_text": input_text, "session_id": session_id, "domain": domain})
+        return initial_state, TurnContext(self, root_span)
+
+    def run_stream(self, input_text: str, session_id: str = None, domain: str = None,
+                   idempotency_key: str = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Run the step pipeline, yielding events as it progresses
+
+        Yields ("step", ...) when a node completes, ("token", ...) for each
+        synthesizer token and a final ("done", ...) or ("error", ...) with the
+        same payload run() returns. The graph runs on the turn runner: closing
+        the generator cancels the turn, as does exceeding workflow_timeout.
+        A retry with the same idempotency_key resumes the turn (see run()).
+        """
+        if idempotency_key:
+            recorded = IdempotencyKeyDB.get(self._turn_idempotency_key(idempotency_key))
+            if recorded is not None:
+                yield "done", recorded
+                return
+
+        initial_state, turn = self._start_workflow(input_text, session_id, domain, idempotency_key)
+        trace_id = initial_state["trace_id"]
+        final_state = initial_state
 
         try:
-            # Use the structured router to get tool decision with Langfuse tracing
-            router_output = self.router.plan_actions(
-                state["input_text"],
-                trace_id=state.get("trace_id"),
-                user_id=state.get("session_id")
-            )
-            
-            # Store router output in state
-            state["router_output"] = router_output
-            state["tool_name"] = router_output["tool_name"]
-            state["tool_args"] = router_output["tool_args"]
-
-            # Add assistant message to conversation
-            state["messages"].append(AIMessage(content=router_output["assistant_text"]))
-
-            output_data = {
-                "router_output": router_output,
-                "tool_name": state["tool_name"],
-                "tool_args": state["tool_args"],
-                "routing_success": True
+            events = self.step_pipeline.stream(initial_state, turn, self.workflow_timeout, thread_id=idempotency_key)
+            for event, payload in events:
+                if event == "state":
+                    final_state = payload
+                else:
+                    yield event, payload
+
+            end_root_span(turn.root_span, {"final_message": final_state.get("final_message")})
+            response = {
+                "success": True,
+                "message": "Agent step completed",
+                "final_message": final_state.get("final_message"),
+                "trace_id": trace_id,
+                "current_step": final_state.get("current_step")
             }
+            if idempotency_key:
+                response = IdempotencyKeyDB.put(self._turn_idempotency_key(idempotency_key), "turn", response)
+            yield "done", response
 
-            self._log_node(state, "router_llm", input_data, output_data)
-            return state
+        except (TurnTimeout, TurnRejected) as e:
+            logger.error(f"LangGraph execution stopped: {e}")
+            end_root_span(turn.root_span, {"final_message": final_state.get("final_message")}, error=str(e))
+            yield "error", self._stopped_response(e, trace_id)
 
         except Exception as e:
-            logger.error(f"Error in router_llm: {str(e)}")
-            # Fallback
-            state["router_output"] = {
-                "assistant_text": "I'm sorry, I encountered an error processing your request.",
-                "tool_name": "no_op",
-                "tool_args": {}
-            }
-            state["tool_name"] = "no_op"
-            state["tool_args"] = {}
-
-            output_data = {
-                "error": str(e),
-                "fallback_used": True
-            }
-
-            self._log_node(state, "router_llm", input_data, output_data, error=str(e))
-            return state
-    
-    def _tool_exec(self, state: AgentState) -> AgentState:
-        """Node 3: Execute tool using ToolNode"""
-        # Increment step counter
-        state["current_step"] += 1
-
-        input_data = {
-            "tool_name": state["tool_name"],
-            "tool_args": state["tool_args"]
-        }
-
-        try:
-            # Execute the tool using the router's execute_tool method
-            tool_result = self.router.execute_tool(state["tool_name"], state["tool_args"])
-            state["tool_result"] = tool_result
-
-            # Add tool result to conversation
-            state["messages"].append(AIMessage(content=tool_result))
-
-            output_data = {
-                "tool_name": state["tool_name"],
-                "tool_args": state["tool_args"],
-                "tool_result": tool_result,
-                "execution_success": True
+            logger.error(f"LangGraph execution failed: {str(e)}")
+            end_root_span(turn.root_span, {"final_message": final_state.get("final_message")}, error=str(e))
+            yield "error", {
+                "success": False,
+                "message": f"Agent step failed: {str(e)}",
+                "final_message": "I'm sorry, I encountered an error processing your request. Please try again.",
+                "trace_id": trace_id
             }
 
-            self._log_node(state, "tool_exec", input_data, output_data)
-            return state
-
-        except Exception as e:
-            logger.error(f"Error in tool_exec: {str(e)}")
-            error_msg = f"❌ Error executing {state['tool_name']}: {str(e)}"
-            state["tool_result"] = error_msg
-            state["messages"].append(AIMessage(content=error_msg))
-
-            output_data = {
-                "error": str(e),
-                "tool_result": error_msg,
-                "execution_success": False
+    @staticmethod
+    def _stopped_response(error: Exception, trace_id: str) -> Dict[str, Any]:
+        """Response for a turn that timed out or never got a slot"""
+        if isinstance(error, TurnRejected):
+            return {
+                "success": False,
+                "message": "Agent busy",
+                "final_message": "I'm still working on other requests. Please try again in a moment.",
+                "trace_id": trace_id
             }
-
-            self._log_node(state, "tool_exec", input_data, output_data, error=str(e))
-            return state
-    
-    def _synthesizer_llm(self, state: AgentState) -> AgentState:
-        """Node 4: Synthesize final response"""
-        # Increment step counter
-        state["current_step"] += 1
-
-        input_data = {
-            "tool_result": state.get("tool_result"),
-            "router_output": state.get("router_output"),
-            "input_text": state["input_text"]
+        return {
+            "success": False,
+            "message": "Agent step timed out",
+            "final_message": "I'm taking longer than expected to process your request. Please try with a simpler request or try again later.",
+            "trace_id": trace_id
         }
 
-        try:
-            # Load synthesizer prompt from registry
-            from config.prompts import get_synthesizer_prompt
-            tool_result_str = state.get("tool_result", "No result")
-            full_prompt = get_synthesizer_prompt(state["input_text"], tool_result_str)
-
-            # Create messages
-            system_msg = SystemMessage(content=full_prompt)
-            messages = [system_msg]
-
-            # Get Langfuse callback handler for synthesizer
-            langfuse_handler = langfuse_config.get_callback_handler(
-                trace_id=state.get("trace_id"),
-                user_id=state.get("session_id")
-            )
-
-            # Call LLM with Langfuse tracing
-            if langfuse_handler:
-                response_message = self.llm.invoke(
-                    messages,
-                    config={"callbacks": [langfuse_handler]}
-                )
-            else:
-                response_message = self.llm.invoke(messages)
-
-            # Extract content from AIMessage
-            response = response_message.content if hasattr(response_message, 'content') else str(response_message)
-            
-            # Add AI message to conversation
-            state["messages"].append(AIMessage(content=response))
-            state["final_message"] = response
-
-            output_data = {
-                "final_message": response,
-                "messages_count": len(state["messages"]),
-                "synthesis_success": True
-            }
-
-            self._log_node(state, "synthesizer_llm", input_data, output_data,
-                          rendered_prompt=full_prompt, llm_input={"messages": [{"type": msg.__class__.__name__, "content": msg.content} for msg in messages]},
-                          llm_output=response)
-            return state
-
-        except Exception as e:
-            logger.error(f"Error in synthesizer_llm: {str(e)}")
-            fallback_response = "I'm sorry, I encountered an error processing your request. Please try again."
-            state["final_message"] = fallback_response
-            state["messages"].append(AIMessage(content=fallback_response))
-
-            output_data = {
-                "error": str(e),
-                "fallback_response": fallback_response,
-                "synthesis_success": False
-            }
-
-            self._log_node(state, "synthesizer_llm", input_data, output_data, error=str(e))
-            return state
-    
-    def run(self, input_text: str, session_id: str = None, domain: str = None) -> Dict[str, Any]:
-        """Run the LangGraph workflow with timeout handling"""
-        import threading
-        import time
-
-        # Generate trace_id if not provided
-        trace_id = session_id or f"chat-{int(time.time())}"
-
-        # Get next step number for this trace
-        next_step = AgentStepDB.get_next_step_number(trace_id)
-
-        # Log workflow start
-        initial_state = AgentState(
-            messages=[],
-            input_text=input_text,
-            session_id=session_id,
-            domain=domain,
-            trace_id=trace_id,
-            current_step=next_step,
-            router_output=None,
-            tool_name=None,
-            tool_args=None,
-            tool_result=None,
-            final_message=None
-        )
-
-        self._log_node(initial_state, "workflow_start", {
-            "input_text": input_text,
-            "session_id": session_id,
-            "domain": domain
-        })
+    @traced("agent.step.run")
+    @timed(orchestrator_run_seconds, orchestrator="langgraph")
+    def run(self, input_text: str, session_id: str = None, domain: str = None,
+            idempotency_key: str = None) -> Dict[str, Any]:
+        """Run the step pipeline on the turn runner, cancelling it on timeout
+
+        With an idempotency_key, a client retrying a failed or timed-out turn
+        doesn't pay for it twice: the turn resumes after its last completed
+        node, tools with side effects that already ran aren't repeated, and a
+        retry of a completed turn returns the recorded response.
+        """
+        if idempotency_key:
+            recorded = IdempotencyKeyDB.get(self._turn_idempotency_key(idempotency_key))
+            if recorded is not None:
+                logger.info(f"Turn {idempotency_key} already completed, returning its response")
+                return recorded
+
+        initial_state, turn = self._start_workflow(input_text, session_id, domain, idempotency_key)
+        trace_id = initial_state["trace_id"]
+        next_step = initial_state["current_step"]
 
         try:
-            
-            # Run the graph with timeout using threading
-            result = {"success": False, "final_state": None, "error": None}
-            
-            def run_graph():
-                try:
-                    final_state = self.graph.invoke(initial_state)
-                    result["success"] = True
-                    result["final_state"] = final_state
-                except Exception as e:
-                    result["error"] = str(e)
-            
-            # Start the graph execution in a thread
-            thread = threading.Thread(target=run_graph)
-            thread.daemon = True
-            thread.start()
-            
-            # Wait for completion with timeout
-            thread.join(timeout=self.workflow_timeout)
-            
-            if thread.is_alive():
-                # Timeout occurred
-                logger.error("LangGraph execution timed out")
-                return {
-                    "success": False,
-                    "message": "Agent step timed out",
-                    "final_message": "I'm taking longer than expected to process your request. Please try with a simpler request or try again later.",
-                    "state_patch": {
-                        "session_id": session_id,
-                        "domain": domain
-                    }
-                }
-            
-            if not result["success"]:
-                # Error occurred during execution
-                logger.error(f"LangGraph execution failed: {result['error']}")
-                return {
-                    "success": False,
-                    "message": f"Agent step failed: {result['error']}",
-                    "final_message": "I'm sorry, I encountered an error processing your request. Please try again.",
-                    "trace_id": trace_id,
-                    "state_patch": {
-                        "session_id": session_id,
-                        "domain": domain,
-                        "trace_id": trace_id,
-                        "current_step": next_step
-                    }
-                }
-            
-            # Success - convert to response format
-            final_state = result["final_state"]
+            final_state = self.step_pipeline.run(initial_state, turn, self.workflow_timeout, thread_id=idempotency_key)
+            end_root_span(turn.root_span, {"final_message": final_state["final_message"]})
 
-            # Flush Langfuse events
-            langfuse_config.flush()
-
-            return {
+            response = {
                 "success": True,
                 "message": "Agent step completed",
                 "final_message": final_state["final_message"],
@@ -391,9 +184,23 @@ class LangGraphOrchestrator:
                     "messages": [msg.content for msg in final_state["messages"]]
                 }
             }
-            
+            if idempotency_key:
+                response = IdempotencyKeyDB.put(self._turn_idempotency_key(idempotency_key), "turn", response)
+            return response
+
+        except (TurnTimeout, TurnRejected) as e:
+            logger.error(f"LangGraph execution stopped: {e}")
+            end_root_span(turn.root_span, {}, error=str(e))
+            response = self._stopped_response(e, trace_id)
+            response["state_patch"] = {
+                "session_id": session_id,
+                "domain": domain
+            }
+            return response
+
         except Exception as e:
             logger.error(f"LangGraph execution failed: {str(e)}")
+            end_root_span(turn.root_span, {}, error=str(e))
             return {
                 "success": False,
                 "message": f"Agent step failed: {str(e)}",
@@ -406,3 +213,17 @@ class LangGraphOrchestrator:
                     "current_step": next_step
                 }
             }
+
+
+_orchestrator = None
+_orchestrator_lock = threading.Lock()
+
+
+def get_orchestrator() -> LangGraphOrchestrator:
+    """The process-wide orchestrator, created on first use"""
+    global _orchestrator
+    if _orchestrator is None:
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                _orchestrator = LangGraphOrchestrator()
+    return _orchestrator
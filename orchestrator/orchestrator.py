@@ -7,6 +7,7 @@ from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableParallel
+import asyncio
 import json
 import logging
 from datetime import datetime
@@ -14,8 +15,13 @@ from datetime import datetime
 from .tools.router import Router
 from .tools.tool_registry import ToolRegistry
 from .config.router_config import RouterConfigManager
+from .runtime.turn_runner import TurnRejected, TurnTimeout, turn_runner, with_node_deadline
 from models.task_db import AgentStepDB
 from config.langfuse_config import langfuse_config
+from utils.agent_metrics import node_seconds, orchestrator_run_seconds
+from utils.ollama_client import ollama_client
+from utils.prometheus import timed
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -120,7 +126,9 @@ class Orchestrator:
     
     def _create_router_chain(self):
         """Create the router chain using LCEL"""
-        def router_llm(state: AgentState) -> AgentState:
+        @traced("node.router_llm")
+        @timed(node_seconds, pipeline="orchestrator", node="router_llm")
+        async def router_llm(state: AgentState) -> AgentState:
             """Node 2: Route to appropriate tool using structured router"""
             # Increment step counter
             state["current_step"] += 1
@@ -132,11 +140,11 @@ class Orchestrator:
 
             try:
                 # Use the idiomatic router to get tool decision with Langfuse tracing
-                router_output = self.router.plan_actions(
-                    state["input_text"], 
+                router_output = await with_node_deadline("router_llm", self.router.aplan_actions(
+                    state["input_text"],
                     trace_id=state.get("trace_id"),
                     user_id=state.get("session_id")
-                )
+                ))
                 
                 # Store router output in state
                 state["router_output"] = router_output
@@ -179,7 +187,9 @@ class Orchestrator:
     
     def _create_tool_execution_chain(self):
         """Create the tool execution chain using LCEL"""
-        def tool_exec(state: AgentState) -> AgentState:
+        @traced("node.tool_exec")
+        @timed(node_seconds, pipeline="orchestrator", node="tool_exec")
+        async def tool_exec(state: AgentState) -> AgentState:
             """Node 3: Execute tool using proper error handling"""
             # Increment step counter
             state["current_step"] += 1
@@ -191,7 +201,9 @@ class Orchestrator:
 
             try:
                 # Execute the tool using the router's execute_tool method
-                tool_result = self.router.execute_tool(state["tool_name"], state["tool_args"])
+                tool_result = await with_node_deadline("tool_exec", asyncio.to_thread(
+                    self.router.execute_tool, state["tool_name"], state["tool_args"]
+                ))
                 state["tool_result"] = tool_result
 
                 # Add tool result to conversation
@@ -226,7 +238,9 @@ class Orchestrator:
     
     def _create_synthesizer_chain(self):
         """Create the synthesizer chain using LCEL"""
-        def synthesizer_llm(state: AgentState) -> AgentState:
+        @traced("node.synthesizer_llm")
+        @timed(node_seconds, pipeline="orchestrator", node="synthesizer_llm")
+        async def synthesizer_llm(state: AgentState) -> AgentState:
             """Node 4: Synthesize final response"""
             # Increment step counter
             state["current_step"] += 1
@@ -254,13 +268,9 @@ class Orchestrator:
                 )
 
                 # Call LLM using the router's LLM instance with Langfuse tracing
-                if langfuse_handler:
-                    response = self.router.llm.invoke(
-                        messages,
-                        config={"callbacks": [langfuse_handler]}
-                    )
-                else:
-                    response = self.router.llm.invoke(messages)
+                config = {"callbacks": [langfuse_handler]} if langfuse_handler else None
+                async with ollama_client.limits.aslot(self.router.model_name):
+                    response = await with_node_deadline("synthesizer_llm", self.router.llm.ainvoke(messages, config=config))
 
                 # Add AI message to conversation
                 state["messages"].append(AIMessage(content=response))
@@ -323,9 +333,10 @@ class Orchestrator:
         if error:
             logger.error(f"[{step_type}] Error: {error}")
     
+    @traced("orchestrator.run")
+    @timed(orchestrator_run_seconds, orchestrator="orchestrator")
     def run(self, input_text: str, session_id: str = None, domain: str = None) -> Dict[str, Any]:
-        """Run the LangGraph workflow with proper timeout handling"""
-        import threading
+        """Run the LangGraph workflow on the turn runner with proper timeout handling"""
         import time
 
         # Generate trace_id if not provided
@@ -356,59 +367,8 @@ class Orchestrator:
         })
 
         try:
-            # Run the graph with timeout using threading
-            result = {"success": False, "final_state": None, "error": None}
-            
-            def run_graph():
-                try:
-                    final_state = self.graph.invoke(initial_state)
-                    result["success"] = True
-                    result["final_state"] = final_state
-                except Exception as e:
-                    result["error"] = str(e)
-            
-            # Start the graph execution in a thread
-            thread = threading.Thread(target=run_graph)
-            thread.daemon = True
-            thread.start()
-            
-            # Wait for completion with timeout
-            thread.join(timeout=self.workflow_timeout)
-            
-            if thread.is_alive():
-                # Timeout occurred
-                logger.error("LangGraph execution timed out")
-                return {
-                    "success": False,
-                    "message": "Agent step timed out",
-                    "final_message": "I'm taking longer than expected to process your request. Please try with a simpler request or try again later.",
-                    "state_patch": {
-                        "session_id": session_id,
-                        "domain": domain
-                    }
-                }
-            
-            if not result["success"]:
-                # Error occurred during execution
-                logger.error(f"LangGraph execution failed: {result['error']}")
-                return {
-                    "success": False,
-                    "message": f"Agent step failed: {result['error']}",
-                    "final_message": "I'm sorry, I encountered an error processing your request. Please try again.",
-                    "trace_id": trace_id,
-                    "state_patch": {
-                        "session_id": session_id,
-                        "domain": domain,
-                        "trace_id": trace_id,
-                        "current_step": next_step
-                    }
-                }
-            
-            # Success - convert to response format
-            final_state = result["final_state"]
-
-            # Flush Langfuse events
-            langfuse_config.flush()
+            # Run the graph on the turn runner; a timeout cancels it, including in-flight LLM calls
+            final_state = turn_runner.run(lambda: self.graph.ainvoke(initial_state), timeout=self.workflow_timeout)
 
             return {
                 "success": True,
@@ -425,6 +385,30 @@ class Orchestrator:
                 }
             }
             
+        except TurnTimeout:
+            logger.error("LangGraph execution timed out")
+            return {
+                "success": False,
+                "message": "Agent step timed out",
+                "final_message": "I'm taking longer than expected to process your request. Please try with a simpler request or try again later.",
+                "state_patch": {
+                    "session_id": session_id,
+                    "domain": domain
+                }
+            }
+
+        except TurnRejected:
+            logger.error("LangGraph execution rejected: all turn slots busy")
+            return {
+                "success": False,
+                "message": "Agent busy",
+                "final_message": "I'm still working on other requests. Please try again in a moment.",
+                "state_patch": {
+                    "session_id": session_id,
+                    "domain": domain
+                }
+            }
+
         except Exception as e:
             logger.error(f"LangGraph execution failed: {str(e)}")
             return {
@@ -0,0 +1,3 @@
+"""
+Turn pipeline engine and nodes shared by every agent entry point
+"""
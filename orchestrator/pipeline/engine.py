@@ -0,0 +1,320 @@
+"""
+Turn pipeline engine shared by every agent entry point
+
+A pipeline is an ordered list of nodes compiled onto a LangGraph graph.
+The engine, not the nodes, numbers and records steps, publishes step and
+token events, and runs the turn on the turn runner, so deadlines,
+cancellation, checkpoints and step logging work the same for the chat
+route, /step and the graph runtime.
+"""
+import asyncio
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Annotated, Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, TypedDict
+
+from langchain_core.messages import BaseMessage
+from langgraph.config import get_stream_writer
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+
+from models.task_db import AgentStepDB
+from utils.agent_metrics import node_seconds
+from utils.tracing import span_tracer
+from ..runtime.turn_runner import TURN_TIMEOUT_SECONDS, turn_runner
+
+logger = logging.getLogger(__name__)
+
+
+class TurnState(TypedDict):
+    """Graph state of one turn; everything in it is checkpointed"""
+    messages: Annotated[List[BaseMessage], add_messages]
+    input_text: str
+    session_id: Optional[str]
+    domain: Optional[str]
+    trace_id: Optional[str]
+    run_id: Optional[str]
+    current_step: int
+    idempotency_key: Optional[str]
+    conversation_context: List[Dict[str, Any]]
+    turn_kind: Optional[str]
+    # {"key", "version", "response"} of a read-only turn the response cache can answer or store
+    response_cache: Optional[Dict[str, Any]]
+    planner_output: Optional[Dict[str, Any]]
+    actions_to_execute: List[Dict[str, Any]]
+    action_results: List[Dict[str, Any]]
+    tool_result: Optional[str]
+    final_message: Optional[str]
+    error: Optional[str]
+
+
+def new_turn_state(input_text: str, session_id: str = None, domain: str = None, trace_id: str = None,
+                   **fields) -> TurnState:
+    """Initial state for a turn, numbered after the trace's existing steps
+
+    Reads the database, so call it before handing the turn to the turn
+    runner rather than from a node.
+    """
+    state = TurnState(
+        messages=[],
+        input_text=input_text,
+        session_id=session_id,
+        domain=domain,
+        trace_id=trace_id,
+        run_id=None,
+        current_step=AgentStepDB.get_next_step_number(trace_id),
+        idempotency_key=None,
+        conversation_context=[],
+        turn_kind=None,
+        response_cache=None,
+        planner_output=None,
+        actions_to_execute=[],
+        action_results=[],
+        tool_result=None,
+        final_message=None,
+        error=None
+    )
+    state.update(fields)
+    return state
+
+
+def record_step(state: Dict[str, Any], step_type: str, step_number: int = None, input_data: Dict[str, Any] = None,
+                output_data: Dict[str, Any] = None, rendered_prompt: str = None, llm_input: Dict[str, Any] = None,
+                llm_output: str = None, llm_model: str = None, error: str = None):
+    """Log a step of the turn to the database"""
+    trace_id = state.get("trace_id") or state.get("session_id") or "default-trace"
+    step_number = state.get("current_step", 1) if step_number is None else step_number
+
+    AgentStepDB.create(
+        session_id=state.get("session_id") or "",
+        trace_id=trace_id,
+        step_number=step_number,
+        step_type=step_type,
+        input_data=input_data or {},
+        output_data=output_data or {},
+        rendered_prompt=rendered_prompt,
+        llm_input=llm_input or {},
+        llm_output=llm_output,
+        llm_model=llm_model,
+        error=error
+    )
+
+    logger.info(f"[{step_type}] Trace: {trace_id}, Step: {step_number}")
+    if output_data:
+        logger.debug(f"[{step_type}] Output: {json.dumps(output_data, indent=2, default=str)}")
+    if error:
+        logger.error(f"[{step_type}] Error: {error}")
+
+
+def start_root_span(name: str, trace_context, input_data: Dict[str, Any]):
+    """Root Langfuse span for a turn; LLM generations and tool spans nest under it"""
+    from config.langfuse_config import langfuse_config
+    if not trace_context or not langfuse_config.enabled:
+        return None
+    try:
+        return langfuse_config.client.start_span(trace_context=trace_context, name=name, input=input_data)
+    except Exception as e:
+        logger.warning(f"Failed to create Langfuse root span: {e}")
+        return None
+
+
+def end_root_span(root_span, output: Dict[str, Any], error: Optional[str] = None):
+    """End a turn's root span; a failed or slow turn is kept by tail sampling"""
+    from config.langfuse_config import langfuse_config
+    if not root_span:
+        return
+    try:
+        if error:
+            root_span.update(output=output, level="ERROR", status_message=error)
+        else:
+            root_span.update(output=output)
+        root_span.end()
+    except Exception as e:
+        logger.warning(f"Failed to end Langfuse root span: {e}")
+    langfuse_config.finish_trace(getattr(root_span, "trace_id", None), error)
+
+
+class TurnContext:
+    """
+    Per-turn objects that don't belong in the checkpointed state
+
+    Nodes reach the LLM, router and action executor through `services` (the
+    agent orchestrator) at call time, so swapping one of them out applies to
+    every pipeline at once.
+    """
+
+    def __init__(self, services, root_span=None):
+        self.services = services
+        self.root_span = root_span
+        # Local tracing span open where the turn was started, which the turn's spans nest under
+        self.span = span_tracer.current_span()
+        self.prefetch = None
+        # Planner LLM call started ahead of the planner node (see ResponseCacheNode)
+        self.planner_call = None
+        self.llm_calls = 0
+        self.planner_ms = 0.0
+        self.result_tokens_saved = 0
+
+    def release_prefetch(self):
+        """Stop a speculative prefetch nobody used"""
+        if self.prefetch and not self.prefetch.used:
+            self.prefetch.cancel()
+
+    def release_planner_call(self):
+        """Cancel a planner call nobody awaited"""
+        if self.planner_call:
+            self.planner_call.cancel()
+            self.planner_call = None
+
+
+@dataclass
+class NodeOutput:
+    """What a node did: the state it changes and the step it reports"""
+    update: Dict[str, Any] = field(default_factory=dict)
+    content: str = ""
+    details: Dict[str, Any] = field(default_factory=dict)
+    # AgentStepDB fields besides the step's identity (see record_step)
+    log: Dict[str, Any] = field(default_factory=dict)
+
+
+class PipelineNode:
+    """
+    One step of a turn
+
+    Subclasses set `name` and implement run(). Nodes that record a step get a
+    step number (one past the previous step unless advances_step is False), a
+    row in agent_steps and a 'step' event; the rest only change state.
+    """
+    name: str = ""
+    records_step: bool = True
+    advances_step: bool = True
+
+    def should_run(self, state: TurnState, turn: TurnContext) -> bool:
+        return True
+
+    async def run(self, state: TurnState, turn: TurnContext, emit) -> NodeOutput:
+        """Do the node's work; emit(event, payload) publishes events such as tokens"""
+        raise NotImplementedError
+
+
+class Pipeline:
+    """An ordered list of nodes, run as a LangGraph graph on the turn runner"""
+
+    def __init__(self, name: str, nodes: List[PipelineNode]):
+        self.name = name
+        self.nodes = nodes
+        self.graph = self.compile()
+        # Compiled with a SQLite checkpointer on first use by a turn with an idempotency key
+        self._checkpointed_graph = None
+        self._checkpointer = None
+        self._checkpointer_lock = threading.Lock()
+
+    def compile(self, checkpointer=None):
+        """Chain the nodes into a graph
+
+        With a checkpointer, state is saved after every node under the turn's
+        thread_id, so a retried turn resumes after the last completed node
+        instead of starting over.
+        """
+        workflow = StateGraph(TurnState)
+        for node in self.nodes:
+            workflow.add_node(node.name, self._graph_node(node, self.name))
+        workflow.set_entry_point(self.nodes[0].name)
+        for node, next_node in zip(self.nodes, self.nodes[1:]):
+            workflow.add_edge(node.name, next_node.name)
+        workflow.add_edge(self.nodes[-1].name, END)
+        return workflow.compile(checkpointer=checkpointer)
+
+    @property
+    def checkpointed_graph(self):
+        """The graph with SQLite checkpoints, for turns that can be retried"""
+        if self._checkpointed_graph is None:
+            with self._checkpointer_lock:
+                if self._checkpointed_graph is None:
+                    from ..runtime.checkpoints import create_checkpointer
+                    self._checkpointer = create_checkpointer()
+                    self._checkpointed_graph = self.compile(self._checkpointer)
+        return self._checkpointed_graph
+
+    @staticmethod
+    def _graph_node(node: PipelineNode, pipeline_name: str):
+        async def run(state: TurnState, config) -> Dict[str, Any]:
+            turn = config["configurable"]["turn"]
+            if not node.should_run(state, turn):
+                return {}
+
+            write = get_stream_writer()
+            step_number = state["current_step"] + (1 if node.records_step and node.advances_step else 0)
+            with span_tracer.span(f"node.{node.name}", step_number=step_number), \
+                    node_seconds.labels(pipeline=pipeline_name, node=node.name).time():
+                output = await node.run(state, turn, lambda event, payload: write((event, payload)))
+
+                if node.records_step:
+                    # SQLite writes (and their lock retries) would stall every turn on the runner loop
+                    await asyncio.to_thread(record_step, state, node.name, step_number, **output.log)
+                    write(("step", {
+                        "step_number": step_number,
+                        "step_type": node.name,
+                        "status": "completed",
+                        "content": output.content,
+                        "details": output.details,
+                        "timestamp": datetime.now().isoformat()
+                    }))
+            return dict(output.update, current_step=step_number)
+
+        return run
+
+    async def _events(self, graph, state: TurnState, turn: TurnContext,
+                      thread_id: Optional[str]) -> AsyncIterator[Tuple[str, Any]]:
+        config = {"configurable": {"turn": turn}}
+        graph_input = state
+        if thread_id:
+            config["configurable"]["thread_id"] = thread_id
+            snapshot = await graph.aget_state(config)
+            if snapshot.next:
+                logger.info(f"Resuming turn {thread_id} at {', '.join(snapshot.next)}")
+                graph_input = None
+
+        final_state = state
+        try:
+            with span_tracer.span(self.name, parent=turn.span, session_id=state.get("session_id"),
+                                  trace_id=state.get("trace_id"), resumed=graph_input is None):
+                async for mode, chunk in graph.astream(graph_input, config, stream_mode=["custom", "values"]):
+                    if mode == "custom":
+                        yield chunk
+                    else:
+                        final_state = chunk
+
+                if thread_id:
+                    # The turn completed: a retry now gets the recorded response instead
+                    await self._checkpointer.adelete_thread(thread_id)
+        finally:
+            # Failed, cancelled or timed out turns can leave background work behind
+            turn.release_prefetch()
+            turn.release_planner_call()
+        yield "state", final_state
+
+    def stream(self, state: TurnState, turn: TurnContext, timeout: float = TURN_TIMEOUT_SECONDS,
+               thread_id: str = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Run a turn on the turn runner, yielding its events in the calling thread
+
+        Yields ("step", ...) as each recording node completes, whatever nodes
+        emit (e.g. ("token", ...)), and finally ("state", final state). With a
+        thread_id the turn is checkpointed and resumes where an earlier
+        attempt with the same thread_id stopped. Closing the generator or
+        exceeding the timeout cancels the turn (TurnTimeout, TurnRejected).
+        """
+        graph = self.checkpointed_graph if thread_id else self.graph
+        return turn_runner.stream(lambda: self._events(graph, state, turn, thread_id), timeout=timeout)
+
+    def run(self, state: TurnState, turn: TurnContext, timeout: float = TURN_TIMEOUT_SECONDS,
+            thread_id: str = None) -> TurnState:
+        """Run a turn to completion and return its final state"""
+        final_state = state
+        for event, payload in self.stream(state, turn, timeout, thread_id):
+            if event == "state":
+                final_state = payload
+        return final_state
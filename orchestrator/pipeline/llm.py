@@ -0,0 +1,166 @@
+"""
+Shared LLM client, message building and token accounting for pipeline nodes
+"""
+import logging
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from utils.agent_metrics import prompt_cache_metrics
+from utils.token_accounting import token_accounting, token_counter, usage_from_metadata
+
+logger = logging.getLogger(__name__)
+
+# Model served by Ollama for every agent LLM call
+LLM_MODEL = "gemma3:4b"
+
+
+def create_agent_llm() -> ChatOpenAI:
+    """Chat model for the agent's planner and synthesizer calls"""
+    # Use OpenAI-compatible format for proper Langfuse token counting
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        base_url="http://localhost:11434/v1",  # OpenAI-compatible endpoint
+        api_key="ollama",  # Dummy key for Ollama
+        stream_usage=True  # Token usage on streamed responses, for the prompt cache metric
+    )
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in text with the tokenizer matched to the agent model
+
+    Falls back to ~4 characters per token when no tokenizer is available
+    (see TokenCounter).
+
+    Args:
+        text: Text to count tokens for
+
+    Returns:
+        Number of tokens (memoized, so repeated context is not re-encoded)
+    """
+    return token_counter.count(text, LLM_MODEL)
+
+
+def count_message_tokens(messages: list) -> int:
+    """
+    Count total tokens in a list of messages
+
+    Args:
+        messages: List of LangChain messages
+
+    Returns:
+        Total token count, including per-message formatting overhead
+    """
+    return token_counter.count_messages(messages, LLM_MODEL)
+
+
+def record_llm_usage(call: str, messages: list, usage_metadata) -> None:
+    """
+    Record tokens Ollama reported for an OpenAI-compatible call, and evaluated vs. cached prompt tokens
+
+    Ollama reports the tokens it actually evaluated as input_tokens; the full
+    prompt size is counted locally since /v1 responses don't include it, and
+    only with a real tokenizer, as the character heuristic is too rough to
+    tell cached tokens apart.
+    """
+    usage = usage_from_metadata(usage_metadata)
+    if usage is None:
+        return
+    token_accounting.record(call, LLM_MODEL, usage)
+    if token_counter.has_tokenizer(LLM_MODEL):
+        prompt_cache_metrics.record_call(call, count_message_tokens(messages), usage.prompt_tokens, model=LLM_MODEL)
+
+
+def convert_conversation_context_to_messages(conversation_context):
+    """Convert conversation context (client or session memory) to LangChain messages"""
+    messages = []
+    for msg in conversation_context:
+        if msg.get('type') == 'user':
+            messages.append(HumanMessage(content=msg.get('content', '')))
+        elif msg.get('type') == 'bot':
+            messages.append(AIMessage(content=msg.get('content', '')))
+        elif msg.get('type') == 'summary':
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{msg.get('content', '')}"))
+    return messages
+
+
+def build_llm_messages(prompt, conversation_context, input_text, **template_vars):
+    """
+    Build LLM messages so consecutive calls share the longest possible prefix
+
+    Ollama reuses its KV cache for a prompt prefix identical to the previous
+    call's, so the static part of the system prompt comes first, then the
+    conversation context (which only grows at the end), and only then the
+    per-request values (datetime, action results) and the new user input.
+
+    Returns:
+        (messages, rendered system prompt)
+    """
+    static_prompt, dynamic_prompt = prompt.render_split(**template_vars)
+    messages = [SystemMessage(content=static_prompt.rstrip())] if static_prompt.strip() else []
+    messages += convert_conversation_context_to_messages(conversation_context)
+    if dynamic_prompt.strip():
+        messages.append(SystemMessage(content=dynamic_prompt.strip()))
+    messages.append(HumanMessage(content=input_text))
+    return messages, static_prompt + dynamic_prompt
+
+
+def messages_for_log(messages: list) -> List[Dict[str, Any]]:
+    """Messages as stored in agent steps and Langfuse observations"""
+    return [{"type": msg.__class__.__name__, "content": msg.content} for msg in messages]
+
+
+def start_generation(root_span, name: str, messages: list, langfuse_prompt=None):
+    """
+    Start a Langfuse generation for an LLM call under the turn's root span
+
+    We don't use CallbackHandler for these calls because the observation is
+    created manually here; using both would create duplicates.
+    """
+    if not root_span:
+        return None
+    try:
+        return root_span.start_observation(
+            name=name,
+            as_type="generation",
+            input={"messages": messages_for_log(messages)},
+            prompt=langfuse_prompt  # Pass the actual Langfuse prompt object
+        )
+    except Exception as e:
+        logger.warning(f"Failed to create Langfuse generation {name}: {e}")
+        return None
+
+
+def end_generation(generation, messages: list, output: str, usage_metadata=None) -> None:
+    """
+    Record output and token counts on a generation and end it
+
+    The output count is Ollama's when the response reported usage. The input
+    count is always the whole prompt, counted locally: Ollama's input_tokens
+    leave out the prefix served from its KV cache.
+    """
+    if not generation:
+        return
+    try:
+        input_tokens = count_message_tokens(messages)
+        usage = usage_from_metadata(usage_metadata)
+        output_tokens = usage.completion_tokens if usage else count_tokens(output)
+        generation.update(
+            output=output,
+            usage={
+                "input": input_tokens,
+                "output": output_tokens,
+                "total": input_tokens + output_tokens,
+                "unit": "TOKENS"
+            }
+        )
+        logger.info(f"Generation tokens: {input_tokens} input + {output_tokens} output = {input_tokens + output_tokens} total")
+    except Exception as e:
+        logger.warning(f"Failed to update Langfuse generation: {e}")
+    try:
+        generation.end()
+    except Exception as e:
+        logger.warning(f"Failed to end Langfuse generation: {e}")
+
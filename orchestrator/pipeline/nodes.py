@@ -0,0 +1,501 @@
+"""
+Pluggable nodes for agent turn pipelines
+
+Each entry point composes its pipeline from these: planners (JSON planner
+or the single-tool router), executors (scheduled actions or router tools)
+and the streaming synthesizer.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from ..actions.prefetch import TaskPrefetch
+from ..actions.scheduler import action_scheduler, is_read_action
+from ..runtime.turn_runner import with_node_deadline
+from ..tools.catalog import get_tool_catalog
+from ..tools.router import TURN_CHAT, TURN_READ
+from .engine import NodeOutput, PipelineNode, TurnContext, TurnState
+from .llm import LLM_MODEL, build_llm_messages, end_generation, messages_for_log, record_llm_usage, start_generation
+from .response_cache import response_cache, response_cache_key
+from .result_renderer import render_action_results
+from utils.agent_metrics import llm_request_seconds, turn_metrics
+from utils.ollama_client import ollama_client
+from utils.tracing import span_tracer
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_RESPONSE = "I'm sorry, I encountered an error processing your request. Please try again."
+
+# LLM calls a response cache hit replaces: planner and synthesizer
+CACHED_TURN_LLM_CALLS = 2
+
+
+def _cached_response(state: TurnState) -> Optional[str]:
+    return (state.get("response_cache") or {}).get("response")
+
+
+class IngestNode(PipelineNode):
+    """Add the user's input to the conversation"""
+    name = "ingest_user_input"
+    advances_step = False
+
+    async def run(self, state: TurnState, turn: TurnContext, emit) -> NodeOutput:
+        logger.info(f"Processing input: {state['input_text']}")
+        return NodeOutput(
+            update={"messages": [HumanMessage(content=state["input_text"])], "run_id": state.get("run_id") or str(uuid.uuid4())},
+            log={
+                "input_data": {"input_text": state["input_text"], "session_id": state.get("session_id"), "domain": state.get("domain")},
+                "output_data": {"messages_count": len(state["messages"]) + 1, "user_message_added": True}
+            }
+        )
+
+
+class RouteTurnNode(PipelineNode):
+    """
+    Route the turn before any LLM call
+
+    Pure chat skips the planner and actions; likely reads start prefetching
+    tasks while the planner runs (see Router.classify_turn).
+    """
+    name = "route_turn"
+    records_step = False
+
+    async def run(self, state: TurnState, turn: TurnContext, emit) -> NodeOutput:
+        context = state.get("conversation_context") or []
+        last_bot_message = next((m.get('content') for m in reversed(context) if m.get('type') == 'bot'), None)
+        turn_kind = turn.services.router.classify_turn(state["input_text"], last_bot_message)
+
+        update = {"turn_kind": turn_kind}
+        if turn_kind == TURN_CHAT:
+            logger.info("Pure chat turn, skipping planner")
+            update["planner_output"] = {"assistant_text": "", "actions": []}
+        elif turn_kind == TURN_READ:
+            turn.prefetch = TaskPrefetch(turn.services.action_executor)
+        return NodeOutput(update=update)
+
+
+class ResponseCacheNode(PipelineNode):
+    """
+    Look up the answer to a read turn while the planner runs
+
+    Keys on the prefetched tasks, so it starts the planner call and then
+    waits for the prefetch; on a hit the planner call is cancelled, actions
+    are skipped and the synthesizer replays the answer. Misses leave the key
+    in state for the synthesizer to store the answer, and PlannerNode
+    awaits the call already in flight.
+    """
+    name = "response_cache"
+    records_step = False
+
+    def should_run(self, state: TurnState, turn: TurnContext) -> bool:
+        return state.get("turn_kind") == TURN_READ and turn.prefetch is not None and response_cache.enabled
+
+    async def run(self, state: TurnState, turn: TurnContext, emit) -> NodeOutput:
+        # Read before the data: a write landing in between makes the stored answer stale, not wrong
+        version = response_cache.version
+        turn.planner_call = PlannerCall.start(state, turn)
+        try:
+            prefetched = await asyncio.to_thread(turn.prefetch.result)
+            if prefetched is None:
+                return NodeOutput()
+
+            catalog = get_tool_catalog()
+            key = response_cache_key(state["input_text"], prefetched[1], [catalog.prompt("planner"), catalog.prompt("synthesizer")],
+                                     LLM_MODEL, state.get("conversation_context"))
+            response = response_cache.get(key, CACHED_TURN_LLM_CALLS)
+        except BaseException:
+            # Nobody will await the planner call if the lookup fails or the turn is cancelled
+            turn.release_planner_call()
+            raise
+
+        update = {"response_cache": {"key": key, "version": version, "response": response}}
+        if response is not None:
+            logger.info("Response cache hit, cancelling planner and skipping synthesizer")
+            turn.release_planner_call()
+            turn.prefetch.used = True
+            update["planner_output"] = {"assistant_text": "", "actions": []}
+        return NodeOutput(update=update)
+
+
+class PlannerCall:
+    """
+    A planner LLM call running in the background
+
+    Started by ResponseCacheNode so the planner overlaps the task prefetch
+    and cache lookup; PlannerNode awaits it rather than calling again.
+    """
+
+    def __init__(self, messages, compiled_prompt, generation, task: "asyncio.Task"):
+        self.messages = messages
+        self.compiled_prompt = compiled_prompt
+        self.generation = generation
+        self.task = task
+
+    @classmethod
+    def start(cls, state: TurnState, turn: TurnContext) -> "PlannerCall":
+        # Planner prompt from the catalog, with tool descriptions already compiled in;
+        # static prompt and conversation context first, datetime last (see build_llm_messages)
+        planner_prompt = get_tool_catalog().prompt("planner")
+        messages, compiled_prompt = build_llm_messages(planner_prompt, state.get("conversation_context") or [],
+                                                       state["input_text"])
+        generation = start_generation(turn.root_span, "planner.llm", messages, planner_prompt.langfuse_prompt)
+        return cls(messages, compiled_prompt, generation, asyncio.ensure_future(cls._invoke(turn, messages)))
+
+    @staticmethod
+    async def _invoke(turn: TurnContext, messages):
+        with span_tracer.span("llm.planner", model=LLM_MODEL, messages=len(messages)):
+            # Shares the per-model limit with classification's native Ollama calls
+            async with ollama_client.limits.aslot(LLM_MODEL):
+                started = time.perf_counter()
+                response = await with_node_deadline(PlannerNode.name, turn.services.llm.ainvoke(messages))
+                turn.planner_ms = (time.perf_counter() - started) * 1000
+        llm_request_seconds.labels(model=LLM_MODEL, prompt="planner").observe(turn.planner_ms / 1000)
+        return response
+
+    def cancel(self):
+        """Stop a call whose answer is no longer needed"""
+        self.task.cancel()
+        end_generation(self.generation, self.messages, "")
+
+
+class PlannerNode(PipelineNode):
+    """Plan a list of actions with the catalog's planner prompt"""
+    name = "planner_llm"
+
+    def should_run(self, state: TurnState, turn: TurnContext) -> bool:
+        return state.get("turn_kind") != TURN_CHAT and _cached_response(state) is None
+
+    async def run(self, state: TurnState, turn: TurnContext, emit) -> NodeOutput:
+        input_text = state["input_text"]
+        context = state.get("conversation_context") or []
+
+        # Usually already in flight for read turns (see ResponseCacheNode)
+        call = turn.planner_call or PlannerCall.start(state, turn)
+        turn.planner_call = None
+        messages, compiled_prompt, generation = call.messages, call.compiled_prompt, call.generation
+        response = await call.task
+        turn.llm_calls += 1
+        turn_metrics.record_planner_latency(turn.planner_ms)
+        usage_metadata = getattr(response, 'usage_metadata', None)
+        record_llm_usage('planner', messages, usage_metadata)
+
+        response_content = response.content if hasattr(response, 'content') else str(response)
+        end_generation(generation, messages, response_content, usage_metadata)
+
+        try:
+            cleaned_response = response_content.strip()
+            if cleaned_response.startswith("```json"):
+                cleaned_response = cleaned_response[7:]
+            if cleaned_response.endswith("```"):
+                cleaned_response = cleaned_response[:-3]
+            planner_output = json.loads(cleaned_response.strip())
+            actions = planner_output.get("actions", [])
+        except json.JSONDecodeError:
+            planner_output = {
+                "assistant_text": "I'm sorry, I had trouble understanding your request.",
+                "actions": [{"name": "no_op", "args": {}}]
+            }
+            actions = [{"name": "no_op", "args": {}}]
+
+        assistant_text = planner_output.get('assistant_text', '')
+        return NodeOutput(
+            update={"planner_output": planner_output, "actions_to_execute": actions},
+            content=assistant_text or f"🤔 Planning actions based on: '{input_text}'",
+            details={"assistant_text": assistant_text, "actions_count": len(actions)},
+            log={
+                "input_data": {"input_text": input_text, "messages_count": len(messages), "conversation_context_length": len(context)},
+                "output_data": {"llm_response": response_content, "planner_output": planner_output, "actions_to_execute": actions},
+                "rendered_prompt": compiled_prompt,
+                "llm_input": {"messages": messages_for_log(messages)},
+                "llm_model": LLM_MODEL,
+                "llm_output": response_content
+            }
+        )
+
+
+class RouterPlannerNode(PipelineNode):
+    """Pick a single tool with the router, falling back to no_op on errors"""
+
+    def __init__(self, name: str = "router_llm"):
+        self.name = name
+
+    async def run(self, state: TurnState, turn: TurnContext, emit) -> NodeOutput:
+        input_data = {"input_text": state["input_text"], "messages_count": len(state["messages"])}
+        error = None
+        try:
+            router_output = await with_node_deadline(self.name, turn.services.router.aplan_actions(
+                state["input_text"],
+                trace_id=state.get("trace_id"),
+                user_id=state.get("session_id")
+            ))
+            output_data = {"router_output": router_output, "routing_success": True}
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            logger.error(f"Error in {self.name}: {error}")
+            router_output = {
+                "assistant_text": "I'm sorry, I encountered an error processing your request.",
+                "tool_name": "no_op",
+                "tool_args": {}
+            }
+            output_data = {"error": str(e), "fallback_used": True}
+
+        tool_name, tool_args = router_output.get("tool_name", "no_op"), router_output.get("tool_args", {})
+        return NodeOutput(
+            update={
+                "planner_output": router_output,
+                "actions_to_execute": [{"name": tool_name, "args": tool_args}],
+                "messages": [AIMessage(content=router_output.get("assistant_text", ""))]
+            },
+            content=router_output.get("assistant_text", ""),
+            details={"assistant_text": router_output.get("assistant_text"), "tool_name": tool_name},
+            log={"input_data": input_data, "output_data": dict(output_data, tool_name=tool_name, tool_args=tool_args), "error": error}
+        )
+
+
+class ActionNode(PipelineNode):
+    """
+    Execute the planned actions through the action scheduler
+
+    Independent actions run concurrently, conflicting ones keep planner
+    order; reads are served from the turn's prefetch when it answers them.
+    """
+    name = "action_exec"
+
+    def should_run(self, state: TurnState, turn: TurnContext) -> bool:
+        return bool(state.get("actions_to_execute"))
+
+    async def run(self, state: TurnState, turn: TurnContext, emit) -> NodeOutput:
+        actions = state["actions_to_execute"]
+
+        started = time.perf_counter()
+        outcomes = await with_node_deadline(self.name, asyncio.to_thread(
+            action_scheduler.run, actions, lambda name, args: self._execute(turn, name, args)
+        ))
+        wall_ms = round((time.perf_counter() - started) * 1000, 1)
+        turn.release_prefetch()
+
+        action_results = [{
+            "name": outcome.name,
+            "ok": outcome.success,
+            "result": outcome.result if outcome.success else None,
+            "error": outcome.result.get("error") if not outcome.success else None
+        } for outcome in outcomes]
+        action_timings = [outcome.timing() for outcome in outcomes]
+
+        return NodeOutput(
+            update={"action_results": action_results},
+            content=f"⚡ Executed {len(action_results)} actions",
+            details={
+                "successful_actions": len([r for r in action_results if r["ok"]]),
+                "failed_actions": len([r for r in action_results if not r["ok"]]),
+                "action_timings": action_timings,
+                "wall_ms": wall_ms
+            },
+            log={
+                "input_data": {"actions_to_execute": actions},
+                "output_data": {
+                    "action_results": action_results,
+                    "actions_executed": len(action_results),
+                    "action_timings": action_timings,
+                    "wall_ms": wall_ms
+                }
+            }
+        )
+
+    @staticmethod
+    def _execute(turn: TurnContext, action_name: str, action_args: Dict[str, Any]):
+        """Run one action inside its own Langfuse tool span"""
+        tool_span = None
+        if turn.root_span:
+            try:
+                tool_span = turn.root_span.start_span(
+                    name=f"tool.execute.{action_name}",
+                    input={"tool_name": action_name, "tool_args": action_args}
+                )
+                tool_span.create_event(name="tool.request", input={"tool_name": action_name, "tool_args": action_args})
+            except Exception as e:
+                logger.warning(f"Failed to create Langfuse tool span for {action_name}: {e}")
+                tool_span = None
+
+        prefetched = turn.prefetch.take(action_name, action_args) if turn.prefetch else None
+        if prefetched:
+            success, result = prefetched
+        else:
+            success, result = turn.services.action_executor.execute_action(action_name, action_args)
+
+        if tool_span:
+            try:
+                tool_span.create_event(
+                    name="tool.response",
+                    input={"success": success, "result": result if success else None, "error": result.get("error") if not success else None}
+                )
+                tool_span.update(output={"success": success, "result": result if success else None})
+                tool_span.end()
+            except Exception as e:
+                logger.warning(f"Failed to update Langfuse tool span for {action_name}: {e}")
+
+        return success, result
+
+
+class ToolNode(PipelineNode):
+    """Run the router's tool; side effects run once per turn idempotency key"""
+    name = "tool_exec"
+
+    async def run(self, state: TurnState, turn: TurnContext, emit) -> NodeOutput:
+        action = (state.get("actions_to_execute") or [{"name": "no_op", "args": {}}])[0]
+        tool_name, tool_args = action["name"], action.get("args", {})
+        input_data = {"tool_name": tool_name, "tool_args": tool_args}
+        error = None
+        try:
+            # Blocking I/O, so in a worker thread; a timed-out tool finishes there but its result is dropped
+            tool_result = await with_node_deadline(self.name, asyncio.to_thread(
+                turn.services.router.execute_tool, tool_name, tool_args,
+                idempotency_key=self._idempotency_key(state, tool_name, tool_args)
+            ))
+            output_data = {"tool_name": tool_name, "tool_args": tool_args, "tool_result": tool_result, "execution_success": True}
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Error in tool_exec: {error}")
+            tool_result = f"❌ Error executing {tool_name}: {error}"
+            output_data = {"error": error, "tool_result": tool_result, "execution_success": False}
+
+        return NodeOutput(
+            update={
+                "tool_result": tool_result,
+                "action_results": [{"name": tool_name, "ok": error is None, "result": tool_result, "error": error}],
+                "messages": [AIMessage(content=tool_result)]
+            },
+            content=tool_result,
+            details={"tool_name": tool_name, "tool_result": tool_result},
+            log={"input_data": input_data, "output_data": output_data, "error": error}
+        )
+
+    @staticmethod
+    def _idempotency_key(state: TurnState, tool_name: str, tool_args: Dict[str, Any]) -> Optional[str]:
+        """Key for the turn's tool call: the same turn, tool and arguments run once"""
+        if not state.get("idempotency_key"):
+            return None
+        args = json.dumps(tool_args or {}, sort_keys=True, default=str)
+        digest = hashlib.sha256(f"{tool_name}:{args}".encode()).hexdigest()[:16]
+        return f"{state['idempotency_key']}:tool_exec:{digest}"
+
+
+class SynthesizerNode(PipelineNode):
+    """
+    Stream the final response with the catalog's synthesizer prompt
+
+    Emits a 'token' event per token. With fallback_on_error, LLM failures
+    produce an apology instead of failing the turn, except for turns with an
+    idempotency key, which fail so a retry resumes here.
+    """
+    name = "synthesizer_llm"
+
+    def __init__(self, fallback_on_error: bool = False):
+        self.fallback_on_error = fallback_on_error
+
+    async def run(self, state: TurnState, turn: TurnContext, emit) -> NodeOutput:
+        turn.release_prefetch()
+        cached = _cached_response(state)
+        if cached is not None:
+            return self._replay(state, cached, emit)
+
+        input_text = state["input_text"]
+        context = state.get("conversation_context") or []
+        # Router tools report plain text; scheduled actions report structured results, rendered compactly
+        result_tokens_saved = 0
+        if state.get("tool_result") is not None:
+            action_results = state["tool_result"]
+        else:
+            action_results, result_tokens_saved = render_action_results(state.get("action_results") or [])
+            turn.result_tokens_saved += result_tokens_saved
+
+        # Action results go after the conversation context so the prefix stays cacheable
+        synthesizer_prompt = get_tool_catalog().prompt("synthesizer")
+        messages, full_prompt = build_llm_messages(
+            synthesizer_prompt, context, input_text,
+            user_input=input_text,
+            action_results=action_results
+        )
+        input_data = {"action_results": state.get("action_results"), "input_text": input_text, "conversation_context_length": len(context)}
+        generation = start_generation(turn.root_span, "synthesizer.llm", messages, synthesizer_prompt.langfuse_prompt)
+
+        async def synthesize():
+            tokens, usage = [], None
+            async with ollama_client.limits.aslot(LLM_MODEL):
+                async for chunk in turn.services.llm.astream(messages):
+                    token = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                    if token:
+                        tokens.append(token)
+                        emit("token", {"node": self.name, "content": token})
+                    usage = getattr(chunk, 'usage_metadata', None) or usage
+            return "".join(tokens), usage
+
+        try:
+            with span_tracer.span("llm.synthesizer", model=LLM_MODEL, messages=len(messages)), \
+                    llm_request_seconds.labels(model=LLM_MODEL, prompt="synthesizer").time():
+                response, usage = await with_node_deadline(self.name, synthesize())
+        except Exception as e:
+            end_generation(generation, messages, "")
+            if not self.fallback_on_error or state.get("idempotency_key"):
+                raise
+            error = str(e) or type(e).__name__
+            logger.error(f"Error in synthesizer_llm: {error}")
+            return NodeOutput(
+                update={"final_message": FALLBACK_RESPONSE, "error": error, "messages": [AIMessage(content=FALLBACK_RESPONSE)]},
+                content=FALLBACK_RESPONSE,
+                details={"final_message": FALLBACK_RESPONSE, "is_final": True},
+                log={
+                    "input_data": input_data,
+                    "output_data": {"error": str(e), "fallback_response": FALLBACK_RESPONSE, "synthesis_success": False},
+                    "error": error
+                }
+            )
+
+        turn.llm_calls += 1
+        record_llm_usage('synthesizer', messages, usage)
+        end_generation(generation, messages, response, usage)
+        if self._cacheable(state):
+            response_cache.put(state["response_cache"]["key"], response, state["response_cache"]["version"])
+
+        return NodeOutput(
+            update={"final_message": response, "messages": [AIMessage(content=response)]},
+            content=response,
+            details={"final_message": response, "is_final": True},
+            log={
+                "input_data": input_data,
+                "output_data": {"final_message": response, "synthesis_success": True, "result_tokens_saved": result_tokens_saved},
+                "rendered_prompt": full_prompt,
+                "llm_input": {"messages": messages_for_log(messages)},
+                "llm_model": LLM_MODEL,
+                "llm_output": response
+            }
+        )
+
+    def _replay(self, state: TurnState, response: str, emit) -> NodeOutput:
+        """Answer from the response cache, as one token"""
+        emit("token", {"node": self.name, "content": response})
+        return NodeOutput(
+            update={"final_message": response, "messages": [AIMessage(content=response)]},
+            content=response,
+            details={"final_message": response, "is_final": True},
+            log={
+                "input_data": {"input_text": state["input_text"], "response_cache_key": state["response_cache"]["key"]},
+                "output_data": {"final_message": response, "synthesis_success": True, "response_cache": "hit"}
+            }
+        )
+
+    @staticmethod
+    def _cacheable(state: TurnState) -> bool:
+        """Whether the turn was looked up and only read tasks, all successfully"""
+        if not (state.get("response_cache") or {}).get("key"):
+            return False
+        actions = state.get("actions_to_execute") or []
+        results = state.get("action_results") or []
+        return (all(is_read_action(a.get("name", "no_op"), a.get("args", {})) for a in actions)
+                and all(r["ok"] for r in results))
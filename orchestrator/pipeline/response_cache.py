@@ -0,0 +1,156 @@
+"""
+Response cache for read-only chat turns
+
+Questions like "what did I finish this week?" plan the same fetch_tasks call
+and produce the same answer until the tasks change. A turn the router
+classifies as a read looks its answer up by (normalized input, hash of the
+conversation context and of the prefetched tasks, planner and synthesizer
+prompt versions, model, date) while the planner runs; a hit cancels the
+planner and answers the turn without waiting for any LLM call.
+
+Entries are dropped on every committed task write (see TaskChangeFeed), and
+a response computed while a write landed is not stored. Set
+GISKARD_RESPONSE_CACHE=0 to turn the cache off, or toggle it at runtime via
+POST /api/agent/response-cache.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from models.task_db import task_change_feed
+from utils.agent_metrics import response_cache_metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("GISKARD_RESPONSE_CACHE", "1").lower() not in ("0", "false", "off", "no")
+CACHE_MAX_ENTRIES = int(os.getenv("GISKARD_RESPONSE_CACHE_MAX_ENTRIES", "256"))
+# Bounds how stale relative dates ("this week") can get within a day
+CACHE_TTL_SECONDS = float(os.getenv("GISKARD_RESPONSE_CACHE_TTL_SECONDS", "600"))
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize_input(text: str) -> str:
+    """Case, punctuation and whitespace don't change a question's answer"""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def prompt_fingerprint(prompt) -> str:
+    """Version label plus a hash of the template, so local prompt edits count too"""
+    text_hash = hashlib.sha256(prompt.prompt_data["text"].encode()).hexdigest()[:12]
+    return f"{prompt.name}:{prompt.version}:{text_hash}"
+
+
+def _json_hash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def response_cache_key(input_text: str, tool_results: Any, prompts: Iterable, model: str,
+                       context: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Cache key of a read-only turn
+
+    The conversation context is part of both the planner and synthesizer
+    prompts ("what about the done ones?"), so it is hashed into the key.
+    """
+    context_messages = [(message.get("type"), message.get("content")) for message in context or []]
+    parts = [
+        normalize_input(input_text),
+        _json_hash(context_messages),
+        _json_hash(tool_results),
+        *(prompt_fingerprint(prompt) for prompt in prompts),
+        model,
+        # The prompts include the current datetime, so answers about "today" expire at midnight
+        date.today().isoformat()
+    ]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+class ResponseCache:
+    """LRU of final responses, invalidated by the task change feed"""
+
+    def __init__(self, enabled: bool = CACHE_ENABLED, max_entries: int = CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = CACHE_TTL_SECONDS, change_feed=task_change_feed):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.change_feed = change_feed
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        change_feed.subscribe(self._on_task_change)
+
+    @property
+    def version(self) -> int:
+        """Task data version; read it before fetching the data a response is built from"""
+        return self.change_feed.version
+
+    def get(self, key: str, llm_calls_saved: int = 0) -> Optional[str]:
+        """Cached response for the key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (entry["version"] != self.change_feed.version
+                          or time.monotonic() - entry["stored_at"] > self.ttl_seconds):
+                del self._entries[key]
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+        response_cache_metrics.record_lookup(entry is not None, llm_calls_saved)
+        return entry["response"] if entry else None
+
+    def put(self, key: str, response: str, version: int) -> bool:
+        """
+        Store a response built from task data read at `version`
+
+        Returns False (and stores nothing) if the tasks changed since, since
+        the response may describe data that no longer exists.
+        """
+        with self._lock:
+            stored = self.enabled and version == self.change_feed.version
+            if stored:
+                self._entries[key] = {"response": response, "version": version, "stored_at": time.monotonic()}
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        response_cache_metrics.record_store(stored)
+        return stored
+
+    def clear(self) -> int:
+        """Drop every entry, returning how many there were"""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+        return dropped
+
+    def set_enabled(self, enabled: bool):
+        """Kill switch: a disabled cache is empty and skipped by every turn"""
+        self.enabled = enabled
+        if not enabled:
+            self.clear()
+        logger.info(f"Response cache {'enabled' if enabled else 'disabled'}")
+
+    def _on_task_change(self, change: Dict[str, Any]):
+        dropped = self.clear()
+        response_cache_metrics.record_invalidation(dropped)
+        if dropped:
+            logger.debug(f"Task {change['change_type']} invalidated {dropped} cached responses")
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "task_version": self.change_feed.version
+        }
+
+
+# Global response cache instance
+response_cache = ResponseCache()
@@ -0,0 +1,100 @@
+"""
+Compact, token-budgeted rendering of action results for the synthesizer prompt
+
+fetch_tasks returns whole task dicts (timestamps, sort keys, descriptions),
+which with a few hundred tasks costs thousands of prompt tokens the
+synthesizer never uses. Tasks are projected to the fields an answer needs,
+with long descriptions truncated, and a list that still doesn't fit the
+budget is summarized as counts per status and category plus as many tasks
+as fit, without their descriptions.
+"""
+import json
+import os
+from collections import Counter
+from typing import Any, Dict, List, Tuple, Union
+
+from .llm import count_tokens
+
+# Prompt tokens the rendered results of one turn may take
+RESULT_TOKEN_BUDGET = int(os.getenv("GISKARD_RESULT_TOKEN_BUDGET", "1200"))
+
+# Longest description kept in a rendered task; longer ones are cut off with an ellipsis
+DESCRIPTION_MAX_CHARS = int(os.getenv("GISKARD_RESULT_DESCRIPTION_CHARS", "300"))
+
+# Task fields the synthesizer needs to answer questions about tasks
+TASK_FIELDS = ("id", "title", "description", "status", "project", "categories", "completed_at")
+
+# Fields of the tasks listed in a summary, which has no room for descriptions
+SUMMARY_TASK_FIELDS = tuple(name for name in TASK_FIELDS if name != "description")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def project_task(task: Dict[str, Any], fields: Tuple[str, ...] = TASK_FIELDS) -> Dict[str, Any]:
+    """A task reduced to `fields`, leaving out empty ones and truncating a long description"""
+    projected = {name: task[name] for name in fields if task.get(name) not in (None, "", [])}
+    description = projected.get("description")
+    if isinstance(description, str) and len(description) > DESCRIPTION_MAX_CHARS:
+        projected["description"] = description[:DESCRIPTION_MAX_CHARS].rstrip() + "…"
+    return projected
+
+
+def render_tasks(tasks: List[Dict[str, Any]], token_budget: int) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Projected tasks, or a summary if they don't fit the budget
+
+    The summary keeps the total, counts per status and category, and the
+    first tasks (in the order they were fetched) that fit the budget,
+    without descriptions.
+    """
+    projected = [project_task(task) for task in tasks]
+    if count_tokens(_dumps(projected)) <= token_budget:
+        return projected
+
+    summary = {
+        "count": len(tasks),
+        "by_status": dict(Counter(task.get("status") or "unknown" for task in tasks)),
+        "by_category": dict(Counter(category for task in tasks for category in task.get("categories") or [])),
+        "tasks": [],
+        "omitted": 0
+    }
+    used = count_tokens(_dumps(summary))
+    for task in (project_task(task, SUMMARY_TASK_FIELDS) for task in tasks):
+        cost = count_tokens(_dumps(task)) + 1
+        if used + cost > token_budget:
+            break
+        summary["tasks"].append(task)
+        used += cost
+    summary["omitted"] = len(tasks) - len(summary["tasks"])
+    return summary
+
+
+def _render_result(result: Dict[str, Any], task_budget: int) -> Dict[str, Any]:
+    rendered = {key: value for key, value in result.items() if value is not None}
+    payload = result.get("result")
+    if isinstance(payload, dict):
+        payload = dict(payload)
+        if isinstance(payload.get("tasks"), list):
+            payload["tasks"] = render_tasks(payload["tasks"], task_budget)
+            # The count is in the summary, or implied by the list
+            payload.pop("count", None)
+        if isinstance(payload.get("task"), dict):
+            payload["task"] = project_task(payload["task"])
+        rendered["result"] = payload
+    return rendered
+
+
+def render_action_results(action_results: List[Dict[str, Any]], token_budget: int = RESULT_TOKEN_BUDGET) -> Tuple[str, int]:
+    """
+    Action results as compact JSON for the synthesizer prompt
+
+    Task lists share the budget equally. Returns (text, tokens saved
+    compared to the full results as indented JSON).
+    """
+    task_lists = sum(1 for r in action_results if isinstance(r.get("result"), dict) and isinstance(r["result"].get("tasks"), list))
+    task_budget = token_budget // max(1, task_lists)
+    text = _dumps([_render_result(result, task_budget) for result in action_results])
+    full_tokens = count_tokens(json.dumps(action_results, indent=2, default=str))
+    return text, max(0, full_tokens - count_tokens(text))
@@ -0,0 +1,39 @@
+"""
+SQLite checkpoints for resuming agent turns
+"""
+import asyncio
+import logging
+import os
+
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+import database
+from .turn_runner import turn_runner
+
+logger = logging.getLogger(__name__)
+
+
+def checkpoint_db_path() -> str:
+    """Checkpoint database, next to the main database unless GISKARD_CHECKPOINT_DB is set"""
+    return os.getenv("GISKARD_CHECKPOINT_DB") or os.path.join(os.path.dirname(database.DATABASE_PATH), "checkpoints.db")
+
+
+def create_checkpointer(path: str = None) -> AsyncSqliteSaver:
+    """
+    Create a checkpointer on the turn runner's loop
+
+    AsyncSqliteSaver binds to the loop it is created on, so it has to be the
+    loop the graphs run on. Must not be called from that loop.
+    """
+    path = path or checkpoint_db_path()
+
+    async def create() -> AsyncSqliteSaver:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        saver = AsyncSqliteSaver(aiosqlite.connect(path, timeout=30.0))
+        await saver.setup()
+        return saver
+
+    saver = asyncio.run_coroutine_threadsafe(create(), turn_runner.loop).result()
+    logger.info(f"Graph checkpoints at {path}")
+    return saver
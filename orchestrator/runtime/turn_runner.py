@@ -0,0 +1,241 @@
+"""
+Cancellable async execution of agent turns with deadlines and a concurrency limit
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+from utils.prometheus import registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Total time budget for one turn
+TURN_TIMEOUT_SECONDS = 90
+
+# Turns allowed to run at once; a local model serves requests one or two at a time anyway
+MAX_CONCURRENT_TURNS = int(os.getenv("GISKARD_MAX_CONCURRENT_TURNS", "2"))
+
+# How long a turn waits for a free slot before it is rejected
+QUEUE_TIMEOUT_SECONDS = 15
+
+# Largest share of the turn budget a single node may use
+NODE_BUDGET_SHARES = {
+    "router_llm": 0.4,
+    "planner_llm": 0.4,
+    "tool_exec": 0.2,
+    "action_exec": 0.2,
+    "synthesizer_llm": 0.6,
+}
+
+turn_outcomes = registry.counter(
+    "turn_runner_outcomes", "Finished turns by outcome (completed, failed, timed_out, cancelled, rejected)", ("outcome",)
+)
+turn_slots = registry.gauge("turn_runner_turns", "Turns running or waiting for a slot now", ("state",))
+
+# (deadline on the runner loop's clock, total budget) of the turn the current task belongs to
+_turn_deadline: contextvars.ContextVar[Optional[Tuple[float, float]]] = contextvars.ContextVar("turn_deadline", default=None)
+
+
+class TurnTimeout(Exception):
+    """The turn used up its total time budget and was cancelled"""
+
+
+class TurnRejected(Exception):
+    """No turn slot became free within QUEUE_TIMEOUT_SECONDS"""
+
+
+class TurnRunner:
+    """
+    Runs agent turns as tasks on one background asyncio loop
+
+    Timeouts cancel the turn's task, which aborts in-flight LLM requests
+    (async HTTP) and skips the remaining nodes and their DB writes, instead
+    of abandoning a still-running thread. A semaphore bounds how many turns
+    run at once; waiting turns count against their own budget.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_TURNS, queue_timeout: float = QUEUE_TIMEOUT_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        with self._lock:
+            self._counts = defaultdict(int)
+            self._node_timeouts = defaultdict(int)
+
+    def _count(self, key: str, delta: int = 1):
+        with self._lock:
+            self._counts[key] += delta
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The runner's event loop, started on first use"""
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="turn-runner", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def _acquire_slot(self):
+        self._count("queued")
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            self._count("queued", -1)
+        if not acquired:
+            self._count("rejected")
+            turn_outcomes.labels(outcome="rejected").inc()
+            raise TurnRejected(f"All {self.max_concurrent} turn slots busy")
+        self._count("running")
+
+    def _release_slot(self, outcome: str):
+        self._count("running", -1)
+        self._count(outcome)
+        turn_outcomes.labels(outcome=outcome).inc()
+        self._slots.release()
+
+    async def _run_with_deadline(self, coro_factory: Callable[[], Awaitable[T]], timeout: float) -> T:
+        _turn_deadline.set((asyncio.get_running_loop().time() + timeout, timeout))
+        try:
+            return await asyncio.wait_for(coro_factory(), timeout)
+        except asyncio.TimeoutError:
+            raise TurnTimeout(f"Turn exceeded its {timeout:.0f}s budget")
+
+    def submit(self, coro_factory: Callable[[], Awaitable[T]], timeout: float = TURN_TIMEOUT_SECONDS) -> Future:
+        """
+        Start a turn once a slot is free
+
+        Blocks the calling thread until a slot is free (TurnRejected after
+        queue_timeout). Cancelling the returned future cancels the turn.
+
+        Args:
+            coro_factory: Creates the turn's coroutine (called on the runner loop)
+            timeout: Total budget in seconds, including the wait for a slot
+        """
+        started = time.monotonic()
+        self._acquire_slot()
+        remaining = max(timeout - (time.monotonic() - started), 0.001)
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._run_with_deadline(coro_factory, remaining), self.loop)
+        except Exception:
+            self._release_slot("failed")
+            raise
+
+        def finished(f: Future):
+            if f.cancelled():
+                outcome = "cancelled"
+            elif isinstance(f.exception(), TurnTimeout):
+                outcome = "timed_out"
+            elif f.exception() is not None:
+                outcome = "failed"
+            else:
+                outcome = "completed"
+            self._release_slot(outcome)
+
+        future.add_done_callback(finished)
+        return future
+
+    def run(self, coro_factory: Callable[[], Awaitable[T]], timeout: float = TURN_TIMEOUT_SECONDS) -> T:
+        """Run a turn and wait for its result (raises TurnTimeout, TurnRejected or the turn's error)"""
+        future = self.submit(coro_factory, timeout)
+        try:
+            return future.result()
+        except BaseException:
+            # The caller gave up (e.g. KeyboardInterrupt): don't leave the turn running
+            future.cancel()
+            raise
+
+    def stream(self, agen_factory: Callable[[], AsyncIterator[T]], timeout: float = TURN_TIMEOUT_SECONDS) -> Iterator[T]:
+        """
+        Run a turn that produces events, yielding them in the calling thread
+
+        Closing the generator (e.g. the client disconnected) cancels the turn.
+        """
+        events: queue.Queue = queue.Queue()
+        done = object()
+
+        async def pump():
+            async for item in agen_factory():
+                events.put(item)
+
+        future = self.submit(pump, timeout)
+        future.add_done_callback(lambda f: events.put(done))
+        try:
+            while True:
+                item = events.get()
+                if item is done:
+                    future.result()
+                    return
+                yield item
+        finally:
+            if not future.done():
+                logger.info("Turn stream closed early, cancelling the turn")
+                future.cancel()
+
+    def record_node_timeout(self, node_name: str):
+        with self._lock:
+            self._node_timeouts[node_name] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Running/queued turns now, and outcome counts since the last reset"""
+        with self._lock:
+            counts = dict(self._counts)
+            node_timeouts = dict(self._node_timeouts)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": counts.get("running", 0),
+            "queued": counts.get("queued", 0),
+            "completed": counts.get("completed", 0),
+            "failed": counts.get("failed", 0),
+            "timed_out": counts.get("timed_out", 0),
+            "cancelled": counts.get("cancelled", 0),
+            "rejected": counts.get("rejected", 0),
+            "node_timeouts": node_timeouts
+        }
+
+
+async def with_node_deadline(node_name: str, awaitable: Awaitable[T]) -> T:
+    """
+    Await a node's work within its share of the turn budget
+
+    The node gets NODE_BUDGET_SHARES[node_name] of the total budget. Raises
+    asyncio.TimeoutError (after cancelling the work) so the node can fall
+    back; outside a turn, or when the turn's own deadline comes first, it
+    just awaits and the turn is cancelled as a whole.
+    """
+    turn = _turn_deadline.get()
+    if turn is None:
+        return await awaitable
+    deadline, budget = turn
+    node_timeout = budget * NODE_BUDGET_SHARES.get(node_name, 1.0)
+    if node_timeout >= deadline - asyncio.get_running_loop().time():
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, node_timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"[{node_name}] exceeded its {node_timeout:.1f}s deadline")
+        turn_runner.record_node_timeout(node_name)
+        raise
+
+
+# Global turn runner instance
+turn_runner = TurnRunner()
+
+for _state in ("running", "queued"):
+    turn_slots.labels(state=_state).set_function(lambda state=_state: turn_runner.get_metrics()[state])
@@ -0,0 +1,107 @@
+"""
+Process-wide catalog of agent tools and precompiled prompts
+"""
+import logging
+import threading
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, Optional
+
+from langchain_core.tools import StructuredTool
+
+from config.prompt_manager import CompiledPrompt, prompt_manager
+from .tool_registry import ToolRegistry
+
+logger = logging.getLogger(__name__)
+
+# Prompts compiled into the catalog: name -> Langfuse label (None = local file only)
+CATALOG_PROMPTS = {
+    "planner": "production",
+    "synthesizer": "production",
+    "router": None,  # Router is deprecated and only uses the local prompt
+    "conversation_summary": None,
+}
+
+
+class ToolCatalog:
+    """
+    Immutable snapshot of the tool registry and prompts compiled against it
+
+    Tool descriptions are baked into the prompt templates once, so a request
+    only fills in its own variables. Reloading builds a new catalog and swaps
+    it in; requests already holding the old one finish with it unchanged.
+    """
+
+    def __init__(self, tool_registry: ToolRegistry, prompts: Dict[str, CompiledPrompt]):
+        self.tool_registry = tool_registry
+        self.tools = tuple(tool_registry.get_tools())
+        self.tool_names = frozenset(tool.name for tool in self.tools)
+        self.tool_descriptions = tool_registry.get_tool_descriptions()
+        self.prompts = MappingProxyType(dict(prompts))
+        self.loaded_at = datetime.now().isoformat()
+
+    def prompt(self, name: str) -> CompiledPrompt:
+        """Precompiled prompt by name (KeyError if not in the catalog)"""
+        return self.prompts[name]
+
+    def get_tool_by_name(self, name: str) -> Optional[StructuredTool]:
+        return self.tool_registry.get_tool_by_name(name)
+
+    def summary(self) -> Dict[str, Any]:
+        """What is loaded, for the reload endpoint and logs"""
+        return {
+            "tools": sorted(self.tool_names),
+            "prompts": {
+                name: {"source": prompt.source, "version": prompt.version, "variables": prompt.variables}
+                for name, prompt in self.prompts.items()
+            },
+            "loaded_at": self.loaded_at
+        }
+
+
+def build_tool_catalog(tool_registry: Optional[ToolRegistry] = None,
+                       prompt_names: Optional[Dict[str, Optional[str]]] = None) -> ToolCatalog:
+    """
+    Build a catalog, loading every prompt from Langfuse or the local files
+
+    Args:
+        tool_registry: Registry to reuse (a new one is created if omitted)
+        prompt_names: Prompt name -> Langfuse label (defaults to CATALOG_PROMPTS)
+    """
+    tool_registry = tool_registry or ToolRegistry()
+    tool_descriptions = tool_registry.get_tool_descriptions()
+    prompts = {
+        name: prompt_manager.precompile(name, label=label, tool_descriptions=tool_descriptions)
+        for name, label in (prompt_names or CATALOG_PROMPTS).items()
+    }
+    return ToolCatalog(tool_registry, prompts)
+
+
+_catalog: Optional[ToolCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_tool_catalog() -> ToolCatalog:
+    """The current catalog, built on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = build_tool_catalog()
+                logger.info(f"Tool catalog built: {len(_catalog.tools)} tools, {len(_catalog.prompts)} prompts")
+    return _catalog
+
+
+def reload_tool_catalog() -> ToolCatalog:
+    """
+    Reload all prompts and swap in a new catalog
+
+    The tool registry is reused. If any prompt fails to load the exception
+    propagates and the current catalog stays in place.
+    """
+    global _catalog
+    with _catalog_lock:
+        tool_registry = _catalog.tool_registry if _catalog else None
+        _catalog = build_tool_catalog(tool_registry)
+    logger.info(f"Tool catalog reloaded at {_catalog.loaded_at}")
+    return _catalog
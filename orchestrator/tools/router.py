@@ -3,6 +3,7 @@ Idiomatic LangChain router using proper LCEL patterns and structured output
 """
 import logging
 import os
+import re
 import json
 from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
@@ -12,11 +13,51 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableParallel
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_openai import ChatOpenAI
+from .catalog import get_tool_catalog
 from .tool_registry import ToolRegistry
-from config.prompt_manager import get_compiled_prompt
+from ..actions.scheduler import is_read_action
+from models.task_db import IdempotencyKeyDB
+from utils.ollama_client import ollama_client
 
 logger = logging.getLogger(__name__)
 
+# Turn kinds returned by Router.classify_turn
+TURN_CHAT = "chat"  # Pure conversation: skip the planner and actions
+TURN_READ = "read"  # Likely reads tasks: prefetch them while the planner runs
+TURN_TOOL = "tool"  # Anything else goes through the planner as usual
+
+# Short conversational messages that never need a tool: the whole message must be
+# one or more of these phrases, followed by nothing but punctuation or emoji
+_CHAT_PHRASE = (
+    r"(?:hi|hello|hey|yo|thanks|thank you|thank u|thx|ty|cheers|cool|great|nice|awesome|perfect|"
+    r"got it|sounds good|good (?:morning|afternoon|evening|night)|bye|goodbye|see you|"
+    r"how are you|how's it going|lol|haha|wow|ok thanks|okay thanks)"
+    r"(?:\s+(?:so much|very much|a lot|again|there|everyone|giskard))?"
+)
+CHAT_PATTERN = re.compile(rf"{_CHAT_PHRASE}(?:[\s,!.]+{_CHAT_PHRASE})*[\W_]*")
+
+# Words that mean the user wants something done or looked up
+TOOL_WORDS = frozenset({
+    "task", "tasks", "todo", "todos", "list", "add", "create", "new", "mark", "done", "complete",
+    "completed", "finish", "finished", "start", "started", "update", "change", "rename", "move",
+    "reorder", "prioritize", "delete", "remove", "show", "what", "which", "many", "due",
+    "today", "tomorrow", "week", "open", "progress", "status", "project", "remind",
+})
+
+# Words that suggest the planner will call fetch_tasks
+READ_WORDS = frozenset({
+    "show", "list", "what", "which", "many", "see", "view", "display", "tasks", "todos",
+    "open", "pending", "progress", "remaining", "left", "today", "completed", "done",
+})
+
+# Words that suggest a write, where a prefetch would likely be wasted
+WRITE_WORDS = frozenset({
+    "add", "create", "new", "mark", "complete", "finish", "start", "update", "change",
+    "rename", "move", "reorder", "prioritize", "delete", "remove",
+})
+
+_WORD_PATTERN = re.compile(r"[a-z']+")
+
 
 class RouterDecision(BaseModel):
     """Structured output for router decisions"""
@@ -59,7 +100,12 @@ class Router:
             base_url=f"{base_url}/v1",  # OpenAI-compatible endpoint
             api_key="ollama"  # Dummy key for Ollama
         )
-        self.tool_registry = ToolRegistry(api_base_url)
+        # Share the process-wide tools unless pointed at a different API
+        catalog = get_tool_catalog()
+        if catalog.tool_registry.action_executor.base_url == api_base_url:
+            self.tool_registry = catalog.tool_registry
+        else:
+            self.tool_registry = ToolRegistry(api_base_url)
         self.tools = self.tool_registry.get_tools()
         
         # Setup the router chain
@@ -70,8 +116,9 @@ class Router:
         # Load and format the prompt template
         self.prompt_template = self._load_prompt_template()
         
-        # Create a custom prompt function that handles the compiled template
+        # Render per call so catalog reloads (and the current datetime) apply
         def create_messages(input_data):
+            self.prompt_template = self._load_prompt_template()
             return [
                 SystemMessage(content=self.prompt_template),
                 HumanMessage(content=input_data["input"])
@@ -94,7 +141,11 @@ class Router:
         """Load and format the router prompt template using local file only"""
         # Router is deprecated - use local prompt only
         from config.prompt_manager import prompt_manager
-        
+
+        catalog = get_tool_catalog()
+        if self.prompt_name in catalog.prompts and self.tool_registry is catalog.tool_registry:
+            return catalog.prompt(self.prompt_name).render()
+
         try:
             local_prompt_data = prompt_manager.load_local_prompt(self.prompt_name)
             compiled_prompt = prompt_manager.compile_prompt(
@@ -190,6 +241,30 @@ class Router:
                 tool_args={}
             )
     
+    def classify_turn(self, user_input: str, last_assistant_message: Optional[str] = None) -> str:
+        """
+        Cheap heuristic routing of a turn before any LLM call
+
+        Args:
+            user_input: The user's input text
+            last_assistant_message: Previous assistant reply, if any. A reply
+                ending in a question means a short answer may confirm an action,
+                so such turns never take the chat fast path.
+
+        Returns:
+            TURN_CHAT, TURN_READ or TURN_TOOL
+        """
+        text = user_input.strip().lower()
+        words = set(_WORD_PATTERN.findall(text))
+        awaiting_answer = bool(last_assistant_message and last_assistant_message.rstrip().endswith("?"))
+
+        if (not awaiting_answer and len(words) <= 8 and words.isdisjoint(TOOL_WORDS)
+                and CHAT_PATTERN.fullmatch(text)):
+            return TURN_CHAT
+        if not words.isdisjoint(READ_WORDS) and words.isdisjoint(WRITE_WORDS):
+            return TURN_READ
+        return TURN_TOOL
+
     def plan_actions(self, user_input: str, trace_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Plan actions using the idiomatic router approach without separate Langfuse tracing
@@ -201,14 +276,25 @@ class Router:
             
         Returns:
             Dictionary with assistant_text, tool_name, and tool_args
+            (plus fast_path=True when the LLM call was skipped)
         """
+        # Pure chat turns skip the router LLM entirely
+        if self.classify_turn(user_input) == TURN_CHAT:
+            return {
+                "assistant_text": "",
+                "tool_name": "no_op",
+                "tool_args": {},
+                "fast_path": True
+            }
+
         try:
             # Prepare the input for the chain
             chain_input = {"input": user_input}
             
             # Execute the router chain without separate Langfuse tracing
             # The main conversation flow will handle all tracing
-            decision = self.router_chain.invoke(chain_input)
+            with ollama_client.limits.semaphore(self.model_name):
+                decision = self.router_chain.invoke(chain_input)
             
             # Convert to dictionary format for compatibility
             return {
@@ -225,14 +311,41 @@ class Router:
                 "tool_name": "no_op",
                 "tool_args": {}
             }
-    
-    def execute_tool(self, tool_name: str, tool_args: Dict[str, Any]) -> str:
+
+    async def aplan_actions(self, user_input: str, trace_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async variant of plan_actions
+
+        Cancelling the awaiting task aborts the in-flight LLM request. Errors,
+        including asyncio.TimeoutError from a node deadline, propagate so the
+        caller can apply its own fallback.
+        """
+        if self.classify_turn(user_input) == TURN_CHAT:
+            return {
+                "assistant_text": "",
+                "tool_name": "no_op",
+                "tool_args": {},
+                "fast_path": True
+            }
+
+        async with ollama_client.limits.aslot(self.model_name):
+            decision = await self.router_chain.ainvoke({"input": user_input})
+        return {
+            "assistant_text": decision.assistant_text,
+            "tool_name": decision.tool_name,
+            "tool_args": decision.tool_args
+        }
+
+    def execute_tool(self, tool_name: str, tool_args: Dict[str, Any], idempotency_key: Optional[str] = None) -> str:
         """
         Execute a tool with the given arguments using proper error handling
         
         Args:
             tool_name: Name of the tool to execute
             tool_args: Arguments for the tool
+            idempotency_key: Key of this call within a retryable turn; a tool with
+                side effects that already succeeded under it returns its recorded
+                result instead of running again
             
         Returns:
             Result string from the tool execution
@@ -241,10 +354,19 @@ class Router:
             tool = self.tool_registry.get_tool_by_name(tool_name)
             if not tool:
                 return f"❌ Error: Unknown tool '{tool_name}'"
-            
+
+            record = idempotency_key is not None and not is_read_action(tool_name, tool_args)
+            if record:
+                recorded = IdempotencyKeyDB.get(idempotency_key)
+                if recorded is not None:
+                    logger.info(f"Tool {tool_name} already ran under {idempotency_key}, returning its result")
+                    return recorded
+
             # Execute the tool using LangChain's invoke method
             # The tool expects the arguments to be passed as a dictionary
             result = tool.invoke(tool_args)
+            if record and not str(result).startswith("❌"):
+                result = IdempotencyKeyDB.put(idempotency_key, "tool", result)
             return result
             
         except Exception as e:
@@ -269,7 +391,8 @@ class Router:
         def handle_router_error(inputs: Dict[str, Any]) -> RouterDecision:
             """Handle router errors with fallback"""
             try:
-                return self.router_chain.invoke(inputs)
+                with ollama_client.limits.semaphore(self.model_name):
+                    return self.router_chain.invoke(inputs)
             except Exception as e:
                 logger.error(f"Router chain error: {str(e)}")
                 return RouterDecision(
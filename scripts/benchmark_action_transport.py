@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark agent action latency over the in-process and HTTP transports
+
+Runs the same create/fetch/update actions through ActionExecutor against a
+temporary database, once calling the task service directly and once through
+the REST API served from a local thread.
+
+Usage:
+    python scripts/benchmark_action_transport.py [--iterations 200] [--tasks 100]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from werkzeug.serving import make_server
+
+import database
+from api.routes import api
+from models.task_db import TaskDB
+from orchestrator.actions.actions import ActionExecutor
+from utils.task_service import task_service
+
+
+def start_api_server():
+    """Serve the REST API on a free local port; returns (server, base_url)"""
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    app = Flask(__name__)
+    app.register_blueprint(api)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def time_action(executor: ActionExecutor, action_name: str, args_for, iterations: int) -> list:
+    """Per-call latencies in milliseconds"""
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        success, result = executor.execute_action(action_name, args_for(i))
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert success, result
+    return latencies
+
+
+def run_benchmark(iterations: int, task_count: int):
+    tmp = tempfile.TemporaryDirectory()
+    database.DATABASE_PATH = os.path.join(tmp.name, 'giskard.db')
+    database.init_database()
+    # No classifier running here; keep both transports doing the same work
+    task_service.enqueue_classification = False
+
+    task_ids = [TaskDB.create(f"Seed task {i}").id for i in range(task_count)]
+    server, base_url = start_api_server()
+
+    actions = {
+        "create_task": lambda i: {"title": f"Benchmark task {i}"},
+        "fetch_tasks": lambda i: {"status": "open"},
+        "update_task_status": lambda i: {"task_id": task_ids[i % task_count], "status": ("in_progress", "open")[i % 2]},
+    }
+
+    print(f"📊 Action transport benchmark ({iterations} calls per action, {task_count} seeded tasks)")
+    print(f"  {'action':<20} {'transport':<10} {'mean':>9} {'p50':>9} {'p95':>9}")
+    try:
+        for action_name, args_for in actions.items():
+            for transport in ("inprocess", "http"):
+                executor = ActionExecutor(base_url, transport=transport)
+                latencies = sorted(time_action(executor, action_name, args_for, iterations))
+                p95 = latencies[int(len(latencies) * 0.95) - 1]
+                print(f"  {action_name:<20} {transport:<10} {statistics.mean(latencies):7.2f}ms "
+                      f"{statistics.median(latencies):7.2f}ms {p95:7.2f}ms")
+    finally:
+        server.shutdown()
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark in-process vs HTTP action execution")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=100)
+    args = parser.parse_args()
+    run_benchmark(args.iterations, args.tasks)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Compare classifier prompt versions and models on the labelled tasks in the database
+
+Every combination of --prompt-versions and --models is replayed through
+TaskClassificationService (fast path disabled) in parallel, and precision/recall
+per category, tokens, latency and throughput are reported side by side.
+
+Usage:
+    # Live against Ollama, recording responses for later replay
+    python scripts/evaluate_classifier_prompts.py --prompt-versions 3.1 3.2 --record data/evaluations/recorded.jsonl
+
+    # Offline, replaying the recorded responses
+    python scripts/evaluate_classifier_prompts.py --prompt-versions 3.1 3.2 --replay data/evaluations/recorded.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.prompt_registry import prompt_registry
+from utils.classifier_evaluation import ClassifierEvaluator, EvaluationVariant, RecordedResponses, load_labelled_tasks
+
+
+def load_dataset_file(path: str) -> list:
+    """Load (task_text, categories) pairs from a JSONL file of {"task": ..., "categories": [...]}"""
+    dataset = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                dataset.append((entry["task"], entry.get("categories", [])))
+    return dataset
+
+
+def print_report(reports: list):
+    print("\n📊 Results")
+    for report in reports:
+        summary = report.to_dict()
+        print(f"\n  {summary['variant']}")
+        print(f"    Exact-match accuracy: {summary['exact_match_accuracy']}   Fallback rate: {summary['fallback_rate']}")
+        for category, stats in summary['per_category'].items():
+            print(f"    {category:<9} precision={stats['precision']} recall={stats['recall']} f1={stats['f1']}")
+        print(f"    Tokens: prompt={summary['tokens']['prompt']} response={summary['tokens']['response']}")
+        print(f"    Latency: mean={summary['latency_ms']['mean']}ms p95={summary['latency_ms']['p95']}ms")
+        print(f"    Throughput: {summary['throughput_tasks_per_s']} tasks/s over {summary['wall_seconds']}s")
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Evaluate classifier prompt versions and models")
+    parser.add_argument("--prompt-versions", nargs="*", default=[None],
+                        help="task_classification prompt versions (default: production classifier prompt)")
+    parser.add_argument("--models", nargs="*", default=[None], help="Ollama models (default: configured model)")
+    parser.add_argument("--dataset", help="JSONL file of labelled tasks instead of the database")
+    parser.add_argument("--limit", type=int, help="Maximum number of labelled tasks")
+    parser.add_argument("--include-uncategorized", action="store_true",
+                        help="Treat tasks without categories as labelled 'no category'")
+    parser.add_argument("--workers", type=int, default=4)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", help="Record Ollama responses to this JSONL file")
+    mode.add_argument("--replay", help="Replay recorded responses instead of calling Ollama")
+    parser.add_argument("--output", default=f"data/evaluations/classifier_eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    args = parser.parse_args()
+
+    available = {v.version for v in prompt_registry.get_prompt_versions("task_classification")}
+    missing = [v for v in args.prompt_versions if v and v not in available]
+    if missing:
+        print(f"❌ Unknown prompt versions: {missing} (available: {sorted(available)})")
+        return False
+
+    dataset = load_dataset_file(args.dataset) if args.dataset else load_labelled_tasks(args.limit, args.include_uncategorized)
+    if args.limit:
+        dataset = dataset[:args.limit]
+    if not dataset:
+        print("❌ No labelled tasks to evaluate")
+        return False
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    recorded = None
+    if args.record or args.replay:
+        recorded = RecordedResponses(args.record or args.replay, mode="record" if args.record else "replay")
+
+    variants = [EvaluationVariant(prompt_version=v, model=m) for v in args.prompt_versions for m in args.models]
+    print(f"🔄 Evaluating {len(variants)} variants on {len(dataset)} labelled tasks "
+          f"({'replay' if args.replay else 'live Ollama'}, {args.workers} workers)...")
+
+    evaluator = ClassifierEvaluator(variants, max_workers=args.workers, recorded=recorded,
+                                    log_file=os.path.join(os.path.dirname(args.output) or '.', "classification_eval_log.txt"))
+    reports = evaluator.run(dataset)
+    print_report(reports)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            "generated_at": datetime.now().isoformat(),
+            "dataset_size": len(dataset),
+            "mode": "replay" if args.replay else "live",
+            "variants": [report.to_dict() for report in reports]
+        }, f, indent=2)
+    print(f"\n✅ Report written to {args.output}")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
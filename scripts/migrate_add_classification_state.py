@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the task_classification_state table
+"""
+import os
+import sys
+from datetime import datetime
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection, create_classification_state_table, DATABASE_PATH
+
+def create_classification_state():
+    """Create the task_classification_state table and index"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        create_classification_state_table(cursor)
+        conn.commit()
+        print("✅ Created task_classification_state table")
+
+def verify_migration():
+    """Verify the migration was successful"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type='table' AND name='task_classification_state'
+        """)
+        if not cursor.fetchone():
+            print("❌ task_classification_state table not found")
+            return False
+        print("✅ task_classification_state table exists")
+
+        cursor.execute("""
+            SELECT COUNT(*) FROM tasks
+            WHERE id NOT IN (SELECT task_id FROM task_classification_state)
+        """)
+        print(f"📋 {cursor.fetchone()[0]} unclassified tasks will be classified on next startup")
+
+        return True
+
+def main():
+    """Run the migration"""
+    print("🚀 Starting migration to add task_classification_state table")
+    print("=" * 60)
+
+    # Backup existing database
+    backup_path = f"{DATABASE_PATH}.backup.{int(datetime.now().timestamp())}"
+    print(f"📦 Creating backup: {backup_path}")
+
+    import shutil
+    shutil.copy2(DATABASE_PATH, backup_path)
+    print("✅ Database backup created")
+
+    try:
+        print("\n🔧 Creating task_classification_state table...")
+        create_classification_state()
+
+        print("\n✅ Verifying migration...")
+        if verify_migration():
+            print("\n🎉 Migration completed successfully!")
+            print(f"📦 Backup available at: {backup_path}")
+        else:
+            print("\n❌ Migration verification failed")
+            print(f"📦 Restore from backup: {backup_path}")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        print(f"📦 Restore from backup: {backup_path}")
+        raise
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Fold local trace spans into stacks for a latency flame graph
+
+Reads the JSONL or SQLite sink written with GISKARD_TRACING_SINK=jsonl or
+sqlite and prints one "root;child;leaf <self time in µs>" line per stack,
+the input flamegraph.pl, inferno and speedscope take.
+
+Usage:
+    python scripts/trace_flamegraph.py data/traces.jsonl > turns.folded
+    flamegraph.pl --countname=us turns.folded > turns.svg
+    python scripts/trace_flamegraph.py data/traces.db --trace <trace_id> --top 10
+"""
+
+import argparse
+import os
+import sys
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.tracing import folded_stacks, load_spans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold local trace spans into flame graph stacks")
+    parser.add_argument("path", help="JSONL or SQLite span file")
+    parser.add_argument("--trace", help="Only spans of this trace id")
+    parser.add_argument("--top", type=int, help="Print the N stacks with the most self time, in ms, instead")
+    args = parser.parse_args()
+
+    spans = load_spans(args.path)
+    if args.trace:
+        spans = [span for span in spans if span["trace_id"] == args.trace]
+    stacks = folded_stacks(spans)
+
+    if args.top:
+        print(f"📊 Self time of {len(spans)} spans")
+        for stack, ms in sorted(stacks.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {ms:10.1f}ms  {stack}")
+        return
+    for stack, ms in stacks.items():
+        print(f"{stack} {int(round(ms * 1000))}")
+
+
+if __name__ == '__main__':
+    main()
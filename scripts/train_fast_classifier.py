@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Train the fast-path task classifier and report accuracy/latency against the logged predictions
+
+Training data comes from two sources:
+- data/classification_predictions_log.txt and its rotated segments: LLM predictions (fallback, skipped and
+  fast-path entries are excluded so the model never learns from itself)
+- the categories already stored on tasks in the database, which win over the log
+  because they include manual corrections
+
+Usage:
+    python scripts/train_fast_classifier.py [--holdout 0.2] [--output data/fast_classifier.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# Add the parent directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.fast_classifier import FastClassifier, CATEGORIES
+from utils.prediction_log import iter_prediction_log, list_log_segments
+from utils.classifier_evaluation import category_scores
+
+EXCLUDED_RESPONSE_PREFIXES = ("FALLBACK", "SKIPPED", "FAST_PATH")
+
+
+def load_logged_predictions(log_file: str) -> dict:
+    """Load task_text -> categories from the LLM prediction log, including rotated segments (last prediction wins)"""
+    examples = {}
+    if not os.path.exists(log_file) and not list_log_segments(log_file):
+        print(f"⚠️  Prediction log not found at {log_file}")
+        return examples
+
+    for entry in iter_prediction_log(log_file):
+        raw_response = str(entry.get('raw_response', ''))
+        if raw_response.startswith(EXCLUDED_RESPONSE_PREFIXES):
+            continue
+        task_text = entry.get('task')
+        if task_text:
+            examples[task_text] = [c for c in entry.get('categories', []) if c in CATEGORIES]
+    return examples
+
+
+def load_task_categories() -> dict:
+    """Load task_text -> categories for tasks that have categories stored in the database"""
+    examples = {}
+    try:
+        from models.task_db import TaskDB
+        for task in TaskDB.get_all():
+            if not task.categories:
+                continue
+            task_text = f"{task.title} - {task.description}" if task.description else task.title
+            examples[task_text] = [c for c in task.categories if c in CATEGORIES]
+    except Exception as e:
+        print(f"⚠️  Could not load tasks from database: {e}")
+    return examples
+
+
+def evaluate(model: FastClassifier, examples: list) -> dict:
+    """Evaluate the model on (text, categories) pairs"""
+    pairs = []
+    exact_matches = 0
+    confident = 0
+    confident_exact = 0
+    latencies_ms = []
+
+    for text, expected in examples:
+        start = time.perf_counter()
+        prediction = model.predict(text)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        predicted = set(prediction.categories)
+        expected = set(expected)
+        pairs.append((expected, predicted))
+        if predicted == expected:
+            exact_matches += 1
+        if prediction.confident:
+            confident += 1
+            if predicted == expected:
+                confident_exact += 1
+
+    total = len(examples)
+    latencies_ms.sort()
+
+    return {
+        "examples": total,
+        "exact_match_accuracy": round(exact_matches / total, 3) if total else None,
+        "fast_path_coverage": round(confident / total, 3) if total else None,
+        "fast_path_accuracy": round(confident_exact / confident, 3) if confident else None,
+        "per_category": category_scores(pairs, model.categories),
+        "latency_ms": {
+            "mean": round(sum(latencies_ms) / total, 4) if total else None,
+            "p50": round(latencies_ms[total // 2], 4) if total else None,
+            "p95": round(latencies_ms[min(int(total * 0.95), total - 1)], 4) if total else None
+        }
+    }
+
+
+def train(log_file: str, output: str, report_file: str, holdout: float) -> bool:
+    """Train, evaluate on a holdout split, then retrain on everything and save"""
+    print("🔄 Loading training data...")
+    examples = load_logged_predictions(log_file)
+    logged_count = len(examples)
+    examples.update(load_task_categories())
+    dataset = sorted(examples.items())
+
+    print(f"  📋 {logged_count} logged predictions, {len(dataset) - logged_count} additional task labels")
+    if len(dataset) < 10:
+        print("❌ Not enough labelled examples to train a model (need at least 10)")
+        return False
+
+    # Deterministic split: every Nth example goes to the holdout set
+    step = max(int(round(1 / holdout)), 2) if holdout > 0 else 0
+    holdout_set = [ex for i, ex in enumerate(dataset) if step and i % step == 0]
+    training_set = [ex for i, ex in enumerate(dataset) if not step or i % step != 0]
+
+    print(f"🧠 Training on {len(training_set)} examples, evaluating on {len(holdout_set)}...")
+    start = time.perf_counter()
+    model = FastClassifier().fit(training_set)
+    training_seconds = time.perf_counter() - start
+    holdout_report = evaluate(model, holdout_set) if holdout_set else None
+
+    # Final model uses every labelled example
+    model = FastClassifier().fit(dataset)
+    model.save(output)
+    print(f"💾 Saved model artifact to {output}")
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "model_file": output,
+        "training_examples": len(dataset),
+        "vocabulary_size": len(model.vocabulary),
+        "training_seconds": round(training_seconds, 3),
+        "thresholds": {"high": model.high_confidence, "low": model.low_confidence},
+        "holdout": holdout_report,
+        "logged_predictions": evaluate(model, list(load_logged_predictions(log_file).items()))
+    }
+    os.makedirs(os.path.dirname(report_file) or '.', exist_ok=True)
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    if holdout_report:
+        print("\n📊 Holdout results")
+        print(f"  Exact-match accuracy: {holdout_report['exact_match_accuracy']}")
+        print(f"  Fast-path coverage:   {holdout_report['fast_path_coverage']}")
+        print(f"  Fast-path accuracy:   {holdout_report['fast_path_accuracy']}")
+        for category, stats in holdout_report['per_category'].items():
+            print(f"  {category:<9} precision={stats['precision']} recall={stats['recall']}")
+        print(f"  Latency: mean={holdout_report['latency_ms']['mean']}ms p95={holdout_report['latency_ms']['p95']}ms")
+    print(f"\n✅ Report written to {report_file}")
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the fast-path task classifier")
+    parser.add_argument("--log-file", default="data/classification_predictions_log.txt")
+    parser.add_argument("--output", default="data/fast_classifier.json")
+    parser.add_argument("--report", default="data/fast_classifier_report.json")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of examples held out for evaluation")
+    args = parser.parse_args()
+
+    success = train(args.log_file, args.output, args.report, args.holdout)
+    sys.exit(0 if success else 1)
@@ -1,83 +1,57 @@
 """
 LangGraph-based agent API endpoints
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 import logging
 import time
 import json
 from datetime import datetime
-from orchestrator.langgraph_orchestrator import LangGraphOrchestrator
-from models.task_db import AgentStepDB
+from orchestrator.langgraph_orchestrator import get_orchestrator
+from orchestrator.pipeline.engine import Pipeline, TurnContext, end_root_span, new_turn_state, start_root_span
+from orchestrator.pipeline.llm import LLM_MODEL, count_message_tokens, convert_conversation_context_to_messages
+from orchestrator.pipeline.nodes import ActionNode, PlannerNode, ResponseCacheNode, RouteTurnNode, SynthesizerNode
+from orchestrator.pipeline.response_cache import response_cache
+from orchestrator.runtime.turn_runner import TurnRejected, turn_runner
+from orchestrator.tools.catalog import get_tool_catalog, reload_tool_catalog
+from orchestrator.tools.router import TURN_CHAT
 from models.session_db import SessionDB, TraceDB
-from database import get_connection
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-import tiktoken
+from utils.agent_metrics import prompt_cache_metrics, response_cache_metrics, turn_metrics
+from utils.conversation_memory import ConversationMemory, format_turns
+from utils.ollama_client import ollama_client
+from utils.token_accounting import token_accounting
+from utils.tracing import span_tracer, traced
+from langchain_core.messages import HumanMessage
 
 logger = logging.getLogger(__name__)
 
-# Initialize tokenizer for token counting
-try:
-    # Use cl100k_base encoding (used by GPT-4, GPT-3.5-turbo)
-    # This is a reasonable approximation for counting tokens
-    tokenizer = tiktoken.get_encoding("cl100k_base")
-except Exception as e:
-    logger.warning(f"Failed to load tiktoken encoder: {e}")
-    tokenizer = None
-
-
-def count_tokens(text: str) -> int:
-    """
-    Count tokens in text using tiktoken
-
-    Args:
-        text: Text to count tokens for
-
-    Returns:
-        Number of tokens (or 0 if tokenizer unavailable)
-    """
-    if not tokenizer or not text:
-        return 0
-    try:
-        return len(tokenizer.encode(text))
-    except Exception as e:
-        logger.warning(f"Failed to count tokens: {e}")
-        return 0
+# Create blueprint
+agent = Blueprint('agent', __name__)
 
 
-def count_message_tokens(messages: list) -> int:
-    """
-    Count total tokens in a list of messages
+def count_context_tokens(conversation_context) -> int:
+    """Token count of conversation context as it is sent to the LLM"""
+    return count_message_tokens(convert_conversation_context_to_messages(conversation_context))
 
-    Args:
-        messages: List of LangChain messages
 
-    Returns:
-        Total token count
-    """
-    total = 0
-    for msg in messages:
-        content = msg.content if hasattr(msg, 'content') else str(msg)
-        total += count_tokens(content)
-        # Add tokens for message formatting (role, etc.)
-        total += 4  # Approximate overhead per message
-    return total
+def summarize_conversation(previous_summary: str, turns: list) -> str:
+    """Fold conversation turns into the rolling session summary with the agent LLM"""
+    prompt = get_tool_catalog().prompt("conversation_summary")
+    text = prompt.render(previous_summary=previous_summary or "(none yet)", turns=format_turns(turns))
+    with ollama_client.limits.semaphore(LLM_MODEL):
+        response = orchestrator.llm.invoke([HumanMessage(content=text)])
+    return response.content
 
-# Create blueprint
-agent = Blueprint('agent', __name__)
 
+# Initialize orchestrator
+orchestrator = get_orchestrator()
 
-def convert_conversation_context_to_messages(conversation_context):
-    """Convert conversation context from frontend to LangChain messages"""
-    messages = []
-    for msg in conversation_context:
-        if msg.get('type') == 'user':
-            messages.append(HumanMessage(content=msg.get('content', '')))
-        elif msg.get('type') == 'bot':
-            messages.append(AIMessage(content=msg.get('content', '')))
-    return messages
+# Chat turns: route, answer repeated reads from the cache, plan, run actions, stream the answer
+conversation_pipeline = Pipeline("chat.turn", [
+    RouteTurnNode(), ResponseCacheNode(), PlannerNode(), ActionNode(), SynthesizerNode()
+])
 
-# Initialize orchestrator
-orchestrator = LangGraphOrchestrator()
+# Per-session history for the planner and synthesizer, bounded by a token budget
+conversation_memory = ConversationMemory(count_context_tokens, summarize_conversation)
 
 
 class APIResponse:
@@ -96,19 +70,34 @@ class APIResponse:
 
 
 @agent.route('/step', methods=['POST'])
+@traced("http.agent.step")
 def agent_step():
-    """Handle agent orchestration step with LangGraph"""
+    """Handle agent orchestration step with LangGraph
+
+    Clients that may retry a step send the same `idempotency_key` (or
+    `Idempotency-Key` header) with every attempt: a retry resumes the turn
+    after its last completed node instead of re-running the router LLM and
+    repeating tool side effects.
+    """
     try:
         data = request.get_json()
         input_text = data.get('input_text', '').strip()
         session_id = data.get('session_id')
         domain = data.get('domain')
+        idempotency_key = data.get('idempotency_key') or request.headers.get('Idempotency-Key')
         
         if not input_text:
             return APIResponse.error('input_text is required')
-        
+
+        if data.get('stream') or request.accept_mimetypes.best == 'text/event-stream':
+            return Response(
+                stream_with_context(_sse_stream(orchestrator.run_stream(input_text, session_id, domain, idempotency_key))),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
         # Execute the LangGraph orchestrator
-        result = orchestrator.run(input_text, session_id, domain)
+        result = orchestrator.run(input_text, session_id, domain, idempotency_key)
         
         # Log the request and response for observability
         logger.info(f"LangGraph agent step processed: input_text='{input_text[:50]}...', success={result.get('success')}")
@@ -120,6 +109,66 @@ def agent_step():
         return APIResponse.error(f"LangGraph agent step failed: {str(e)}", 500)
 
 
+@agent.route('/health', methods=['GET'])
+def model_health():
+    """Return the cached Ollama reachability and model residency state"""
+    try:
+        from utils.model_health import model_health_monitor
+        return APIResponse.success('Model health retrieved', {"health": model_health_monitor.get_status()})
+
+    except Exception as e:
+        logger.error(f"Model health check failed: {str(e)}")
+        return APIResponse.error(f"Model health check failed: {str(e)}", 500)
+
+
+@agent.route('/metrics', methods=['GET'])
+def turn_metrics_summary():
+    """Return LLM calls per turn, latency saved by fast-path routing and prefetching, token usage and speed, prompt and response cache reuse, running/cancelled turns, the Langfuse export queue and the local tracing sink"""
+    try:
+        from config.langfuse_config import langfuse_config
+        return APIResponse.success('Turn metrics retrieved', {
+            "turns": turn_metrics.get_metrics(),
+            "tokens": token_accounting.get_metrics(),
+            "prompt_cache": prompt_cache_metrics.get_metrics(),
+            "response_cache": dict(response_cache_metrics.get_metrics(), **response_cache.get_status()),
+            "execution": turn_runner.get_metrics(),
+            "trace_export": langfuse_config.get_export_metrics(),
+            "local_tracing": span_tracer.get_status()
+        })
+
+    except Exception as e:
+        logger.error(f"Turn metrics failed: {str(e)}")
+        return APIResponse.error(f"Turn metrics failed: {str(e)}", 500)
+
+
+@agent.route('/response-cache', methods=['POST'])
+def configure_response_cache():
+    """Turn the response cache for read-only turns on or off (`enabled`), or empty it (`clear`)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        if 'enabled' in data:
+            response_cache.set_enabled(bool(data['enabled']))
+        if data.get('clear'):
+            response_cache.clear()
+        return APIResponse.success('Response cache updated', {"response_cache": response_cache.get_status()})
+
+    except Exception as e:
+        logger.error(f"Response cache update failed: {str(e)}")
+        return APIResponse.error(f"Response cache update failed: {str(e)}", 500)
+
+
+@agent.route('/prompts/reload', methods=['POST'])
+def reload_prompts():
+    """Reload planner/synthesizer/router prompts after they change (Langfuse or local files)"""
+    try:
+        catalog = reload_tool_catalog()
+        return APIResponse.success('Prompts reloaded', {"catalog": catalog.summary()})
+
+    except Exception as e:
+        logger.error(f"Prompt reload failed: {str(e)}")
+        return APIResponse.error(f"Prompt reload failed, keeping previous prompts: {str(e)}", 500)
+
+
 @agent.route('/graph/visualize', methods=['GET'])
 def visualize_graph():
     """Return graph structure for visualization"""
@@ -231,15 +280,108 @@ def conversation_test():
         logger.error(f"Test endpoint error: {str(e)}")
         return APIResponse.error(f"Test endpoint error: {str(e)}", 500)
 
+def _conversation_events(input_text, session_id, domain, conversation_context, trace_id, trace, langfuse_trace_context):
+    """
+    Run one chat turn on the conversation pipeline, yielding (event, payload) pairs
+
+    Yields a 'step' event as each of planner_llm, action_exec and
+    synthesizer_llm completes, a 'token' event for every synthesizer token,
+    and finally a 'done' event with the same payload the JSON endpoint returns.
+    Pure chat turns (see Router.classify_turn) go straight to the synthesizer,
+    as do repeated reads the response cache answers (replayed without an LLM
+    call). The turn runs on the turn runner: a client disconnect cancels it.
+    """
+    from config.langfuse_config import langfuse_config
+
+    turn_started = time.perf_counter()
+    root_span = start_root_span("chat.turn", langfuse_trace_context,
+                                {"input_text": input_text, "session_id": session_id, "domain": domain})
+    turn = TurnContext(orchestrator, root_span)
+    state = new_turn_state(input_text, session_id, domain, trace_id, conversation_context=conversation_context)
+
+    steps_data = []
+    final_state = state
+    try:
+        for event, payload in conversation_pipeline.stream(state, turn):
+            if event == 'state':
+                final_state = payload
+                continue
+            if event == 'step':
+                steps_data.append(payload)
+            yield event, payload
+    except Exception as e:
+        end_root_span(root_span, {"total_steps": len(steps_data)}, error=str(e))
+        raise
+
+    response_content = final_state['final_message']
+    end_root_span(root_span, {"final_message": response_content, "total_steps": len(steps_data)})
+    if root_span:
+        try:
+            langfuse_config.client.update_current_trace(output={"final_message": response_content, "total_steps": len(steps_data)})
+        except Exception as e:
+            logger.warning(f"Failed to update Langfuse current trace: {e}")
+
+    # Mark trace as completed, then fold old turns into the summary if the session outgrew its budget
+    trace.mark_completed(response_content)
+    conversation_memory.schedule_compaction(session_id)
+
+    # Report LLM calls and the latency the fast path, response cache or prefetch saved
+    prefetch = turn.prefetch
+    if final_state['turn_kind'] == TURN_CHAT:
+        path, latency_saved_ms, prefetch_outcome = 'fast_path', turn_metrics.estimated_planner_latency(), None
+    elif (final_state.get('response_cache') or {}).get('response') is not None:
+        path, latency_saved_ms, prefetch_outcome = 'response_cache', turn_metrics.estimated_planner_latency(), None
+    else:
+        path, latency_saved_ms, prefetch_outcome = 'planned', 0.0, None
+        if prefetch:
+            prefetch_outcome = 'hit' if prefetch.used else 'miss'
+            if prefetch.used and prefetch.duration_ms is not None:
+                latency_saved_ms = min(prefetch.duration_ms, turn.planner_ms)
+    turn_latency_ms = (time.perf_counter() - turn_started) * 1000
+    turn_metrics.record_turn(path, turn.llm_calls, turn_latency_ms, latency_saved_ms, prefetch_outcome, turn.result_tokens_saved)
+
+    yield 'done', {
+        'session_id': session_id,
+        'trace_id': trace_id,
+        'steps': steps_data,
+        'final_message': response_content,
+        'total_steps': len(steps_data),
+        'turn_metrics': {
+            'path': path,
+            'llm_calls': turn.llm_calls,
+            'latency_ms': round(turn_latency_ms, 1),
+            'latency_saved_ms': round(latency_saved_ms, 1),
+            'prefetch': prefetch_outcome,
+            'result_tokens_saved': turn.result_tokens_saved
+        }
+    }
+
+
+def _sse_stream(events):
+    """Format conversation events as Server-Sent Events"""
+    try:
+        for event, payload in events:
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    except Exception as e:
+        logger.error(f"Conversation stream failed: {str(e)}")
+        yield f"event: error\ndata: {json.dumps({'error': f'Conversation failed: {str(e)}'})}\n\n"
+
+
 @agent.route('/conversation', methods=['POST'])
+@traced("http.agent.conversation")
 def conversation_stream():
-    """Handle step-by-step conversation with real-time updates"""
+    """Handle step-by-step conversation with real-time updates
+
+    Clients sending `Accept: text/event-stream` (or `"stream": true`) receive
+    steps and synthesizer tokens as Server-Sent Events while the turn runs;
+    others receive all steps in one JSON response at the end.
+    """
     try:
         data = request.get_json()
         input_text = data.get('input_text', '').strip()
         session_id = data.get('session_id')
         domain = data.get('domain', 'chat')
-        conversation_context = data.get('conversation_context', [])
+        client_context = data.get('conversation_context') or []
         trace_id = data.get('trace_id')
 
         # Debug logging
@@ -251,6 +393,7 @@ def conversation_stream():
 
         # Handle session management
         logger.info("Starting session management")
+        existing_session = False
         if not session_id:
             # Create new session
             logger.info("Creating new session")
@@ -275,8 +418,19 @@ def conversation_stream():
             else:
                 # Update session timestamp
                 session.save()
+                existing_session = True
                 logger.info(f"Updated existing session: {session_id}")
 
+        # History comes from the session's own traces; the client's context is
+        # only used to seed a session the server has no turns for yet
+        conversation_context = conversation_memory.load(session_id) if existing_session else []
+        context_source = 'session'
+        if not conversation_context:
+            conversation_context = conversation_memory.window(client_context)
+            context_source = 'client'
+        context_tokens = count_context_tokens(conversation_context)
+        logger.info(f"Conversation context: {len(conversation_context)} messages, {context_tokens} tokens from {context_source}")
+
         # Generate trace_id if not provided (Langfuse requires 32 lowercase hex chars)
         logger.info("Generating trace_id")
         if not trace_id:
@@ -289,7 +443,12 @@ def conversation_stream():
         trace = TraceDB.create(
             session_id=session_id,
             user_message=input_text,
-            metadata={"domain": domain, "conversation_context": conversation_context}
+            metadata={
+                "domain": domain,
+                "context_source": context_source,
+                "context_messages": len(conversation_context),
+                "context_tokens": context_tokens
+            }
         )
         logger.info(f"Created trace: {trace.id}")
 
@@ -302,389 +461,30 @@ def conversation_stream():
             input_data={"input_text": input_text, "session_id": session_id, "domain": domain}
         )
 
-        # Get the orchestrator to run step by step
-        logger.info("Getting orchestrator for step-by-step execution")
-        steps_data = []
-
-        # Create initial state
-        initial_state = {
-            'messages': [],
-            'input_text': input_text,
-            'session_id': session_id,
-            'domain': domain,
-            'trace_id': trace_id,
-            'current_step': AgentStepDB.get_next_step_number(trace_id),
-            'planner_output': None,
-            'actions_to_execute': [],
-            'action_results': [],
-            'final_message': None
-        }
-
-        # Step 1: Planner LLM (thinking/planning phase)
-        initial_state['current_step'] += 1
-
-        # Load planner prompt using new prompt management system
-        from config.prompt_manager import get_prompt, get_compiled_prompt
-        
-        # Get the prompt (tries Langfuse first, falls back to local)
-        prompt_data = get_prompt("planner", label="production")
-        langfuse_prompt = prompt_data.get("langfuse_prompt")  # Get the actual Langfuse prompt object
-        
-        # Compile the prompt with template variables
-        # Get tool descriptions for the planner
-        from orchestrator.tools.tool_registry import ToolRegistry
-        tool_registry = ToolRegistry("http://localhost:5001")
-        tool_descriptions = tool_registry.get_tool_descriptions()
-        
-        compiled_prompt = get_compiled_prompt(
-            "planner", 
-            label="production",
-            tool_descriptions=tool_descriptions
+        # Runs on the turn runner like /step turns; a client disconnect cancels the turn
+        events = _conversation_events(
+            input_text, session_id, domain, conversation_context, trace_id, trace, langfuse_trace_context
         )
 
-        # Create messages for LLM with conversation context
-        system_msg = SystemMessage(content=compiled_prompt)
-        user_msg = HumanMessage(content=input_text)
-        
-        # Include conversation context if available
-        context_messages = convert_conversation_context_to_messages(conversation_context)
-        messages = [system_msg] + context_messages + [user_msg]
-
-        # Call LLM for planning with Langfuse tracing
-        from config.langfuse_config import langfuse_config
-        if not langfuse_config.enabled:
-            # Handle case where Langfuse is not configured
-            logger.warning("Langfuse not configured, skipping tracing")
-            client = None
-        else:
-            client = langfuse_config.client
-        
-        # Create root span for the entire chat turn
-        root_span = None
-        if client and langfuse_trace_context:
-            try:
-                root_span = client.start_span(
-                    trace_context=langfuse_trace_context,
-                    name="chat.turn",
-                    input={"input_text": input_text, "session_id": session_id, "domain": domain}
-                )
-            except Exception as e:
-                logger.warning(f"Failed to create Langfuse root span: {e}")
-                root_span = None
-
-        # Create planner generation with proper prompt integration
-        planner_generation = None
-        if client and root_span:
-            try:
-                # Create planner generation directly within the root span
-                # This ensures proper hierarchy and token counting
-                planner_generation = root_span.start_observation(
-                    name="planner.llm",
-                    as_type="generation",
-                    input={"messages": [{"type": msg.__class__.__name__, "content": msg.content} for msg in messages]},
-                    prompt=langfuse_prompt  # Pass the actual Langfuse prompt object
-                )
-            except Exception as e:
-                logger.warning(f"Failed to create Langfuse planner generation: {e}")
-                planner_generation = None
-        
-        # Call LLM for planning
-        logger.info("Calling LLM for planning")
-
-        # Note: We don't use CallbackHandler here because we're manually creating
-        # the observation above (planner_generation). Using both would create duplicates.
-        response = orchestrator.llm.invoke(messages)
-
-        logger.info("LLM planning response received")
-
-        # Extract content from AIMessage
-        response_content = response.content if hasattr(response, 'content') else str(response)
-
-        # Update generation with output and token counts
-        if planner_generation:
-            try:
-                # Count tokens for input and output
-                input_tokens = count_message_tokens(messages)
-                output_tokens = count_tokens(response_content)
-                total_tokens = input_tokens + output_tokens
-
-                # Update observation with output and usage
-                planner_generation.update(
-                    output=response_content,
-                    usage={
-                        "input": input_tokens,
-                        "output": output_tokens,
-                        "total": total_tokens,
-                        "unit": "TOKENS"
-                    }
-                )
-                logger.info(f"Planner tokens: {input_tokens} input + {output_tokens} output = {total_tokens} total")
-            except Exception as e:
-                logger.warning(f"Failed to update Langfuse planner generation: {e}")
-            try:
-                planner_generation.end()
-            except Exception as e:
-                logger.warning(f"Failed to end Langfuse planner generation: {e}")
-
-        # Parse response
-        try:
-            cleaned_response = response_content.strip()
-            if cleaned_response.startswith("```json"):
-                cleaned_response = cleaned_response[7:]
-            if cleaned_response.endswith("```"):
-                cleaned_response = cleaned_response[:-3]
-            cleaned_response = cleaned_response.strip()
-
-            planner_output = json.loads(cleaned_response)
-            initial_state['planner_output'] = planner_output
-            initial_state['actions_to_execute'] = planner_output.get("actions", [])
-
-        except json.JSONDecodeError:
-            planner_output = {
-                "assistant_text": "I'm sorry, I had trouble understanding your request.",
-                "actions": [{"name": "no_op", "args": {}}]
-            }
-            initial_state['actions_to_execute'] = [{"name": "no_op", "args": {}}]
-
-        # Log planner step
-        AgentStepDB.create(
-            session_id=session_id,
-            trace_id=trace_id,
-            step_number=initial_state['current_step'],
-            step_type='planner_llm',
-            input_data={'input_text': input_text, 'messages_count': len(messages), 'conversation_context_length': len(conversation_context)},
-            output_data={'llm_response': response_content, 'planner_output': planner_output, 'actions_to_execute': initial_state['actions_to_execute']},
-            rendered_prompt=compiled_prompt,
-            llm_input={'messages': [{'type': msg.__class__.__name__, 'content': msg.content} for msg in messages]},
-            llm_model='gemma3:4b',
-            llm_output=response_content
-        )
-
-        # Get the assistant text for display
-        assistant_text = planner_output.get('assistant_text', '')
-        display_content = assistant_text if assistant_text else f"🤔 Planning actions based on: '{input_text}'"
-        
-        steps_data.append({
-            'step_number': initial_state['current_step'],
-            'step_type': 'planner_llm',
-            'status': 'completed',
-            'content': display_content,
-            'details': {
-                'assistant_text': assistant_text,
-                'actions_count': len(initial_state['actions_to_execute'])
-            },
-            'timestamp': datetime.now().isoformat()
-        })
-
-        # Step 2: Execute actions
-        if initial_state['actions_to_execute']:
-            initial_state['current_step'] += 1
-
-            action_results = []
-            for action in initial_state['actions_to_execute']:
-                action_name = action.get("name", "no_op")
-                action_args = action.get("args", {})
-
-                # Create individual tool execution span for each action
-                tool_span = None
-                if client and root_span:
-                    try:
-                        # Create span as child of root_span for proper hierarchy
-                        tool_span = root_span.start_span(
-                            name=f"tool.execute.{action_name}",
-                            input={"tool_name": action_name, "tool_args": action_args}
-                        )
-                        
-                        # Add tool request event
-                        tool_span.create_event(
-                            name="tool.request",
-                            input={"tool_name": action_name, "tool_args": action_args}
-                        )
-                    except Exception as e:
-                        logger.warning(f"Failed to create Langfuse tool span for {action_name}: {e}")
-                        tool_span = None
-
-                # Execute the action
-                success, result = orchestrator.action_executor.execute_action(action_name, action_args)
-
-                # Add tool response event and end span
-                if tool_span:
-                    try:
-                        tool_span.create_event(
-                            name="tool.response",
-                            input={"success": success, "result": result if success else None, "error": result.get("error") if not success else None}
-                        )
-                        tool_span.update(output={"success": success, "result": result if success else None})
-                        tool_span.end()
-                    except Exception as e:
-                        logger.warning(f"Failed to update Langfuse tool span for {action_name}: {e}")
-
-                action_results.append({
-                    "name": action_name,
-                    "ok": success,
-                    "result": result if success else None,
-                    "error": result.get("error") if not success else None
-                })
-
-            initial_state['action_results'] = action_results
-
-            # Log action execution
-            AgentStepDB.create(
-                session_id=session_id,
-                trace_id=trace_id,
-                step_number=initial_state['current_step'],
-                step_type='action_exec',
-                input_data={'actions_to_execute': initial_state['actions_to_execute']},
-                output_data={'action_results': action_results, 'actions_executed': len(action_results)}
+        if data.get('stream') or request.accept_mimetypes.best == 'text/event-stream':
+            return Response(
+                stream_with_context(_sse_stream(events)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
             )
 
-            steps_data.append({
-                'step_number': initial_state['current_step'],
-                'step_type': 'action_exec',
-                'status': 'completed',
-                'content': f"⚡ Executed {len(action_results)} actions",
-                'details': {
-                    'successful_actions': len([r for r in action_results if r["ok"]]),
-                    'failed_actions': len([r for r in action_results if not r["ok"]])
-                },
-                'timestamp': datetime.now().isoformat()
-            })
-
-        # Step 3: Synthesize final response
-        initial_state['current_step'] += 1
-
-        # Load synthesizer prompt using new prompt management system
-        from config.prompt_manager import get_prompt, get_compiled_prompt
-        
-        # Get the prompt (tries Langfuse first, falls back to local)
-        synthesizer_prompt_data = get_prompt("synthesizer", label="production")
-        synthesizer_langfuse_prompt = synthesizer_prompt_data.get("langfuse_prompt")  # Get the actual Langfuse prompt object
-        
-        # Compile the prompt with template variables
-        action_results_str = json.dumps(initial_state['action_results'], indent=2)
-        full_prompt = get_compiled_prompt(
-            "synthesizer", 
-            label="production",
-            user_input=input_text,
-            action_results=action_results_str
-        )
-
-        # Create messages for synthesis with conversation context
-        system_msg = SystemMessage(content=full_prompt)
-        user_msg = HumanMessage(content=input_text)
-        
-        # Include conversation context if available
-        context_messages = convert_conversation_context_to_messages(conversation_context)
-        messages = [system_msg] + context_messages + [user_msg]
-
-        # Call LLM for final response with Langfuse tracing
-        synthesizer_generation = None
-        if client and root_span:
-            try:
-                # Create synthesizer generation directly within the root span
-                # This ensures proper hierarchy and token counting
-                synthesizer_generation = root_span.start_observation(
-                    name="synthesizer.llm",
-                    as_type="generation",
-                    input={"messages": [{"type": msg.__class__.__name__, "content": msg.content} for msg in messages]},
-                    prompt=synthesizer_langfuse_prompt  # Pass the actual Langfuse prompt object
-                )
-            except Exception as e:
-                logger.warning(f"Failed to create Langfuse synthesizer generation: {e}")
-                synthesizer_generation = None
-        
-        # Call LLM for final response
-        # Note: We don't use CallbackHandler here because we're manually creating
-        # the observation above (synthesizer_generation). Using both would create duplicates.
-        response = orchestrator.llm.invoke(messages)
-
-        # Extract content from AIMessage
-        response_content = response.content if hasattr(response, 'content') else str(response)
-
-        # Update generation with output and token counts
-        if synthesizer_generation:
-            try:
-                # Count tokens for input and output
-                input_tokens = count_message_tokens(messages)
-                output_tokens = count_tokens(response_content)
-                total_tokens = input_tokens + output_tokens
-
-                # Update observation with output and usage
-                synthesizer_generation.update(
-                    output=response_content,
-                    usage={
-                        "input": input_tokens,
-                        "output": output_tokens,
-                        "total": total_tokens,
-                        "unit": "TOKENS"
-                    }
-                )
-                logger.info(f"Synthesizer tokens: {input_tokens} input + {output_tokens} output = {total_tokens} total")
-            except Exception as e:
-                logger.warning(f"Failed to update Langfuse synthesizer generation: {e}")
-            try:
-                synthesizer_generation.end()
-            except Exception as e:
-                logger.warning(f"Failed to end Langfuse synthesizer generation: {e}")
-
-        # Add to conversation history (response_content already extracted above)
-        initial_state['messages'].append(AIMessage(content=response_content))
-        initial_state['final_message'] = response_content
-
-        # Log synthesizer step
-        AgentStepDB.create(
-            session_id=session_id,
-            trace_id=trace_id,
-            step_number=initial_state['current_step'],
-            step_type='synthesizer_llm',
-            input_data={'action_results': initial_state['action_results'], 'input_text': input_text, 'conversation_context_length': len(conversation_context)},
-            output_data={'final_message': response_content, 'synthesis_success': True},
-            rendered_prompt=full_prompt,
-            llm_input={'messages': [{'type': msg.__class__.__name__, 'content': msg.content} for msg in messages]},
-            llm_model='gemma3:4b',
-            llm_output=response_content
-        )
-
-        steps_data.append({
-            'step_number': initial_state['current_step'],
-            'step_type': 'synthesizer_llm',
-            'status': 'completed',
-            'content': response_content,
-            'details': {
-                'is_final': True
-            },
-            'timestamp': datetime.now().isoformat()
-        })
-
-        # End root span
-        if root_span:
-            try:
-                root_span.update(output={"final_message": response_content, "total_steps": len(steps_data)})
-                root_span.end()
-            except Exception as e:
-                logger.warning(f"Failed to end Langfuse root span: {e}")
-
-        # Complete the trace
-        if langfuse_trace_context and client:
-            try:
-                client.update_current_trace(output={"final_message": response_content, "total_steps": len(steps_data)})
-            except Exception as e:
-                logger.warning(f"Failed to update Langfuse current trace: {e}")
-
-        # Mark trace as completed
-        trace.mark_completed(response_content)
-
-        # Flush Langfuse events
-        langfuse_config.flush()
-
-        # Return all steps for the frontend to display progressively
-        return APIResponse.success('Conversation completed', {
-            'session_id': session_id,
-            'trace_id': trace_id,
-            'steps': steps_data,
-            'final_message': response_content,
-            'total_steps': len(steps_data)
-        })
+        # Non-streaming clients get all steps at once when the turn has finished
+        # ('done' is the last event; running the generator out finishes the turn cleanly)
+        done_payload = None
+        for event, payload in events:
+            if event == 'done':
+                done_payload = payload
+        if done_payload is not None:
+            return APIResponse.success('Conversation completed', done_payload)
+
+    except TurnRejected as e:
+        logger.error(f"Conversation rejected: {str(e)}")
+        return APIResponse.error(f"Conversation rejected: {str(e)}", 503)
 
     except Exception as e:
         logger.error(f"Conversation failed: {str(e)}")
@@ -0,0 +1,133 @@
+"""
+Tests for dependency-aware concurrent execution of planner actions
+"""
+import threading
+import time
+import unittest
+
+from models.task_db import TaskDB
+from orchestrator.actions.scheduler import ActionScheduler, plan_dependencies
+from testing_utils import use_temp_database
+
+
+def create(title):
+    return {"name": "create_task", "args": {"title": title}}
+
+
+def update_status(task_id, status):
+    return {"name": "update_task_status", "args": {"task_id": task_id, "status": status}}
+
+
+FETCH = {"name": "fetch_tasks", "args": {}}
+
+
+class RecordingExecutor:
+    """execute(name, args) stand-in that sleeps and records start/end order"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.events = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __call__(self, name, args):
+        with self.lock:
+            self.events.append(("start", name, args.get("title") or args.get("status")))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+            self.events.append(("end", name, args.get("title") or args.get("status")))
+        if name == "fail":
+            raise RuntimeError("boom")
+        return True, {"message": f"{name} ok"}
+
+
+class TestPlanDependencies(unittest.TestCase):
+    """Tests for plan_dependencies"""
+
+    def test_creates_keep_planner_order_and_fetch_waits(self):
+        self.assertEqual(plan_dependencies([create("a"), create("b"), create("c"), FETCH]), [[], [0], [0, 1], [0, 1, 2]])
+
+    def test_updates_to_different_tasks_are_independent(self):
+        self.assertEqual(plan_dependencies([update_status(1, "a"), update_status(2, "b"), FETCH]), [[], [], [0, 1]])
+
+    def test_same_task_writes_keep_order(self):
+        actions = [update_status(1, "in_progress"), update_status(2, "done"), update_status(1, "done")]
+        self.assertEqual(plan_dependencies(actions), [[], [], [0]])
+
+    def test_reads_run_together_and_reorder_serializes(self):
+        reorder = {"name": "reorder_tasks", "args": {"task_ids": [2, 1]}}
+        self.assertEqual(plan_dependencies([FETCH, FETCH, reorder, create("a")]), [[], [], [0, 1], [0, 1, 2]])
+
+    def test_no_op_never_waits(self):
+        self.assertEqual(plan_dependencies([create("a"), {"name": "no_op", "args": {}}]), [[], []])
+
+
+class TestActionScheduler(unittest.TestCase):
+    """Tests for ActionScheduler.run"""
+
+    def setUp(self):
+        self.scheduler = ActionScheduler(max_workers=3)
+        self.execute = RecordingExecutor()
+
+    def test_independent_actions_overlap(self):
+        started = time.perf_counter()
+        outcomes = self.scheduler.run([update_status(1, "a"), update_status(2, "b"), update_status(3, "c"), FETCH],
+                                      self.execute)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(self.execute.max_in_flight, 3)
+        self.assertLess(elapsed, 0.18)  # Two waves of 50ms rather than four
+        # The fetch only starts after every update finished
+        fetch_start = self.execute.events.index(("start", "fetch_tasks", None))
+        self.assertEqual(sum(1 for e in self.execute.events[:fetch_start] if e[0] == "end"), 3)
+        self.assertEqual([o.name for o in outcomes], ["update_task_status"] * 3 + ["fetch_tasks"])
+        self.assertEqual(outcomes[3].depends_on, [0, 1, 2])
+        self.assertGreaterEqual(outcomes[3].started_ms, outcomes[0].duration_ms)
+
+    def test_pool_is_bounded(self):
+        self.scheduler.run([update_status(i, str(i)) for i in range(7)], self.execute)
+        self.assertEqual(self.execute.max_in_flight, 3)
+
+    def test_same_task_writes_run_in_order(self):
+        self.scheduler.run([update_status(1, "in_progress"), update_status(1, "done")], self.execute)
+        self.assertEqual([e for e in self.execute.events], [
+            ("start", "update_task_status", "in_progress"), ("end", "update_task_status", "in_progress"),
+            ("start", "update_task_status", "done"), ("end", "update_task_status", "done"),
+        ])
+
+    def test_failures_become_outcomes(self):
+        outcomes = self.scheduler.run([{"name": "fail", "args": {}}, create("a")], self.execute)
+        self.assertFalse(outcomes[0].success)
+        self.assertEqual(outcomes[0].result, {"error": "boom"})
+        self.assertTrue(outcomes[1].success)
+
+
+class TestConcurrentCreates(unittest.TestCase):
+    """Creates run against a temporary SQLite database keep planner order"""
+
+    def setUp(self):
+        use_temp_database(self)
+
+    def test_sort_keys_are_distinct_and_ordered(self):
+        def execute(name, args):
+            task = TaskDB(title=args["title"])
+            task.save()
+            return True, {"task_id": task.id, "sort_key": task.sort_key}
+
+        titles = [str(i) for i in range(6)]
+        outcomes = ActionScheduler(max_workers=4).run([create(title) for title in titles], execute)
+
+        sort_keys = [o.result["sort_key"] for o in outcomes]
+        self.assertEqual(len(set(sort_keys)), len(titles))
+        self.assertEqual(sort_keys, sorted(sort_keys))
+        self.assertEqual([o.result["task_id"] for o in outcomes], sorted(o.result["task_id"] for o in outcomes))
+        stored = {task.title: task.sort_key for task in TaskDB.get_all()}
+        self.assertEqual([stored[title] for title in titles], sort_keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,7 +26,7 @@ class TestAgentIntegration(unittest.TestCase):
             if 'test' in task.title.lower():
                 task.delete()
     
-    @patch('utils.agent_service.requests.post')
+    @patch('utils.ollama_client.ollama_client.session.request')
     def test_agent_step_with_create_task(self, mock_post):
         """Test agent step that creates a task"""
         # Mock Ollama response with tool call
@@ -65,7 +65,7 @@ ARGUMENTS: {"title": "Test task", "description": "A test task for integration te
         self.assertIn('test', test_tasks[0].categories)
         self.assertIn('integration', test_tasks[0].categories)
     
-    @patch('utils.agent_service.requests.post')
+    @patch('utils.ollama_client.ollama_client.session.request')
     def test_agent_step_idempotency(self, mock_post):
         """Test that creating the same task twice is prevented"""
         # Mock Ollama response
@@ -96,7 +96,7 @@ ARGUMENTS: {"title": "Duplicate test task", "description": "This should not be c
         duplicate_tasks = [t for t in tasks if 'duplicate' in t.title.lower()]
         self.assertEqual(len(duplicate_tasks), 1)
     
-    @patch('utils.agent_service.requests.post')
+    @patch('utils.ollama_client.ollama_client.session.request')
     def test_agent_step_undo_functionality(self, mock_post):
         """Test undo functionality"""
         # Mock Ollama response
@@ -134,7 +134,7 @@ ARGUMENTS: {"title": "Undo test task", "description": "This task will be undone"
         deleted_task = TaskDB.get_by_id(task_id)
         self.assertIsNone(deleted_task)
     
-    @patch('utils.agent_service.requests.post')
+    @patch('utils.ollama_client.ollama_client.session.request')
     def test_agent_step_no_tool_calls(self, mock_post):
         """Test agent step with no tool calls"""
         # Mock Ollama response without tool calls
@@ -157,7 +157,7 @@ ARGUMENTS: {"title": "Undo test task", "description": "This task will be undone"
         self.assertEqual(len(result['side_effects']), 0)
         self.assertIn('productivity', result['assistant_text'].lower())
     
-    @patch('utils.agent_service.requests.post')
+    @patch('utils.ollama_client.ollama_client.session.request')
     def test_agent_step_invalid_tool_call(self, mock_post):
         """Test agent step with invalid tool call"""
         # Mock Ollama response with invalid tool call
@@ -226,7 +226,7 @@ class TestAgentAPIEndpoints(unittest.TestCase):
             if 'test' in task.title.lower():
                 task.delete()
     
-    @patch('utils.agent_service.requests.post')
+    @patch('utils.ollama_client.ollama_client.session.request')
     def test_agent_step_endpoint(self, mock_post):
         """Test the /agent/step endpoint"""
         # Mock Ollama response
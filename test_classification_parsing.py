@@ -0,0 +1,70 @@
+"""
+Tests for structured-output classification parsing and parse-failure metrics
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from config.ollama_config import CLASSIFICATION_CONFIG, CLASSIFICATION_RESPONSE_SCHEMA
+from utils.agent_metrics import ClassificationMetrics, classification_metrics
+from utils.classification_service import TaskClassificationService, ClassificationParseError
+
+
+class TestClassificationParsing(unittest.TestCase):
+    """Tests for _parse_classification_response"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = TaskClassificationService(
+            log_file=os.path.join(self.tmp.name, "log.txt"),
+            fast_model_file=os.path.join(self.tmp.name, "missing.json")
+        )
+        classification_metrics.reset_metrics()
+
+    def tearDown(self):
+        self.service.prediction_log.close()
+        self.tmp.cleanup()
+
+    def test_request_uses_json_schema(self):
+        self.assertEqual(CLASSIFICATION_CONFIG["format"], CLASSIFICATION_RESPONSE_SCHEMA)
+        self.assertIn("num_predict", CLASSIFICATION_CONFIG["options"])
+
+    def test_structured_response(self):
+        self.assertEqual(self.service._parse_classification_response('["health", "learning"]'), ["health", "learning"])
+        self.assertEqual(self.service._parse_classification_response('[]'), [])
+
+    def test_filters_unknown_and_duplicate_categories(self):
+        self.assertEqual(self.service._parse_classification_response('["career", "chores", "career"]'), ["career"])
+
+    def test_array_embedded_in_text(self):
+        self.assertEqual(self.service._parse_classification_response('Sure! ["health"]'), ["health"])
+
+    def test_unparseable_response_raises(self):
+        for response in ("I think health", '{"categories": ["health"]}', "[health"):
+            with self.assertRaises(ClassificationParseError):
+                self.service._parse_classification_response(response)
+
+    @patch.object(TaskClassificationService, '_build_classification_prompt',
+                  return_value=("prompt", {"source": "langfuse", "name": "classifier", "version": 4}))
+    @patch.object(TaskClassificationService, '_send_to_ollama')
+    def test_parse_failures_tracked_per_prompt_version(self, mock_send, _mock_prompt):
+        mock_send.return_value = ("not json", {'response_time_ms': 10, 'prompt_tokens': 5, 'response_tokens': 2})
+        # Parse failure falls back to keywords instead of silently returning []
+        self.assertEqual(self.service.classify_task("Morning yoga session"), ["health"])
+
+        mock_send.return_value = ('["career"]', {'response_time_ms': 10, 'prompt_tokens': 5, 'response_tokens': 2})
+        self.assertEqual(self.service.classify_task("Prepare slides for the client"), ["career"])
+
+        stats = classification_metrics.get_metrics()["prompt_versions"]["langfuse:classifier:v4"]
+        self.assertEqual((stats["parsed"], stats["failed"]), (1, 1))
+        self.assertEqual(stats["parse_failure_rate"], 0.5)
+
+    def test_metrics_reset(self):
+        metrics = ClassificationMetrics()
+        metrics.record_parse("local:classifier", success=False)
+        metrics.reset_metrics()
+        self.assertEqual(metrics.get_metrics()["prompt_versions"], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
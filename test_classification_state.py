@@ -0,0 +1,137 @@
+"""
+Tests for incremental startup classification backed by task_classification_state
+"""
+import os
+import unittest
+from unittest.mock import patch
+from database import get_connection
+from models.task_db import TaskDB
+from testing_utils import use_temp_database
+from utils.classification_manager import ClassificationManager
+from utils.classification_service import (SOURCE_FAILED, SOURCE_KEYWORD, SOURCE_LLM, ClassificationResults,
+                                          TaskClassificationService)
+
+
+def results_from(tasks, source=SOURCE_LLM):
+    results = ClassificationResults()
+    for task in tasks:
+        results.add(task['id'], [], source)
+    return results
+
+
+class TestClassificationState(unittest.TestCase):
+    """Tests against a temporary SQLite database"""
+
+    def setUp(self):
+        self.tmp_dir = use_temp_database(self)
+
+        self.gym = TaskDB.create("Go to the gym")
+        self.groceries = TaskDB.create("Buy groceries")
+        self.tagged = TaskDB.create("Job interview prep", categories=["career"])
+
+    def _stale_ids(self, prompt_version="local:classifier", model="gemma3:4b", chunk_size=100):
+        return [[t.id for t in chunk] for chunk in TaskDB.iter_needing_classification(prompt_version, model, chunk_size)]
+
+    def test_stale_query_probes_state_by_primary_key(self):
+        with get_connection() as conn:
+            plan = " ".join(str(row) for row in conn.execute("""
+                EXPLAIN QUERY PLAN SELECT t.id FROM tasks t
+                WHERE t.id > 0 AND NOT EXISTS (
+                    SELECT 1 FROM task_classification_state s
+                    WHERE s.task_id = t.id AND s.prompt_version = 'v1' AND s.model = 'm'
+                )
+            """).fetchall())
+        self.assertIn("SEARCH s USING INTEGER PRIMARY KEY", plan)
+        self.assertNotIn("SCAN s", plan)
+
+    def test_iterates_unclassified_tasks_in_chunks(self):
+        extra = TaskDB.create("Call mom")
+        self.assertEqual(self._stale_ids(chunk_size=2), [[self.gym.id, self.groceries.id], [self.tagged.id, extra.id]])
+
+    def test_bulk_update_records_state(self):
+        changed = TaskDB.bulk_update_categories({self.gym.id: ["health"], self.groceries.id: []},
+                                                "local:classifier", "gemma3:4b")
+        self.assertEqual(changed, 1)
+        self.assertEqual(TaskDB.get_by_id(self.gym.id).categories, ["health"])
+        self.assertEqual(TaskDB.get_history(self.gym.id)[-1]['new_value'], '["health"]')
+
+        # Groceries stayed uncategorized but is not stale for the same prompt/model
+        self.assertEqual(self._stale_ids(), [[self.tagged.id]])
+        # A new prompt version or model makes categorized and uncategorized tasks stale again
+        all_ids = [[self.gym.id, self.groceries.id, self.tagged.id]]
+        self.assertEqual(self._stale_ids(prompt_version="langfuse:classifier:v2"), all_ids)
+        self.assertEqual(self._stale_ids(model="llama3:8b"), all_ids)
+
+    def test_classify_on_startup_only_touches_stale_tasks(self):
+        manager = ClassificationManager()
+        service = manager.classification_service
+        with patch.object(service, 'is_ollama_available', return_value=True), \
+             patch.object(service, 'get_classification_identity', return_value=("local:classifier", "gemma3:4b")), \
+             patch.object(service, 'classify_tasks_batch', side_effect=results_from) as mock_batch:
+            manager.classify_on_startup()
+            manager.classify_on_startup()
+
+        mock_batch.assert_called_once()
+        self.assertEqual([t['id'] for t in mock_batch.call_args[0][0]], [self.gym.id, self.groceries.id, self.tagged.id])
+
+    def test_fallback_results_are_not_recorded(self):
+        results = ClassificationResults()
+        results.add(self.gym.id, ["health"], SOURCE_LLM)
+        results.add(self.groceries.id, [], SOURCE_KEYWORD)
+        extra = TaskDB.create("Call mom")
+        results.add(extra.id, [], SOURCE_FAILED)
+
+        TaskDB.bulk_update_categories(results, "local:classifier", "gemma3:4b", classified_ids=results.settled_ids())
+        self.assertEqual(self._stale_ids(), [[self.groceries.id, self.tagged.id, extra.id]])
+
+    def test_startup_reclassifies_keyword_fallback_categories(self):
+        fallback = ClassificationResults()
+        fallback.add(self.gym.id, ["health"], SOURCE_KEYWORD)
+        TaskDB.bulk_update_categories(fallback, "local:classifier", "gemma3:4b", classified_ids=fallback.settled_ids())
+        self.assertEqual(TaskDB.get_by_id(self.gym.id).categories, ["health"])
+
+        def llm_results(tasks):
+            results = ClassificationResults()
+            for task in tasks:
+                results.add(task['id'], ["health", "personal"] if task['id'] == self.gym.id else [], SOURCE_LLM)
+            return results
+
+        manager = ClassificationManager()
+        service = manager.classification_service
+        with patch.object(service, 'is_ollama_available', return_value=True), \
+             patch.object(service, 'get_classification_identity', return_value=("local:classifier", "gemma3:4b")), \
+             patch.object(service, 'classify_tasks_batch', side_effect=llm_results) as mock_batch:
+            manager.classify_on_startup()
+
+        self.assertIn(self.gym.id, [t['id'] for t in mock_batch.call_args[0][0]])
+        self.assertEqual(TaskDB.get_by_id(self.gym.id).categories, ["health", "personal"])
+        self.assertEqual(self._stale_ids(), [])
+
+    def test_startup_retries_tasks_classified_while_ollama_was_down(self):
+        manager = ClassificationManager()
+        service = manager.classification_service
+        with patch.object(service, 'is_ollama_available', return_value=True), \
+             patch.object(service, 'get_classification_identity', return_value=("local:classifier", "gemma3:4b")), \
+             patch.object(service, 'classify_tasks_batch',
+                          side_effect=lambda tasks: results_from(tasks, SOURCE_KEYWORD)) as mock_batch:
+            manager.classify_on_startup()
+            manager.classify_on_startup()
+
+        self.assertEqual(mock_batch.call_count, 2)
+
+    def test_batch_reports_the_source_of_each_result(self):
+        service = TaskClassificationService(log_file=os.path.join(self.tmp_dir, "log.txt"),
+                                            fast_model_file=None)
+        self.addCleanup(service.prediction_log.close)
+        with patch.object(service, 'is_ollama_available', return_value=True), \
+             patch.object(service, '_send_to_ollama', side_effect=[('["health"]', {}), RuntimeError("timeout")]), \
+             patch('time.sleep'):
+            results = service.classify_tasks_batch([{'id': 1, 'title': "Go for a long run"},
+                                                    {'id': 2, 'title': "Morning yoga session"}])
+
+        self.assertEqual(results.sources, {1: SOURCE_LLM, 2: SOURCE_KEYWORD})
+        self.assertEqual(results.settled_ids(), {1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Tests for the offline classifier prompt evaluation harness
+"""
+import json
+import os
+import tempfile
+import unittest
+from config.prompt_registry import prompt_registry
+from utils.classification_service import TaskClassificationService
+from utils.classifier_evaluation import (
+    ClassifierEvaluator, EvaluationVariant, RecordedResponses, category_scores
+)
+
+DATASET = [
+    ("Go to the gym", ["health"]),
+    ("Prepare for job interview", ["career"]),
+    ("Finish Python course", ["learning"]),
+]
+
+
+class TestClassifierEvaluation(unittest.TestCase):
+    """Tests using recorded responses instead of a running Ollama"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.recording = os.path.join(self.tmp.name, "recorded.jsonl")
+        self.log_file = os.path.join(self.tmp.name, "eval_log.txt")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _record(self, version: str, model: str, answers: dict):
+        """Write recorded responses for the prompts the service would build"""
+        service = TaskClassificationService(log_file=self.log_file, fast_model_file=None,
+                                            prompt_version=version, model=model)
+        with open(self.recording, 'a', encoding='utf-8') as f:
+            for task_text, response in answers.items():
+                prompt, _ = service._build_classification_prompt(task_text, "")
+                f.write(json.dumps({
+                    "key": RecordedResponses.key(model, prompt), "model": model, "response": response,
+                    "metrics": {"response_time_ms": 100, "prompt_tokens": 50, "response_tokens": 3}
+                }) + '\n')
+        service.prediction_log.close()
+
+    def test_pinned_prompt_version(self):
+        service = TaskClassificationService(log_file=self.log_file, fast_model_file=None, prompt_version="3.1")
+        prompt, metadata = service._build_classification_prompt("Go to the gym", "")
+        self.assertIn('"Go to the gym"', prompt)
+        self.assertEqual(metadata["version"], "3.1")
+        self.assertEqual(prompt, prompt_registry.get_prompt_text("task_classification", "3.1").format(task_text="Go to the gym"))
+        service.prediction_log.close()
+
+    def test_compares_variants_from_recording(self):
+        self._record("3.1", "gemma3:4b", {
+            "Go to the gym": '["health"]', "Prepare for job interview": '["career", "learning"]',
+            "Finish Python course": '["learning"]'
+        })
+        self._record("3.2", "llama3:8b", {
+            "Go to the gym": '["health"]', "Prepare for job interview": '["career"]'
+        })
+
+        evaluator = ClassifierEvaluator(
+            [EvaluationVariant("3.1", "gemma3:4b"), EvaluationVariant("3.2", "llama3:8b")],
+            max_workers=4, recorded=RecordedResponses(self.recording), log_file=self.log_file
+        )
+        v31, v32 = [report.to_dict() for report in evaluator.run(DATASET)]
+
+        self.assertEqual(v31["examples"], 3)
+        self.assertEqual(v31["per_category"]["learning"]["precision"], 0.5)
+        self.assertEqual(v31["tokens"], {"prompt": 150, "response": 9})
+        self.assertEqual(v31["fallback_rate"], 0.0)
+        self.assertEqual(v31["latency_ms"]["p50"], 100)
+        # Missing recording is reported as a fallback, not silently skipped
+        self.assertAlmostEqual(v32["fallback_rate"], 0.333, places=3)
+        self.assertEqual(v32["exact_match_accuracy"], 1.0)
+
+    def test_category_scores(self):
+        scores = category_scores([(["health"], ["health", "career"]), (["career"], [])])
+        self.assertEqual(scores["health"]["precision"], 1.0)
+        self.assertEqual(scores["career"]["precision"], 0.0)
+        self.assertEqual(scores["career"]["recall"], 0.0)
+        self.assertIsNone(scores["learning"]["precision"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Tests for server-side conversation memory
+"""
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from flask import Flask
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+
+from models.session_db import SessionDB, TraceDB
+from scripts.migrate_to_session_model import create_session_tables
+from server.routes.agent import agent, conversation_memory, orchestrator
+from testing_utils import achunks, use_temp_database
+from utils.conversation_memory import MEMORY_METADATA_KEY, ConversationMemory
+
+
+def count_words(context):
+    """One token per word keeps budgets easy to reason about"""
+    return sum(len(message["content"].split()) for message in context)
+
+
+class ConversationMemoryTestCase(unittest.TestCase):
+    """Runs against a temporary SQLite database"""
+
+    def setUp(self):
+        use_temp_database(self)
+        create_session_tables()
+        self.session = SessionDB.create(metadata={"domain": "chat"})
+
+    def add_turns(self, count, words=5):
+        for i in range(count):
+            trace = TraceDB.create(self.session.id, " ".join([f"ask{i}"] * words))
+            trace.mark_completed(" ".join([f"answer{i}"] * words))
+
+
+class TestConversationMemory(ConversationMemoryTestCase):
+    """Tests for windowing and rolling summaries"""
+
+    def setUp(self):
+        super().setUp()
+        self.summarize = MagicMock(return_value="User asked about everything so far.")
+        self.memory = ConversationMemory(count_words, self.summarize, token_budget=40)
+
+    def test_history_comes_from_completed_traces(self):
+        self.add_turns(2)
+        TraceDB.create(self.session.id, "still running")
+
+        context = self.memory.load(self.session.id)
+        self.assertEqual([m["type"] for m in context], ["user", "bot", "user", "bot"])
+        self.assertEqual(context[0]["content"], "ask0 ask0 ask0 ask0 ask0")
+
+    def test_window_stays_within_budget_without_a_summary(self):
+        self.add_turns(10)
+        context = self.memory.load(self.session.id)
+
+        self.assertLessEqual(count_words(context), 40)
+        self.assertEqual(context[0]["type"], "user")
+        self.assertEqual(context[-1]["content"], "answer9 answer9 answer9 answer9 answer9")
+
+    def test_compaction_folds_oldest_turns_into_summary(self):
+        self.add_turns(6)
+        self.assertTrue(self.memory.needs_compaction(self.session.id))
+        self.assertTrue(self.memory.compact(self.session.id))
+
+        previous_summary, folded = self.summarize.call_args[0]
+        self.assertEqual(previous_summary, "")
+        self.assertEqual(folded[0]["content"], "ask0 ask0 ask0 ask0 ask0")
+
+        memory = SessionDB.get_by_id(self.session.id).metadata[MEMORY_METADATA_KEY]
+        self.assertEqual(memory["summarized_turns"], 4)
+        context = self.memory.load(self.session.id)
+        self.assertEqual(context[0], {"type": "summary", "content": "User asked about everything so far."})
+        self.assertEqual(context[1]["content"], "ask4 ask4 ask4 ask4 ask4")
+        self.assertFalse(self.memory.needs_compaction(self.session.id))
+
+    def test_missing_summarized_trace_does_not_repeat_folded_turns(self):
+        self.add_turns(6)
+        self.memory.compact(self.session.id)
+        memory = SessionDB.get_by_id(self.session.id).metadata[MEMORY_METADATA_KEY]
+
+        # The last folded trace was deleted; older metadata has no timestamp either
+        for stale in [{"summarized_through": "deleted-trace"},
+                      {"summarized_through": "deleted-trace", "summarized_through_at": None}]:
+            SessionDB.set_metadata_value(self.session.id, MEMORY_METADATA_KEY, dict(memory, **stale))
+            context = self.memory.load(self.session.id)
+            self.assertEqual(context[0]["type"], "summary")
+            self.assertEqual(context[1]["content"], "ask4 ask4 ask4 ask4 ask4")
+            self.assertEqual(len(context), 5)
+
+    def test_summary_rolls_forward(self):
+        self.add_turns(6)
+        self.memory.compact(self.session.id)
+        self.add_turns(4)
+        self.memory.compact(self.session.id)
+
+        self.assertEqual(self.summarize.call_args[0][0], "User asked about everything so far.")
+        self.assertEqual(SessionDB.get_by_id(self.session.id).metadata[MEMORY_METADATA_KEY]["summarized_turns"], 8)
+
+    def test_failed_summary_keeps_memory_unchanged(self):
+        self.add_turns(6)
+        self.summarize.side_effect = RuntimeError("model unavailable")
+
+        self.assertFalse(self.memory.compact(self.session.id))
+        self.assertNotIn(MEMORY_METADATA_KEY, SessionDB.get_by_id(self.session.id).metadata)
+        self.assertLessEqual(count_words(self.memory.load(self.session.id)), 40)
+
+    def test_metadata_update_keeps_other_keys(self):
+        self.assertTrue(SessionDB.set_metadata_value(self.session.id, MEMORY_METADATA_KEY, {"summary": "s"}))
+        self.assertEqual(SessionDB.get_by_id(self.session.id).metadata,
+                         {"domain": "chat", MEMORY_METADATA_KEY: {"summary": "s"}})
+
+
+class TestConversationRouteMemory(ConversationMemoryTestCase):
+    """The conversation route sends session memory instead of the client's context"""
+
+    def test_existing_session_uses_server_memory(self):
+        self.add_turns(1)
+        SessionDB.set_metadata_value(self.session.id, MEMORY_METADATA_KEY, {"summary": "Earlier: planned a trip."})
+
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        llm = MagicMock()
+        llm.ainvoke = AsyncMock()
+        llm.ainvoke.return_value = AIMessage(content=json.dumps({"assistant_text": "", "actions": []}))
+        llm.astream.side_effect = lambda messages, **kwargs: achunks([AIMessageChunk(content="Done.")])
+        client_context = [{"type": "user", "content": "stale client copy"}] * 50
+
+        with patch.object(orchestrator, 'llm', llm), \
+                patch.object(conversation_memory, 'schedule_compaction') as schedule:
+            response = app.test_client().post('/api/agent/conversation', json={
+                "input_text": "add a task", "session_id": self.session.id, "conversation_context": client_context
+            })
+
+        self.assertTrue(response.get_json()['success'])
+        schedule.assert_called_once_with(self.session.id)
+        planner_messages = llm.ainvoke.call_args[0][0]
+        self.assertEqual([type(m) for m in planner_messages[1:4]], [SystemMessage, HumanMessage, AIMessage])
+        self.assertIn("Earlier: planned a trip.", planner_messages[1].content)
+        self.assertNotIn("stale client copy", [m.content for m in planner_messages])
+
+        trace = TraceDB.get_by_session_id(self.session.id)[-1]
+        self.assertEqual(trace.metadata["context_source"], "session")
+        self.assertEqual(trace.metadata["context_messages"], 3)
+        self.assertNotIn("conversation_context", trace.metadata)
+
+
+if __name__ == '__main__':
+    unittest.main()
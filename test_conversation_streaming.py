@@ -0,0 +1,144 @@
+"""
+Tests for token-level streaming of agent conversations over Server-Sent Events
+"""
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from flask import Flask
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from orchestrator.pipeline.llm import LLM_MODEL
+from server.routes.agent import agent, orchestrator
+from testing_utils import achunks
+from utils.ollama_client import ModelConcurrencyLimit, ollama_client
+
+
+PLANNER_RESPONSE = json.dumps({
+    "assistant_text": "Let me fetch your tasks.",
+    "actions": [{"name": "fetch_tasks", "args": {}}]
+})
+SYNTHESIZER_TOKENS = ["You have ", "two ", "tasks."]
+
+
+def parse_sse(body: str):
+    """Split an SSE body into (event, payload) pairs"""
+    events = []
+    for raw_event in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in raw_event.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class TestConversationStreaming(unittest.TestCase):
+    """Tests for /api/agent/conversation in streaming and JSON modes"""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        self.client = app.test_client()
+
+        llm = MagicMock()
+
+        llm.ainvoke = AsyncMock()
+        llm.ainvoke.return_value = AIMessage(content=PLANNER_RESPONSE)
+        llm.astream.side_effect = lambda messages, **kwargs: achunks(AIMessageChunk(content=t) for t in SYNTHESIZER_TOKENS)
+        executor = MagicMock()
+        executor.execute_action.return_value = (True, {"tasks": [{"title": "a"}, {"title": "b"}]})
+
+        session = MagicMock(id="session-1")
+        self.patches = [
+            patch.object(orchestrator, 'llm', llm),
+            patch.object(orchestrator, 'action_executor', executor),
+            patch('orchestrator.pipeline.engine.AgentStepDB.create'),
+            patch('orchestrator.pipeline.engine.AgentStepDB.get_next_step_number', return_value=0),
+            patch('server.routes.agent.SessionDB.create', return_value=session),
+            patch('server.routes.agent.TraceDB.create', return_value=MagicMock(id=1)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def _post(self, **headers):
+        return self.client.post('/api/agent/conversation', json={"input_text": "What are my tasks?"}, headers=headers)
+
+    def test_streams_steps_then_tokens(self):
+        response = self._post(Accept='text/event-stream')
+        self.assertEqual(response.mimetype, 'text/event-stream')
+
+        events = parse_sse(response.get_data(as_text=True))
+        names = [event for event, _ in events]
+        self.assertEqual(names, ['step', 'step', 'token', 'token', 'token', 'step', 'done'])
+        self.assertEqual(events[0][1]['step_type'], 'planner_llm')
+        self.assertEqual(events[1][1]['step_type'], 'action_exec')
+        self.assertEqual([payload['content'] for event, payload in events if event == 'token'], SYNTHESIZER_TOKENS)
+        self.assertTrue(events[5][1]['details']['is_final'])
+        self.assertEqual(events[-1][1]['final_message'], "You have two tasks.")
+
+    def test_json_response_unchanged_without_stream(self):
+        response = self._post()
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['final_message'], "You have two tasks.")
+        self.assertEqual([s['step_type'] for s in data['steps']], ['planner_llm', 'action_exec', 'synthesizer_llm'])
+
+    def test_stream_reports_errors_as_events(self):
+        orchestrator.llm.astream.side_effect = RuntimeError("model unloaded")
+        events = parse_sse(self._post(Accept='text/event-stream').get_data(as_text=True))
+        self.assertEqual(events[-1][0], 'error')
+        self.assertIn("model unloaded", events[-1][1]['error'])
+
+    def test_llm_calls_hold_the_shared_model_slot(self):
+        limits = ModelConcurrencyLimit(1)
+        slot_free = []
+
+        def held(result):
+            slot_free.append(limits.semaphore(LLM_MODEL).acquire(blocking=False))
+            return result
+
+        orchestrator.llm.ainvoke.side_effect = lambda messages, **kwargs: held(AIMessage(content=PLANNER_RESPONSE))
+        orchestrator.llm.astream.side_effect = lambda messages, **kwargs: held(
+            achunks(AIMessageChunk(content=t) for t in SYNTHESIZER_TOKENS))
+        with patch.object(ollama_client, 'limits', limits):
+            self.assertEqual(self._post().get_json()['final_message'], "You have two tasks.")
+
+        # Planner and synthesizer each ran while holding the model's only slot, and released it
+        self.assertEqual(slot_free, [False, False])
+        self.assertTrue(limits.semaphore(LLM_MODEL).acquire(blocking=False))
+
+
+class TestOrchestratorRunStream(unittest.TestCase):
+    """Tests for LangGraphOrchestrator.run_stream"""
+
+    @patch('orchestrator.pipeline.engine.AgentStepDB')
+    def test_yields_node_steps_and_synthesizer_tokens(self, mock_steps):
+        mock_steps.get_next_step_number.return_value = 1
+        async def astream(messages, **kwargs):
+            for t in SYNTHESIZER_TOKENS:
+                yield AIMessageChunk(content=t)
+
+        llm = MagicMock()
+
+        llm.ainvoke = AsyncMock()
+        llm.astream.side_effect = astream
+        router = MagicMock()
+        router.aplan_actions = AsyncMock(return_value={"assistant_text": "Fetching", "tool_name": "get_tasks", "tool_args": {}})
+        router.execute_tool.return_value = "2 tasks"
+
+        with patch.object(orchestrator, 'llm', llm), patch.object(orchestrator, 'router', router):
+            events = list(orchestrator.run_stream("What are my tasks?", session_id="s1"))
+
+        steps = [payload['step_type'] for event, payload in events if event == 'step']
+        self.assertEqual(steps, ['ingest_user_input', 'router_llm', 'tool_exec', 'synthesizer_llm'])
+        self.assertEqual([payload['content'] for event, payload in events if event == 'token'], SYNTHESIZER_TOKENS)
+        self.assertEqual(events[-1], ('done', {
+            "success": True, "message": "Agent step completed", "final_message": "You have two tasks.",
+            "trace_id": "s1", "current_step": 4
+        }))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Tests for the fast-path local task classifier
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from utils.fast_classifier import FastClassifier, tokenize
+from utils.classification_service import TaskClassificationService
+
+TRAINING_EXAMPLES = [
+    ("Go to the gym - leg day", ["health"]),
+    ("Morning run in the park", ["health"]),
+    ("Book doctor appointment", ["health"]),
+    ("Yoga class with friends", ["health"]),
+    ("Prepare for job interview", ["career"]),
+    ("Update resume for applications", ["career"]),
+    ("Send proposal to client", ["career"]),
+    ("Networking event downtown", ["career"]),
+    ("Finish Python course module", ["learning"]),
+    ("Read chapter of statistics book", ["learning"]),
+    ("Study for certification exam", ["learning"]),
+    ("Practice Spanish vocabulary", ["learning"]),
+    ("Buy groceries", []),
+    ("Call mom", []),
+    ("Clean the kitchen", []),
+    ("Pay electricity bill", []),
+] * 3
+
+
+class TestFastClassifier(unittest.TestCase):
+    """Tests for the Naive Bayes fast path"""
+
+    def setUp(self):
+        self.model = FastClassifier().fit(TRAINING_EXAMPLES)
+
+    def test_tokenize_strips_urls_and_adds_bigrams(self):
+        tokens = tokenize("Read https://example.com/article Deep Work")
+        self.assertIn("read", tokens)
+        self.assertIn("deep work", tokens)
+        self.assertFalse(any("example" in token for token in tokens))
+
+    def test_confident_prediction(self):
+        prediction = self.model.predict("Go to the gym")
+        self.assertTrue(prediction.confident)
+        self.assertEqual(prediction.categories, ["health"])
+
+    def test_unknown_text_escalates(self):
+        prediction = self.model.predict("zxq plorf")
+        self.assertFalse(prediction.confident)
+
+    def test_round_trip_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "fast_classifier.json")
+            self.model.save(path)
+            restored = FastClassifier.load(path)
+
+        self.assertEqual(restored.training_size, self.model.training_size)
+        self.assertEqual(
+            restored.predict("Prepare for job interview").categories,
+            self.model.predict("Prepare for job interview").categories
+        )
+
+    def test_missing_artifact(self):
+        self.assertIsNone(FastClassifier.load("/nonexistent/fast_classifier.json"))
+
+
+class TestTwoTierClassification(unittest.TestCase):
+    """Tests for the fast path inside TaskClassificationService"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = TaskClassificationService(
+            log_file=os.path.join(self.tmp.name, "log.txt"),
+            fast_model_file=os.path.join(self.tmp.name, "missing.json")
+        )
+        self.service.fast_classifier = FastClassifier().fit(TRAINING_EXAMPLES)
+
+    def tearDown(self):
+        self.service.prediction_log.close()
+        self.tmp.cleanup()
+
+    @patch.object(TaskClassificationService, '_send_to_ollama')
+    def test_confident_task_skips_llm(self, mock_send):
+        categories = self.service.classify_task("Go to the gym", "leg day")
+        self.assertEqual(categories, ["health"])
+        mock_send.assert_not_called()
+
+    @patch.object(TaskClassificationService, '_build_classification_prompt', return_value=("prompt", {"source": "test"}))
+    @patch.object(TaskClassificationService, '_send_to_ollama')
+    def test_uncertain_task_escalates_to_llm(self, mock_send, _mock_prompt):
+        mock_send.return_value = ('["learning"]', {'response_time_ms': 10, 'prompt_tokens': 5, 'response_tokens': 2})
+        categories = self.service.classify_task("Plorf the zxq widgets thoroughly")
+        self.assertEqual(categories, ["learning"])
+        mock_send.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""
+Tests for fast-path routing of pure chat turns and speculative task prefetching
+"""
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from flask import Flask
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from orchestrator.actions.prefetch import TaskPrefetch
+from orchestrator.pipeline.response_cache import response_cache
+from orchestrator.tools.router import TURN_CHAT, TURN_READ, TURN_TOOL
+from server.routes.agent import agent, orchestrator
+from testing_utils import achunks
+from utils.agent_metrics import turn_metrics
+
+
+TASKS = [{"id": 1, "title": "a", "status": "open"}, {"id": 2, "title": "b", "status": "done"}]
+
+
+class TestClassifyTurn(unittest.TestCase):
+    """Tests for Router.classify_turn"""
+
+    def setUp(self):
+        self.router = orchestrator.router
+
+    def test_pure_chat(self):
+        for text in ["thanks!", "Thank you so much", "hello", "Good morning :)", "how are you?", "hi there, thanks! 🙏"]:
+            self.assertEqual(self.router.classify_turn(text), TURN_CHAT, text)
+
+    def test_reads(self):
+        for text in ["What are my tasks?", "show me what's open", "how many tasks are left"]:
+            self.assertEqual(self.router.classify_turn(text), TURN_READ, text)
+
+    def test_tool_turns(self):
+        for text in ["thanks, now add a task to call mom", "mark the gym task done", "ok", "hi, create a new task"]:
+            self.assertEqual(self.router.classify_turn(text), TURN_TOOL, text)
+
+    def test_greeting_prefixed_requests_reach_the_planner(self):
+        for text in ["hi, I need to buy milk", "thanks! also buy groceries", "hello, schedule dentist friday",
+                     "hey call the bank"]:
+            self.assertEqual(self.router.classify_turn(text), TURN_TOOL, text)
+
+    @patch.object(orchestrator.router, 'router_chain')
+    def test_plan_actions_sends_greeting_prefixed_requests_to_the_llm(self, chain):
+        orchestrator.router.plan_actions("hi, I need to buy milk")
+        chain.invoke.assert_called_once()
+
+    def test_answer_to_question_is_not_chat(self):
+        self.assertEqual(self.router.classify_turn("thanks", "Should I create it?"), TURN_TOOL)
+
+    @patch.object(orchestrator.router, 'router_chain')
+    def test_plan_actions_skips_llm_for_chat(self, chain):
+        decision = orchestrator.router.plan_actions("thanks!")
+        self.assertEqual((decision["tool_name"], decision["fast_path"]), ("no_op", True))
+        chain.invoke.assert_not_called()
+
+
+class TestTaskPrefetch(unittest.TestCase):
+    """Tests for TaskPrefetch"""
+
+    def setUp(self):
+        self.executor = MagicMock()
+        self.executor.fetch_tasks.return_value = (True, {"tasks": TASKS, "count": 2})
+
+    def test_serves_unfiltered_and_status_filtered_fetches(self):
+        prefetch = TaskPrefetch(self.executor)
+        self.assertEqual(prefetch.take("fetch_tasks", {})[1]["count"], 2)
+        self.assertEqual(prefetch.take("fetch_tasks", {"status": "open"})[1]["tasks"], [TASKS[0]])
+        self.assertTrue(prefetch.used)
+        self.executor.fetch_tasks.assert_called_once_with()
+
+    def test_other_actions_and_filters_fall_through(self):
+        prefetch = TaskPrefetch(self.executor)
+        self.assertIsNone(prefetch.take("create_task", {"title": "x"}))
+        self.assertIsNone(prefetch.take("fetch_tasks", {"completed_at_period": "today"}))
+        self.assertFalse(prefetch.used)
+
+    def test_failed_prefetch_falls_through(self):
+        self.executor.fetch_tasks.return_value = (False, {"error": "down"})
+        self.assertIsNone(TaskPrefetch(self.executor).take("fetch_tasks", {}))
+
+
+class TestConversationFastPath(unittest.TestCase):
+    """Tests for LLM call counts on /api/agent/conversation"""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        self.client = app.test_client()
+        turn_metrics.reset_metrics()
+        response_cache.clear()
+
+        self.llm = MagicMock()
+
+        self.llm.ainvoke = AsyncMock()
+        self.llm.ainvoke.return_value = AIMessage(content=json.dumps({
+            "assistant_text": "Fetching", "actions": [{"name": "fetch_tasks", "args": {"status": "open"}}]
+        }))
+        self.llm.astream.side_effect = lambda messages, **kwargs: achunks([AIMessageChunk(content="Done.")])
+        self.executor = MagicMock()
+        self.executor.fetch_tasks.return_value = (True, {"tasks": TASKS, "count": 2})
+
+        self.patches = [
+            patch.object(orchestrator, 'llm', self.llm),
+            patch.object(orchestrator, 'action_executor', self.executor),
+            patch('orchestrator.pipeline.engine.AgentStepDB.create'),
+            patch('orchestrator.pipeline.engine.AgentStepDB.get_next_step_number', return_value=0),
+            patch('server.routes.agent.SessionDB.create', return_value=MagicMock(id="session-1")),
+            patch('server.routes.agent.TraceDB.create', return_value=MagicMock(id=1)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def _converse(self, text):
+        return self.client.post('/api/agent/conversation', json={"input_text": text}).get_json()
+
+    def test_chat_turn_makes_one_llm_call(self):
+        data = self._converse("thanks!")
+        self.llm.ainvoke.assert_not_called()
+        self.assertEqual([s['step_type'] for s in data['steps']], ['synthesizer_llm'])
+        self.assertEqual((data['turn_metrics']['path'], data['turn_metrics']['llm_calls']), ('fast_path', 1))
+
+    def test_read_turn_uses_prefetched_tasks(self):
+        data = self._converse("What are my open tasks?")
+        self.executor.execute_action.assert_not_called()
+        self.assertEqual(data['turn_metrics']['llm_calls'], 2)
+        self.assertEqual(data['turn_metrics']['prefetch'], 'hit')
+
+        summary = self.client.get('/api/agent/metrics').get_json()['turns']
+        self.assertEqual(summary['prefetch'], {'hit': 1})
+        self.assertEqual(summary['paths']['planned']['llm_calls_per_turn'], 2.0)
+
+    def test_write_turn_executes_normally(self):
+        self.llm.ainvoke.return_value = AIMessage(content=json.dumps({
+            "assistant_text": "Adding", "actions": [{"name": "create_task", "args": {"title": "x"}}]
+        }))
+        self.executor.execute_action.return_value = (True, {"task_id": 3})
+        data = self._converse("add a task to call mom")
+        self.executor.fetch_tasks.assert_not_called()
+        self.executor.execute_action.assert_called_once_with("create_task", {"title": "x"})
+        self.assertIsNone(data['turn_metrics']['prefetch'])
+
+
+if __name__ == '__main__':
+    unittest.main()
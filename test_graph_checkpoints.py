@@ -0,0 +1,111 @@
+"""
+Tests for resuming retried agent turns from graph checkpoints
+"""
+import os
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from langchain_core.messages import AIMessageChunk
+
+from models.task_db import IdempotencyKeyDB
+from orchestrator.langgraph_orchestrator import LangGraphOrchestrator
+from testing_utils import use_temp_database
+
+
+class CheckpointTestCase(unittest.TestCase):
+    """Runs against temporary main and checkpoint databases"""
+
+    def setUp(self):
+        tmp_dir = use_temp_database(self)
+        for patcher in [
+            patch.dict(os.environ, {"GISKARD_CHECKPOINT_DB": os.path.join(tmp_dir, 'checkpoints.db')}),
+            patch('orchestrator.pipeline.engine.AgentStepDB'),
+        ]:
+            started = patcher.start()
+            self.addCleanup(patcher.stop)
+        started.get_next_step_number.return_value = 1
+
+
+class TestTurnResume(CheckpointTestCase):
+    """A retried turn continues after its last completed node"""
+
+    def setUp(self):
+        super().setUp()
+        self.orchestrator = LangGraphOrchestrator()
+        self.router = MagicMock()
+        self.router.aplan_actions = AsyncMock(return_value={
+            "assistant_text": "Adding it", "tool_name": "create_task", "tool_args": {"title": "Buy milk"}
+        })
+        self.router.execute_tool.return_value = "Created task: Buy milk"
+        self.orchestrator.router = self.router
+        self.orchestrator.llm = MagicMock()
+
+    def synthesize(self, *tokens, error=None):
+        async def astream(messages, **kwargs):
+            if error:
+                raise error
+            for token in tokens:
+                yield AIMessageChunk(content=token)
+        self.orchestrator.llm.astream.side_effect = astream
+
+    def test_retry_after_synthesizer_failure_skips_router_and_tool(self):
+        self.synthesize(error=RuntimeError("model unloaded"))
+        failed = self.orchestrator.run("add buy milk", session_id="s1", idempotency_key="turn-1")
+        self.assertFalse(failed["success"])
+
+        self.synthesize("Added ", "Buy milk.")
+        retried = self.orchestrator.run("add buy milk", session_id="s1", idempotency_key="turn-1")
+
+        self.assertTrue(retried["success"])
+        self.assertEqual(retried["final_message"], "Added Buy milk.")
+        self.assertEqual(self.router.aplan_actions.await_count, 1)
+        self.assertEqual(self.router.execute_tool.call_count, 1)
+
+    def test_retry_of_completed_turn_returns_recorded_response(self):
+        self.synthesize("Done.")
+        first = self.orchestrator.run("add buy milk", session_id="s1", idempotency_key="turn-2")
+        streamed = list(self.orchestrator.run_stream("add buy milk", session_id="s1", idempotency_key="turn-2"))
+
+        self.assertEqual(self.orchestrator.run("add buy milk", session_id="s1", idempotency_key="turn-2"), first)
+        self.assertEqual(streamed, [("done", first)])
+        self.assertEqual(self.orchestrator.llm.astream.call_count, 1)
+
+    def test_turns_without_a_key_are_not_checkpointed(self):
+        self.synthesize(error=RuntimeError("model unloaded"))
+        result = self.orchestrator.run("add buy milk", session_id="s1")
+
+        self.assertTrue(result["success"])
+        self.assertIn("encountered an error", result["final_message"])
+        self.assertIsNone(self.orchestrator.step_pipeline._checkpointer)
+
+
+class TestToolIdempotency(CheckpointTestCase):
+    """Tools with side effects run once per idempotency key"""
+
+    def test_side_effects_are_not_repeated(self):
+        router = LangGraphOrchestrator().router
+        tool = MagicMock()
+        tool.invoke.return_value = "Created task: Buy milk"
+
+        with patch.object(router.tool_registry, 'get_tool_by_name', return_value=tool):
+            results = [router.execute_tool("create_task", {"title": "Buy milk"}, idempotency_key="t:1") for _ in range(2)]
+            for _ in range(2):
+                router.execute_tool("fetch_tasks", {}, idempotency_key="t:2")
+
+        self.assertEqual(results, ["Created task: Buy milk"] * 2)
+        self.assertEqual(tool.invoke.call_count, 3)
+        self.assertIsNone(IdempotencyKeyDB.get("t:2"))
+
+    def test_failed_tool_calls_can_be_retried(self):
+        router = LangGraphOrchestrator().router
+        tool = MagicMock()
+        tool.invoke.side_effect = ["❌ Error: API unavailable", "Created task: Buy milk"]
+
+        with patch.object(router.tool_registry, 'get_tool_by_name', return_value=tool):
+            router.execute_tool("create_task", {"title": "Buy milk"}, idempotency_key="t:3")
+            self.assertEqual(router.execute_tool("create_task", {"title": "Buy milk"}, idempotency_key="t:3"),
+                             "Created task: Buy milk")
+
+
+if __name__ == '__main__':
+    unittest.main()
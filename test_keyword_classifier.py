@@ -0,0 +1,86 @@
+"""
+Tests for the compiled keyword fallback classifier
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from utils.keyword_classifier import KeywordClassifier, inflections
+from utils.classification_service import TaskClassificationService
+
+
+class TestKeywordClassifier(unittest.TestCase):
+    """Tests for word-boundary keyword matching"""
+
+    def setUp(self):
+        self.classifier = KeywordClassifier()
+
+    def test_basic_categories(self):
+        self.assertEqual(self.classifier.classify("Go to the gym"), ["health"])
+        self.assertEqual(self.classifier.classify("Prepare for job interview"), ["career"])
+        self.assertEqual(self.classifier.classify("Finish Python course"), ["learning"])
+        self.assertEqual(self.classifier.classify("Buy groceries"), [])
+
+    def test_word_boundaries(self):
+        # Substring matching used to tag these as career/learning
+        self.assertEqual(self.classifier.classify("Evening workout"), ["health"])
+        self.assertEqual(self.classifier.classify("Make the bed already"), [])
+
+    def test_inflections_and_case(self):
+        self.assertEqual(self.classifier.classify("LEARNING Rust"), ["learning"])
+        self.assertEqual(self.classifier.classify("Books to order"), ["learning"])
+        self.assertEqual(self.classifier.classify("Two meetings today"), ["career"])
+        for text in ["Running club", "Ran 5k", "Swimming lessons", "Studied for exam", "Writing practice"]:
+            self.assertNotEqual(self.classifier.classify(text), [], text)
+
+    def test_inflections_are_spelled_correctly(self):
+        self.assertEqual(inflections("run"), {"run", "runs", "ran", "running", "runner", "runners"})
+        self.assertEqual(inflections("write"), {"write", "writes", "wrote", "written", "writing", "writer", "writers"})
+        self.assertEqual(inflections("study"), {"study", "studies", "studied", "studying", "studier", "studiers"})
+        self.assertEqual(inflections("learn"), {"learn", "learns", "learned", "learning", "learner", "learners"})
+        self.assertEqual(self.classifier.classify("Runer up"), [])
+
+    def test_multi_word_keywords(self):
+        classifier = KeywordClassifier({"health": ["mental health"], "career": ["side project"]})
+        self.assertEqual(classifier.classify("Side  projects on Sunday"), ["career"])
+        self.assertEqual(classifier.classify("Mental health day"), ["health"])
+        self.assertEqual(classifier.classify("Mental arithmetic"), [])
+
+    def test_keyword_override_file(self):
+        from config import classification_keywords
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "keywords.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({"health": ["pilates"]}, f)
+            with patch.dict(os.environ, {"GISKARD_CLASSIFICATION_KEYWORDS_FILE": path}):
+                keywords = classification_keywords.load_classification_keywords()
+
+        self.assertEqual(keywords, {"health": ["pilates"]})
+        self.assertEqual(KeywordClassifier(keywords).classify("Pilates class"), ["health"])
+
+
+class TestKeywordFallbackBatch(unittest.TestCase):
+    """Tests for the batch fallback inside TaskClassificationService"""
+
+    @patch.object(TaskClassificationService, 'is_ollama_available', return_value=False)
+    @patch.object(TaskClassificationService, '_send_to_ollama')
+    def test_batch_uses_keywords_when_ollama_down(self, mock_send, _mock_available):
+        with tempfile.TemporaryDirectory() as tmp:
+            service = TaskClassificationService(
+                log_file=os.path.join(tmp, "log.txt"),
+                fast_model_file=os.path.join(tmp, "missing.json")
+            )
+            results = service.classify_tasks_batch([
+                {"id": 1, "title": "Morning yoga", "description": None},
+                {"id": 2, "title": "Update resume", "description": "and LinkedIn"},
+            ])
+            service.prediction_log.close()
+
+        self.assertEqual(results, {1: ["health"], 2: ["career"]})
+        mock_send.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
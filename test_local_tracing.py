@@ -0,0 +1,128 @@
+"""
+Tests for local span tracing: nesting, the JSONL and SQLite sinks, and spans of a chat turn
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from flask import Flask
+from langchain_core.messages import AIMessage, AIMessageChunk
+from opentelemetry.trace import INVALID_SPAN
+
+from orchestrator.pipeline.response_cache import response_cache
+from server.routes.agent import agent, orchestrator
+from testing_utils import achunks
+from utils.tracing import folded_stacks, load_spans, span_tracer, traced
+
+
+class TracingTestCase(unittest.TestCase):
+    """Points the global span tracer at a temporary sink for each test"""
+    sink = "jsonl"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "traces.jsonl" if self.sink == "jsonl" else "traces.db")
+        span_tracer.configure(self.sink, self.path)
+        self.addCleanup(span_tracer.configure, None)
+
+    def spans(self):
+        self.assertTrue(span_tracer.force_flush())
+        return {span["name"]: span for span in load_spans(self.path)}
+
+
+class TestSpanNesting(TracingTestCase):
+    """Tests for span() and traced()"""
+
+    def test_spans_nest_and_record_errors(self):
+        @traced("db.tasks.save")
+        def save():
+            raise ValueError("disk full")
+
+        with span_tracer.span("chat.turn", session_id="s-1"):
+            with span_tracer.span("node.action_exec"):
+                with self.assertRaises(ValueError):
+                    save()
+
+        spans = self.spans()
+        self.assertEqual(spans["node.action_exec"]["parent_span_id"], spans["chat.turn"]["span_id"])
+        self.assertEqual(spans["db.tasks.save"]["parent_span_id"], spans["node.action_exec"]["span_id"])
+        self.assertEqual(len({span["trace_id"] for span in spans.values()}), 1)
+        self.assertEqual(spans["db.tasks.save"]["status"], "ERROR")
+        self.assertEqual(spans["chat.turn"]["attributes"], {"session_id": "s-1"})
+
+    def test_disabled_tracing_writes_nothing(self):
+        span_tracer.configure(None)
+        with span_tracer.span("chat.turn") as span:
+            self.assertIs(span, INVALID_SPAN)
+        self.assertFalse(os.path.exists(self.path))
+
+
+class TestSqliteSink(TracingTestCase):
+    """Spans land in a SQLite spans table and fold into flame graph stacks"""
+    sink = "sqlite"
+
+    def test_folded_stacks_report_self_time(self):
+        with span_tracer.span("chat.turn"):
+            with span_tracer.span("llm.planner"):
+                pass
+        self.assertTrue(span_tracer.force_flush())
+        spans = load_spans(self.path)
+
+        self.assertEqual(sorted(span["name"] for span in spans), ["chat.turn", "llm.planner"])
+        stacks = folded_stacks(spans)
+        self.assertEqual(set(stacks), {"chat.turn", "chat.turn;llm.planner"})
+        turn = next(span for span in spans if span["name"] == "chat.turn")
+        self.assertAlmostEqual(sum(stacks.values()), turn["duration_ms"], places=2)
+
+
+class TestConversationSpans(TracingTestCase):
+    """A conversation turn records route, node, LLM and tool spans in one trace"""
+
+    def setUp(self):
+        super().setUp()
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        self.client = app.test_client()
+        response_cache.clear()
+
+        llm = MagicMock()
+        llm.ainvoke = AsyncMock(return_value=AIMessage(content=json.dumps({
+            "assistant_text": "Adding it", "actions": [{"name": "create_task", "args": {"title": "Buy milk"}}]
+        })))
+        llm.astream.side_effect = lambda messages, **kwargs: achunks([AIMessageChunk(content="Added.")])
+        api_client = MagicMock()
+        api_client.create_task.return_value = {"task": {"id": 7}}
+
+        for patcher in [
+            patch.object(orchestrator, 'llm', llm),
+            patch.object(orchestrator.action_executor, 'api_client', api_client),
+            patch('server.routes.agent.SessionDB.create', return_value=MagicMock(id="session-1")),
+            patch('server.routes.agent.TraceDB.create', return_value=MagicMock(id=1)),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        steps_patcher = patch('orchestrator.pipeline.engine.AgentStepDB')
+        steps_patcher.start().get_next_step_number.return_value = 1
+        self.addCleanup(steps_patcher.stop)
+
+    def test_turn_spans_form_one_tree(self):
+        response = self.client.post('/api/agent/conversation', json={"input_text": "Create a task to buy milk"})
+        self.assertEqual(response.status_code, 200)
+
+        spans = self.spans()
+        by_id = {span["span_id"]: span["name"] for span in spans.values()}
+        parent = {name: by_id.get(span["parent_span_id"]) for name, span in spans.items()}
+
+        self.assertEqual(parent["chat.turn"], "http.agent.conversation")
+        self.assertEqual(parent["node.planner_llm"], "chat.turn")
+        self.assertEqual(parent["llm.planner"], "node.planner_llm")
+        self.assertEqual(parent["tool.create_task"], "node.action_exec")
+        self.assertEqual(parent["llm.synthesizer"], "node.synthesizer_llm")
+        self.assertEqual(len({span["trace_id"] for span in spans.values()}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
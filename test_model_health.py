@@ -0,0 +1,104 @@
+"""
+Tests for the Ollama model health monitor
+"""
+import unittest
+from unittest.mock import MagicMock
+from utils.model_health import ModelHealthMonitor
+
+
+def _response(status_code=200, payload=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload or {}
+    response.raise_for_status.return_value = None
+    return response
+
+
+class TestModelHealthMonitor(unittest.TestCase):
+    """Tests for cached reachability and residency tracking"""
+
+    def setUp(self):
+        self.client = MagicMock()
+        self.monitor = ModelHealthMonitor(model="gemma3:4b", stale_after=60, client=self.client)
+
+    def test_refresh_detects_loaded_model(self):
+        """/api/tags and /api/ps results are cached"""
+        mock_get = self.client.get
+        mock_get.side_effect = [
+            _response(200, {"models": [{"name": "gemma3:4b"}]}),
+            _response(200, {"models": [{"name": "gemma3:4b", "expires_at": "2030-01-01T00:00:00Z"}]})
+        ]
+
+        status = self.monitor.refresh()
+
+        self.assertTrue(status['ollama_available'])
+        self.assertTrue(status['model_loaded'])
+        self.assertEqual(status['model_expires_at'], "2030-01-01T00:00:00Z")
+
+    def test_cached_state_avoids_probe(self):
+        """Fresh state is served without hitting Ollama again"""
+        mock_get = self.client.get
+        mock_get.side_effect = [
+            _response(200),
+            _response(200, {"models": [{"name": "gemma3:4b"}]})
+        ]
+        self.monitor.refresh()
+        mock_get.reset_mock()
+
+        self.assertTrue(self.monitor.is_available())
+        self.assertTrue(self.monitor.is_model_loaded())
+        mock_get.assert_not_called()
+
+    def test_no_warmup_when_resident(self):
+        """A resident model is not warmed up again"""
+        mock_get, mock_post = self.client.get, self.client.request
+        mock_get.side_effect = [
+            _response(200),
+            _response(200, {"models": [{"name": "gemma3:4b"}]})
+        ]
+        self.monitor.refresh()
+
+        self.assertTrue(self.monitor.ensure_model_loaded())
+        mock_post.assert_not_called()
+
+    def test_warmup_when_evicted(self):
+        """An evicted model is loaded with an empty prompt and keep_alive"""
+        mock_get, mock_post = self.client.get, self.client.request
+        mock_get.side_effect = [
+            _response(200),
+            _response(200, {"models": []})
+        ]
+        mock_post.return_value = _response(200)
+        self.monitor.refresh()
+
+        self.assertTrue(self.monitor.ensure_model_loaded())
+        payload = mock_post.call_args.kwargs['json']
+        self.assertEqual(payload['prompt'], "")
+        self.assertEqual(payload['keep_alive'], self.monitor.keep_alive)
+        self.assertEqual(self.monitor.warmup_count, 1)
+
+        # Second call sees the cached residency and skips the warmup
+        self.assertTrue(self.monitor.ensure_model_loaded())
+        self.assertEqual(mock_post.call_count, 1)
+
+    def test_unreachable_ollama(self):
+        """Connection failures mark Ollama unavailable"""
+        mock_get = self.client.get
+        mock_get.side_effect = Exception("connection refused")
+
+        self.assertFalse(self.monitor.is_available())
+        self.assertFalse(self.monitor.ensure_model_loaded())
+
+    def test_mark_unavailable(self):
+        """A failed request clears the cached state until the next poll"""
+        self.monitor.ollama_available = True
+        self.monitor.model_loaded = True
+
+        self.monitor.mark_unavailable()
+
+        self.assertFalse(self.monitor.ollama_available)
+        self.assertFalse(self.monitor.model_loaded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+"""
+Tests for the shared Ollama clients against a local stub server
+"""
+import asyncio
+import json
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from utils.ollama_client import AsyncOllamaClient, ModelConcurrencyLimit, OllamaClient
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """Minimal /api/generate and /api/tags stub with scripted failures"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, model):
+        chunks = [{"model": model, "response": t, "done": False} for t in ("Keep ", "going", "!")]
+        chunks.append({"model": model, "response": "", "done": True, "prompt_eval_count": 20, "eval_count": 3})
+        body = "".join(json.dumps(c) + "\n" for c in chunks).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        self._send(200, {"models": [{"name": "gemma3:4b"}]})
+
+    def do_POST(self):
+        self.server.connections.add(self.client_address)
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            if self.server.failures_remaining > 0:
+                self.server.failures_remaining -= 1
+                return self._send(503, {"error": "server busy"})
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.in_flight -= 1
+        if payload.get("stream"):
+            return self._send_stream(payload["model"])
+        self._send(200, {"model": payload["model"], "response": '["health"]', "prompt_eval_count": 12, "eval_count": 3})
+
+
+class TestOllamaClient(unittest.TestCase):
+    """Tests for pooling, retries, concurrency limits and accounting"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllamaHandler)
+        self.server.lock = threading.Lock()
+        self.server.connections = set()
+        self.server.failures_remaining = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = OllamaClient(self.base_url, backoff_base=0.01, max_concurrency_per_model=2)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            self.client.generate({"model": "gemma3:4b", "prompt": "hi"})
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_retries_transient_errors(self):
+        self.server.failures_remaining = 2
+        result = self.client.generate({"model": "gemma3:4b", "prompt": "hi"})
+        self.assertEqual(result["response"], '["health"]')
+        self.assertEqual(self.client.get_stats()["gemma3:4b"]["retries"], 2)
+
+    def test_gives_up_after_max_retries(self):
+        self.server.failures_remaining = 5
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.client.generate({"model": "gemma3:4b", "prompt": "hi"}, retries=1)
+        self.assertEqual(self.client.get_stats()["gemma3:4b"]["failures"], 1)
+
+    def test_per_model_concurrency_limit(self):
+        self.server.delay = 0.05
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            list(executor.map(lambda _: self.client.generate({"model": "gemma3:4b", "prompt": "hi"}), range(6)))
+        self.assertLessEqual(self.server.max_in_flight, 2)
+
+    def test_token_and_latency_accounting(self):
+        self.client.generate({"model": "gemma3:4b", "prompt": "hi"})
+        self.client.generate({"model": "gemma3:4b", "prompt": "hi"})
+        stats = self.client.get_stats()["gemma3:4b"]
+        self.assertEqual((stats["requests"], stats["prompt_tokens"], stats["completion_tokens"]), (2, 24, 6))
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_stream_generate(self):
+        chunks = list(self.client.stream_generate({"model": "gemma3:4b", "prompt": "hi"}))
+        self.assertEqual("".join(c["response"] for c in chunks), "Keep going!")
+        self.assertTrue(chunks[-1]["done"])
+        stats = self.client.get_stats()["gemma3:4b"]
+        self.assertEqual((stats["requests"], stats["completion_tokens"], stats["in_flight"]), (1, 3, 0))
+        # The concurrency slot is released once the stream is consumed
+        self.assertTrue(self.client._semaphore("gemma3:4b").acquire(blocking=False))
+
+    def test_probes(self):
+        self.assertTrue(self.client.is_reachable())
+        self.assertEqual(self.client.list_models(), ["gemma3:4b"])
+        self.assertFalse(OllamaClient("http://127.0.0.1:9").is_reachable(timeout=0.5))
+
+    def test_async_client(self):
+        self.server.failures_remaining = 1
+        self.server.delay = 0.05
+        client = AsyncOllamaClient(self.base_url, backoff_base=0.01, max_concurrency_per_model=2)
+
+        async def run():
+            try:
+                return await asyncio.gather(*[client.generate({"model": "gemma3:4b", "prompt": "hi"}) for _ in range(4)])
+            finally:
+                await client.aclose()
+
+        results = asyncio.run(run())
+        self.assertEqual([r["eval_count"] for r in results], [3, 3, 3, 3])
+        self.assertLessEqual(self.server.max_in_flight, 2)
+        self.assertEqual(client.get_stats()["gemma3:4b"]["retries"], 1)
+
+    def test_sync_and_async_clients_share_one_limit(self):
+        self.server.delay = 0.05
+        limits = ModelConcurrencyLimit(2)
+        sync_client = OllamaClient(self.base_url, limits=limits)
+        async_client = AsyncOllamaClient(self.base_url, limits=limits)
+        self.addCleanup(sync_client.close)
+
+        async def run():
+            try:
+                await asyncio.gather(*[async_client.generate({"model": "gemma3:4b", "prompt": "hi"}) for _ in range(4)])
+            finally:
+                await async_client.aclose()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(sync_client.generate, {"model": "gemma3:4b", "prompt": "hi"}) for _ in range(4)]
+            asyncio.run(run())
+            [future.result() for future in futures]
+        self.assertLessEqual(self.server.max_in_flight, 2)
+        self.assertTrue(limits.semaphore("gemma3:4b").acquire(blocking=False))
+
+    def test_client_from_another_loop_is_closed(self):
+        client = AsyncOllamaClient(self.base_url)
+        other_loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+        thread.start()
+        self.addCleanup(other_loop.close)
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(other_loop.call_soon_threadsafe, other_loop.stop)
+
+        asyncio.run_coroutine_threadsafe(client.list_models(), other_loop).result(5)
+        first = client._client
+
+        async def run():
+            try:
+                return await client.list_models()
+            finally:
+                await client.aclose()
+
+        self.assertEqual(asyncio.run(run()), ["gemma3:4b"])
+        deadline = time.time() + 2
+        while not first.is_closed and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(first.is_closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+"""
+Parity tests: every agent entry point keeps its behaviour on the shared turn pipeline
+"""
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from flask import Flask
+from langchain_core.messages import AIMessage, AIMessageChunk, SystemMessage
+
+from orchestrator.runtime.run import OrchestratorRuntime
+from orchestrator.tools.catalog import get_tool_catalog
+from server.routes.agent import agent, orchestrator
+from testing_utils import achunks
+
+SYNTHESIZER_TOKENS = ["You have ", "two tasks."]
+ROUTER_OUTPUT = {"assistant_text": "Fetching", "tool_name": "fetch_tasks", "tool_args": {"status": "open"}}
+STEP_KEYS = {"step_number", "step_type", "status", "content", "details", "timestamp"}
+
+
+def parse_sse(body: str):
+    """Split an SSE body into (event, payload) pairs"""
+    events = []
+    for raw_event in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in raw_event.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class PipelineTestCase(unittest.TestCase):
+    """Mocks the LLM, tools and databases behind the shared orchestrator"""
+
+    def setUp(self):
+        self.llm = MagicMock()
+        self.llm.ainvoke = AsyncMock(return_value=AIMessage(content=json.dumps({
+            "assistant_text": "Let me check.", "actions": [{"name": "fetch_tasks", "args": {}}]
+        })))
+        self.llm.astream.side_effect = lambda messages, **kwargs: achunks(AIMessageChunk(content=t) for t in SYNTHESIZER_TOKENS)
+        self.executor = MagicMock()
+        self.executor.execute_action.return_value = (True, {"tasks": [{"title": "a"}, {"title": "b"}]})
+        self.router = MagicMock(wraps=orchestrator.router)
+        self.router.aplan_actions = AsyncMock(return_value=ROUTER_OUTPUT)
+        self.router.execute_tool.return_value = "2 tasks"
+
+        for patcher in [
+            patch.object(orchestrator, 'llm', self.llm),
+            patch.object(orchestrator, 'action_executor', self.executor),
+            patch.object(orchestrator, 'router', self.router),
+            patch('server.routes.agent.SessionDB.create', return_value=MagicMock(id="session-1")),
+            patch('server.routes.agent.TraceDB.create', return_value=MagicMock(id=1)),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        steps_patcher = patch('orchestrator.pipeline.engine.AgentStepDB')
+        self.steps = steps_patcher.start()
+        self.addCleanup(steps_patcher.stop)
+        self.steps.get_next_step_number.return_value = 1
+
+    def logged_steps(self):
+        return [(c.kwargs["step_type"], c.kwargs["step_number"]) for c in self.steps.create.call_args_list]
+
+
+class TestConversationParity(PipelineTestCase):
+    """/api/agent/conversation"""
+
+    def setUp(self):
+        super().setUp()
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        self.client = app.test_client()
+
+    def converse(self, text="add a task", **headers):
+        return self.client.post('/api/agent/conversation', json={"input_text": text}, headers=headers)
+
+    def test_events_and_logged_steps(self):
+        events = parse_sse(self.converse(Accept='text/event-stream').get_data(as_text=True))
+
+        self.assertEqual([event for event, _ in events], ['step', 'step', 'token', 'token', 'step', 'done'])
+        for event, payload in events:
+            if event == 'step':
+                self.assertEqual(set(payload), STEP_KEYS)
+        self.assertEqual(events[0][1]['details'], {"assistant_text": "Let me check.", "actions_count": 1})
+        self.assertEqual(events[1][1]['content'], "⚡ Executed 1 actions")
+        self.assertEqual(events[4][1]['content'], "You have two tasks.")
+        self.assertEqual(set(events[-1][1]), {'session_id', 'trace_id', 'steps', 'final_message', 'total_steps', 'turn_metrics'})
+        self.assertEqual(self.logged_steps(), [("planner_llm", 2), ("action_exec", 3), ("synthesizer_llm", 4)])
+        self.assertEqual({c.kwargs["session_id"] for c in self.steps.create.call_args_list}, {"session-1"})
+
+    def test_unparseable_plan_falls_back_to_no_op(self):
+        self.llm.ainvoke.return_value = AIMessage(content="not json")
+        data = self.converse().get_json()
+        self.assertTrue(data['success'])
+        self.executor.execute_action.assert_called_once_with("no_op", {})
+
+    def test_llm_errors_fail_the_turn(self):
+        self.llm.ainvoke.side_effect = RuntimeError("model unloaded")
+        response = self.converse()
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("model unloaded", response.get_json()['error'])
+
+
+class TestStepParity(PipelineTestCase):
+    """/api/agent/step (LangGraphOrchestrator.run)"""
+
+    def test_response_and_logged_steps(self):
+        result = orchestrator.run("What are my open tasks?", session_id="s1", domain="chat")
+
+        self.assertEqual(result["final_message"], "You have two tasks.")
+        self.assertEqual(result["current_step"], 4)
+        self.assertEqual(result["state_patch"]["messages"], ["What are my open tasks?", "Fetching", "2 tasks", "You have two tasks."])
+        self.assertEqual(self.logged_steps(), [
+            ("workflow_start", 1), ("ingest_user_input", 1), ("router_llm", 2), ("tool_exec", 3), ("synthesizer_llm", 4)
+        ])
+        self.router.execute_tool.assert_called_once_with("fetch_tasks", {"status": "open"}, idempotency_key=None)
+
+    def test_router_and_synthesizer_errors_fall_back(self):
+        self.router.aplan_actions.side_effect = RuntimeError("router down")
+        self.llm.astream.side_effect = RuntimeError("model unloaded")
+        result = orchestrator.run("What are my open tasks?", session_id="s1")
+
+        self.assertTrue(result["success"])
+        self.assertIn("encountered an error", result["final_message"])
+        self.router.execute_tool.assert_called_once_with("no_op", {}, idempotency_key=None)
+
+
+class TestRuntimeParity(PipelineTestCase):
+    """OrchestratorRuntime.execute"""
+
+    def test_events(self):
+        result = OrchestratorRuntime().execute("What are my open tasks?", session_id="s1", domain="chat")
+
+        self.assertEqual([e["type"] for e in result["events"]], [
+            "run_started", "llm_message", "action_call", "action_result", "llm_message", "final_message", "run_completed"
+        ])
+        self.assertEqual(result["events"][2], {"type": "action_call", "name": "fetch_tasks", "args": {"status": "open"}})
+        self.assertEqual(result["events"][-1], {"type": "run_completed", "status": "ok", "error": None})
+        self.assertEqual(result["final_message"], "You have two tasks.")
+        self.assertEqual(set(result["state_patch"]), {"run_id", "session_id", "domain"})
+        self.executor.execute_action.assert_called_once_with("fetch_tasks", {"status": "open"})
+
+    def test_synthesizer_error_completes_with_error(self):
+        self.llm.astream.side_effect = RuntimeError("model unloaded")
+        result = OrchestratorRuntime().execute("What are my open tasks?")
+
+        self.assertEqual(result["events"][-1]["status"], "error")
+        self.assertIn("encountered an error", result["final_message"])
+
+
+class TestSharedPipeline(PipelineTestCase):
+    """One LLM client and one synthesizer prompt serve every entry point"""
+
+    def test_synthesizer_prompt_prefix_is_identical(self):
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        app.test_client().post('/api/agent/conversation', json={"input_text": "What are my open tasks?"})
+        orchestrator.run("What are my open tasks?", session_id="s1")
+        OrchestratorRuntime().execute("What are my open tasks?")
+
+        static_prompt, _ = get_tool_catalog().prompt("synthesizer").render_split(user_input="", action_results="")
+        first_messages = [c.args[0][0] for c in self.llm.astream.call_args_list]
+        self.assertEqual(len(first_messages), 3)
+        for message in first_messages:
+            self.assertIsInstance(message, SystemMessage)
+            self.assertEqual(message.content, static_prompt.rstrip())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Tests for the buffered, rotating classification prediction log
+"""
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from utils.prediction_log import PredictionLogWriter, get_prediction_log, iter_prediction_log, list_log_segments
+
+
+class TestPredictionLogWriter(unittest.TestCase):
+    """Tests for batching, rotation and streaming reads"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "predictions.txt")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _writer(self, **kwargs):
+        kwargs.setdefault("flush_interval", 60)
+        writer = PredictionLogWriter(self.path, **kwargs)
+        self.addCleanup(writer.close)
+        return writer
+
+    def test_writes_are_batched(self):
+        writer = self._writer(flush_batch_size=3)
+        writer.write({"task": "a"})
+        writer.write({"task": "b"})
+        self.assertFalse(os.path.exists(self.path))
+
+        writer.write({"task": "c"})
+        self.assertEqual([e["task"] for e in iter_prediction_log(self.path)], ["a", "b", "c"])
+
+    def test_close_flushes_remaining_entries(self):
+        writer = self._writer()
+        writer.write({"task": "a"})
+        writer.close()
+        self.assertEqual(len(list(iter_prediction_log(self.path))), 1)
+
+    def test_size_rotation_with_gzip(self):
+        writer = self._writer(max_bytes=50, flush_batch_size=1)
+        for i in range(6):
+            writer.write({"task": f"task number {i}"})
+
+        segments = list_log_segments(self.path)
+        self.assertTrue(segments)
+        self.assertTrue(all(s.endswith(".gz") for s in segments))
+        with gzip.open(segments[0], 'rt', encoding='utf-8') as f:
+            self.assertIn("task number 0", f.read())
+        # Reader streams rotated segments oldest first, then the live file
+        self.assertEqual([e["task"] for e in iter_prediction_log(self.path)], [f"task number {i}" for i in range(6)])
+
+    def test_age_rotation_without_compression(self):
+        writer = self._writer(max_age_seconds=0, flush_batch_size=1, compress=False)
+        writer.write({"task": "a"})
+        segments = list_log_segments(self.path)
+        self.assertEqual(len(segments), 1)
+        self.assertFalse(segments[0].endswith(".gz"))
+
+    def test_backup_count(self):
+        writer = self._writer(max_bytes=1, flush_batch_size=1, backup_count=2)
+        for i in range(5):
+            writer.write({"task": i})
+        self.assertEqual(len(list_log_segments(self.path)), 2)
+        self.assertEqual([e["task"] for e in iter_prediction_log(self.path)], [3, 4])
+
+    def test_writes_are_not_blocked_while_a_segment_compresses(self):
+        writer = self._writer(max_bytes=1, flush_batch_size=1)
+        compressing, release = threading.Event(), threading.Event()
+        copy = shutil.copyfileobj
+
+        def slow_copy(src, dst):
+            compressing.set()
+            release.wait(5)
+            copy(src, dst)
+
+        with patch('utils.prediction_log.shutil.copyfileobj', side_effect=slow_copy):
+            rotating = threading.Thread(target=writer.write, args=({"task": "a"},))
+            rotating.start()
+            self.assertTrue(compressing.wait(5))
+
+            # The next flush only appends, so it shouldn't wait for the compression
+            writer.max_bytes = 1024 * 1024
+            writing = threading.Thread(target=lambda: (writer.write({"task": "b"}), writer.flush()))
+            writing.start()
+            writing.join(2)
+            self.assertFalse(writing.is_alive())
+            release.set()
+            rotating.join(5)
+        writing.join(5)
+        self.assertEqual(sorted(e["task"] for e in iter_prediction_log(self.path)), ["a", "b"])
+
+    def test_one_shared_writer_per_path(self):
+        writer = get_prediction_log(self.path)
+        self.addCleanup(writer.close)
+        self.assertIs(get_prediction_log(os.path.join(self.tmp.name, ".", "predictions.txt")), writer)
+        self.assertIsNot(get_prediction_log(self.path + ".other"), writer)
+
+    def test_reader_skips_malformed_lines(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"task": "a"}\nnot json\n{"task": "b"}\n')
+        self.assertEqual([e["task"] for e in iter_prediction_log(self.path)], ["a", "b"])
+
+
+if __name__ == '__main__':
+    unittest.main()
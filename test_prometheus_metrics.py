@@ -0,0 +1,166 @@
+"""
+Tests for the Prometheus metrics registry, the /metrics endpoint and the metrics fed into it
+"""
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from flask import Flask
+
+from flask import Response
+
+from utils.agent_metrics import AgentMetrics, PromptCacheMetrics, ResponseCacheMetrics, TurnMetrics
+from utils.classification_manager import ClassificationManager
+from utils.prometheus import CONTENT_TYPE, MetricsRegistry, instrument_app, registry, timed
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Tests for counters, gauges, histograms and the text format"""
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_histogram_buckets_are_cumulative(self):
+        latency = self.registry.histogram("llm_request_duration_seconds", "LLM latency", ("model", "prompt"),
+                                          buckets=(0.5, 1.0))
+        for seconds in (0.2, 0.7, 3.0):
+            latency.labels(model="qwen", prompt="planner").observe(seconds)
+
+        self.assertIn("# TYPE giskard_llm_request_duration_seconds histogram", self.registry.render())
+        labels = {"model": "qwen", "prompt": "planner"}
+        bucket = lambda le: self.registry.sample("llm_request_duration_seconds_bucket", le=le, **labels)
+        self.assertEqual((bucket("0.5"), bucket("1.0"), bucket("+Inf")), (1, 2, 3))
+        self.assertAlmostEqual(self.registry.sample("llm_request_duration_seconds_sum", **labels), 3.9)
+        self.assertEqual(self.registry.sample("llm_request_duration_seconds_count", **labels), 3)
+
+    def test_counters_gauges_and_label_escaping(self):
+        lookups = self.registry.counter("cache_lookups", "Cache lookups", ("cache", "result"))
+        lookups.labels(cache='say "hi"\n', result="hit").inc(2)
+        depth = self.registry.gauge("queue_depth", "Queue depth")
+        depth.set_function(lambda: 7)
+
+        text = self.registry.render()
+        self.assertIn("# TYPE giskard_cache_lookups_total counter", text)
+        self.assertIn('giskard_cache_lookups_total{cache="say \\"hi\\"\\n",result="hit"} 2.0', text)
+        self.assertIn("giskard_queue_depth 7.0", text)
+
+    def test_registration_is_idempotent(self):
+        first = self.registry.counter("requests", "Requests", ("outcome",))
+        self.assertIs(self.registry.counter("requests", "Requests", ("outcome",)), first)
+        with self.assertRaises(ValueError):
+            self.registry.histogram("requests", "Requests", ("outcome",))
+
+    def test_concurrent_increments_are_not_lost(self):
+        counter = self.registry.counter("tool_calls", "Tool calls", ("tool",))
+        latency = self.registry.histogram("db_query_duration_seconds", "DB latency", ("operation",))
+
+        @timed(latency, operation="tasks.save")
+        def save():
+            counter.labels(tool="create_task").inc()
+
+        threads = [threading.Thread(target=lambda: [save() for _ in range(1000)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.registry.sample("tool_calls_total", tool="create_task"), 8000)
+        self.assertEqual(self.registry.sample("db_query_duration_seconds_count", operation="tasks.save"), 8000)
+
+
+class TestFlaskInstrumentation(unittest.TestCase):
+    """Requests are timed per URL rule and the registry is served at /metrics"""
+
+    def test_requests_are_labelled_by_route(self):
+        registry = MetricsRegistry()
+        app = Flask(__name__)
+
+        @app.route('/api/tasks/<int:task_id>')
+        def get_task(task_id):
+            return {"id": task_id}
+
+        instrument_app(app, registry)
+        client = app.test_client()
+        client.get('/api/tasks/1')
+        client.get('/api/tasks/2')
+        client.get('/missing')
+
+        response = client.get('/metrics')
+        self.assertEqual(response.content_type, CONTENT_TYPE)
+        text = response.get_data(as_text=True)
+        self.assertIn('giskard_http_request_duration_seconds_count{method="GET",route="/api/tasks/<int:task_id>",'
+                      'status="200"} 2.0', text)
+        self.assertIn('giskard_http_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 1.0', text)
+
+    def test_streamed_responses_are_observed_when_the_stream_closes(self):
+        registry = MetricsRegistry()
+        app = Flask(__name__)
+
+        @app.route('/stream')
+        def stream():
+            return Response((chunk for chunk in ["a", "b"]), mimetype='text/event-stream')
+
+        instrument_app(app, registry)
+        labels = {"method": "GET", "route": "/stream", "status": "200"}
+        response = app.test_client().get('/stream', buffered=False)
+        self.assertEqual(registry.sample("http_request_duration_seconds_count", **labels), 0)
+        self.assertEqual(b"".join(response.response), b"ab")
+        response.close()
+        self.assertEqual(registry.sample("http_request_duration_seconds_count", **labels), 1)
+
+
+class TestAgentMetrics(unittest.TestCase):
+    """AgentMetrics keeps its JSON summary and feeds Prometheus"""
+
+    def test_average_covers_the_recent_window(self):
+        metrics = AgentMetrics(max_history=3)
+        successes = registry.sample("agent_requests_total", outcome="success") or 0
+        for seconds in (10.0, 1.0, 2.0, 3.0):
+            metrics.record_request(success=True, response_time=seconds)
+
+        summary = metrics.get_metrics()
+        self.assertEqual(summary['response_times'], [1.0, 2.0, 3.0])
+        self.assertAlmostEqual(summary['average_response_time'], 2.0)
+        self.assertEqual(summary['requests_total'], 4)
+        self.assertEqual(registry.sample("agent_requests_total", outcome="success") - successes, 4)
+
+    def test_concurrent_records_are_not_lost(self):
+        turns, prompts, lookups = TurnMetrics(), PromptCacheMetrics(), ResponseCacheMetrics()
+
+        def record():
+            for _ in range(1000):
+                turns.record_turn('planned', llm_calls=2, latency_ms=1.0)
+                prompts.record_call('planner', prompt_tokens=10, evaluated_tokens=4)
+                lookups.record_lookup(hit=True, llm_calls_saved=2)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        planned = turns.get_metrics()['paths']['planned']
+        self.assertEqual((planned['turns'], planned['llm_calls']), (8000, 16000))
+        self.assertEqual(prompts.get_metrics()['calls']['planner']['cached_tokens'], 48000)
+        self.assertEqual((lookups.get_metrics()['hits'], lookups.get_metrics()['llm_calls_saved']), (8000, 16000))
+
+
+class TestClassificationQueueMetrics(unittest.TestCase):
+    """Queue depth and age are read from the manager at scrape time"""
+
+    @patch('utils.classification_manager.TaskClassificationService')
+    def test_queue_depth_and_oldest_age(self, _service):
+        manager = ClassificationManager()
+        manager.classification_queue.append({'id': 1, 'timestamp': datetime.now() - timedelta(seconds=30)})
+        manager.classification_queue.append({'id': 2, 'timestamp': datetime.now()})
+        manager.deferred_tasks[3] = {'id': 3, 'timestamp': datetime.now()}
+
+        self.assertEqual(registry.sample("classification_queue_depth", queue='immediate'), 2)
+        self.assertEqual(registry.sample("classification_queue_depth", queue='deferred'), 1)
+        self.assertGreaterEqual(registry.sample("classification_queue_oldest_age_seconds", queue='immediate'), 30)
+        self.assertLess(registry.sample("classification_queue_oldest_age_seconds", queue='deferred'), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
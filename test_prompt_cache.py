@@ -0,0 +1,125 @@
+"""
+Tests for cache-friendly prompt assembly and the prompt cache metric
+"""
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from flask import Flask
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+
+from config.prompt_manager import CompiledPrompt
+from orchestrator.tools.catalog import get_tool_catalog
+from orchestrator.pipeline.llm import build_llm_messages
+from server.routes.agent import agent, orchestrator
+from testing_utils import achunks
+from utils.agent_metrics import prompt_cache_metrics
+from utils.chat_service import ChatService
+from utils.ollama_client import OllamaClient, prompt_token_usage
+from utils.token_accounting import token_counter
+
+
+CONTEXT = [{"type": "user", "content": "add milk"}, {"type": "bot", "content": "Added milk."}]
+
+
+class TestStablePrefix(unittest.TestCase):
+    """Static prompt content stays byte-identical across calls"""
+
+    def test_split_keeps_dynamic_values_out_of_prefix(self):
+        prompt = CompiledPrompt({"name": "p", "text": "Rules\nTools: {{tools}}\nNow: {{current_datetime}}\nEnd"}, tools="x")
+        first = prompt.render_split(current_datetime="2025-01-01")
+        second = prompt.render_split(current_datetime="2025-06-30")
+        self.assertEqual(first[0], "Rules\nTools: x\n")
+        self.assertEqual(first[0], second[0])
+        self.assertEqual("".join(first), prompt.render(current_datetime="2025-01-01"))
+
+    def test_shipped_prompts_end_with_their_variables(self):
+        catalog = get_tool_catalog()
+        planner_static, planner_dynamic = catalog.prompt("planner").render_split()
+        self.assertIn("- fetch_tasks:", planner_static)
+        self.assertTrue(planner_dynamic.startswith("Current datetime:"))
+
+        synthesizer_static, synthesizer_dynamic = catalog.prompt("synthesizer").render_split(user_input="hi", action_results="[]")
+        self.assertIn("Guidelines:", synthesizer_static)
+        self.assertTrue(synthesizer_dynamic.startswith("- Original user input: hi"))
+
+    def test_messages_put_context_before_dynamic_values(self):
+        prompt = get_tool_catalog().prompt("synthesizer")
+        first, rendered = build_llm_messages(prompt, CONTEXT, "thanks", user_input="thanks", action_results="[1]")
+        second, _ = build_llm_messages(prompt, CONTEXT, "what next?", user_input="what next?", action_results="[2]")
+
+        self.assertEqual([type(m) for m in first], [SystemMessage, HumanMessage, AIMessage, SystemMessage, HumanMessage])
+        self.assertEqual(first[:3], second[:3])
+        self.assertIn("- Actions performed: [1]", first[3].content)
+        self.assertEqual(rendered, prompt.render(user_input="thanks", action_results="[1]"))
+
+    def test_chat_history_window_moves_in_blocks(self):
+        self.assertEqual([ChatService._history_window_start(n) for n in (0, 6, 11, 12, 17, 18)], [0, 0, 0, 6, 6, 12])
+
+        service = ChatService()
+        history = [{"type": "user" if i % 2 == 0 else "bot", "content": f"message {i}"} for i in range(14)]
+        with patch('config.prompts.get_coaching_prompt', return_value="Coach"):
+            previous = service._build_prompt("message 14", history[:12])
+            current = service._build_prompt("message 16", history + [{"type": "user", "content": "message 14"}])
+        self.assertTrue(current.startswith(previous.split("\n\nUser: message 14")[0]))
+
+
+class TestPromptCacheMetrics(unittest.TestCase):
+    """Tests for evaluated vs. cached prompt token accounting"""
+
+    def setUp(self):
+        prompt_cache_metrics.reset_metrics()
+
+    def test_usage_from_generate_response(self):
+        self.assertEqual(prompt_token_usage({"context": list(range(120)), "eval_count": 20, "prompt_eval_count": 15}),
+                         {"prompt_tokens": 100, "evaluated_tokens": 15})
+        # prompt_eval_count is omitted when the whole prompt came from the cache
+        self.assertEqual(prompt_token_usage({"context": list(range(50)), "eval_count": 10}),
+                         {"prompt_tokens": 40, "evaluated_tokens": 0})
+        self.assertIsNone(prompt_token_usage({"message": {"content": "hi"}, "prompt_eval_count": 12}))
+
+    def test_generate_records_per_call_site(self):
+        client = OllamaClient("http://ollama.invalid")
+        response = MagicMock()
+        response.json.return_value = {"response": "ok", "context": list(range(110)), "eval_count": 10, "prompt_eval_count": 25}
+        with patch.object(client, 'request', return_value=response):
+            client.generate({"model": "gemma3:4b", "prompt": "x"}, call="chat")
+            client.generate({"model": "gemma3:4b", "prompt": "x"})
+
+        metrics = prompt_cache_metrics.get_metrics()
+        self.assertEqual(metrics['calls']['chat'], {
+            'calls': 1, 'prompt_tokens': 100, 'evaluated_tokens': 25, 'cached_tokens': 75, 'cached_ratio': 0.75
+        })
+        self.assertEqual(metrics['calls']['gemma3:4b']['calls'], 1)
+        self.assertEqual(metrics['recent'][0]['model'], 'gemma3:4b')
+
+    def test_conversation_records_planner_and_synthesizer(self):
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        llm = MagicMock()
+        llm.ainvoke = AsyncMock()
+        llm.ainvoke.return_value = AIMessage(
+            content=json.dumps({"assistant_text": "", "actions": []}),
+            usage_metadata={"input_tokens": 30, "output_tokens": 5, "total_tokens": 35})
+        llm.astream.side_effect = lambda messages, **kwargs: achunks([
+            AIMessageChunk(content="Done."),
+            AIMessageChunk(content="", usage_metadata={"input_tokens": 12, "output_tokens": 2, "total_tokens": 14}),
+        ])
+
+        with patch.object(orchestrator, 'llm', llm), \
+                patch('orchestrator.pipeline.engine.AgentStepDB.create'), \
+                patch('orchestrator.pipeline.engine.AgentStepDB.get_next_step_number', return_value=0), \
+                patch('server.routes.agent.SessionDB.create', return_value=MagicMock(id="session-1")), \
+                patch('server.routes.agent.TraceDB.create', return_value=MagicMock(id=1)), \
+                patch.object(token_counter, 'has_tokenizer', return_value=True), \
+                patch('orchestrator.pipeline.llm.count_message_tokens', return_value=100):
+            client = app.test_client()
+            client.post('/api/agent/conversation', json={"input_text": "add a task", "conversation_context": CONTEXT})
+            calls = client.get('/api/agent/metrics').get_json()['prompt_cache']['calls']
+
+        self.assertEqual((calls['planner']['evaluated_tokens'], calls['synthesizer']['evaluated_tokens']), (30, 12))
+        self.assertEqual((calls['planner']['cached_tokens'], calls['synthesizer']['cached_tokens']), (70, 88))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+"""
+Tests for the response cache of read-only agent turns and the task change feed behind it
+"""
+import asyncio
+import json
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from flask import Flask
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from models.task_db import TaskChangeFeed, TaskDB, task_change_feed
+from orchestrator.pipeline.response_cache import ResponseCache, normalize_input, response_cache, response_cache_key
+from orchestrator.tools.catalog import get_tool_catalog
+from orchestrator.pipeline.engine import TurnContext, new_turn_state
+from orchestrator.runtime.turn_runner import TurnTimeout
+from server.routes.agent import agent, conversation_pipeline, orchestrator
+from testing_utils import achunks, use_temp_database
+from utils.agent_metrics import response_cache_metrics
+
+
+TASKS = [{"id": 1, "title": "a", "status": "done"}, {"id": 2, "title": "b", "status": "open"}]
+
+
+class TestTaskChangeFeed(unittest.TestCase):
+    """TaskDB writes publish to the change feed"""
+
+    def setUp(self):
+        use_temp_database(self)
+
+        self.changes = []
+        feed_patcher = patch('models.task_db.task_change_feed', TaskChangeFeed())
+        self.feed = feed_patcher.start()
+        self.addCleanup(feed_patcher.stop)
+        self.feed.subscribe(self.changes.append)
+
+    def test_writes_publish_changes(self):
+        first = TaskDB.create("first")
+        second = TaskDB.create("second")
+        first.mark_done()
+        TaskDB.reorder_tasks([second.id, first.id])
+        second.delete()
+
+        self.assertEqual([(c["change_type"], c["task_ids"]) for c in self.changes], [
+            ("save", [first.id]), ("save", [second.id]), ("save", [first.id]),
+            ("reorder", [second.id, first.id]), ("delete", [second.id])
+        ])
+        self.assertEqual(self.feed.version, 5)
+
+    def test_reads_and_unchanged_categories_publish_nothing(self):
+        task = TaskDB.create("task", categories=["work"])
+        self.changes.clear()
+        TaskDB.get_all()
+        TaskDB.bulk_update_categories({task.id: ["work"]}, "v1", "model")
+        self.assertEqual(self.changes, [])
+
+    def test_failing_subscriber_does_not_fail_the_write(self):
+        self.feed.subscribe(MagicMock(side_effect=RuntimeError("boom")))
+        self.assertIsNotNone(TaskDB.create("task").id)
+
+
+class TestResponseCache(unittest.TestCase):
+    """Keys, invalidation and bounds of ResponseCache"""
+
+    def setUp(self):
+        self.feed = TaskChangeFeed()
+        self.cache = ResponseCache(enabled=True, max_entries=2, ttl_seconds=600, change_feed=self.feed)
+        catalog = get_tool_catalog()
+        self.prompts = [catalog.prompt("planner"), catalog.prompt("synthesizer")]
+
+    def key(self, text="What did I finish this week?", tasks=TASKS, model="gemma3:4b"):
+        return response_cache_key(text, {"tasks": tasks}, self.prompts, model)
+
+    def test_key_ignores_case_and_punctuation(self):
+        self.assertEqual(normalize_input("  What did I FINISH this week?! "), "what did i finish this week")
+        self.assertEqual(self.key(), self.key("what did i finish this week"))
+
+    def test_key_changes_with_conversation_context(self):
+        context = [{"type": "user", "content": "Show my career tasks"}, {"type": "bot", "content": "You have 2."}]
+        self.assertNotEqual(self.key(), response_cache_key("What did I finish this week?", {"tasks": TASKS},
+                                                           self.prompts, "gemma3:4b", context))
+        self.assertEqual(self.key(), response_cache_key("What did I finish this week?", {"tasks": TASKS},
+                                                        self.prompts, "gemma3:4b", []))
+
+    def test_key_changes_with_data_prompt_and_model(self):
+        self.assertNotEqual(self.key(), self.key(tasks=TASKS[:1]))
+        self.assertNotEqual(self.key(), self.key(model="llama3"))
+        self.assertNotEqual(self.key(), response_cache_key("What did I finish this week?", {"tasks": TASKS}, self.prompts[:1], "gemma3:4b"))
+
+    def test_task_writes_invalidate(self):
+        self.assertTrue(self.cache.put("k", "answer", self.cache.version))
+        self.assertEqual(self.cache.get("k"), "answer")
+        self.feed.publish("save", [1])
+        self.assertIsNone(self.cache.get("k"))
+
+    def test_response_built_across_a_write_is_not_stored(self):
+        version = self.cache.version
+        self.feed.publish("delete", [1])
+        self.assertFalse(self.cache.put("k", "answer", version))
+        self.assertIsNone(self.cache.get("k"))
+
+    def test_lru_eviction_and_ttl(self):
+        for key in ["a", "b"]:
+            self.cache.put(key, key, self.cache.version)
+        self.cache.get("a")
+        self.cache.put("c", "c", self.cache.version)
+        self.assertEqual((self.cache.get("a"), self.cache.get("b"), self.cache.get("c")), ("a", None, "c"))
+
+        self.cache.ttl_seconds = 0
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_kill_switch(self):
+        self.cache.put("k", "answer", self.cache.version)
+        self.cache.set_enabled(False)
+        self.assertEqual(self.cache.get_status()["entries"], 0)
+        self.assertFalse(self.cache.put("k", "answer", self.cache.version))
+
+
+class TestConversationResponseCache(unittest.TestCase):
+    """Repeated read-only questions on /api/agent/conversation skip the LLM"""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        self.client = app.test_client()
+        self.addCleanup(response_cache.set_enabled, response_cache.enabled)
+        response_cache.set_enabled(True)
+        response_cache.clear()
+        response_cache_metrics.reset_metrics()
+
+        self.llm = MagicMock()
+        self.llm.ainvoke = AsyncMock(return_value=AIMessage(content=json.dumps({
+            "assistant_text": "Checking", "actions": [{"name": "fetch_tasks", "args": {"status": "done"}}]
+        })))
+        self.llm.astream.side_effect = lambda messages, **kwargs: achunks([AIMessageChunk(content="You finished "), AIMessageChunk(content="a.")])
+        self.executor = MagicMock()
+        self.executor.fetch_tasks.return_value = (True, {"tasks": TASKS, "count": 2})
+
+        for patcher in [
+            patch.object(orchestrator, 'llm', self.llm),
+            patch.object(orchestrator, 'action_executor', self.executor),
+            patch('server.routes.agent.SessionDB.create', return_value=MagicMock(id="session-1")),
+            patch('server.routes.agent.TraceDB.create', return_value=MagicMock(id=1)),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        steps_patcher = patch('orchestrator.pipeline.engine.AgentStepDB')
+        steps_patcher.start().get_next_step_number.return_value = 1
+        self.addCleanup(steps_patcher.stop)
+
+    def converse(self, text="Which tasks are done this week?"):
+        return self.client.post('/api/agent/conversation', json={"input_text": text}).get_json()
+
+    def test_repeated_read_is_answered_without_llm_calls(self):
+        first = self.converse()
+        second = self.converse("which tasks are DONE this week")
+
+        self.assertEqual(first['turn_metrics']['llm_calls'], 2)
+        self.assertEqual((second['turn_metrics']['path'], second['turn_metrics']['llm_calls']), ('response_cache', 0))
+        self.assertEqual(second['final_message'], "You finished a.")
+        self.assertEqual([s['step_type'] for s in second['steps']], ['synthesizer_llm'])
+        # The second planner call started alongside the lookup and was cancelled by the hit
+        self.assertEqual(self.llm.ainvoke.call_count, 2)
+        self.assertEqual(self.llm.astream.call_count, 1)
+
+        metrics = self.client.get('/api/agent/metrics').get_json()['response_cache']
+        self.assertEqual((metrics['hits'], metrics['misses'], metrics['hit_rate'], metrics['llm_calls_saved']), (1, 1, 0.5, 2))
+
+    def test_planner_overlaps_the_prefetch(self):
+        planned = self.llm.ainvoke.return_value
+
+        async def slow_plan(messages, **kwargs):
+            await asyncio.sleep(0.2)
+            return planned
+
+        def slow_fetch():
+            time.sleep(0.2)
+            return True, {"tasks": TASKS, "count": 2}
+
+        self.llm.ainvoke.side_effect = slow_plan
+        self.executor.fetch_tasks.side_effect = slow_fetch
+        started = time.perf_counter()
+        self.assertEqual(self.converse()['turn_metrics']['llm_calls'], 2)
+        self.assertLess(time.perf_counter() - started, 0.35)  # One wait of 200ms rather than two
+
+    def test_hit_cancels_the_planner_call(self):
+        self.converse()
+        cancelled = []
+
+        async def stuck_plan(messages, **kwargs):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        self.llm.ainvoke.side_effect = stuck_plan
+        started = time.perf_counter()
+        self.assertEqual(self.converse()['turn_metrics']['path'], 'response_cache')
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(cancelled, [True])
+
+    def test_cancelled_lookup_cancels_the_planner_call(self):
+        cancelled = []
+
+        async def stuck_plan(messages, **kwargs):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        def slow_fetch():
+            time.sleep(1)
+            return True, {"tasks": TASKS, "count": 2}
+
+        self.llm.ainvoke.side_effect = stuck_plan
+        self.executor.fetch_tasks.side_effect = slow_fetch
+        state = new_turn_state("Which tasks are done this week?")
+        with self.assertRaises(TurnTimeout):
+            conversation_pipeline.run(state, TurnContext(orchestrator), timeout=0.3)
+
+        deadline = time.monotonic() + 2
+        while not cancelled and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(cancelled, [True])
+
+    def test_task_write_invalidates(self):
+        self.converse()
+        task_change_feed.publish("save", [1])
+        self.assertEqual(self.converse()['turn_metrics']['llm_calls'], 2)
+
+    def test_changed_tasks_miss(self):
+        self.converse()
+        self.executor.fetch_tasks.return_value = (True, {"tasks": TASKS[:1], "count": 1})
+        self.assertEqual(self.converse()['turn_metrics']['llm_calls'], 2)
+
+    def test_turns_with_writes_are_not_stored(self):
+        self.llm.ainvoke.return_value = AIMessage(content=json.dumps({
+            "assistant_text": "Completing", "actions": [{"name": "update_task_status", "args": {"task_id": 2, "status": "done"}}]
+        }))
+        self.executor.execute_action.return_value = (True, {"task_id": 2})
+        self.converse()
+        self.assertEqual(self.converse()['turn_metrics']['llm_calls'], 2)
+        self.assertEqual(response_cache_metrics.get_metrics()['stores'], 0)
+
+    def test_kill_switch_endpoint(self):
+        self.converse()
+        status = self.client.post('/api/agent/response-cache', json={"enabled": False}).get_json()['response_cache']
+        self.assertEqual((status['enabled'], status['entries']), (False, 0))
+        self.assertEqual(self.converse()['turn_metrics']['llm_calls'], 2)
+        self.assertEqual(response_cache_metrics.get_metrics()['lookups'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Tests for compact, token-budgeted action result rendering in synthesizer prompts
+"""
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from flask import Flask
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from orchestrator.pipeline.result_renderer import (DESCRIPTION_MAX_CHARS, SUMMARY_TASK_FIELDS, project_task,
+                                                   render_action_results, render_tasks)
+from orchestrator.pipeline.response_cache import response_cache
+from server.routes.agent import agent, orchestrator
+from testing_utils import achunks
+
+
+def make_task(task_id, status="open", categories=("work",)):
+    return {
+        "id": task_id, "title": f"Task {task_id}", "description": "", "status": status, "sort_key": task_id * 1000,
+        "project": None, "categories": list(categories), "created_at": "2026-01-01T09:00:00", "updated_at": "2026-01-02T09:00:00",
+        "started_at": None, "completed_at": "2026-01-03T09:00:00" if status == "done" else None
+    }
+
+
+TASKS = [make_task(i, status="done" if i % 3 == 0 else "open", categories=("work",) if i % 2 else ("home", "errands"))
+         for i in range(1, 301)]
+
+
+class TestRenderTasks(unittest.TestCase):
+    """Tests for task projection and summaries"""
+
+    def test_projection_keeps_answer_fields_only(self):
+        self.assertEqual(project_task(make_task(3, status="done")), {
+            "id": 3, "title": "Task 3", "status": "done", "categories": ["work"], "completed_at": "2026-01-03T09:00:00"
+        })
+
+    def test_descriptions_are_kept_and_truncated(self):
+        task = dict(make_task(1), description="Bring the signed lease")
+        self.assertEqual(project_task(task)["description"], "Bring the signed lease")
+        long_description = project_task(dict(task, description="x" * (DESCRIPTION_MAX_CHARS + 50)))["description"]
+        self.assertEqual(long_description, "x" * DESCRIPTION_MAX_CHARS + "…")
+
+    def test_short_lists_are_kept_whole(self):
+        tasks = [dict(t, description=f"Notes for {t['id']}") for t in TASKS[:3]]
+        self.assertEqual(render_tasks(tasks, 1000), [project_task(t) for t in tasks])
+        self.assertEqual(render_tasks(tasks, 1000)[0]["description"], "Notes for 1")
+
+    def test_long_lists_are_summarized_within_budget(self):
+        summary = render_tasks(TASKS, 500)
+        self.assertEqual(summary["count"], 300)
+        self.assertEqual(summary["by_status"], {"open": 200, "done": 100})
+        self.assertEqual(summary["by_category"], {"work": 150, "home": 150, "errands": 150})
+        self.assertEqual(summary["tasks"], [project_task(t, SUMMARY_TASK_FIELDS) for t in TASKS[:len(summary["tasks"])]])
+        self.assertGreater(len(summary["tasks"]), 0)
+        self.assertEqual(summary["omitted"], 300 - len(summary["tasks"]))
+        self.assertLessEqual(len(json.dumps(summary)) // 4, 500)
+
+    def test_summaries_drop_descriptions(self):
+        summary = render_tasks([dict(t, description="Long notes " * 20) for t in TASKS], 500)
+        self.assertTrue(all("description" not in task for task in summary["tasks"]))
+
+
+class TestRenderActionResults(unittest.TestCase):
+    """Tests for render_action_results"""
+
+    def test_renders_compactly_and_reports_tokens_saved(self):
+        results = [
+            {"name": "fetch_tasks", "ok": True, "result": {"tasks": TASKS, "count": 300, "message": "Fetched 300 tasks"}, "error": None},
+            {"name": "update_task", "ok": False, "result": None, "error": "not found"}
+        ]
+        text, saved = render_action_results(results, token_budget=800)
+        rendered = json.loads(text)
+
+        self.assertEqual(rendered[0]["result"]["message"], "Fetched 300 tasks")
+        self.assertEqual(rendered[0]["result"]["tasks"]["count"], 300)
+        self.assertEqual(rendered[1], {"name": "update_task", "ok": False, "error": "not found"})
+        self.assertLess(len(text) // 4, 900)
+        self.assertGreater(saved, 10000)
+
+    def test_single_task_results_are_projected(self):
+        task = dict(make_task(12), description="Call the landlord about the heating")
+        results = [{"name": "update_task", "ok": True, "result": {"task_id": 12, "task": task, "message": "Updated task 12"}, "error": None}]
+        rendered = json.loads(render_action_results(results)[0])
+        self.assertEqual(rendered[0]["result"]["task"], project_task(task))
+        self.assertEqual(rendered[0]["result"]["task"]["description"], "Call the landlord about the heating")
+
+
+class TestSynthesizerPrompt(unittest.TestCase):
+    """The conversation synthesizer gets compact results and reports the tokens saved"""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        self.client = app.test_client()
+        response_cache.clear()
+
+        self.llm = MagicMock()
+        self.llm.ainvoke = AsyncMock(return_value=AIMessage(content=json.dumps({
+            "assistant_text": "Checking", "actions": [{"name": "fetch_tasks", "args": {}}]
+        })))
+        self.llm.astream.side_effect = lambda messages, **kwargs: achunks([AIMessageChunk(content="300 tasks.")])
+        self.executor = MagicMock()
+        self.executor.fetch_tasks.return_value = (True, {"tasks": TASKS, "count": 300})
+
+        for patcher in [
+            patch.object(orchestrator, 'llm', self.llm),
+            patch.object(orchestrator, 'action_executor', self.executor),
+            patch('server.routes.agent.SessionDB.create', return_value=MagicMock(id="session-1")),
+            patch('server.routes.agent.TraceDB.create', return_value=MagicMock(id=1)),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        steps_patcher = patch('orchestrator.pipeline.engine.AgentStepDB')
+        steps_patcher.start().get_next_step_number.return_value = 1
+        self.addCleanup(steps_patcher.stop)
+
+    def test_prompt_holds_summary_not_raw_tasks(self):
+        data = self.client.post('/api/agent/conversation', json={"input_text": "show all my tasks"}).get_json()
+
+        prompt = "\n".join(m.content for m in self.llm.astream.call_args.args[0])
+        self.assertIn('"by_status"', prompt)
+        self.assertNotIn("sort_key", prompt)
+        self.assertGreater(data['turn_metrics']['result_tokens_saved'], 10000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Tests for the shared task service and in-process action execution
+"""
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from api.routes import api
+from models.task_db import TaskDB
+from orchestrator.actions.actions import ActionExecutor, make_action_transport
+from testing_utils import use_temp_database
+from utils.http_client import APIClient
+from utils.task_service import TaskService, TaskServiceError, task_service
+
+
+class TaskServiceTestCase(unittest.TestCase):
+    """Runs against a temporary SQLite database with classification disabled"""
+
+    def setUp(self):
+        use_temp_database(self)
+        patcher = patch.object(task_service, 'enqueue_classification', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestTaskService(TaskServiceTestCase):
+    """Tests for TaskService validation"""
+
+    def test_validation_errors_carry_status_codes(self):
+        cases = [
+            (lambda: task_service.create_task("   "), 'Title cannot be empty', 400),
+            (lambda: task_service.create_task("x" * 201), 'Title too long (max 200 characters)', 400),
+            (lambda: task_service.get_task(999), 'Task not found', 404),
+            (lambda: task_service.get_tasks(status="open,later"), "Invalid status filter: later. Valid options: open, in_progress, done", 400),
+        ]
+        for call, message, status_code in cases:
+            with self.assertRaises(TaskServiceError) as ctx:
+                call()
+            self.assertEqual((ctx.exception.message, ctx.exception.status_code), (message, status_code))
+
+    def test_update_only_changes_given_fields(self):
+        task = TaskDB.create("Call mom", "Sunday", project="family")
+        task_service.update_task(task.id, title="Call mom and dad", completed_at="2025-01-15T14:30:00")
+
+        updated = TaskDB.get_by_id(task.id)
+        self.assertEqual((updated.title, updated.description, updated.project), ("Call mom and dad", "Sunday", "family"))
+        self.assertEqual(updated.status, 'done')
+
+    @patch('utils.task_service._enqueue_classification')
+    def test_classification_enqueued_once_per_create(self, enqueue):
+        TaskService().create_task("Go to the gym")
+        enqueue.assert_called_once()
+
+
+class TestInProcessActions(TaskServiceTestCase):
+    """Tests for ActionExecutor over the in-process transport"""
+
+    def setUp(self):
+        super().setUp()
+        self.executor = ActionExecutor(transport="inprocess")
+
+    def test_transport_selection(self):
+        self.assertIs(make_action_transport("inprocess"), task_service)
+        self.assertIsInstance(make_action_transport("http", "http://example:5001"), APIClient)
+        with self.assertRaises(ValueError):
+            make_action_transport("carrier-pigeon")
+
+    def test_actions_round_trip(self):
+        success, created = self.executor.execute_action("create_task", {"title": "Buy groceries"})
+        self.assertTrue(success)
+
+        success, _ = self.executor.execute_action("update_task_status", {"task_id": created["task_id"], "status": "in_progress"})
+        self.assertTrue(success)
+
+        success, fetched = self.executor.execute_action("fetch_tasks", {"status": "in_progress"})
+        self.assertEqual(fetched["count"], 1)
+        self.assertEqual(fetched["tasks"][0]["title"], "Buy groceries")
+
+    def test_validation_failures_become_action_errors(self):
+        self.assertEqual(self.executor.execute_action("update_task_status", {"task_id": 1, "status": "done"}),
+                         (False, {"error": "Task not found"}))
+        task = TaskDB.create("Read a book")
+        self.assertEqual(self.executor.execute_action("update_task_status", {"task_id": task.id, "status": "later"}),
+                         (False, {"error": "Invalid status. Must be: open, in_progress, or done"}))
+
+
+class TestRouteParity(TaskServiceTestCase):
+    """The REST API and the service return the same payloads and errors"""
+
+    def setUp(self):
+        super().setUp()
+        app = Flask(__name__)
+        app.register_blueprint(api)
+        self.client = app.test_client()
+
+    def test_payloads_match(self):
+        task = TaskDB.create("Write blog post", "LangGraph")
+        self.assertEqual(self.client.get(f'/api/tasks/{task.id}').get_json(), task_service.get_task(task.id))
+        self.assertEqual(self.client.get('/api/tasks?status=open').get_json(), task_service.get_tasks(status="open"))
+
+        response = self.client.post('/api/tasks', json={"title": "  Pay bills  ", "categories": ["finance"]})
+        self.assertEqual(response.get_json()['message'], 'Created: Pay bills')
+        self.assertEqual(response.get_json()['task'], task_service.get_task(response.get_json()['task']['id'])['task'])
+
+    def test_errors_match(self):
+        cases = [
+            ('get', '/api/tasks/999', None, 404, 'Task not found'),
+            ('post', '/api/tasks', {"title": ""}, 400, 'Title cannot be empty'),
+            ('post', '/api/tasks', {}, 400, 'Title is required'),
+            ('put', '/api/tasks/999/status', {"status": "done"}, 404, 'Task not found'),
+            ('get', '/api/tasks?completed_at_period=someday', None, 400,
+             'Invalid period: someday. Valid options: this_week, this_month, last_week, last_month, last_7_days, last_30_days, today, yesterday'),
+        ]
+        for method, url, body, status_code, message in cases:
+            response = getattr(self.client, method)(url, json=body)
+            self.assertEqual((response.status_code, response.get_json()), (status_code, {"error": message}), url)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Tests for token accounting: Ollama's reported counts and timings, and the memoized tokenizer fallback
+"""
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from utils.classification_service import TaskClassificationService
+from utils.ollama_client import OllamaClient
+from utils.token_accounting import TokenCounter, token_accounting, usage_from_metadata, usage_from_ollama
+
+# A final /api/generate response: durations are in nanoseconds
+GENERATE_RESPONSE = {
+    "response": '["health"]', "context": list(range(130)), "prompt_eval_count": 40, "eval_count": 30,
+    "load_duration": 5_000_000, "prompt_eval_duration": 200_000_000, "eval_duration": 1_500_000_000,
+    "total_duration": 1_800_000_000
+}
+
+
+class TestReportedUsage(unittest.TestCase):
+    """Tests for usage parsed from Ollama responses"""
+
+    def test_generate_response_counts_and_timings(self):
+        usage = usage_from_ollama(GENERATE_RESPONSE)
+        self.assertEqual((usage.prompt_tokens, usage.completion_tokens, usage.source), (100, 30, "reported"))
+        self.assertEqual((usage.load_ms, usage.prompt_eval_ms, usage.eval_ms), (5.0, 200.0, 1500.0))
+        self.assertEqual(usage.tokens_per_second, 20.0)
+
+    def test_openai_compatible_usage_has_counts_only(self):
+        usage = usage_from_metadata({"input_tokens": 12, "output_tokens": 3, "total_tokens": 15})
+        self.assertEqual((usage.prompt_tokens, usage.completion_tokens), (12, 3))
+        self.assertIsNone(usage.tokens_per_second)
+        self.assertIsNone(usage_from_metadata(None))
+        self.assertIsNone(usage_from_ollama({"response": "partial"}))
+
+    def test_client_calls_are_recorded_per_call_site(self):
+        token_accounting.reset_metrics()
+        client = OllamaClient("http://ollama.invalid")
+        response = MagicMock()
+        response.json.return_value = GENERATE_RESPONSE
+        with patch.object(client, 'request', return_value=response):
+            client.generate({"model": "gemma3:4b", "prompt": "x"}, call="classification")
+            client.generate({"model": "gemma3:4b", "prompt": "x"}, call="classification")
+
+        stats = token_accounting.get_metrics()['calls']['classification']
+        self.assertEqual((stats['calls'], stats['reported'], stats['prompt_tokens'], stats['completion_tokens']), (2, 2, 200, 60))
+        self.assertEqual((stats['tokens_per_second'], stats['average_prompt_eval_ms'], stats['average_load_ms']),
+                         (20.0, 200.0, 5.0))
+
+
+class TestTokenCounter(unittest.TestCase):
+    """Tests for the local tokenizer fallback"""
+
+    def counter(self, encode, cache_size=4):
+        counter = TokenCounter(cache_size=cache_size)
+        for patcher in [patch.object(counter, '_load_hf', return_value=None),
+                        patch.object(counter, '_load_tiktoken', return_value=("fake", encode))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return counter
+
+    def test_counts_are_memoized(self):
+        encode = MagicMock(side_effect=lambda text: len(text.split()))
+        counter = self.counter(encode, cache_size=2)
+        for text in ["one two", "one two", "three", "four five six", "one two"]:
+            counter.count(text, "gemma3:4b")
+
+        self.assertEqual(counter.count("one two", "gemma3:4b"), 2)
+        # "one two" was evicted by the two newer texts and encoded again
+        self.assertEqual(encode.call_count, 4)
+        self.assertEqual(counter.tokenizer_name("gemma3:4b"), "fake")
+
+    def test_heuristic_without_a_tokenizer(self):
+        counter = self.counter(None)
+        self.assertEqual(counter.count("abcdefgh", "gemma3:4b"), 2)
+        self.assertFalse(counter.has_tokenizer("gemma3:4b"))
+
+    def test_tokenizer_load_does_not_block_memoized_counts(self):
+        counter = TokenCounter()
+        counter._counts[("fake", "cached")] = 1
+        counts_while_loading = []
+
+        def load(family):
+            # Another thread reading the memoized counts must not wait for the load
+            worker = threading.Thread(target=lambda: counts_while_loading.append(counter.get_status()["cached_counts"]))
+            worker.start()
+            worker.join(2)
+            return None
+
+        with patch.object(counter, '_load_hf', side_effect=load), \
+             patch.object(counter, '_load_tiktoken', return_value=("fake", len)):
+            self.assertEqual(counter.count("cached", "gemma3:4b"), 1)
+        self.assertEqual(counts_while_loading, [1])
+
+    def test_messages_include_template_overhead(self):
+        counter = self.counter(lambda text: len(text.split()))
+        messages = [MagicMock(content="add a task"), MagicMock(content="done")]
+        self.assertEqual(counter.count_messages(messages, "gemma3:4b"), 3 + 1 + 2 * 4)
+
+
+class TestClassificationTokens(unittest.TestCase):
+    """Classification metrics use Ollama's counts instead of word counts"""
+
+    def test_send_uses_reported_counts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            service = TaskClassificationService(log_file=os.path.join(tmp, "log.txt"),
+                                                fast_model_file=os.path.join(tmp, "missing.json"))
+            self.addCleanup(service.prediction_log.close)
+            with patch('utils.classification_service.ollama_client.generate', return_value=GENERATE_RESPONSE):
+                response, metrics = service._send_to_ollama("Classify: run a marathon")
+
+        self.assertEqual(response, '["health"]')
+        self.assertEqual((metrics['prompt_tokens'], metrics['response_tokens'], metrics['token_source']), (100, 30, "reported"))
+        self.assertEqual((metrics['tokens_per_second'], metrics['prompt_eval_ms'], metrics['load_ms']), (20.0, 200.0, 5.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
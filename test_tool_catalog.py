@@ -0,0 +1,127 @@
+"""
+Tests for the process-wide tool catalog and precompiled prompts
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from flask import Flask
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from config.prompt_manager import CompiledPrompt, prompt_manager
+from orchestrator.tools import catalog as catalog_module
+from orchestrator.tools.catalog import build_tool_catalog, get_tool_catalog, reload_tool_catalog
+from server.routes.agent import agent, orchestrator
+from testing_utils import achunks
+
+
+TEMPLATE = "Now: {{current_datetime}}\nTools:\n{{tool_descriptions}}\nUser: {{ user_input }} {{unknown}}"
+
+
+class TestCompiledPrompt(unittest.TestCase):
+    """Tests for CompiledPrompt"""
+
+    def setUp(self):
+        self.prompt_data = {"name": "planner", "text": TEMPLATE, "source": "local"}
+
+    def test_baked_variables_leave_only_per_request_slots(self):
+        prompt = CompiledPrompt(self.prompt_data, tool_descriptions="- no_op: nothing")
+        self.assertEqual(prompt.variables, ["current_datetime", "user_input", "unknown"])
+
+    def test_render_matches_compile_prompt(self):
+        prompt = CompiledPrompt(self.prompt_data, tool_descriptions="- no_op: nothing")
+        variables = {"current_datetime": "2025-01-15T09:00:00", "user_input": "hi"}
+        self.assertEqual(prompt.render(**variables),
+                         prompt_manager.compile_prompt(self.prompt_data, tool_descriptions="- no_op: nothing", **variables))
+        self.assertTrue(prompt.render(**variables).endswith("User: hi {{unknown}}"))
+
+
+class TestToolCatalog(unittest.TestCase):
+    """Tests for building, sharing and reloading the catalog"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name in ["planner", "synthesizer", "router", "conversation_summary"]:
+            self._write_prompt(name, f"{name} v1\n{{{{tool_descriptions}}}}")
+        patcher = patch.object(prompt_manager, 'local_prompts_dir', self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Restore the shared catalog after each test
+        previous = catalog_module._catalog
+        self.addCleanup(setattr, catalog_module, '_catalog', previous)
+        catalog_module._catalog = build_tool_catalog(previous.tool_registry if previous else None)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write_prompt(self, name, text):
+        with open(os.path.join(self.tmp.name, f"{name}.txt"), "w") as f:
+            f.write(text)
+
+    def test_catalog_is_shared_and_immutable(self):
+        catalog = get_tool_catalog()
+        self.assertIs(get_tool_catalog(), catalog)
+        self.assertIn("fetch_tasks", catalog.tool_names)
+        self.assertIn("- fetch_tasks:", catalog.prompt("planner").render())
+        with self.assertRaises(TypeError):
+            catalog.prompts["planner"] = None
+
+    def test_reload_picks_up_changed_prompts(self):
+        old = get_tool_catalog()
+        self._write_prompt("planner", "planner v2")
+        new = reload_tool_catalog()
+
+        self.assertIsNot(new, old)
+        self.assertIs(new.tool_registry, old.tool_registry)
+        self.assertEqual(new.prompt("planner").render(), "planner v2")
+        self.assertTrue(old.prompt("planner").render().startswith("planner v1"))
+
+    def test_failed_reload_keeps_current_catalog(self):
+        old = get_tool_catalog()
+        os.remove(os.path.join(self.tmp.name, "synthesizer.txt"))
+        with self.assertRaises(FileNotFoundError):
+            reload_tool_catalog()
+        self.assertIs(get_tool_catalog(), old)
+
+    def test_reload_endpoint(self):
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        self._write_prompt("synthesizer", "synthesizer v2 {{user_input}}")
+
+        data = app.test_client().post('/api/agent/prompts/reload').get_json()
+        self.assertEqual(data['catalog']['prompts']['synthesizer']['variables'], ['user_input'])
+        self.assertEqual(get_tool_catalog().prompt("synthesizer").render(user_input="x"), "synthesizer v2 x")
+
+
+class TestConversationUsesCatalog(unittest.TestCase):
+    """A conversation turn neither rebuilds tools nor reloads prompts"""
+
+    def test_no_registry_or_prompt_loading_per_request(self):
+        app = Flask(__name__)
+        app.register_blueprint(agent, url_prefix='/api/agent')
+        llm = MagicMock()
+        llm.ainvoke = AsyncMock()
+        llm.ainvoke.return_value = AIMessage(content=json.dumps({"assistant_text": "", "actions": []}))
+        llm.astream.side_effect = lambda messages, **kwargs: achunks([AIMessageChunk(content="Done.")])
+
+        with patch.object(orchestrator, 'llm', llm), \
+                patch('orchestrator.pipeline.engine.AgentStepDB.create'), \
+                patch('orchestrator.pipeline.engine.AgentStepDB.get_next_step_number', return_value=0), \
+                patch('server.routes.agent.SessionDB.create', return_value=MagicMock(id="session-1")), \
+                patch('server.routes.agent.TraceDB.create', return_value=MagicMock(id=1)), \
+                patch('orchestrator.tools.catalog.ToolRegistry') as registry, \
+                patch.object(prompt_manager, 'get_prompt') as get_prompt:
+            response = app.test_client().post('/api/agent/conversation', json={"input_text": "add a task"})
+
+        self.assertTrue(response.get_json()['success'])
+        registry.assert_not_called()
+        get_prompt.assert_not_called()
+        planner_messages = llm.ainvoke.call_args[0][0]
+        self.assertIn("- create_task:", planner_messages[0].content)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+Tests for the background Langfuse span exporter, against a local stub OTLP collector
+"""
+import threading
+import time
+import unittest
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+from langfuse import Langfuse
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExportResult
+
+from config.trace_exporter import BackgroundSpanExporter, create_langfuse_otlp_exporter
+
+
+class StubCollector:
+    """Local HTTP server recording OTLP export requests, optionally slow to answer"""
+
+    def __init__(self, delay: float = 0.0):
+        self.requests = []
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                time.sleep(collector.delay)
+                collector.requests.append((self.path, self.headers, body))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-protobuf')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.delay = delay
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_spans(exporter, count):
+    """End `count` spans on a tracer that exports synchronously to the exporter"""
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = provider.get_tracer("test")
+    for i in range(count):
+        with tracer.start_as_current_span(f"span-{i}"):
+            pass
+
+
+class TestBackgroundSpanExporter(unittest.TestCase):
+    """Tests for BackgroundSpanExporter"""
+
+    def setUp(self):
+        self.collector = StubCollector(delay=0.5)
+        self.addCleanup(self.collector.stop)
+
+    def test_spans_are_exported_without_waiting_for_the_collector(self):
+        exporter = BackgroundSpanExporter(create_langfuse_otlp_exporter("pk-test", "sk-test", self.collector.url), export_interval=0.05)
+        self.addCleanup(exporter.shutdown)
+
+        started = time.perf_counter()
+        make_spans(exporter, 3)
+        self.assertLess(time.perf_counter() - started, 0.25)
+
+        self.assertTrue(exporter.force_flush(5000))
+        path, headers, _ = self.collector.requests[0]
+        self.assertEqual(path, "/api/public/otel/v1/traces")
+        self.assertTrue(headers["Authorization"].startswith("Basic "))
+        self.assertEqual(exporter.get_metrics()["exported"], 3)
+
+    def test_overflow_drops_and_counts_spans(self):
+        release = threading.Event()
+        delegate = MagicMock()
+        delegate.export.side_effect = lambda batch: release.wait(5) and SpanExportResult.SUCCESS
+        exporter = BackgroundSpanExporter(delegate, max_queue_size=2, max_batch_size=1, export_interval=0.05)
+
+        make_spans(exporter, 1)
+        for _ in range(100):
+            if delegate.export.called:
+                break
+            time.sleep(0.01)
+        make_spans(exporter, 5)
+        self.assertEqual(exporter.get_metrics()["dropped"], 3)
+
+        release.set()
+        exporter.shutdown()
+        metrics = exporter.get_metrics()
+        self.assertEqual((metrics["exported"], metrics["queue_size"]), (3, 0))
+
+    def test_shutdown_drains_the_queue(self):
+        delegate = MagicMock()
+        delegate.export.side_effect = lambda batch: time.sleep(0.05) or SpanExportResult.SUCCESS
+        exporter = BackgroundSpanExporter(delegate, max_batch_size=4, export_interval=0.05)
+        make_spans(exporter, 10)
+
+        exporter.shutdown()
+        self.assertEqual(sum(len(c.args[0]) for c in delegate.export.call_args_list), 10)
+        delegate.shutdown.assert_called_once()
+        self.assertEqual(exporter.export([MagicMock()]), SpanExportResult.FAILURE)
+
+    def test_failed_exports_are_counted(self):
+        delegate = MagicMock()
+        delegate.export.side_effect = ConnectionError("collector down")
+        exporter = BackgroundSpanExporter(delegate, export_interval=0.05)
+        make_spans(exporter, 2)
+
+        self.assertTrue(exporter.force_flush(2000))
+        self.assertEqual(exporter.get_metrics()["failed"], 2)
+        exporter.shutdown()
+
+
+class TestLangfuseClientExport(unittest.TestCase):
+    """The Langfuse client exports through the background exporter"""
+
+    def test_flush_does_not_wait_for_the_collector(self):
+        collector = StubCollector(delay=1.0)
+        self.addCleanup(collector.stop)
+        public_key = f"pk-lf-{uuid.uuid4()}"
+        exporter = BackgroundSpanExporter(create_langfuse_otlp_exporter(public_key, "sk-lf-test", collector.url), export_interval=0.05)
+        client = Langfuse(public_key=public_key, secret_key="sk-lf-test", host=collector.url, span_exporter=exporter)
+        self.addCleanup(client.shutdown)
+
+        client.start_observation(name="chat.turn", input={"input_text": "hi"}).end()
+        started = time.perf_counter()
+        client.flush()
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+        self.assertTrue(exporter.force_flush(5000))
+        self.assertEqual([path for path, _, _ in collector.requests], ["/api/public/otel/v1/traces"])
+        self.assertIn(b"chat.turn", collector.requests[0][2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+Tests for trace sampling, rate limits and payload truncation
+"""
+import json
+import unittest
+import uuid
+from unittest.mock import MagicMock, patch
+
+from langfuse import Langfuse
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.trace import format_trace_id
+
+from config.langfuse_config import langfuse_config
+from config.trace_exporter import BackgroundSpanExporter, ExportByteCounter, create_langfuse_otlp_exporter
+from config.trace_sampling import DROP, EXPORT, HOLD, TracePolicy, TraceSampler, truncate_payload
+from test_trace_exporter import StubCollector
+
+
+def end_span(exporter) -> str:
+    """End one span on a tracer exporting to the exporter and return its trace id"""
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    with provider.get_tracer("test").start_as_current_span("span") as span:
+        trace_id = format_trace_id(span.get_span_context().trace_id)
+    return trace_id
+
+
+def start_traced(sampler, exporter, trace_type) -> str:
+    """End a span whose trace was started on the sampler first"""
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    with provider.get_tracer("test").start_as_current_span("span") as span:
+        trace_id = format_trace_id(span.get_span_context().trace_id)
+        sampler.start(trace_type, trace_id)
+    return trace_id
+
+
+class TestTruncatePayload(unittest.TestCase):
+    """Tests for truncate_payload"""
+
+    def test_small_payloads_are_unchanged(self):
+        data = {"input_text": "hi", "task_ids": [1, 2]}
+        self.assertIs(truncate_payload(data, 1024), data)
+
+    def test_long_strings_and_lists_are_marked(self):
+        data = {"task_descriptions": ["x" * 5000] * 3, "task_ids": list(range(2000))}
+        truncated = truncate_payload(data, 8192)
+
+        self.assertEqual(truncated["task_ids"][-1], "… [truncated 1980 items]")
+        self.assertEqual(truncated["task_descriptions"][0], "x" * 1024 + "… [truncated 3976 chars]")
+        self.assertLessEqual(len(json.dumps(truncated, ensure_ascii=False).encode()), 8192)
+
+    def test_still_too_large_payloads_become_a_marked_string(self):
+        truncated = truncate_payload({f"key{i}": "y" * 100 for i in range(500)}, 1024)
+        self.assertIsInstance(truncated, str)
+        self.assertIn("[truncated", truncated)
+        self.assertLessEqual(len(truncated.encode()), 1024)
+
+
+class TestTraceSampler(unittest.TestCase):
+    """Tests for head/tail sampling and rate limits"""
+
+    def setUp(self):
+        self.sampler = TraceSampler({
+            "chat": TracePolicy(sample_rate=1.0, max_per_minute=2),
+            "classification": TracePolicy(sample_rate=0.0, tail_slow_ms=60000),
+            "warmup": TracePolicy(sample_rate=0.0, tail_errors=False)
+        })
+
+    def test_head_sampled_traces_are_exported(self):
+        self.assertTrue(self.sampler.start("chat", "a" * 32))
+        self.assertEqual(self.sampler.decision("a" * 32), EXPORT)
+
+    def test_rate_limited_traces_are_not_recorded(self):
+        results = [self.sampler.start("chat", f"{i:032x}") for i in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(self.sampler.get_metrics()["trace_types"]["chat"]["rate_limited"], 1)
+
+    def test_tail_sampling_keeps_failed_traces_only(self):
+        self.assertTrue(self.sampler.start("classification", "b" * 32))
+        self.assertTrue(self.sampler.start("classification", "c" * 32))
+        self.assertEqual(self.sampler.decision("b" * 32), HOLD)
+
+        self.sampler.finish("b" * 32, error="timeout")
+        self.sampler.finish("c" * 32)
+        self.assertEqual((self.sampler.decision("b" * 32), self.sampler.decision("c" * 32)), (EXPORT, DROP))
+        stats = self.sampler.get_metrics()["trace_types"]["classification"]
+        self.assertEqual((stats["tail_kept"], stats["tail_dropped"]), (1, 1))
+
+    def test_unsampled_traces_without_tail_rules_are_not_recorded(self):
+        self.assertFalse(self.sampler.start("warmup", "d" * 32))
+
+    def test_head_sampling_is_stable_per_trace_id(self):
+        sampler = TraceSampler({"chat": TracePolicy(sample_rate=0.5, tail_errors=False)})
+        trace_ids = [uuid.uuid4().hex for _ in range(200)]
+        first = [sampler.start("chat", trace_id) for trace_id in trace_ids]
+        self.assertEqual(first, [sampler.start("chat", trace_id) for trace_id in trace_ids])
+        self.assertTrue(60 < sum(first) < 140)
+
+
+class TestSampledExport(unittest.TestCase):
+    """The background exporter holds spans of tail-sampled traces until they are decided"""
+
+    def setUp(self):
+        self.sampler = TraceSampler({"classification": TracePolicy(sample_rate=0.0)})
+        self.delegate = MagicMock()
+        self.exporter = BackgroundSpanExporter(self.delegate, export_interval=0.05, sampler=self.sampler)
+        self.addCleanup(self.exporter.shutdown)
+
+    def exported(self):
+        self.assertTrue(self.exporter.force_flush(2000))
+        return sum(len(c.args[0]) for c in self.delegate.export.call_args_list)
+
+    def test_failed_trace_spans_are_released(self):
+        trace_id = start_traced(self.sampler, self.exporter, "classification")
+        self.assertEqual((self.exported(), self.exporter.get_metrics()["held"]), (0, 1))
+
+        self.sampler.finish(trace_id, error="boom")
+        self.assertEqual(self.exported(), 1)
+
+    def test_successful_trace_spans_are_discarded(self):
+        trace_id = start_traced(self.sampler, self.exporter, "classification")
+        self.sampler.finish(trace_id)
+        end_span(self.exporter)  # not sampled here: exported as-is
+
+        self.assertEqual(self.exported(), 1)
+        metrics = self.exporter.get_metrics()
+        self.assertEqual((metrics["held"], metrics["sampled_out"]), (0, 1))
+
+
+class TestLangfuseTracing(unittest.TestCase):
+    """Payload caps and bytes per minute through the Langfuse client"""
+
+    def test_payloads_are_capped_and_bytes_counted(self):
+        collector = StubCollector()
+        self.addCleanup(collector.stop)
+        sampler = TraceSampler(max_payload_bytes=2048)
+        byte_counter = ExportByteCounter()
+        public_key = f"pk-lf-{uuid.uuid4()}"
+        exporter = BackgroundSpanExporter(
+            create_langfuse_otlp_exporter(public_key, "sk-lf-test", collector.url, byte_counter=byte_counter),
+            export_interval=0.05, sampler=sampler, byte_counter=byte_counter
+        )
+        client = Langfuse(public_key=public_key, secret_key="sk-lf-test", host=collector.url,
+                          span_exporter=exporter, mask=sampler.mask)
+        self.addCleanup(client.shutdown)
+
+        client.start_observation(name="classification.batch", input={"task_descriptions": ["z" * 20000]}).end()
+        client.flush()
+        self.assertTrue(exporter.force_flush(5000))
+
+        body = collector.requests[0][2]
+        self.assertIn("[truncated".encode(), body)
+        self.assertNotIn(b"z" * 2048, body)
+        self.assertEqual(sampler.get_metrics()["payloads_truncated"], 1)
+        metrics = exporter.get_metrics()
+        self.assertEqual(metrics["bytes_per_minute"], len(body))
+        self.assertEqual(metrics["bytes_total"], len(body))
+
+    def test_rate_limited_traces_get_no_trace_context(self):
+        sampler = TraceSampler({"chat": TracePolicy(sample_rate=1.0, max_per_minute=1)})
+        with patch.object(langfuse_config, 'enabled', True), patch.object(langfuse_config, 'sampler', sampler):
+            self.assertIsNotNone(langfuse_config.create_trace_context("chat.turn", trace_id="e" * 32))
+            self.assertIsNone(langfuse_config.create_trace_context("chat.turn", trace_id="f" * 32))
+
+
+if __name__ == '__main__':
+    unittest.main()
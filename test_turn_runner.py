@@ -0,0 +1,147 @@
+"""
+Tests for cancellable async turn execution
+"""
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from langchain_core.messages import AIMessageChunk
+
+from orchestrator.runtime import turn_runner as turn_runner_module
+from orchestrator.runtime.turn_runner import TurnRejected, TurnRunner, TurnTimeout, with_node_deadline
+from server.routes.agent import orchestrator
+
+
+class TestTurnRunner(unittest.TestCase):
+    """Tests for TurnRunner"""
+
+    def setUp(self):
+        self.runner = TurnRunner(max_concurrent=1, queue_timeout=0.2)
+
+    def wait_until(self, condition, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_timeout_cancels_the_turn(self):
+        cancelled = threading.Event()
+
+        async def stuck_turn():
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with self.assertRaises(TurnTimeout):
+            self.runner.run(stuck_turn, timeout=0.1)
+        self.assertTrue(cancelled.wait(1))
+        self.wait_until(lambda: self.runner.get_metrics()["running"] == 0)
+        self.assertEqual(self.runner.get_metrics()["timed_out"], 1)
+
+    def test_limiter_rejects_when_slots_are_busy(self):
+        release = threading.Event()
+
+        async def slow_turn():
+            await asyncio.get_running_loop().run_in_executor(None, release.wait)
+            return "first"
+
+        future = self.runner.submit(slow_turn, timeout=5)
+        with self.assertRaises(TurnRejected):
+            self.runner.run(AsyncMock(return_value="second"), timeout=5)
+        release.set()
+
+        self.assertEqual(future.result(timeout=2), "first")
+        self.wait_until(lambda: self.runner.get_metrics()["completed"] == 1)
+        self.assertEqual(self.runner.get_metrics()["rejected"], 1)
+        self.assertEqual(self.runner.run(AsyncMock(return_value="third")), "third")
+
+    def test_closing_a_stream_cancels_the_turn(self):
+        cancelled = threading.Event()
+
+        async def events():
+            try:
+                for i in range(100):
+                    yield i
+                    await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        stream = self.runner.stream(events, timeout=10)
+        self.assertEqual(next(stream), 0)
+        stream.close()
+
+        self.assertTrue(cancelled.wait(1))
+        self.wait_until(lambda: self.runner.get_metrics()["cancelled"] == 1)
+        self.assertEqual(self.runner.get_metrics()["running"], 0)
+
+    def test_node_deadline_is_a_share_of_the_turn_budget(self):
+        async def turn():
+            with self.assertRaises(asyncio.TimeoutError):
+                await with_node_deadline("tool_exec", asyncio.sleep(5))
+            return "fell back"
+
+        with patch.dict(turn_runner_module.NODE_BUDGET_SHARES, {"tool_exec": 0.1}):
+            started = time.monotonic()
+            self.assertEqual(self.runner.run(turn, timeout=1), "fell back")
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertGreaterEqual(turn_runner_module.turn_runner.get_metrics()["node_timeouts"].get("tool_exec", 0), 1)
+
+
+class TestOrchestratorCancellation(unittest.TestCase):
+    """LangGraphOrchestrator.run stops the graph at the deadline"""
+
+    @patch('orchestrator.pipeline.engine.AgentStepDB')
+    def test_timed_out_run_skips_remaining_nodes(self, mock_steps):
+        mock_steps.get_next_step_number.return_value = 1
+        router = MagicMock()
+
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(30)
+
+        router.aplan_actions.side_effect = hang
+
+        with patch.object(orchestrator, 'router', router), \
+                patch.object(orchestrator, 'workflow_timeout', 0.2), \
+                patch.dict(turn_runner_module.NODE_BUDGET_SHARES, {"router_llm": 10}):
+            result = orchestrator.run("What are my tasks?", session_id="s1")
+            time.sleep(0.1)
+
+        self.assertEqual(result["message"], "Agent step timed out")
+        router.execute_tool.assert_not_called()
+        logged = [c.kwargs.get("step_type") for c in mock_steps.create.call_args_list]
+        self.assertEqual(logged, ["workflow_start", "ingest_user_input"])
+
+
+class TestStepLogging(unittest.TestCase):
+    """Node steps are written to the database off the turn runner's loop"""
+
+    @patch('orchestrator.pipeline.engine.AgentStepDB')
+    def test_steps_are_recorded_in_worker_threads(self, mock_steps):
+        mock_steps.get_next_step_number.return_value = 1
+        threads = {}
+        mock_steps.create.side_effect = lambda **kwargs: threads.setdefault(kwargs["step_type"], threading.current_thread().name)
+
+        async def astream(messages, **kwargs):
+            yield AIMessageChunk(content="Two tasks.")
+
+        llm = MagicMock()
+        llm.astream.side_effect = astream
+        router = MagicMock()
+        router.aplan_actions = AsyncMock(return_value={"assistant_text": "Fetching", "tool_name": "get_tasks", "tool_args": {}})
+        router.execute_tool.return_value = "2 tasks"
+
+        with patch.object(orchestrator, 'llm', llm), patch.object(orchestrator, 'router', router):
+            orchestrator.run("What are my tasks?", session_id="s1")
+
+        self.assertEqual(list(threads), ["workflow_start", "ingest_user_input", "router_llm", "tool_exec", "synthesizer_llm"])
+        self.assertEqual(threads["workflow_start"], threading.current_thread().name)
+        self.assertTrue(all(name != "turn-runner" for name in threads.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+"""
+Helpers shared by the test_*.py modules
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import database
+
+
+async def achunks(chunks):
+    """Async stand-in for llm.astream"""
+    for chunk in chunks:
+        yield chunk
+
+
+def use_temp_database(test_case: unittest.TestCase) -> str:
+    """
+    Point the app at a fresh SQLite database for one test
+
+    Patches database.DATABASE_PATH to a file in a temporary directory,
+    creates the schema, and registers cleanups on `test_case`. Returns the
+    directory, for any other files the test needs.
+    """
+    tmp = tempfile.TemporaryDirectory()
+    test_case.addCleanup(tmp.cleanup)
+    patcher = patch.object(database, 'DATABASE_PATH', os.path.join(tmp.name, 'giskard.db'))
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    database.init_database()
+    return tmp.name
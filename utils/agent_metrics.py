@@ -1,19 +1,54 @@
 """
 Agent metrics and observability utilities
+
+The JSON summaries here back /api/agent/metrics; the Prometheus metrics
+declared below are served at /metrics (see utils/prometheus.py).
 """
 import time
 import logging
+import threading
 from typing import Dict, Any, Optional
 from datetime import datetime
 from collections import defaultdict, deque
 
+from utils.prometheus import LLM_BUCKETS, registry
+
 logger = logging.getLogger(__name__)
 
+# Prometheus metrics shared across modules
+llm_request_seconds = registry.histogram(
+    "llm_request_duration_seconds", "LLM call latency by model and prompt", ("model", "prompt"), buckets=LLM_BUCKETS
+)
+db_query_seconds = registry.histogram(
+    "db_query_duration_seconds", "SQLite query latency by operation", ("operation",)
+)
+node_seconds = registry.histogram(
+    "pipeline_node_duration_seconds", "Agent pipeline node latency", ("pipeline", "node"), buckets=LLM_BUCKETS
+)
+orchestrator_run_seconds = registry.histogram(
+    "orchestrator_run_duration_seconds", "Non-streaming agent run latency by orchestrator", ("orchestrator",),
+    buckets=LLM_BUCKETS
+)
+turn_seconds = registry.histogram(
+    "chat_turn_duration_seconds", "Chat turn latency by path", ("path",), buckets=LLM_BUCKETS
+)
+turn_llm_calls = registry.counter("chat_turn_llm_calls", "LLM calls made by chat turns, by path", ("path",))
+cache_lookups = registry.counter("cache_lookups", "Cache lookups by cache and result (hit or miss)", ("cache", "result"))
+prompt_cache_tokens = registry.counter(
+    "prompt_cache_tokens", "Prompt tokens Ollama evaluated or reused from its KV cache", ("call", "kind")
+)
+agent_requests = registry.counter("agent_requests", "Agent requests by outcome", ("outcome",))
+agent_request_seconds = registry.histogram(
+    "agent_request_duration_seconds", "Agent request latency", buckets=LLM_BUCKETS
+)
+
 class AgentMetrics:
     """Simple metrics collector for agent operations"""
     
     def __init__(self, max_history: int = 100):
         self.max_history = max_history
+        self._lock = threading.Lock()
+        self._response_time_sum = 0.0
         self.metrics = {
             'requests_total': 0,
             'requests_successful': 0,
@@ -30,44 +65,55 @@ class AgentMetrics:
     def record_request(self, success: bool, response_time: float, tool_calls: int = 0, 
                       create_task_calls: int = 0, error_type: Optional[str] = None):
         """Record a request and its metrics"""
-        self.metrics['requests_total'] += 1
-        self.metrics['response_times'].append(response_time)
-        
-        if success:
-            self.metrics['requests_successful'] += 1
-        else:
-            self.metrics['requests_failed'] += 1
-            if error_type:
-                self.metrics['error_counts'][error_type] += 1
+        agent_requests.labels(outcome='success' if success else 'failure').inc()
+        agent_request_seconds.observe(response_time)
         
-        self.metrics['tool_calls_total'] += tool_calls
-        self.metrics['create_task_calls'] += create_task_calls
-        
-        # Update average response time
-        if self.metrics['response_times']:
-            self.metrics['average_response_time'] = sum(self.metrics['response_times']) / len(self.metrics['response_times'])
+        with self._lock:
+            self.metrics['requests_total'] += 1
+            response_times = self.metrics['response_times']
+            # Keep a running sum of the window so the mean is O(1)
+            if len(response_times) == response_times.maxlen:
+                self._response_time_sum -= response_times[0]
+            response_times.append(response_time)
+            self._response_time_sum += response_time
+            self.metrics['average_response_time'] = self._response_time_sum / len(response_times)
+            
+            if success:
+                self.metrics['requests_successful'] += 1
+            else:
+                self.metrics['requests_failed'] += 1
+                if error_type:
+                    self.metrics['error_counts'][error_type] += 1
+            
+            self.metrics['tool_calls_total'] += tool_calls
+            self.metrics['create_task_calls'] += create_task_calls
     
     def record_undo(self):
         """Record an undo operation"""
-        self.metrics['undo_operations'] += 1
+        with self._lock:
+            self.metrics['undo_operations'] += 1
     
     def get_metrics(self) -> Dict[str, Any]:
         """Get current metrics"""
-        # Create a copy and convert non-serializable objects
-        metrics_copy = dict(self.metrics)
-        
-        # Convert deque to list for JSON serialization
-        if 'response_times' in metrics_copy:
+        with self._lock:
+            # Create a copy and convert non-serializable objects
+            metrics_copy = dict(self.metrics)
+            
+            # Convert deque to list for JSON serialization
             metrics_copy['response_times'] = list(metrics_copy['response_times'])
-        
-        # Convert defaultdict to dict for JSON serialization
-        if 'error_counts' in metrics_copy:
+            
+            # Convert defaultdict to dict for JSON serialization
             metrics_copy['error_counts'] = dict(metrics_copy['error_counts'])
         
         return metrics_copy
     
     def reset_metrics(self):
         """Reset all metrics"""
+        with self._lock:
+            self._reset()
+    
+    def _reset(self):
+        self._response_time_sum = 0.0
         self.metrics = {
             'requests_total': 0,
             'requests_successful': 0,
@@ -88,6 +134,256 @@ class AgentMetrics:
 # Global metrics instance
 agent_metrics = AgentMetrics()
 
+class ClassificationMetrics:
+    """Parse success/failure counts for LLM classification responses, per prompt version"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parse_counts = defaultdict(lambda: {'parsed': 0, 'failed': 0})
+        self.last_reset = datetime.now().isoformat()
+    
+    def record_parse(self, prompt_version: str, success: bool):
+        """Record the outcome of parsing one classification response"""
+        with self._lock:
+            self.parse_counts[prompt_version]['parsed' if success else 'failed'] += 1
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get parse counts and failure rate for each prompt version"""
+        by_version = {}
+        with self._lock:
+            for version, counts in self.parse_counts.items():
+                total = counts['parsed'] + counts['failed']
+                by_version[version] = {
+                    **counts,
+                    'total': total,
+                    'parse_failure_rate': round(counts['failed'] / total, 4) if total else 0.0
+                }
+            return {'prompt_versions': by_version, 'last_reset': self.last_reset}
+    
+    def reset_metrics(self):
+        """Reset all metrics"""
+        with self._lock:
+            self.parse_counts.clear()
+            self.last_reset = datetime.now().isoformat()
+
+# Global classification metrics instance
+classification_metrics = ClassificationMetrics()
+
+class TurnMetrics:
+    """Per-path LLM call counts, latency saved by chat fast-path routing and prefetching, and result tokens saved"""
+    
+    def __init__(self, max_history: int = 100):
+        self.max_history = max_history
+        self._lock = threading.Lock()
+        self._reset()
+    
+    def record_planner_latency(self, latency_ms: float):
+        """Record a planner LLM call, used to estimate what a skipped planner call would have cost"""
+        with self._lock:
+            self.planner_latencies.append(latency_ms)
+    
+    def estimated_planner_latency(self) -> float:
+        """Rolling average planner latency in milliseconds (0 before any planner call)"""
+        with self._lock:
+            return self._estimated_planner_latency()
+    
+    def _estimated_planner_latency(self) -> float:
+        if not self.planner_latencies:
+            return 0.0
+        return sum(self.planner_latencies) / len(self.planner_latencies)
+    
+    def record_turn(self, path: str, llm_calls: int, latency_ms: float, latency_saved_ms: float = 0.0,
+                    prefetch: Optional[str] = None, result_tokens_saved: int = 0):
+        """
+        Record a completed chat turn
+        
+        Args:
+            path: 'fast_path' (planner skipped), 'response_cache' (no LLM call) or 'planned'
+            llm_calls: LLM calls made during the turn
+            latency_ms: Wall time of the turn
+            latency_saved_ms: Estimated time saved by skipping or overlapping work
+            prefetch: 'hit', 'miss' or None when nothing was prefetched
+            result_tokens_saved: Prompt tokens saved by compact action result rendering
+        """
+        turn_seconds.labels(path=path).observe(latency_ms / 1000)
+        turn_llm_calls.labels(path=path).inc(llm_calls)
+        with self._lock:
+            stats = self.paths[path]
+            stats['turns'] += 1
+            stats['llm_calls'] += llm_calls
+            stats['latency_ms_total'] += latency_ms
+            stats['latency_saved_ms_total'] += latency_saved_ms
+            stats['result_tokens_saved'] += result_tokens_saved
+            if prefetch:
+                self.prefetch[prefetch] += 1
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get turn counts, LLM calls per turn and latency saved for each path"""
+        by_path = {}
+        with self._lock:
+            for path, stats in self.paths.items():
+                turns = stats['turns']
+                by_path[path] = {
+                    'turns': turns,
+                    'llm_calls': stats['llm_calls'],
+                    'llm_calls_per_turn': round(stats['llm_calls'] / turns, 2) if turns else 0.0,
+                    'average_latency_ms': round(stats['latency_ms_total'] / turns, 1) if turns else 0.0,
+                    'latency_saved_ms_total': round(stats['latency_saved_ms_total'], 1),
+                    'result_tokens_saved': stats['result_tokens_saved'],
+                    'result_tokens_saved_per_turn': round(stats['result_tokens_saved'] / turns, 1) if turns else 0.0
+                }
+            return {
+                'paths': by_path,
+                'prefetch': dict(self.prefetch),
+                'estimated_planner_latency_ms': round(self._estimated_planner_latency(), 1),
+                'last_reset': self.last_reset
+            }
+    
+    def reset_metrics(self):
+        """Reset all metrics"""
+        with self._lock:
+            self._reset()
+    
+    def _reset(self):
+        self.paths = defaultdict(lambda: {'turns': 0, 'llm_calls': 0, 'latency_ms_total': 0.0, 'latency_saved_ms_total': 0.0,
+                                          'result_tokens_saved': 0})
+        self.prefetch = defaultdict(int)
+        self.planner_latencies = deque(maxlen=self.max_history)
+        self.last_reset = datetime.now().isoformat()
+
+# Global turn metrics instance
+turn_metrics = TurnMetrics()
+
+class PromptCacheMetrics:
+    """Prompt tokens Ollama evaluated vs. reused from its KV cache, per LLM call site"""
+    
+    def __init__(self, max_history: int = 100):
+        self.max_history = max_history
+        self._lock = threading.Lock()
+        self._reset()
+    
+    def record_call(self, call: str, prompt_tokens: int, evaluated_tokens: int, model: Optional[str] = None) -> int:
+        """
+        Record one LLM call
+        
+        Args:
+            call: Call site (e.g. 'planner', 'synthesizer', 'chat')
+            prompt_tokens: Tokens in the whole prompt
+            evaluated_tokens: Tokens Ollama actually evaluated (prompt_eval_count)
+            model: Model name, if known
+        
+        Returns:
+            Tokens served from the cache
+        """
+        cached_tokens = max(0, prompt_tokens - evaluated_tokens)
+        prompt_cache_tokens.labels(call=call, kind='evaluated').inc(evaluated_tokens)
+        prompt_cache_tokens.labels(call=call, kind='cached').inc(cached_tokens)
+        with self._lock:
+            stats = self.calls[call]
+            stats['calls'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['evaluated_tokens'] += evaluated_tokens
+            stats['cached_tokens'] += cached_tokens
+            self.recent.append({
+                'call': call,
+                'model': model,
+                'prompt_tokens': prompt_tokens,
+                'evaluated_tokens': evaluated_tokens,
+                'cached_tokens': cached_tokens,
+                'timestamp': datetime.now().isoformat()
+            })
+        return cached_tokens
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get evaluated and cached prompt tokens per call site, plus the most recent calls"""
+        by_call = {}
+        with self._lock:
+            for call, stats in self.calls.items():
+                by_call[call] = {
+                    **stats,
+                    'cached_ratio': round(stats['cached_tokens'] / stats['prompt_tokens'], 4) if stats['prompt_tokens'] else 0.0
+                }
+            return {'calls': by_call, 'recent': list(self.recent), 'last_reset': self.last_reset}
+    
+    def reset_metrics(self):
+        """Reset all metrics"""
+        with self._lock:
+            self._reset()
+    
+    def _reset(self):
+        self.calls = defaultdict(lambda: {'calls': 0, 'prompt_tokens': 0, 'evaluated_tokens': 0, 'cached_tokens': 0})
+        self.recent = deque(maxlen=self.max_history)
+        self.last_reset = datetime.now().isoformat()
+
+# Global prompt cache metrics instance
+prompt_cache_metrics = PromptCacheMetrics()
+
+class ResponseCacheMetrics:
+    """Hits, misses and invalidations of the response cache for read-only agent turns"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def record_lookup(self, hit: bool, llm_calls_saved: int = 0):
+        """Record a cache lookup and, for a hit, the LLM calls it replaced"""
+        cache_lookups.labels(cache='response', result='hit' if hit else 'miss').inc()
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.llm_calls_saved += llm_calls_saved
+            else:
+                self.misses += 1
+
+    def record_store(self, stored: bool):
+        """Record a response offered to the cache (not stored if the tasks changed meanwhile)"""
+        with self._lock:
+            if stored:
+                self.stores += 1
+            else:
+                self.stale_stores += 1
+
+    def record_invalidation(self, entries: int):
+        """Record a task write that dropped cached responses"""
+        with self._lock:
+            self.invalidations += 1
+            self.entries_invalidated += entries
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get hit rate, LLM calls saved and invalidation counts"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'lookups': lookups,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'llm_calls_saved': self.llm_calls_saved,
+                'stores': self.stores,
+                'stale_stores': self.stale_stores,
+                'invalidations': self.invalidations,
+                'entries_invalidated': self.entries_invalidated,
+                'last_reset': self.last_reset
+            }
+
+    def reset_metrics(self):
+        """Reset all metrics"""
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.llm_calls_saved = 0
+        self.stores = 0
+        self.stale_stores = 0
+        self.invalidations = 0
+        self.entries_invalidated = 0
+        self.last_reset = datetime.now().isoformat()
+
+# Global response cache metrics instance
+response_cache_metrics = ResponseCacheMetrics()
+
 class RequestTimer:
     """Context manager for timing requests"""
     
@@ -11,6 +11,7 @@ from datetime import datetime
 from utils.http_client import APIClient
 from config.ollama_config import get_chat_config, REQUEST_TIMEOUT
 from .agent_metrics import agent_metrics, RequestTimer
+from .ollama_client import ollama_client
 
 logger = logging.getLogger(__name__)
 
@@ -375,19 +376,13 @@ Assistant:"""
                 "model": self.config["model"],
                 "prompt": prompt,
                 "stream": self.config["stream"],
+                "keep_alive": self.config.get("keep_alive"),
                 "options": self.config["options"]
             }
             
             logger.info(f"🤖 Sending agent request to Ollama with model: {self.config['model']}")
             
-            response = requests.post(
-                self.ollama_url, 
-                json=payload, 
-                timeout=REQUEST_TIMEOUT
-            )
-            response.raise_for_status()
-            
-            result = response.json()
+            result = ollama_client.generate(payload, timeout=REQUEST_TIMEOUT, call="agent")
             return result.get('response', '').strip()
             
         except requests.exceptions.Timeout:
@@ -906,9 +901,6 @@ Assistant:"""
             logger.error(f"Failed to log agent interaction: {str(e)}")
 
     def is_ollama_available(self) -> bool:
-        """Check if Ollama is running and accessible"""
-        try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
-            return response.status_code == 200
-        except Exception:
-            return False
+        """Check if Ollama is running and accessible (cached by the health monitor)"""
+        from utils.model_health import model_health_monitor
+        return model_health_monitor.is_available()
@@ -3,11 +3,16 @@ Chat service for handling conversations with Ollama
 """
 import requests
 import logging
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterator, List
 from config.ollama_config import get_chat_config, REQUEST_TIMEOUT
+from utils.model_health import model_health_monitor
+from utils.ollama_client import ollama_client
 
 logger = logging.getLogger(__name__)
 
+# Messages of conversation history included in the prompt (between this and twice this)
+HISTORY_WINDOW = 6
+
 class ChatService:
     """Service for handling chat conversations with Ollama"""
     
@@ -26,89 +31,109 @@ class ChatService:
         Returns:
             The AI's response
         """
-        try:
-            # Build the conversation context
-            prompt = self._build_prompt(message, conversation_history or [])
+        if not self.config["stream"]:
+            return self._send_blocking(message, conversation_history)
 
-            # Prepare the request payload
-            payload = {
-                "model": self.config["model"],
-                "prompt": prompt,
-                "stream": self.config["stream"],
-                "options": self.config["options"]
-            }
+        full_response = "".join(self.stream_message(message, conversation_history)).strip()
+        if not full_response:
+            return "I'm sorry, I didn't get a response. Please try again."
+        return full_response
 
-            logger.info(f"🤖 Sending chat request to Ollama with model: {self.config['model']}")
+    def stream_message(self, message: str, conversation_history: List[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Send a message to Ollama and yield the response tokens as they are generated
 
-            # Send request to Ollama
-            response = requests.post(
-                self.ollama_url,
-                json=payload,
-                timeout=REQUEST_TIMEOUT
-            )
-            response.raise_for_status()
+        Connection problems are reported as a single apology chunk, so callers
+        can forward every chunk to the user unchanged.
 
-            # Handle streaming response if enabled
-            if self.config["stream"]:
-                return self._handle_streaming_response(response)
-            else:
-                result = response.json()
-                ai_response = result.get('response', '').strip()
+        Args:
+            message: The user's message
+            conversation_history: Previous conversation messages
+
+        Yields:
+            Response text fragments
+        """
+        # Fail fast from the cached health state instead of waiting for a connect timeout
+        if not model_health_monitor.is_available():
+            logger.error("🔌 Ollama is not available")
+            yield "I'm having trouble connecting right now. Please check if Ollama is running and try again."
+            return
 
-                if not ai_response:
-                    return "I'm sorry, I didn't get a response. Please try again."
+        payload = self._build_payload(message, conversation_history)
+        logger.info(f"🤖 Streaming chat request to Ollama with model: {self.config['model']}")
 
-                logger.info("✅ Chat response received successfully")
-                return ai_response
+        received = False
+        try:
+            for chunk in ollama_client.stream_generate(payload, timeout=REQUEST_TIMEOUT, call="chat"):
+                text = chunk.get('response', '')
+                if text:
+                    received = True
+                    yield text
+            model_health_monitor.mark_model_used()
+            logger.info("✅ Streaming chat response received successfully")
 
         except requests.exceptions.Timeout:
             logger.error("⏰ Chat request timed out")
-            return "I'm having trouble connecting right now. Please check if Ollama is running and try again."
+            if not received:
+                yield "I'm having trouble connecting right now. Please check if Ollama is running and try again."
 
         except requests.exceptions.ConnectionError:
             logger.error("🔌 Failed to connect to Ollama")
-            return "I'm having trouble connecting right now. Please check if Ollama is running with gemma3:4b and try again."
+            model_health_monitor.mark_unavailable()
+            if not received:
+                yield "I'm having trouble connecting right now. Please check if Ollama is running with gemma3:4b and try again."
 
         except Exception as e:
-            logger.error(f"❌ Chat request failed: {str(e)}")
-            return f"I'm having trouble connecting right now. Please check if Ollama is running with {self.config['model']} and try again."
+            logger.error(f"❌ Error handling streaming response: {str(e)}")
+            if not received:
+                yield "I'm having trouble processing the response. Please try again."
+
+    def _build_payload(self, message: str, conversation_history: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the /api/generate payload for a chat message"""
+        return {
+            "model": self.config["model"],
+            "prompt": self._build_prompt(message, conversation_history or []),
+            "stream": self.config["stream"],
+            "keep_alive": self.config.get("keep_alive"),
+            "options": self.config["options"]
+        }
+
+    def _send_blocking(self, message: str, conversation_history: List[Dict[str, Any]] = None) -> str:
+        """Non-streaming request used when streaming is disabled in the chat config"""
+        try:
+            payload = self._build_payload(message, conversation_history)
 
-    def _handle_streaming_response(self, response) -> str:
-        """
-        Handle streaming response from Ollama
+            # Fail fast from the cached health state instead of waiting for a connect timeout
+            if not model_health_monitor.is_available():
+                logger.error("🔌 Ollama is not available")
+                return "I'm having trouble connecting right now. Please check if Ollama is running and try again."
 
-        Args:
-            response: The HTTP response object
+            logger.info(f"🤖 Sending chat request to Ollama with model: {self.config['model']}")
 
-        Returns:
-            Complete response text
-        """
-        full_response = ""
-        try:
-            # Read the response line by line (streaming format)
-            for line in response.iter_lines():
-                if line:
-                    line = line.decode('utf-8')
-                    if line.startswith('data: '):
-                        try:
-                            data = json.loads(line[6:])
-                            if 'response' in data:
-                                full_response += data['response']
-                            if data.get('done', False):
-                                break
-                        except json.JSONDecodeError:
-                            continue
-
-            if not full_response:
+            # Send request to Ollama over the shared pooled client
+            result = ollama_client.generate(payload, timeout=REQUEST_TIMEOUT, call="chat")
+            model_health_monitor.mark_model_used()
+            ai_response = result.get('response', '').strip()
+
+            if not ai_response:
                 return "I'm sorry, I didn't get a response. Please try again."
 
-            logger.info("✅ Streaming chat response received successfully")
-            return full_response.strip()
+            logger.info("✅ Chat response received successfully")
+            return ai_response
+
+        except requests.exceptions.Timeout:
+            logger.error("⏰ Chat request timed out")
+            return "I'm having trouble connecting right now. Please check if Ollama is running and try again."
+
+        except requests.exceptions.ConnectionError:
+            logger.error("🔌 Failed to connect to Ollama")
+            model_health_monitor.mark_unavailable()
+            return "I'm having trouble connecting right now. Please check if Ollama is running with gemma3:4b and try again."
 
         except Exception as e:
-            logger.error(f"❌ Error handling streaming response: {str(e)}")
-            return "I'm having trouble processing the response. Please try again."
-    
+            logger.error(f"❌ Chat request failed: {str(e)}")
+            return f"I'm having trouble connecting right now. Please check if Ollama is running with {self.config['model']} and try again."
+
     def _build_prompt(self, message: str, conversation_history: List[Dict[str, Any]]) -> str:
         """
         Build the prompt for Ollama including conversation history
@@ -122,12 +147,12 @@ class ChatService:
         """
         # Get the coaching system prompt
         from config.prompts import get_coaching_prompt
-        system_prompt = get_coaching_prompt(task_context)
+        system_prompt = get_coaching_prompt()
         
         # Build conversation context
         conversation_context = ""
         if conversation_history:
-            for msg in conversation_history[-6:]:  # Keep last 6 messages for context
+            for msg in conversation_history[self._history_window_start(len(conversation_history)):]:
                 role = "User" if msg.get('type') == 'user' else "Assistant"
                 content = msg.get('content', '')
                 conversation_context += f"{role}: {content}\n"
@@ -142,11 +167,18 @@ class ChatService:
         
         return full_prompt
     
+    @staticmethod
+    def _history_window_start(history_length: int) -> int:
+        """
+        First history message to include in the prompt
+
+        The window only moves in steps of HISTORY_WINDOW messages instead of
+        sliding every turn, so consecutive prompts share the system prompt and
+        history as a byte-identical prefix that Ollama serves from its KV cache.
+        """
+        return max(0, (history_length - HISTORY_WINDOW) // HISTORY_WINDOW * HISTORY_WINDOW)
+    
     def is_ollama_available(self) -> bool:
-        """Check if Ollama is running and accessible"""
-        try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
-            return response.status_code == 200
-        except Exception:
-            return False
+        """Check if Ollama is running and accessible (cached by the health monitor)"""
+        return model_health_monitor.is_available()
 
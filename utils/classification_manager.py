@@ -10,9 +10,31 @@ import logging
 
 from models.task_db import TaskDB
 from utils.classification_service import TaskClassificationService
+from utils.model_health import model_health_monitor
+from utils.agent_metrics import classification_metrics
+from utils.prometheus import LLM_BUCKETS, registry
 
 logger = logging.getLogger(__name__)
 
+queue_depth = registry.gauge(
+    "classification_queue_depth", "Tasks waiting for classification (immediate or deferred)", ("queue",)
+)
+queue_oldest_age = registry.gauge(
+    "classification_queue_oldest_age_seconds", "Age of the oldest task waiting for classification", ("queue",)
+)
+queue_wait_seconds = registry.histogram(
+    "classification_queue_wait_seconds", "Time tasks waited in the queue before their batch started", buckets=LLM_BUCKETS
+)
+batch_seconds = registry.histogram(
+    "classification_batch_duration_seconds", "Classification batch latency", ("outcome",), buckets=LLM_BUCKETS
+)
+
+
+def _oldest_age(items: List[Dict[str, Any]]) -> float:
+    """Seconds since the earliest enqueued item, 0 for an empty queue"""
+    timestamps = [item['timestamp'] for item in items if item.get('timestamp')]
+    return (datetime.now() - min(timestamps)).total_seconds() if timestamps else 0.0
+
 class ClassificationManager:
     """Manages task classification queue and background processing"""
 
@@ -24,6 +46,14 @@ class ClassificationManager:
         self.processing_thread = None
         self.stop_event = threading.Event()
         self.deferred_timeout = 5  # seconds to wait before processing deferred tasks
+        self._register_metrics()
+
+    def _register_metrics(self):
+        """Report queue depth and age at scrape time, from this manager's queues"""
+        queue_depth.labels(queue='immediate').set_function(lambda: len(self.classification_queue))
+        queue_depth.labels(queue='deferred').set_function(lambda: len(self.deferred_tasks))
+        queue_oldest_age.labels(queue='immediate').set_function(lambda: _oldest_age(list(self.classification_queue)))
+        queue_oldest_age.labels(queue='deferred').set_function(lambda: _oldest_age(list(self.deferred_tasks.values())))
         
     def start_background_processing(self):
         """Start background thread for processing classification queue"""
@@ -41,9 +71,14 @@ class ClassificationManager:
             self.processing_thread.join(timeout=5)
         logger.info("Classification background processing stopped")
     
-    def classify_on_startup(self) -> int:
+    def classify_on_startup(self, chunk_size: int = 100) -> int:
         """
-        Classify all uncategorized tasks on startup
+        Classify tasks that the current prompt version/model hasn't classified yet
+        
+        This includes tasks left with keyword fallback categories while Ollama
+        was down. Tasks are streamed from the database in chunks and each
+        chunk's results are written in one transaction, so LLM calls scale
+        with the number of stale tasks rather than the size of the task history.
         
         Returns:
             Number of tasks classified
@@ -53,39 +88,25 @@ class ClassificationManager:
                 logger.warning("Ollama not available, skipping startup classification")
                 return 0
             
-            # Get all tasks from database
-            all_tasks = TaskDB.get_all()
-            uncategorized_tasks = [task for task in all_tasks if not task.categories or len(task.categories) == 0]
-            
-            if not uncategorized_tasks:
-                logger.info("No uncategorized tasks found")
-                return 0
-            
-            logger.info(f"Found {len(uncategorized_tasks)} uncategorized tasks, starting classification...")
-            
-            # Prepare tasks for batch classification
-            task_data = []
-            for task in uncategorized_tasks:
-                task_data.append({
-                    'id': task.id,
-                    'title': task.title,
-                    'description': task.description
-                })
+            prompt_version, model = self.classification_service.get_classification_identity()
             
-            # Classify in batch
-            results = self.classification_service.classify_tasks_batch(task_data)
-            
-            # Update tasks with categories
             updated_count = 0
-            for task in uncategorized_tasks:
-                if task.id in results:
-                    task.categories = results[task.id]
-                    if task.categories:  # Only count if categories were assigned
-                        task.save()  # Save to database
-                        updated_count += 1
+            seen_count = 0
+            for chunk in TaskDB.iter_needing_classification(prompt_version, model, chunk_size):
+                if seen_count == 0:
+                    logger.info(f"Found stale tasks for {prompt_version} / {model}, starting classification...")
+                seen_count += len(chunk)
+                
+                task_data = [{'id': task.id, 'title': task.title, 'description': task.description, 'project': task.project}
+                             for task in chunk]
+                results = self.classification_service.classify_tasks_batch(task_data)
+                updated_count += TaskDB.bulk_update_categories(results, prompt_version, model,
+                                                               classified_ids=results.settled_ids())
             
-            if updated_count > 0:
-                logger.info(f"Classified {updated_count} tasks on startup")
+            if seen_count == 0:
+                logger.info("No stale tasks found")
+            elif updated_count > 0:
+                logger.info(f"Classified {updated_count} of {seen_count} stale tasks on startup")
             
             return updated_count
             
@@ -173,17 +194,19 @@ class ClassificationManager:
             # Generate a unique trace ID for this batch
             trace_id = hashlib.md5(f"classification-batch-{int(time.time() * 1000)}".encode()).hexdigest()
 
-            # Create trace context (like in agent.py)
+            # Create trace context (like in agent.py); titles and descriptions
+            # go in the span input only, not in both trace and span
             trace_context = langfuse_config.create_trace_context(
                 name="classification.batch",
                 trace_id=trace_id,
                 input_data={
                     "batch_size": len(batch),
-                    "task_ids": [task.get('id') for task in batch],
-                    "task_titles": [task.get('title', '') for task in batch],
-                    "task_descriptions": [task.get('description', '') for task in batch]
-                }
+                    "task_ids": [task.get('id') for task in batch]
+                },
+                trace_type="classification"
             )
+            if not trace_context:
+                return None
 
             # Create root span for the batch (like in agent.py)
             root_span = client.start_span(
@@ -209,26 +232,40 @@ class ClassificationManager:
             logger.debug(f"Traceback: {traceback.format_exc()}")
             return None
     
+    def _finish_classification_trace(self, root_span, error: Optional[str] = None):
+        """Let tail sampling decide whether a batch's trace is exported"""
+        from config.langfuse_config import langfuse_config
+        langfuse_config.finish_trace(getattr(root_span, "trace_id", None), error)
+
     def _process_queue_batch(self):
         """Process a batch of tasks from the queue"""
         if not self.classification_queue:
             return
             
+        # Availability and residency come from the health monitor's cached state,
+        # so this no longer costs an HTTP probe and a dummy generate per batch
         if not self.classification_service.is_ollama_available():
             logger.warning("Ollama not available, skipping classification")
             self.classification_queue.clear()
             return
         
-        # Warm up the model to ensure it's loaded and ready
+        # Only warms up if Ollama has evicted the model since the last request
         self.classification_service.warmup_model()
         
         self.is_processing = True
+        root_span = None
+        started = time.perf_counter()
+        outcome = 'failed'
         
         try:
             # Take up to 5 tasks from the queue (reduced from 10 to prevent timeouts)
             batch_size = min(5, len(self.classification_queue))
             batch = self.classification_queue[:batch_size]
             self.classification_queue = self.classification_queue[batch_size:]
+            now = datetime.now()
+            for task_data in batch:
+                if task_data.get('timestamp'):
+                    queue_wait_seconds.observe((now - task_data['timestamp']).total_seconds())
             
             logger.info(f"Processing classification batch of {len(batch)} tasks")
             
@@ -238,21 +275,12 @@ class ClassificationManager:
             # Classify the batch
             results = self.classification_service.classify_tasks_batch(batch, root_span)
 
-            # Update tasks in the database
-            updated_count = 0
-
-            for task_data in batch:
-                task_id = task_data['id']
-                task = TaskDB.get_by_id(task_id)
-
-                if task and task_id in results:
-                    old_categories = task.categories.copy() if task.categories else []
-                    task.categories = results[task_id]
-
-                    if task.categories != old_categories:
-                        task.save()  # Save to database
-                        updated_count += 1
-                        logger.debug(f"Updated task '{task.title}' with categories: {task.categories}")
+            # Update tasks in the database in one transaction, recording which
+            # prompt version/model classified them so startup doesn't redo them
+            # (keyword fallbacks and failures stay stale and are retried)
+            prompt_version, model = self.classification_service.get_classification_identity()
+            updated_count = TaskDB.bulk_update_categories(results, prompt_version, model,
+                                                          classified_ids=results.settled_ids())
 
             # Finalize the root span with results
             if root_span:
@@ -274,14 +302,24 @@ class ClassificationManager:
                     logger.info(f"✅ Ended Langfuse span for classification batch")
                 except Exception as e:
                     logger.warning(f"Failed to end span: {e}")
+                self._finish_classification_trace(root_span)
 
             if updated_count > 0:
                 logger.info(f"Updated {updated_count} tasks with new categories")
+            outcome = 'completed'
 
 
         except Exception as e:
             logger.error(f"Error processing classification batch: {str(e)}")
+            if root_span:
+                try:
+                    root_span.update(level="ERROR", status_message=str(e))
+                    root_span.end()
+                except Exception as span_error:
+                    logger.warning(f"Failed to end span: {span_error}")
+                self._finish_classification_trace(root_span, error=str(e))
         finally:
+            batch_seconds.labels(outcome=outcome).observe(time.perf_counter() - started)
             self.is_processing = False
     
     def get_queue_status(self) -> Dict[str, Any]:
@@ -290,7 +328,9 @@ class ClassificationManager:
             'queue_size': len(self.classification_queue),
             'deferred_tasks_count': len(self.deferred_tasks),
             'is_processing': self.is_processing,
-            'ollama_available': self.classification_service.is_ollama_available()
+            'ollama_available': self.classification_service.is_ollama_available(),
+            'model_health': model_health_monitor.get_status(),
+            'classification_parsing': classification_metrics.get_metrics()
         }
     
     
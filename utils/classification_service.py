@@ -5,42 +5,86 @@ import json
 import requests
 import logging
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 from pathlib import Path
+from utils.fast_classifier import FastClassifier
+from utils.keyword_classifier import keyword_classifier
+from utils.agent_metrics import classification_metrics
+from utils.prediction_log import get_prediction_log
+from utils.ollama_client import ollama_client
+from utils.token_accounting import CallUsage, token_counter, usage_from_ollama
+from utils.tracing import traced
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+class ClassificationParseError(ValueError):
+    """Raised when the LLM response is not a valid category array"""
+
+
+# Where a task's categories came from
+SOURCE_LLM = "llm"
+SOURCE_FAST = "fast"
+SOURCE_SKIPPED = "skipped"
+SOURCE_KEYWORD = "keyword"
+SOURCE_FAILED = "failed"
+# Results the current prompt version/model would give again; keyword fallbacks and
+# failures are retried once the LLM is back, so they aren't recorded as classified
+SETTLED_SOURCES = frozenset({SOURCE_LLM, SOURCE_FAST, SOURCE_SKIPPED})
+
+
+class ClassificationResults(dict):
+    """Categories by task id, with the source of each result in `sources`"""
+
+    def __init__(self):
+        super().__init__()
+        self.sources: Dict[int, str] = {}
+
+    def add(self, task_id: int, categories: List[str], source: str):
+        self[task_id] = categories
+        self.sources[task_id] = source
+
+    def settled_ids(self) -> Set[int]:
+        """Ids whose result came from the classifier itself rather than a fallback"""
+        return {task_id for task_id, source in self.sources.items() if source in SETTLED_SOURCES}
+
 class TaskClassificationService:
     """Service for automatically categorizing tasks using LLM"""
     
-    def __init__(self, log_file: str = "data/classification_predictions_log.txt"):
+    def __init__(self, log_file: str = "data/classification_predictions_log.txt",
+                 fast_model_file: Optional[str] = "data/fast_classifier.json",
+                 prompt_version: Optional[str] = None, model: Optional[str] = None):
+        """
+        Args:
+            log_file: Prediction log path
+            fast_model_file: Fast-path model artifact, or None to always use the LLM
+            prompt_version: Pin a prompts/task_classification_v<version>.txt prompt instead
+                of the production classifier prompt (used by offline evaluation)
+            model: Override the Ollama model from the classification config
+        """
         self.log_file = Path(log_file)
+        # Buffered so logging doesn't add a file open/write per task on the classification thread,
+        # and shared with every other service logging to the same file
+        self.prediction_log = get_prediction_log(self.log_file)
         from config.ollama_config import OLLAMA_BASE_URL, DEFAULT_MODEL
         self.ollama_url = OLLAMA_BASE_URL
-        self.model = DEFAULT_MODEL
+        self.model = model or DEFAULT_MODEL
+        self.model_override = model
+        self.prompt_version = prompt_version
+        # Optional local model that answers confident tasks without calling the LLM
+        self.fast_classifier = FastClassifier.load(fast_model_file) if fast_model_file else None
         
     def is_ollama_available(self) -> bool:
-        """Check if Ollama is running and accessible"""
-        try:
-            # Test with a simple request to check if Ollama is responding
-            test_url = "http://localhost:11434/api/tags"
-            response = requests.get(test_url, timeout=5)
-            return response.status_code == 200
-        except Exception:
-            return False
+        """Check if Ollama is running and accessible (cached by the health monitor)"""
+        from utils.model_health import model_health_monitor
+        return model_health_monitor.is_available()
     
     def warmup_model(self) -> bool:
-        """Warm up the model by sending a simple request to keep it loaded"""
-        try:
-            warmup_prompt = "Classify this task: test"
-            warmup_response, _ = self._send_to_ollama(warmup_prompt)
-            logger.info("Model warmup successful")
-            return True
-        except Exception as e:
-            logger.warning(f"Model warmup failed: {str(e)}")
-            return False
+        """Make sure the model is loaded, warming it up only if Ollama has evicted it"""
+        from utils.model_health import model_health_monitor
+        return model_health_monitor.ensure_model_loaded()
         
     def classify_task(self, title: str, description: str = "", project: str = "", root_span=None) -> List[str]:
         """
@@ -50,6 +94,12 @@ class TaskClassificationService:
             List of categories (0..n from {health, career, learning})
             Empty list if uncertain or no categories apply
         """
+        return self._classify_task(title, description, project, root_span)[0]
+
+    @traced("classification.classify_task")
+    def _classify_task(self, title: str, description: str = "", project: str = "",
+                       root_span=None) -> Tuple[List[str], str]:
+        """Classify a task, returning its categories and their source (SOURCE_*)"""
         try:
             # Handle very long tasks by truncating intelligently
             task_text = f"{title} - {description}" if description else title
@@ -80,11 +130,17 @@ class TaskClassificationService:
             if len(cleaned_text) < 10:
                 logger.warning(f"Skipping task with insufficient content after URL removal: {title[:50]}...")
                 self._log_classification(title, description, [], "SKIPPED: Insufficient content after URL removal", None)
-                return []
+                return [], SOURCE_SKIPPED
             
             # Use cleaned text for classification
             task_text = cleaned_text
             
+            # Tier 1: answer locally when the fast classifier is confident
+            fast_categories = self._fast_path_classification(title, description, cleaned_text)
+            if fast_categories is not None:
+                return fast_categories, SOURCE_FAST
+            
+            # Tier 2: escalate to the LLM
             # Build the prompt using cleaned text
             # Split cleaned text back into title and description if possible
             if ' - ' in cleaned_text:
@@ -112,8 +168,21 @@ class TaskClassificationService:
             # Send to Ollama
             response, metrics = self._send_to_ollama(prompt)
             
-            # Parse response
-            categories = self._parse_classification_response(response)
+            # Parse response, tracking failures per prompt version
+            prompt_version = self._prompt_version_label(prompt_metadata)
+            try:
+                categories = self._parse_classification_response(response)
+            except ClassificationParseError:
+                classification_metrics.record_parse(prompt_version, success=False)
+                if observation:
+                    try:
+                        observation.update(output={"raw_response": response}, level="ERROR",
+                                           status_message="Unparseable classification response")
+                        observation.end()
+                    except Exception as e:
+                        logger.warning(f"Failed to end Langfuse observation: {e}")
+                raise
+            classification_metrics.record_parse(prompt_version, success=True)
             
             # Update observation with results
             if observation:
@@ -127,26 +196,44 @@ class TaskClassificationService:
                     logger.info("✅ Langfuse observation ended")
                 except Exception as e:
                     logger.warning(f"Failed to end Langfuse observation: {e}")
-
-                # Flush Langfuse events to ensure they're sent
-                try:
-                    from config.langfuse_config import langfuse_config
-                    langfuse_config.flush()
-                    logger.info("✅ Langfuse events flushed")
-                except Exception as e:
-                    logger.warning(f"Failed to flush Langfuse events: {e}")
             
             # Log the classification
             self._log_classification(title, description, categories, response, metrics)
             
-            return categories
+            return categories, SOURCE_LLM
             
         except Exception as e:
             logger.error(f"Classification failed for task '{title}': {str(e)}")
             # Try simple keyword-based classification as fallback
             fallback_categories = self._simple_keyword_classification(title, description)
             self._log_classification(title, description, fallback_categories, f"FALLBACK: {str(e)}", None)
-            return fallback_categories
+            return fallback_categories, SOURCE_KEYWORD
+    
+    def _fast_path_classification(self, title: str, description: str, task_text: str) -> Optional[List[str]]:
+        """Classify with the local fast model
+
+        Returns:
+            List of categories if the fast model is confident, None to escalate to the LLM
+        """
+        if not self.fast_classifier:
+            return None
+
+        import time
+        start_time = time.perf_counter()
+        prediction = self.fast_classifier.predict(task_text)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+        if not prediction.confident:
+            logger.debug(f"Fast classifier not confident for '{title[:50]}', escalating to LLM")
+            return None
+
+        logger.info(f"Fast-path classified '{title[:50]}' as {prediction.categories} in {elapsed_ms:.2f}ms")
+        self._log_classification(
+            title, description, prediction.categories,
+            f"FAST_PATH: {json.dumps(prediction.probabilities)}",
+            {'response_time_ms': round(elapsed_ms, 3), 'prompt_tokens': 0, 'response_tokens': 0}
+        )
+        return prediction.categories
     
     def _intelligent_truncate(self, text: str, max_length: int) -> str:
         """
@@ -183,28 +270,29 @@ class TaskClassificationService:
     
     def _simple_keyword_classification(self, title: str, description: str) -> List[str]:
         """Simple keyword-based classification as fallback"""
-        text = f"{title} {description}".lower()
-        
-        categories = []
-        
-        # Health keywords
-        health_keywords = ['gym', 'workout', 'exercise', 'run', 'swim', 'yoga', 'health', 'fitness', 'vitamin', 'doctor', 'therapy', 'mental health', 'wellness']
-        if any(keyword in text for keyword in health_keywords):
-            categories.append('health')
-        
-        # Career keywords
-        career_keywords = ['job', 'interview', 'career', 'work', 'meeting', 'networking', 'application', 'resume', 'linkedin', 'professional', 'business', 'client', 'project']
-        if any(keyword in text for keyword in career_keywords):
-            categories.append('career')
+        return keyword_classifier.classify(f"{title} {description}")
+    
+    def classify_tasks_keyword_fallback(self, tasks: List[Dict[str, Any]]) -> ClassificationResults:
+        """
+        Classify multiple tasks with the compiled keyword matcher
         
-        # Learning keywords
-        learning_keywords = ['learn', 'study', 'course', 'book', 'read', 'tutorial', 'practice', 'skill', 'education', 'training', 'certification', 'research', 'blog', 'write']
-        if any(keyword in text for keyword in learning_keywords):
-            categories.append('learning')
+        Used instead of per-task LLM calls when Ollama is unavailable.
         
-        return categories
+        Args:
+            tasks: List of task dictionaries with 'title', 'description', 'id'
+            
+        Returns:
+            Dictionary mapping id to list of categories
+        """
+        results = ClassificationResults()
+        for task in tasks:
+            if task.get('title'):
+                categories = keyword_classifier.classify(f"{task['title']} {task.get('description') or ''}")
+                results.add(task.get('id'), categories, SOURCE_KEYWORD)
+        return results
     
-    def classify_tasks_batch(self, tasks: List[Dict[str, Any]], root_span=None) -> Dict[int, List[str]]:
+    @traced("classification.classify_tasks_batch")
+    def classify_tasks_batch(self, tasks: List[Dict[str, Any]], root_span=None) -> ClassificationResults:
         """
         Classify multiple tasks in batch
         
@@ -212,9 +300,13 @@ class TaskClassificationService:
             tasks: List of task dictionaries with 'title', 'description', 'id'
             
         Returns:
-            Dictionary mapping id to list of categories
+            Dictionary mapping id to list of categories, with each result's source
         """
-        results = {}
+        results = ClassificationResults()
+        
+        if not self.is_ollama_available():
+            logger.warning(f"Ollama not available, using keyword fallback for {len(tasks)} tasks")
+            return self.classify_tasks_keyword_fallback(tasks)
         
         # Process tasks one by one with small delays to prevent overwhelming the model
         for i, task in enumerate(tasks):
@@ -227,8 +319,8 @@ class TaskClassificationService:
             
             try:
                 project = task.get('project', '')
-                categories = self.classify_task(title, description, project, root_span)
-                results[task_id] = categories
+                categories, source = self._classify_task(title, description, project, root_span)
+                results.add(task_id, categories, source)
                 
                 # Add small delay between requests to prevent overwhelming the model
                 if i < len(tasks) - 1:  # Don't delay after the last task
@@ -238,7 +330,7 @@ class TaskClassificationService:
             except Exception as e:
                 logger.error(f"Failed to classify task '{title}': {str(e)}")
                 # Skip this task and continue with the next one
-                results[task_id] = []  # Default to empty categories on error
+                results.add(task_id, [], SOURCE_FAILED)  # Default to empty categories on error
                 continue
                 
         return results
@@ -315,6 +407,7 @@ class TaskClassificationService:
             import traceback
             logger.debug(f"Traceback: {traceback.format_exc()}")
     
+    @traced("classification.build_prompt")
     def _build_classification_prompt(self, title: str, description: str) -> tuple[str, dict]:
         """Build the classification prompt for the LLM using Langfuse prompt manager
 
@@ -327,6 +420,13 @@ class TaskClassificationService:
         if description:
             task_text += f" - {description}"
 
+        if self.prompt_version:
+            from config.prompt_registry import prompt_registry
+            prompt_text = prompt_registry.get_prompt_text("task_classification", self.prompt_version)
+            if not prompt_text:
+                raise ValueError(f"Prompt task_classification v{self.prompt_version} not found")
+            return prompt_text.format(task_text=task_text), self._pinned_prompt_metadata()
+
         try:
             # Get prompt from Langfuse with fallback to local
             prompt_data = prompt_manager.get_prompt("classifier", label="production")
@@ -340,109 +440,131 @@ class TaskClassificationService:
             from config.prompts import get_classification_prompt
             return get_classification_prompt(task_text), {"source": "hardcoded_fallback"}
     
-    def _send_to_ollama(self, prompt: str, max_retries: int = 1) -> tuple[str, dict]:
-        """Send request to Ollama API with retry logic
+    @traced("llm.classification")
+    def _send_to_ollama(self, prompt: str, max_retries: Optional[int] = None) -> tuple[str, dict]:
+        """Send request to Ollama through the shared pooled client (which retries with jitter)
         
         Returns:
             tuple: (response_text, metrics_dict) where metrics contains:
                 - response_time_ms: int - time taken for response in milliseconds
                 - prompt_tokens: int - number of tokens in the prompt
                 - response_tokens: int - number of tokens in the response
+                - token_source: str - 'reported' by Ollama or 'estimated' with the model's tokenizer
+                - tokens_per_second, prompt_eval_ms, load_ms: Ollama's timings (None if not reported)
         """
         from config.ollama_config import CLASSIFICATION_CONFIG, REQUEST_TIMEOUT
+        from utils.model_health import model_health_monitor
         import time
         
         payload = {
             **CLASSIFICATION_CONFIG,
             "prompt": prompt
         }
+        if self.model_override:
+            payload["model"] = self.model_override
         
-        # Count tokens in prompt (rough estimation)
-        prompt_tokens = len(prompt.split())  # Simple word-based token estimation
-        
-        for attempt in range(max_retries):
-            try:
-                # Use consistent timeout for all attempts
-                timeout = REQUEST_TIMEOUT
-                
-                # Record start time
-                start_time = time.time()
-                
-                response = requests.post(self.ollama_url, json=payload, timeout=timeout)
-                response.raise_for_status()
-                
-                # Record end time
-                end_time = time.time()
-                response_time_ms = int((end_time - start_time) * 1000)
-                
-                result = response.json()
-                response_text = result.get('response', '').strip()
-                
-                # Count tokens in response (rough estimation)
-                response_tokens = len(response_text.split())
-                
-                # Create metrics dictionary
-                metrics = {
-                    'response_time_ms': response_time_ms,
-                    'prompt_tokens': prompt_tokens,
-                    'response_tokens': response_tokens
-                }
-                
-                return response_text, metrics
-                
-            except requests.exceptions.Timeout as e:
-                if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) * 2  # Exponential backoff: 2, 4, 8 seconds
-                    logger.warning(f"Timeout on attempt {attempt + 1}, retrying in {wait_time}s...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    raise Exception(f"Failed to connect to Ollama after {max_retries} attempts: {str(e)}. Make sure Ollama is running with {self.model} model.")
-                    
-            except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) * 2
-                    logger.warning(f"Request failed on attempt {attempt + 1}, retrying in {wait_time}s...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    raise Exception(f"Failed to connect to Ollama after {max_retries} attempts: {str(e)}. Make sure Ollama is running with {self.model} model.")
+        retries = max_retries - 1 if max_retries is not None else None
+        try:
+            # Record start time
+            start_time = time.time()
+            
+            result = ollama_client.generate(payload, timeout=REQUEST_TIMEOUT, retries=retries, call="classification")
+            model_health_monitor.mark_model_used()
+            
+            # Record end time
+            end_time = time.time()
+            response_time_ms = int((end_time - start_time) * 1000)
+            
+            response_text = result.get('response', '').strip()
+            
+            # Ollama's own counts and timings; the model's tokenizer only if it reported none
+            usage = usage_from_ollama(result) or CallUsage(
+                prompt_tokens=token_counter.count(prompt, payload.get('model')),
+                completion_tokens=token_counter.count(response_text, payload.get('model')),
+                source="estimated"
+            )
+            
+            # Create metrics dictionary
+            metrics = {
+                'response_time_ms': response_time_ms,
+                'prompt_tokens': usage.prompt_tokens,
+                'response_tokens': usage.completion_tokens,
+                'token_source': usage.source,
+                'tokens_per_second': usage.as_dict()['tokens_per_second'],
+                'prompt_eval_ms': usage.prompt_eval_ms,
+                'load_ms': usage.load_ms
+            }
+            
+            return response_text, metrics
+            
+        except requests.exceptions.RequestException as e:
+            if isinstance(e, requests.exceptions.ConnectionError):
+                model_health_monitor.mark_unavailable()
+            raise Exception(f"Failed to connect to Ollama: {str(e)}. Make sure Ollama is running with {self.model} model.")
     
     def _parse_classification_response(self, response: str) -> List[str]:
-        """Parse the LLM response and extract categories"""
+        """Parse the LLM response and extract categories
+
+        Requests are constrained to CLASSIFICATION_RESPONSE_SCHEMA, so the response
+        should be a bare JSON array. An array embedded in free text is still
+        accepted for models/servers that ignore `format`.
+
+        Raises:
+            ClassificationParseError: If no valid category array can be parsed, so
+                failures aren't mistaken for "no categories apply"
+        """
+        from config.ollama_config import CLASSIFICATION_CATEGORIES
+
+        response = response.strip()
         try:
-            # Clean the response - remove any extra text before/after JSON
-            response = response.strip()
-            
-            # Find JSON array in the response
+            categories = json.loads(response)
+        except json.JSONDecodeError:
             start_idx = response.find('[')
             end_idx = response.rfind(']') + 1
-            
             if start_idx == -1 or end_idx == 0:
-                logger.warning(f"No JSON array found in response: {response}")
-                return []
-            
-            json_str = response[start_idx:end_idx]
-            categories = json.loads(json_str)
-            
-            # Validate categories
-            valid_categories = {'health', 'career', 'learning'}
-            if isinstance(categories, list):
-                valid_cats = [cat for cat in categories if cat in valid_categories]
-                return valid_cats
-            else:
-                logger.warning(f"Invalid response format: {response}")
-                return []
-                
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse JSON from response '{response}': {str(e)}")
-            return []
+                raise ClassificationParseError(f"No JSON array found in response: {response!r}")
+            try:
+                categories = json.loads(response[start_idx:end_idx])
+            except json.JSONDecodeError as e:
+                raise ClassificationParseError(f"Failed to parse JSON from response {response!r}: {e}")
+
+        if not isinstance(categories, list):
+            raise ClassificationParseError(f"Invalid response format: {response!r}")
+
+        # Preserve order, drop duplicates and anything outside the category set
+        return [cat for i, cat in enumerate(categories)
+                if cat in CLASSIFICATION_CATEGORIES and cat not in categories[:i]]
+    
+    def get_classification_identity(self) -> tuple[str, str]:
+        """Get (prompt_version, model) for the prompt and model classifications currently use
+
+        Stored per task so startup only reclassifies tasks that a different
+        prompt version or model looked at.
+        """
+        from config.ollama_config import CLASSIFICATION_CONFIG
+        model = self.model_override or CLASSIFICATION_CONFIG.get("model", self.model)
+        if self.prompt_version:
+            return self._prompt_version_label(self._pinned_prompt_metadata()), model
+        try:
+            from config.prompt_manager import prompt_manager
+            prompt_version = self._prompt_version_label(prompt_manager.get_prompt("classifier", label="production"))
         except Exception as e:
-            logger.warning(f"Unexpected error parsing response '{response}': {str(e)}")
-            return []
+            logger.warning(f"Failed to load classifier prompt metadata, using fallback version: {e}")
+            prompt_version = self._prompt_version_label({"source": "hardcoded_fallback"})
+        return prompt_version, model
+    
+    def _pinned_prompt_metadata(self) -> dict:
+        return {"source": "registry", "name": "task_classification", "version": self.prompt_version}
+    
+    def _prompt_version_label(self, prompt_metadata: dict) -> str:
+        """Build a stable label for the prompt version used, e.g. 'langfuse:classifier:v3'"""
+        source = prompt_metadata.get("source", "unknown")
+        name = prompt_metadata.get("name", "classifier")
+        version = prompt_metadata.get("version")
+        return f"{source}:{name}:v{version}" if version is not None else f"{source}:{name}"
     
     def _log_classification(self, title: str, description: str, categories: List[str], raw_response: str, metrics: dict = None):
-        """Log the classification result to file"""
+        """Log the classification result to the buffered prediction log"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         task_text = title
         if description:
@@ -460,29 +582,19 @@ class TaskClassificationService:
             log_entry.update({
                 "response_time_ms": metrics.get('response_time_ms'),
                 "prompt_tokens": metrics.get('prompt_tokens'),
-                "response_tokens": metrics.get('response_tokens')
+                "response_tokens": metrics.get('response_tokens'),
+                "token_source": metrics.get('token_source'),
+                "tokens_per_second": metrics.get('tokens_per_second')
             })
         
         try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
+            self.prediction_log.write(log_entry)
         except Exception as e:
             logger.error(f"Failed to write to log file: {str(e)}")
     
-    def is_ollama_available(self) -> bool:
-        """Check if Ollama is available and running"""
-        try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
-    
     def get_available_models(self) -> List[str]:
         """Get list of available Ollama models"""
         try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            return [model['name'] for model in data.get('models', [])]
-        except:
+            return ollama_client.list_models()
+        except Exception:
             return []
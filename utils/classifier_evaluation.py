@@ -0,0 +1,259 @@
+"""
+Offline evaluation of classifier prompt versions and models
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config.ollama_config import CLASSIFICATION_CATEGORIES
+from utils.classification_service import TaskClassificationService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EvaluationVariant:
+    """One prompt version/model combination to evaluate"""
+    prompt_version: Optional[str] = None  # None means the production classifier prompt
+    model: Optional[str] = None  # None means the configured classification model
+
+    @property
+    def label(self) -> str:
+        return f"{self.prompt_version or 'production'} @ {self.model or 'default'}"
+
+
+@dataclass
+class EvaluationResult:
+    """Outcome of classifying one labelled task with one variant"""
+    task_text: str
+    expected: List[str]
+    predicted: List[str]
+    fallback: bool = False
+    response_time_ms: float = 0.0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+
+
+@dataclass
+class VariantReport:
+    """Aggregated results for one variant"""
+    variant: EvaluationVariant
+    results: List[EvaluationResult] = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = len(self.results)
+        latencies = sorted(r.response_time_ms for r in self.results)
+        return {
+            "variant": self.variant.label,
+            "prompt_version": self.variant.prompt_version,
+            "model": self.variant.model,
+            "examples": total,
+            "exact_match_accuracy": round(sum(set(r.predicted) == set(r.expected) for r in self.results) / total, 3) if total else None,
+            "fallback_rate": round(sum(r.fallback for r in self.results) / total, 3) if total else None,
+            "per_category": category_scores([(r.expected, r.predicted) for r in self.results]),
+            "tokens": {
+                "prompt": sum(r.prompt_tokens for r in self.results),
+                "response": sum(r.response_tokens for r in self.results),
+            },
+            "latency_ms": {
+                "mean": round(sum(latencies) / total, 1) if total else None,
+                "p50": latencies[total // 2] if total else None,
+                "p95": latencies[min(int(total * 0.95), total - 1)] if total else None,
+            },
+            "wall_seconds": round(self.wall_seconds, 3),
+            "throughput_tasks_per_s": round(total / self.wall_seconds, 2) if self.wall_seconds else None,
+        }
+
+
+def category_scores(pairs: Iterable[Tuple[Iterable[str], Iterable[str]]],
+                    categories: Iterable[str] = CLASSIFICATION_CATEGORIES) -> Dict[str, Dict[str, Any]]:
+    """Precision/recall/F1 per category from (expected, predicted) category pairs"""
+    counts = {c: {"tp": 0, "fp": 0, "fn": 0} for c in categories}
+    for expected, predicted in pairs:
+        expected, predicted = set(expected), set(predicted)
+        for category, c in counts.items():
+            if category in predicted and category in expected:
+                c["tp"] += 1
+            elif category in predicted:
+                c["fp"] += 1
+            elif category in expected:
+                c["fn"] += 1
+
+    report = {}
+    for category, c in counts.items():
+        precision = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else None
+        recall = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else None
+        f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+        report[category] = {
+            "precision": round(precision, 3) if precision is not None else None,
+            "recall": round(recall, 3) if recall is not None else None,
+            "f1": round(f1, 3) if f1 is not None else None,
+            **c
+        }
+    return report
+
+
+class RecordedResponses:
+    """Record/replay store for Ollama classification responses
+
+    Keyed by a hash of (model, prompt), so a recording made against Ollama can
+    be replayed later without a running model. In replay mode a missing
+    recording raises, which the classification service treats like an Ollama
+    failure (keyword fallback), so it shows up in the fallback rate.
+    """
+
+    def __init__(self, path: str, mode: str = "replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.responses[entry["key"]] = entry
+                    except (json.JSONDecodeError, KeyError):
+                        continue
+
+    @staticmethod
+    def key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()
+
+    def wrap(self, service: TaskClassificationService):
+        """Route the service's Ollama calls through this store"""
+        send_to_ollama = service._send_to_ollama
+        model = service.get_classification_identity()[1]
+
+        def recorded_send(prompt: str, max_retries: Optional[int] = None):
+            key = self.key(model, prompt)
+            if self.mode == "replay":
+                entry = self.responses.get(key)
+                if entry is None:
+                    raise Exception(f"No recorded response for model {model} (key {key[:12]})")
+                return entry["response"], entry["metrics"]
+
+            response, metrics = send_to_ollama(prompt, max_retries)
+            with self._lock:
+                self.responses[key] = {"key": key, "model": model, "response": response, "metrics": metrics}
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(self.responses[key]) + '\n')
+            return response, metrics
+
+        service._send_to_ollama = recorded_send
+
+
+class ClassifierEvaluator:
+    """Replays a labelled task set through prompt versions/models using TaskClassificationService
+
+    Each variant gets its own service instance with the fast path disabled, so
+    every task goes through the production prompt building, Ollama request and
+    response parsing code. Tasks across all variants share one thread pool.
+    """
+
+    def __init__(self, variants: List[EvaluationVariant], max_workers: int = 4,
+                 recorded: Optional[RecordedResponses] = None,
+                 log_file: str = "data/evaluations/classification_eval_log.txt"):
+        self.variants = variants
+        self.max_workers = max_workers
+        self.recorded = recorded
+        self.log_file = log_file
+        self._calls = threading.local()
+
+    def _build_service(self, variant: EvaluationVariant) -> TaskClassificationService:
+        service = TaskClassificationService(
+            log_file=self.log_file,
+            fast_model_file=None,
+            prompt_version=variant.prompt_version,
+            model=variant.model
+        )
+        if self.recorded:
+            self.recorded.wrap(service)
+
+        # Capture raw response and metrics of the current call on this thread
+        log_classification = service._log_classification
+
+        def capture(title, description, categories, raw_response, metrics=None):
+            self._calls.last = (raw_response, metrics or {})
+            log_classification(title, description, categories, raw_response, metrics)
+
+        service._log_classification = capture
+        return service
+
+    def _classify(self, service: TaskClassificationService, task_text: str, expected: List[str]) -> EvaluationResult:
+        self._calls.last = ("", {})
+        title, _, description = task_text.partition(" - ")
+        predicted = service.classify_task(title, description)
+        raw_response, metrics = self._calls.last
+        return EvaluationResult(
+            task_text=task_text,
+            expected=expected,
+            predicted=predicted,
+            fallback=str(raw_response).startswith("FALLBACK"),
+            response_time_ms=metrics.get('response_time_ms') or 0,
+            prompt_tokens=metrics.get('prompt_tokens') or 0,
+            response_tokens=metrics.get('response_tokens') or 0
+        )
+
+    def run(self, dataset: List[Tuple[str, List[str]]]) -> List[VariantReport]:
+        """Evaluate every variant on the (task_text, expected_categories) dataset"""
+        reports = [VariantReport(variant) for variant in self.variants]
+        services = [self._build_service(variant) for variant in self.variants]
+        started = [None] * len(reports)
+        finished = [0.0] * len(reports)
+        lock = threading.Lock()
+
+        def run_one(index: int, task_text: str, expected: List[str]) -> Tuple[int, EvaluationResult]:
+            with lock:
+                if started[index] is None:
+                    started[index] = time.perf_counter()
+            result = self._classify(services[index], task_text, expected)
+            with lock:
+                finished[index] = time.perf_counter()
+            return index, result
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # Interleave variants so they progress side by side rather than one after another
+                futures = [executor.submit(run_one, i, text, expected)
+                           for text, expected in dataset for i in range(len(reports))]
+                for future in futures:
+                    index, result = future.result()
+                    reports[index].results.append(result)
+        finally:
+            # Variants logging to the same file share one writer
+            for prediction_log in {service.prediction_log for service in services}:
+                prediction_log.close()
+
+        for i, report in enumerate(reports):
+            report.wall_seconds = finished[i] - started[i] if started[i] is not None else 0.0
+        return reports
+
+
+def load_labelled_tasks(limit: Optional[int] = None, include_uncategorized: bool = False) -> List[Tuple[str, List[str]]]:
+    """Labelled (task_text, categories) pairs from the categories stored on tasks
+
+    Uncategorized tasks are excluded by default because an empty list may just
+    mean "never classified"; include them when they have been reviewed, so
+    precision accounts for tasks that should get no category.
+    """
+    from models.task_db import TaskDB
+
+    dataset = []
+    for task in TaskDB.get_all():
+        if not task.categories and not include_uncategorized:
+            continue
+        task_text = f"{task.title} - {task.description}" if task.description else task.title
+        dataset.append((task_text, [c for c in task.categories if c in CLASSIFICATION_CATEGORIES]))
+        if limit and len(dataset) >= limit:
+            break
+    return dataset
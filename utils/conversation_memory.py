@@ -0,0 +1,200 @@
+"""
+Server-side conversation memory for agent sessions
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models.session_db import SessionDB, TraceDB
+
+logger = logging.getLogger(__name__)
+
+# Tokens of conversation history (summary included) sent with each LLM call
+CONTEXT_TOKEN_BUDGET = 1500
+
+# Compaction folds the oldest turns into the summary until this share of the budget is left
+COMPACT_TO_RATIO = 0.5
+
+# Hard cap on the stored summary, in case the summarizer ignores its length limit
+MAX_SUMMARY_CHARS = 2000
+
+# Session metadata key holding {"summary", "summarized_through", "summarized_through_at",
+# "summarized_turns", "updated_at"}
+MEMORY_METADATA_KEY = "memory"
+
+# Summaries are LLM calls; one worker keeps them off the request path without competing for the model
+_summary_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-summary")
+
+
+class ConversationMemory:
+    """
+    Bounded conversation history built from a session's completed traces
+
+    Each completed trace is one turn (user message + assistant response).
+    Turns are sent verbatim until they exceed the token budget; compaction
+    then folds the oldest ones into a rolling summary stored in the session
+    metadata. Between compactions the window start doesn't move, so the
+    history stays a stable prompt prefix (see build_llm_messages). If a
+    compaction is late or fails, load() drops the oldest turns instead, so
+    the history never exceeds the budget.
+    """
+
+    def __init__(self, count_tokens: Callable[[List[Dict[str, str]]], int],
+                 summarize: Callable[[str, List[Dict[str, str]]], str],
+                 token_budget: int = CONTEXT_TOKEN_BUDGET, compact_to_ratio: float = COMPACT_TO_RATIO):
+        """
+        Args:
+            count_tokens: Token count of a list of context messages ({"type", "content"} dicts)
+            summarize: (previous summary, turns to fold in) -> new summary
+            token_budget: Maximum tokens of history per LLM call
+            compact_to_ratio: Share of the budget the verbatim turns are compacted down to
+        """
+        self.count_tokens = count_tokens
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.compact_to_ratio = compact_to_ratio
+        self._compacting = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _turn_messages(trace: TraceDB) -> List[Dict[str, str]]:
+        return [{"type": "user", "content": trace.user_message},
+                {"type": "bot", "content": trace.assistant_response}]
+
+    def _load_turns(self, session_id: str) -> Tuple[Dict[str, Any], List[TraceDB]]:
+        """Memory metadata and the completed traces not yet folded into the summary"""
+        session = SessionDB.get_by_id(session_id)
+        memory = dict(session.metadata.get(MEMORY_METADATA_KEY) or {}) if session else {}
+        traces = [t for t in TraceDB.get_by_session_id(session_id)
+                  if t.status == "completed" and t.assistant_response]
+
+        summarized_through = memory.get("summarized_through")
+        if summarized_through:
+            ids = [t.id for t in traces]
+            if summarized_through in ids:
+                traces = traces[ids.index(summarized_through) + 1:]
+            elif memory.get("summarized_through_at"):
+                # The last folded trace is gone (deleted or no longer completed): skip by its timestamp
+                traces = [t for t in traces if t.created_at > memory["summarized_through_at"]]
+            else:
+                traces = traces[memory.get("summarized_turns", 0):]
+        return memory, traces
+
+    @staticmethod
+    def _summary_message(summary: str) -> Dict[str, str]:
+        return {"type": "summary", "content": summary}
+
+    def window(self, context: List[Dict[str, str]], budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Newest messages of a context that fit the token budget
+
+        Whole turns are kept together where possible: a dangling bot message
+        at the start of the window is dropped.
+        """
+        budget = self.token_budget if budget is None else budget
+        if self.count_tokens(context) <= budget:
+            return list(context)
+
+        kept: List[Dict[str, str]] = []
+        for message in reversed(context):
+            if self.count_tokens([message] + kept) > budget:
+                break
+            kept.insert(0, message)
+        while kept and kept[0].get("type") == "bot":
+            kept.pop(0)
+        return kept
+
+    def load(self, session_id: str) -> List[Dict[str, str]]:
+        """
+        History to send for the session's next turn
+
+        Returns:
+            Context messages: the rolling summary (type "summary"), if any,
+            followed by the most recent turns within the token budget
+        """
+        memory, traces = self._load_turns(session_id)
+        summary = memory.get("summary")
+        prefix = [self._summary_message(summary)] if summary else []
+
+        turns = [message for trace in traces for message in self._turn_messages(trace)]
+        remaining = self.token_budget - (self.count_tokens(prefix) if prefix else 0)
+        window = self.window(turns, max(remaining, 0))
+        if len(window) < len(turns):
+            logger.info(f"Session {session_id}: {len(turns) - len(window)} history messages over budget awaiting summary")
+        return prefix + window
+
+    def needs_compaction(self, session_id: str) -> bool:
+        """Whether the verbatim turns plus the summary exceed the token budget"""
+        memory, traces = self._load_turns(session_id)
+        summary = memory.get("summary")
+        context = ([self._summary_message(summary)] if summary else []) + \
+                  [message for trace in traces for message in self._turn_messages(trace)]
+        return self.count_tokens(context) > self.token_budget
+
+    def compact(self, session_id: str) -> bool:
+        """
+        Fold the oldest unsummarized turns into the session's summary
+
+        Keeps the newest turns verbatim until they fit compact_to_ratio of the
+        budget (always at least the last turn). On a summarizer failure nothing
+        is stored and the next turn retries.
+
+        Returns:
+            True if a new summary was stored
+        """
+        with self._lock:
+            if session_id in self._compacting:
+                return False
+            self._compacting.add(session_id)
+        try:
+            memory, traces = self._load_turns(session_id)
+            if len(traces) < 2:
+                return False
+
+            target = int(self.token_budget * self.compact_to_ratio)
+            keep = 1
+            while keep < len(traces) and self.count_tokens(
+                    [message for trace in traces[-(keep + 1):] for message in self._turn_messages(trace)]) <= target:
+                keep += 1
+            folded = traces[:-keep]
+
+            turns = [message for trace in folded for message in self._turn_messages(trace)]
+            try:
+                summary = self.summarize(memory.get("summary", ""), turns).strip()
+            except Exception as e:
+                logger.warning(f"Conversation summary failed for session {session_id}: {e}")
+                return False
+            if not summary:
+                return False
+
+            memory.update({
+                "summary": summary[:MAX_SUMMARY_CHARS],
+                "summarized_through": folded[-1].id,
+                "summarized_through_at": folded[-1].created_at,
+                "summarized_turns": memory.get("summarized_turns", 0) + len(folded),
+                "updated_at": datetime.now().isoformat()
+            })
+            SessionDB.set_metadata_value(session_id, MEMORY_METADATA_KEY, memory)
+            logger.info(f"Session {session_id}: folded {len(folded)} turns into the conversation summary")
+            return True
+        finally:
+            with self._lock:
+                self._compacting.discard(session_id)
+
+    def schedule_compaction(self, session_id: str) -> Optional[Future]:
+        """Compact in the background if the session is over budget"""
+        try:
+            if not self.needs_compaction(session_id):
+                return None
+        except Exception as e:
+            logger.warning(f"Could not check conversation memory for session {session_id}: {e}")
+            return None
+        return _summary_pool.submit(self.compact, session_id)
+
+
+def format_turns(turns: List[Dict[str, str]]) -> str:
+    """Render context messages as a plain transcript for the summarizer"""
+    speakers = {"user": "User", "bot": "Assistant", "summary": "Summary"}
+    return "\n".join(f"{speakers.get(m.get('type'), m.get('type'))}: {m.get('content', '')}" for m in turns)
@@ -0,0 +1,194 @@
+"""
+Fast local task classifier used ahead of the Ollama LLM
+
+A multinomial Naive Bayes model per category (one-vs-rest, so tasks can
+have 0..n labels) over word unigrams and bigrams. It is trained on the
+logged LLM predictions and the categories already stored on tasks, and
+only answers when every category is confidently in or out; anything
+else is escalated to the LLM.
+"""
+import json
+import math
+import re
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ['health', 'career', 'learning']
+
+_URL_PATTERN = re.compile(r'https?://\S+|www\.\S+', re.IGNORECASE)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9']*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word unigrams plus adjacent bigrams, with URLs stripped"""
+    words = _TOKEN_PATTERN.findall(_URL_PATTERN.sub(' ', text.lower()))
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class FastPrediction:
+    """Result of a fast-path prediction"""
+
+    def __init__(self, categories: List[str], probabilities: Dict[str, float], confident: bool):
+        self.categories = categories
+        self.probabilities = probabilities
+        self.confident = confident
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'categories': self.categories,
+            'probabilities': self.probabilities,
+            'confident': self.confident
+        }
+
+
+class FastClassifier:
+    """One-vs-rest multinomial Naive Bayes over task text"""
+
+    def __init__(self, categories: Optional[List[str]] = None, alpha: float = 1.0,
+                 high_confidence: float = 0.9, low_confidence: float = 0.1,
+                 min_known_tokens: int = 1):
+        self.categories = categories or list(CATEGORIES)
+        self.alpha = alpha
+        self.high_confidence = high_confidence
+        self.low_confidence = low_confidence
+        self.min_known_tokens = min_known_tokens
+
+        # Per category: log prior of (in, out) and per-token log likelihoods for (in, out)
+        self.log_priors: Dict[str, Tuple[float, float]] = {}
+        self.token_log_probs: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        self.unknown_log_probs: Dict[str, Tuple[float, float]] = {}
+        self.vocabulary: set = set()
+        self.trained_at = None
+        self.training_size = 0
+
+    def fit(self, examples: Iterable[Tuple[str, List[str]]]) -> 'FastClassifier':
+        """Train on (task_text, categories) pairs"""
+        examples = list(examples)
+        tokenized = [(tokenize(text), set(labels)) for text, labels in examples]
+        self.vocabulary = {token for tokens, _ in tokenized for token in tokens}
+        vocab_size = max(len(self.vocabulary), 1)
+
+        for category in self.categories:
+            in_counts: Dict[str, int] = {}
+            out_counts: Dict[str, int] = {}
+            in_docs = out_docs = 0
+
+            for tokens, labels in tokenized:
+                counts = in_counts if category in labels else out_counts
+                if category in labels:
+                    in_docs += 1
+                else:
+                    out_docs += 1
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+
+            in_total = sum(in_counts.values()) + self.alpha * vocab_size
+            out_total = sum(out_counts.values()) + self.alpha * vocab_size
+            total_docs = in_docs + out_docs + 2 * self.alpha
+
+            self.log_priors[category] = (
+                math.log((in_docs + self.alpha) / total_docs),
+                math.log((out_docs + self.alpha) / total_docs)
+            )
+            self.token_log_probs[category] = {
+                token: (
+                    math.log((in_counts.get(token, 0) + self.alpha) / in_total),
+                    math.log((out_counts.get(token, 0) + self.alpha) / out_total)
+                )
+                for token in set(in_counts) | set(out_counts)
+            }
+            self.unknown_log_probs[category] = (
+                math.log(self.alpha / in_total),
+                math.log(self.alpha / out_total)
+            )
+
+        self.trained_at = datetime.now().isoformat()
+        self.training_size = len(examples)
+        return self
+
+    def predict(self, text: str) -> FastPrediction:
+        """Predict categories and whether the prediction is confident enough to skip the LLM"""
+        tokens = tokenize(text)
+        known_tokens = [token for token in tokens if token in self.vocabulary]
+
+        probabilities = {}
+        for category in self.categories:
+            log_in, log_out = self.log_priors.get(category, (0.0, 0.0))
+            table = self.token_log_probs.get(category, {})
+            for token in known_tokens:
+                token_in, token_out = table.get(token, self.unknown_log_probs[category])
+                log_in += token_in
+                log_out += token_out
+            # Sigmoid of the log-odds, clamped to avoid overflow on long texts
+            log_odds = max(min(log_in - log_out, 50.0), -50.0)
+            probabilities[category] = 1.0 / (1.0 + math.exp(-log_odds))
+
+        categories = [c for c in self.categories if probabilities[c] >= 0.5]
+        confident = (
+            self.training_size > 0
+            and len(known_tokens) >= self.min_known_tokens
+            and all(p >= self.high_confidence or p <= self.low_confidence for p in probabilities.values())
+        )
+        return FastPrediction(categories, probabilities, confident)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the model for persistence"""
+        return {
+            'categories': self.categories,
+            'alpha': self.alpha,
+            'high_confidence': self.high_confidence,
+            'low_confidence': self.low_confidence,
+            'min_known_tokens': self.min_known_tokens,
+            'log_priors': self.log_priors,
+            'token_log_probs': self.token_log_probs,
+            'unknown_log_probs': self.unknown_log_probs,
+            'trained_at': self.trained_at,
+            'training_size': self.training_size
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FastClassifier':
+        """Restore a model saved with to_dict()"""
+        model = cls(
+            categories=data['categories'],
+            alpha=data.get('alpha', 1.0),
+            high_confidence=data.get('high_confidence', 0.9),
+            low_confidence=data.get('low_confidence', 0.1),
+            min_known_tokens=data.get('min_known_tokens', 1)
+        )
+        model.log_priors = {c: tuple(v) for c, v in data['log_priors'].items()}
+        model.token_log_probs = {
+            c: {token: tuple(v) for token, v in table.items()}
+            for c, table in data['token_log_probs'].items()
+        }
+        model.unknown_log_probs = {c: tuple(v) for c, v in data['unknown_log_probs'].items()}
+        model.vocabulary = {token for table in model.token_log_probs.values() for token in table}
+        model.trained_at = data.get('trained_at')
+        model.training_size = data.get('training_size', 0)
+        return model
+
+    def save(self, path: str):
+        """Write the model artifact as JSON"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['FastClassifier']:
+        """Load a model artifact, or return None if it doesn't exist or is unreadable"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                model = cls.from_dict(json.load(f))
+            logger.info(f"Loaded fast classifier from {path} ({model.training_size} training examples)")
+            return model
+        except Exception as e:
+            logger.warning(f"Failed to load fast classifier from {path}: {e}")
+            return None
@@ -7,6 +7,8 @@ import requests
 from typing import Dict, Any, List, Optional, Union
 from urllib.parse import urljoin
 
+from utils.tracing import span_tracer
+
 logger = logging.getLogger(__name__)
 
 
@@ -48,8 +50,10 @@ class APIClient:
 
         try:
             logger.debug(f"Making {method} request to {url}")
-            response = self.session.request(method, url, **kwargs)
-            response.raise_for_status()
+            with span_tracer.span(f"http.{method.upper()} {endpoint}", method=method.upper(), url=url) as span:
+                response = self.session.request(method, url, **kwargs)
+                span.set_attribute("status_code", response.status_code)
+                response.raise_for_status()
             return response
 
         except requests.exceptions.RequestException as e:
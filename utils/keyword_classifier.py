@@ -0,0 +1,103 @@
+"""
+Compiled keyword matcher for fallback task classification
+"""
+import re
+import logging
+from typing import List, Dict, Optional, Set
+
+from config.classification_keywords import CLASSIFICATION_KEYWORDS
+
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_VOWEL_GROUPS = re.compile(r"[aeiou]+")
+_VOWELS = "aeiou"
+# Past tenses that don't take -ed
+_IRREGULAR_PAST = {
+    "run": ("ran",), "swim": ("swam", "swum"), "read": ("read",), "write": ("wrote", "written"),
+    "meet": ("met",), "teach": ("taught",), "think": ("thought",), "build": ("built",),
+}
+
+
+def inflections(word: str) -> Set[str]:
+    """A keyword and its regular English inflections
+
+    Plural/third person, past tense, -ing and the -er/-ers agent noun, with
+    the spelling rules that make them real words: write -> writing, writer;
+    run -> running, runner, ran; study -> studies, studied.
+    """
+    forms = {word}
+    if len(word) > 2 and word.endswith("y") and word[-2] not in _VOWELS:
+        stem = word[:-1]
+        forms |= {stem + "ies", word + "ing", stem + "ier", stem + "iers"}
+        past = stem + "ied"
+    else:
+        forms.add(word + "es" if word.endswith(("s", "x", "z", "ch", "sh")) else word + "s")
+        if word.endswith("e") and not word.endswith("ee"):
+            forms |= {word[:-1] + "ing", word + "r", word + "rs"}
+            past = word + "d"
+        else:
+            # One-syllable words ending consonant-vowel-consonant double the consonant
+            stem = word
+            if (len(word) >= 3 and word[-1] not in _VOWELS + "wxy" and word[-2] in _VOWELS
+                    and word[-3] not in _VOWELS and len(_VOWEL_GROUPS.findall(word)) == 1):
+                stem = word + word[-1]
+            forms |= {stem + "ing", stem + "er", stem + "ers"}
+            past = stem + "ed"
+    return forms | set(_IRREGULAR_PAST.get(word, (past,)))
+
+
+class KeywordClassifier:
+    """Word-boundary keyword classifier compiled once from the configured keyword sets
+
+    Each category's keywords are expanded into a frozen set of accepted word
+    forms (keyword plus inflections()). Classifying a task is one tokenizing
+    regex pass followed by a C-level set-disjointness check per category,
+    so the cost doesn't grow with the number of keywords. Multi-word
+    keywords are matched with a precompiled phrase regex per category, which
+    only runs when the task contains one of the phrases' first words.
+    """
+
+    def __init__(self, keywords: Optional[Dict[str, List[str]]] = None):
+        self.keywords = keywords or CLASSIFICATION_KEYWORDS
+        self.categories = list(self.keywords)
+        self.word_forms = {}
+        self.phrase_first_words = {}
+        self.phrase_patterns = {}
+
+        for category, words in self.keywords.items():
+            single = [w.lower() for w in words if len(w.split()) == 1]
+            phrases = [w.lower().split() for w in words if len(w.split()) > 1]
+
+            self.word_forms[category] = frozenset(form for word in single for form in inflections(word))
+            self.phrase_first_words[category] = frozenset(parts[0] for parts in phrases)
+            self.phrase_patterns[category] = self._compile_phrases(phrases) if phrases else None
+
+    @staticmethod
+    def _compile_phrases(phrases: List[List[str]]):
+        """Compile multi-word keywords into one word-boundary alternation, inflecting the last word"""
+        alternatives = []
+        for parts in phrases:
+            last = "|".join(re.escape(form) for form in sorted(inflections(parts[-1]), key=len, reverse=True))
+            alternatives.append(r"\s+".join([re.escape(part) for part in parts[:-1]] + [f"(?:{last})"]))
+        return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b")
+
+    def _classify_lowered(self, lowered: str) -> List[str]:
+        tokens = set(_WORD_PATTERN.findall(lowered))
+        categories = []
+        for category in self.categories:
+            if not tokens.isdisjoint(self.word_forms[category]):
+                categories.append(category)
+            elif (self.phrase_patterns[category] is not None
+                  and not tokens.isdisjoint(self.phrase_first_words[category])
+                  and self.phrase_patterns[category].search(lowered)):
+                categories.append(category)
+        return categories
+
+    def classify(self, text: str) -> List[str]:
+        """Classify a single text"""
+        return self._classify_lowered(text.lower())
+
+
+# Global keyword classifier instance, compiled once at import
+keyword_classifier = KeywordClassifier()
@@ -0,0 +1,194 @@
+"""
+Background health monitor for the local Ollama server and model residency
+"""
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from config.ollama_config import OLLAMA_HOST, DEFAULT_MODEL, KEEP_ALIVE
+from utils.ollama_client import OllamaClient, ollama_client
+
+logger = logging.getLogger(__name__)
+
+
+class ModelHealthMonitor:
+    """Tracks Ollama reachability and whether the model is resident in memory
+
+    Reachability comes from /api/tags and residency from /api/ps. Both are
+    polled on a background thread so the classification and chat hot paths
+    can read the cached state instead of probing Ollama on every request.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_HOST, model: str = DEFAULT_MODEL,
+                 keep_alive: str = KEEP_ALIVE, poll_interval: int = 30,
+                 stale_after: int = 60, client: Optional[OllamaClient] = None):
+        self.base_url = base_url.rstrip('/')
+        # Probes share the pooled connection used by generation requests
+        self.client = client or ollama_client
+        self.model = model
+        self.keep_alive = keep_alive
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+
+        self.ollama_available = False
+        self.model_loaded = False
+        self.model_expires_at = None
+        self.last_checked = None
+        self.last_warmup = None
+        self.warmup_count = 0
+
+        self._lock = threading.Lock()
+        self._warmup_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background polling thread"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self._thread.start()
+        logger.info("Model health monitor started")
+
+    def stop(self):
+        """Stop the background polling thread"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        logger.info("Model health monitor stopped")
+
+    def _poll_loop(self):
+        """Refresh the cached state until stopped"""
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Model health refresh failed: {str(e)}")
+            self._stop_event.wait(self.poll_interval)
+
+    def refresh(self) -> Dict[str, Any]:
+        """Probe Ollama once and update the cached state"""
+        available = self._check_available()
+        loaded, expires_at = self._check_model_loaded() if available else (False, None)
+
+        with self._lock:
+            if self.model_loaded and not loaded:
+                logger.info(f"Model {self.model} is no longer resident in Ollama")
+            self.ollama_available = available
+            self.model_loaded = loaded
+            self.model_expires_at = expires_at
+            self.last_checked = time.time()
+
+        return self.get_status()
+
+    def _check_available(self) -> bool:
+        """Check if Ollama is running and accessible"""
+        try:
+            response = self.client.get(f"{self.base_url}/api/tags", timeout=5)
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    def _check_model_loaded(self) -> tuple[bool, Optional[str]]:
+        """Check whether the model is currently loaded, via /api/ps
+
+        Returns:
+            tuple: (is_loaded, expires_at) where expires_at is Ollama's unload deadline
+        """
+        try:
+            response = self.client.get(f"{self.base_url}/api/ps", timeout=5)
+            for entry in response.json().get('models', []):
+                if entry.get('name') == self.model or entry.get('model') == self.model:
+                    return True, entry.get('expires_at')
+            return False, None
+        except Exception as e:
+            logger.debug(f"Failed to query running models: {e}")
+            return False, None
+
+    def _is_stale(self) -> bool:
+        return self.last_checked is None or time.time() - self.last_checked > self.stale_after
+
+    def is_available(self) -> bool:
+        """Return cached Ollama reachability, refreshing only if the state is stale"""
+        if self._is_stale():
+            self.refresh()
+        return self.ollama_available
+
+    def is_model_loaded(self) -> bool:
+        """Return cached model residency, refreshing only if the state is stale"""
+        if self._is_stale():
+            self.refresh()
+        return self.model_loaded
+
+    def ensure_model_loaded(self) -> bool:
+        """Warm up the model only if it has been evicted
+
+        Sends an empty prompt to /api/generate, which makes Ollama load the
+        model (and reset its keep_alive timer) without generating any tokens.
+
+        Returns:
+            True if the model is resident after the call
+        """
+        if self.is_model_loaded():
+            return True
+        if not self.ollama_available:
+            return False
+
+        with self._warmup_lock:
+            # Another thread may have loaded the model while we waited
+            if self.model_loaded:
+                return True
+
+            try:
+                start_time = time.time()
+                self.client.request(
+                    'POST', f"{self.base_url}/api/generate",
+                    json={"model": self.model, "prompt": "", "keep_alive": self.keep_alive},
+                    timeout=120, retries=0
+                )
+
+                with self._lock:
+                    self.model_loaded = True
+                    self.last_warmup = time.time()
+                    self.warmup_count += 1
+
+                logger.info(f"Model {self.model} loaded in {int((time.time() - start_time) * 1000)}ms")
+                return True
+            except Exception as e:
+                logger.warning(f"Model warmup failed: {str(e)}")
+                return False
+
+    def mark_model_used(self):
+        """Record that a request just hit the model, which resets Ollama's keep_alive timer"""
+        with self._lock:
+            if self.ollama_available:
+                self.model_loaded = True
+
+    def mark_unavailable(self):
+        """Record a failed request so callers stop routing work to Ollama until the next poll"""
+        with self._lock:
+            self.ollama_available = False
+            self.model_loaded = False
+            self.last_checked = time.time()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the cached health state"""
+        with self._lock:
+            return {
+                'ollama_available': self.ollama_available,
+                'model': self.model,
+                'model_loaded': self.model_loaded,
+                'model_expires_at': self.model_expires_at,
+                'keep_alive': self.keep_alive,
+                'last_checked': datetime.fromtimestamp(self.last_checked).isoformat() if self.last_checked else None,
+                'last_warmup': datetime.fromtimestamp(self.last_warmup).isoformat() if self.last_warmup else None,
+                'warmup_count': self.warmup_count
+            }
+
+
+# Global model health monitor instance
+model_health_monitor = ModelHealthMonitor()
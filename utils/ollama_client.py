@@ -0,0 +1,443 @@
+"""
+Shared Ollama HTTP clients with connection pooling, per-model concurrency limits and retries
+"""
+import asyncio
+import json as jsonlib
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.ollama_config import OLLAMA_HOST, REQUEST_TIMEOUT
+from utils.agent_metrics import llm_request_seconds, prompt_cache_metrics
+from utils.token_accounting import token_accounting, usage_from_ollama
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: Ollama returns 503 while loading/overloaded
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class OllamaStats:
+    """Thread-safe per-model request, token and latency accounting"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {
+            'requests': 0, 'failures': 0, 'retries': 0, 'in_flight': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0, 'total_latency_ms': 0.0
+        })
+
+    def start(self, model: str):
+        with self._lock:
+            self._stats[model]['in_flight'] += 1
+
+    def retry(self, model: str):
+        with self._lock:
+            self._stats[model]['retries'] += 1
+
+    def finish(self, model: str, latency_ms: float, success: bool, result: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            stats = self._stats[model]
+            stats['in_flight'] -= 1
+            stats['requests'] += 1
+            stats['total_latency_ms'] += latency_ms
+            if not success:
+                stats['failures'] += 1
+            if result:
+                stats['prompt_tokens'] += result.get('prompt_eval_count') or 0
+                stats['completion_tokens'] += result.get('eval_count') or 0
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                model: {**stats, 'average_latency_ms': round(stats['total_latency_ms'] / stats['requests'], 1) if stats['requests'] else 0.0}
+                for model, stats in self._stats.items()
+            }
+
+
+class ModelConcurrencyLimit:
+    """Per-model cap on in-flight requests, shared by threads and asyncio tasks
+
+    The sync client blocks on the model's BoundedSemaphore and the async
+    client takes the same semaphore through aslot(), as do the agent's
+    OpenAI-compatible (/v1) LLM calls through ollama_client.limits, so
+    classification and chat turns together never exceed the limit. aslot() polls with a short backoff
+    instead of parking a thread on acquire(), so a cancelled task never
+    takes a slot it can't release; the wait is negligible next to an LLM
+    call.
+    """
+
+    def __init__(self, max_per_model: int = 2):
+        self.max_per_model = max_per_model
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def semaphore(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if model not in self._semaphores:
+                self._semaphores[model] = threading.BoundedSemaphore(self.max_per_model)
+            return self._semaphores[model]
+
+    @asynccontextmanager
+    async def aslot(self, model: str, poll_interval: float = 0.005,
+                    max_poll_interval: float = 0.05) -> AsyncIterator[None]:
+        semaphore = self.semaphore(model)
+        while not semaphore.acquire(blocking=False):
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, max_poll_interval)
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+def prompt_token_usage(result: Dict[str, Any]) -> Optional[Dict[str, int]]:
+    """
+    Prompt tokens and how many Ollama evaluated, from a final /api/generate response
+
+    `context` holds the prompt and response tokens in the model's own
+    tokenizer, so the prompt size is exact; prompt_eval_count only counts
+    tokens not served from the KV cache (and is omitted when that is zero).
+    Returns None for responses without a context (e.g. /api/chat).
+    """
+    context = result.get('context')
+    if not context:
+        return None
+    evaluated = result.get('prompt_eval_count') or 0
+    prompt_tokens = max(len(context) - (result.get('eval_count') or 0), evaluated)
+    return {'prompt_tokens': prompt_tokens, 'evaluated_tokens': evaluated}
+
+
+def _record_prompt_cache(call: Optional[str], model: str, result: Optional[Dict[str, Any]]):
+    usage = prompt_token_usage(result) if result else None
+    if usage:
+        prompt_cache_metrics.record_call(call or model, model=model, **usage)
+
+
+def _finish_call(stats: OllamaStats, call: Optional[str], model: str, start_time: float,
+                 result: Optional[Dict[str, Any]]):
+    """Account a finished model call in the client stats, token and prompt cache metrics and LLM latency histogram"""
+    elapsed = time.time() - start_time
+    stats.finish(model, elapsed * 1000, success=result is not None, result=result)
+    _record_prompt_cache(call, model, result)
+    usage = usage_from_ollama(result) if result else None
+    if usage:
+        token_accounting.record(call or model, model, usage)
+    llm_request_seconds.labels(model=model, prompt=call or 'unknown').observe(elapsed)
+
+
+def _backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """Exponential backoff with full jitter, so concurrent retries don't stampede Ollama"""
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+class OllamaClient:
+    """Synchronous Ollama client over a pooled keep-alive requests.Session
+
+    Requests for the same model are limited to `max_concurrency_per_model`
+    in flight (Ollama queues the rest anyway, so excess concurrency only adds
+    timeouts). Connection errors, timeouts and retryable status codes are
+    retried with jittered exponential backoff. Failures are raised as the
+    usual requests exceptions so existing error handling keeps working.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_HOST, pool_size: int = 10,
+                 max_concurrency_per_model: int = 2, timeout: float = REQUEST_TIMEOUT,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 limits: Optional[ModelConcurrencyLimit] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limits = limits or ModelConcurrencyLimit(max_concurrency_per_model)
+        self.max_concurrency_per_model = self.limits.max_per_model
+        self.stats = OllamaStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _url(self, path: str) -> str:
+        return path if path.startswith(('http://', 'https://')) else f"{self.base_url}/{path.lstrip('/')}"
+
+    def _semaphore(self, model: str) -> threading.BoundedSemaphore:
+        return self.limits.semaphore(model)
+
+    def request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None,
+                timeout: Optional[float] = None, model: Optional[str] = None,
+                retries: Optional[int] = None, stream: bool = False) -> requests.Response:
+        """Send a request, limited per model and retried on transient failures
+
+        Args:
+            method: HTTP method
+            path: API path (e.g. "/api/generate") or absolute URL
+            json: JSON body
+            timeout: Seconds, defaults to the client timeout
+            model: Model to count the request against; None skips the concurrency limit
+            retries: Retry count, defaults to the client's max_retries
+            stream: Don't read the body up front (see stream_generate)
+
+        Raises:
+            requests.RequestException: After the last attempt fails
+        """
+        retries = self.max_retries if retries is None else retries
+        timeout = self.timeout if timeout is None else timeout
+        semaphore = self._semaphore(model) if model else None
+        url = self._url(path)
+
+        for attempt in range(retries + 1):
+            try:
+                if semaphore:
+                    semaphore.acquire()
+                try:
+                    response = self.session.request(method, url, json=json, timeout=timeout, stream=stream)
+                finally:
+                    if semaphore:
+                        semaphore.release()
+
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < retries:
+                    raise requests.exceptions.HTTPError(f"{response.status_code} from Ollama", response=response)
+                response.raise_for_status()
+                return response
+
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
+                retryable = not isinstance(e, requests.exceptions.HTTPError) or (
+                    e.response is not None and e.response.status_code in RETRYABLE_STATUS_CODES)
+                if not retryable or attempt >= retries:
+                    raise
+                delay = _backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                if model:
+                    self.stats.retry(model)
+                logger.warning(f"Ollama {method} {path} failed on attempt {attempt + 1} ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def get(self, path: str, timeout: Optional[float] = None, retries: int = 0) -> requests.Response:
+        """GET without retries by default (health probes should answer fast)"""
+        return self.request('GET', path, timeout=timeout, retries=retries)
+
+    def _post_model(self, path: str, payload: Dict[str, Any], timeout: Optional[float],
+                    retries: Optional[int], call: Optional[str] = None) -> Dict[str, Any]:
+        model = payload.get('model', 'unknown')
+        self.stats.start(model)
+        start_time = time.time()
+        result = None
+        try:
+            response = self.request('POST', path, json=payload, timeout=timeout, model=model, retries=retries)
+            result = response.json()
+            return result
+        finally:
+            _finish_call(self.stats, call, model, start_time, result)
+
+    def generate(self, payload: Dict[str, Any], timeout: Optional[float] = None,
+                 retries: Optional[int] = None, call: Optional[str] = None) -> Dict[str, Any]:
+        """Non-streaming /api/generate call; returns Ollama's JSON response
+
+        `call` names the call site in the prompt cache metrics (defaults to the model).
+        """
+        return self._post_model('/api/generate', {**payload, 'stream': False}, timeout, retries, call)
+
+    def chat(self, payload: Dict[str, Any], timeout: Optional[float] = None,
+             retries: Optional[int] = None) -> Dict[str, Any]:
+        """Non-streaming /api/chat call; returns Ollama's JSON response"""
+        return self._post_model('/api/chat', {**payload, 'stream': False}, timeout, retries)
+
+    def stream_generate(self, payload: Dict[str, Any], timeout: Optional[float] = None,
+                        retries: Optional[int] = None, call: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Streaming /api/generate call yielding Ollama's NDJSON chunks as they arrive
+
+        Each chunk carries a `response` text fragment; the last one has
+        `done: true` plus the eval counts used for token accounting. The
+        per-model concurrency slot is held until the stream is exhausted or
+        closed, since Ollama keeps generating until then. Retries only cover
+        establishing the stream, never a stream that already produced output.
+        """
+        model = payload.get('model', 'unknown')
+        semaphore = self._semaphore(model)
+        self.stats.start(model)
+        start_time = time.time()
+        final_chunk = None
+        semaphore.acquire()
+        try:
+            response = self.request('POST', '/api/generate', json={**payload, 'stream': True},
+                                    timeout=timeout, retries=retries, stream=True)
+            try:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = jsonlib.loads(line)
+                    if chunk.get('error'):
+                        raise requests.exceptions.HTTPError(f"Ollama stream error: {chunk['error']}", response=response)
+                    if chunk.get('done'):
+                        final_chunk = chunk
+                    yield chunk
+                    if final_chunk:
+                        break
+            finally:
+                response.close()
+        finally:
+            semaphore.release()
+            _finish_call(self.stats, call, model, start_time, final_chunk)
+
+    def list_models(self, timeout: float = 5) -> List[str]:
+        """Names of the locally available models"""
+        return [model['name'] for model in self.get('/api/tags', timeout=timeout).json().get('models', [])]
+
+    def is_reachable(self, timeout: float = 2) -> bool:
+        """Whether the Ollama server answers /api/tags"""
+        try:
+            return self.get('/api/tags', timeout=timeout).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return self.stats.get_stats()
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncOllamaClient:
+    """asyncio Ollama client over a pooled httpx.AsyncClient
+
+    Same retries and accounting as OllamaClient; pass the sync client's
+    `limits` to share its per-model concurrency cap rather than adding a
+    second one. The httpx client is bound to an event loop, so it is created
+    lazily and, if the client is used from a different loop, the old one is
+    closed on its own loop and replaced.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_HOST, pool_size: int = 10,
+                 max_concurrency_per_model: int = 2, timeout: float = REQUEST_TIMEOUT,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 stats: Optional[OllamaStats] = None, limits: Optional[ModelConcurrencyLimit] = None):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limits = limits or ModelConcurrencyLimit(max_concurrency_per_model)
+        self.max_concurrency_per_model = self.limits.max_per_model
+        self.stats = stats or OllamaStats()
+
+        self._client = None
+        self._loop = None
+
+    def _ensure_client(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is not loop:
+            self._close_on_own_loop(self._client, self._loop)
+            self._client = None
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+            self._loop = loop
+        return self._client
+
+    @staticmethod
+    def _close_on_own_loop(client, loop: asyncio.AbstractEventLoop):
+        """Close a client left behind by another event loop
+
+        Its connections can only be closed from the loop that opened them, so
+        a client whose loop has been closed is left to the garbage collector.
+        """
+        if loop.is_closed():
+            return
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            logger.warning("Dropping an Ollama HTTP client whose event loop is stopped but not closed")
+
+    def _url(self, path: str) -> str:
+        return path if path.startswith(('http://', 'https://')) else f"{self.base_url}/{path.lstrip('/')}"
+
+    async def request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None, model: Optional[str] = None,
+                      retries: Optional[int] = None):
+        """Send a request, limited per model and retried on transient failures
+
+        Raises:
+            httpx.HTTPError: After the last attempt fails
+        """
+        import httpx
+
+        client = self._ensure_client()
+        retries = self.max_retries if retries is None else retries
+        timeout = self.timeout if timeout is None else timeout
+        url = self._url(path)
+
+        for attempt in range(retries + 1):
+            try:
+                if model:
+                    async with self.limits.aslot(model):
+                        response = await client.request(method, url, json=json, timeout=timeout)
+                else:
+                    response = await client.request(method, url, json=json, timeout=timeout)
+                response.raise_for_status()
+                return response
+
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code in RETRYABLE_STATUS_CODES
+                if not retryable or attempt >= retries:
+                    raise
+                delay = _backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                if model:
+                    self.stats.retry(model)
+                logger.warning(f"Ollama {method} {path} failed on attempt {attempt + 1} ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def get(self, path: str, timeout: Optional[float] = None, retries: int = 0):
+        return await self.request('GET', path, timeout=timeout, retries=retries)
+
+    async def _post_model(self, path: str, payload: Dict[str, Any], timeout: Optional[float],
+                          retries: Optional[int], call: Optional[str] = None) -> Dict[str, Any]:
+        model = payload.get('model', 'unknown')
+        self.stats.start(model)
+        start_time = time.time()
+        result = None
+        try:
+            response = await self.request('POST', path, json=payload, timeout=timeout, model=model, retries=retries)
+            result = response.json()
+            return result
+        finally:
+            _finish_call(self.stats, call, model, start_time, result)
+
+    async def generate(self, payload: Dict[str, Any], timeout: Optional[float] = None,
+                       retries: Optional[int] = None, call: Optional[str] = None) -> Dict[str, Any]:
+        """Non-streaming /api/generate call; returns Ollama's JSON response"""
+        return await self._post_model('/api/generate', {**payload, 'stream': False}, timeout, retries, call)
+
+    async def chat(self, payload: Dict[str, Any], timeout: Optional[float] = None,
+                   retries: Optional[int] = None) -> Dict[str, Any]:
+        """Non-streaming /api/chat call; returns Ollama's JSON response"""
+        return await self._post_model('/api/chat', {**payload, 'stream': False}, timeout, retries)
+
+    async def list_models(self, timeout: float = 5) -> List[str]:
+        response = await self.get('/api/tags', timeout=timeout)
+        return [model['name'] for model in response.json().get('models', [])]
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return self.stats.get_stats()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Global Ollama client instances (sharing accounting and the per-model concurrency limit)
+ollama_client = OllamaClient()
+async_ollama_client = AsyncOllamaClient(stats=ollama_client.stats, limits=ollama_client.limits)
@@ -0,0 +1,183 @@
+"""
+Buffered, rotating JSONL log for classification predictions
+"""
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionLogWriter:
+    """Append-only JSONL writer that batches writes and rotates segments
+
+    Entries are buffered in memory and written in one append when the buffer
+    reaches `flush_batch_size`, or by a background thread every
+    `flush_interval` seconds. After a flush, the live file is rotated to
+    `<path>.<YYYYmmdd-HHMMSS-ffffff>` once it exceeds `max_bytes` or the segment is
+    older than `max_age_seconds`. With `compress` on, the rotated segment is
+    gzipped after the buffer lock is released, so writers aren't blocked while
+    it compresses. At most `backup_count` rotated segments are kept (None
+    keeps all). Use get_prediction_log() to share one writer per path.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024,
+                 max_age_seconds: Optional[float] = 7 * 24 * 3600,
+                 flush_interval: float = 5.0, flush_batch_size: int = 50,
+                 compress: bool = True, backup_count: Optional[int] = None):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.compress = compress
+        self.backup_count = backup_count
+
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        # Serializes compressing and pruning rotated segments, outside _lock
+        self._rotation_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._segment_started_at = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+
+        atexit.register(self.close)
+
+    def write(self, entry: Dict[str, Any]):
+        """Queue one entry, flushing if the batch is full"""
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            self._buffer.append(line)
+            should_flush = len(self._buffer) >= self.flush_batch_size
+        self._ensure_flush_thread()
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Write buffered entries to disk and rotate if needed"""
+        rotated = None
+        with self._lock:
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+                if self._segment_started_at is None:
+                    self._segment_started_at = time.time()
+                if self._should_rotate():
+                    rotated = self._rotate()
+            except Exception as e:
+                logger.error(f"Failed to write {len(lines)} entries to prediction log: {str(e)}")
+        if rotated:
+            self._finish_rotation(rotated)
+
+    def close(self):
+        """Stop the background flusher and write any remaining entries"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def _ensure_flush_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._flush_loop, name="PredictionLogFlusher", daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def _should_rotate(self) -> bool:
+        if os.path.getsize(self.path) >= self.max_bytes:
+            return True
+        if self.max_age_seconds is not None and self._segment_started_at is not None:
+            return time.time() - self._segment_started_at >= self.max_age_seconds
+        return False
+
+    def _rotate(self) -> str:
+        """Move the live file to a timestamped segment (called with the lock held)"""
+        # Microseconds keep names unique and chronologically sortable even for rapid rotations
+        rotated = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+
+        os.replace(self.path, rotated)
+        self._segment_started_at = None
+        return rotated
+
+    def _finish_rotation(self, rotated: str):
+        """Compress the rotated segment and drop old ones, without holding the buffer lock"""
+        with self._rotation_lock:
+            try:
+                if self.compress:
+                    # Compress to a temporary name so readers never see a partial .gz
+                    with open(rotated, 'rb') as src, gzip.open(f"{rotated}.gz.tmp", 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+                    os.replace(f"{rotated}.gz.tmp", f"{rotated}.gz")
+                    os.remove(rotated)
+                    rotated = f"{rotated}.gz"
+                logger.info(f"Rotated prediction log to {rotated}")
+
+                if self.backup_count is not None:
+                    for old_segment in list_log_segments(self.path)[:-self.backup_count or None]:
+                        os.remove(old_segment)
+            except Exception as e:
+                logger.error(f"Failed to finish rotating prediction log segment {rotated}: {str(e)}")
+
+
+_writers: Dict[str, PredictionLogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_prediction_log(path: str, **kwargs) -> PredictionLogWriter:
+    """The shared writer for a log path, created (with kwargs) on first use
+
+    Separate writers on one file would each buffer, flush and rotate it
+    independently, so every service logging to a path shares one writer.
+    """
+    key = os.path.abspath(str(path))
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = PredictionLogWriter(path, **kwargs)
+        return writer
+
+
+def list_log_segments(path: str) -> List[str]:
+    """Rotated segments for a log path, oldest first (the live file is not included)"""
+    segments = [p for p in glob.glob(f"{glob.escape(str(path))}.*")
+                if os.path.basename(p)[len(os.path.basename(str(path))) + 1:][:1].isdigit()
+                and not p.endswith('.tmp')]
+    # Fixed-width timestamp suffixes sort chronologically; strip .gz so compression doesn't affect order
+    return sorted(segments, key=lambda p: p[:-3] if p.endswith('.gz') else p)
+
+
+def iter_prediction_log(path: str, include_rotated: bool = True) -> Iterator[Dict[str, Any]]:
+    """Stream entries from the rotated segments (oldest first) and then the live file
+
+    Reads line by line, so memory use doesn't grow with the history size.
+    Malformed lines are skipped.
+    """
+    files = list_log_segments(path) if include_rotated else []
+    if os.path.exists(str(path)):
+        files.append(str(path))
+
+    for file_path in files:
+        opener = gzip.open if file_path.endswith('.gz') else open
+        try:
+            with opener(file_path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except (OSError, EOFError) as e:
+            logger.warning(f"Failed to read prediction log segment {file_path}: {e}")
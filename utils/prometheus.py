@@ -0,0 +1,137 @@
+"""
+Prometheus metrics on prometheus_client, served at /metrics
+
+MetricsRegistry wraps a prometheus_client CollectorRegistry so modules can
+declare the metrics they record at import time without coordinating:
+counter()/gauge()/histogram() return the metric already registered under
+the name instead of raising. Gauges backed by a function (set_function)
+are read at scrape time and cost nothing in between.
+"""
+import functools
+import inspect
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Seconds; suits HTTP handlers and DB queries
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds; local LLM calls take from a fraction of a second to minutes
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+class MetricsRegistry:
+    """
+    The metrics a process exposes
+
+    Names are prefixed with `namespace`; counters get prometheus_client's
+    `_total` suffix.
+    """
+
+    def __init__(self, namespace: str = "giskard", collector_registry: Optional[CollectorRegistry] = None):
+        self.namespace = namespace
+        self.collector_registry = collector_registry or CollectorRegistry()
+        self._metrics: Dict[str, Tuple[object, Tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        labelnames = tuple(labelnames)
+        with self._lock:
+            if name not in self._metrics:
+                metric = cls(name, documentation, labelnames, namespace=self.namespace,
+                             registry=self.collector_registry, **kwargs)
+                self._metrics[name] = (metric, labelnames)
+            metric, registered_labelnames = self._metrics[name]
+            if not isinstance(metric, cls) or registered_labelnames != labelnames:
+                raise ValueError(f"{self.namespace}_{name} is already registered as a different metric")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def sample(self, name: str, **labels) -> Optional[float]:
+        """Current value of one sample (full name without the namespace, e.g. 'agent_requests_total')"""
+        return self.collector_registry.get_sample_value(f"{self.namespace}_{name}", labels)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        return generate_latest(self.collector_registry).decode("utf-8")
+
+
+def timed(histogram: Histogram, **labels) -> Callable:
+    """Decorator observing the seconds each call (sync or async) takes in a histogram"""
+    def decorator(func: Callable) -> Callable:
+        child = histogram.labels(**labels)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with child.time():
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with child.time():
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_app(app, registry: "MetricsRegistry", path: str = "/metrics"):
+    """
+    Time every request of a Flask app per route, and serve the registry at `path`
+
+    The route label is the URL rule (e.g. /api/tasks/<int:task_id>), so
+    label sets stay bounded whatever ids clients send. Streamed responses
+    (e.g. SSE turns) are observed when the stream closes.
+    """
+    from flask import Response, g, request
+
+    request_seconds = registry.histogram(
+        "http_request_duration_seconds",
+        "Flask request latency by route, method and status; streamed responses until the stream closes",
+        ("method", "route", "status")
+    )
+
+    @app.before_request
+    def _start_request_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            child = request_seconds.labels(method=request.method, route=route, status=response.status_code)
+
+            def observe():
+                child.observe(time.perf_counter() - started)
+
+            # Generator bodies (SSE turns) are produced after this hook returns
+            if inspect.isgenerator(response.response):
+                response.call_on_close(observe)
+            else:
+                observe()
+        return response
+
+    @app.route(path, methods=["GET"], endpoint="prometheus_metrics")
+    def _metrics():
+        return Response(registry.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+    return request_seconds
+
+
+# Global metrics registry instance (prometheus_client's default, so process metrics are included)
+registry = MetricsRegistry(collector_registry=REGISTRY)
@@ -0,0 +1,465 @@
+"""
+Task service layer shared by the REST API and in-process agent actions
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+import logging
+
+from models.task_db import TaskDB
+
+logger = logging.getLogger(__name__)
+
+VALID_STATUSES = ['open', 'in_progress', 'done']
+
+
+class TaskServiceError(Exception):
+    """Validation or lookup failure, carrying the HTTP status the API responds with"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _success(message: str, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Response payload in the same shape as the REST API's JSON"""
+    response = {"success": True, "message": message}
+    if data is not None:
+        response.update(data)
+    return response
+
+
+def _enqueue_classification(task: TaskDB):
+    from app import classification_manager
+    classification_manager.enqueue_classification(task)
+
+
+def filter_tasks_by_completed_at(tasks: List[TaskDB], 
+                                completed_at_gte: Optional[str] = None,
+                                completed_at_lt: Optional[str] = None) -> List[TaskDB]:
+    """Filter tasks by completed_at date range using ISO timestamp comparison"""
+    # Parse filter dates - ISO timestamp format only
+    filter_gte = None
+    filter_lt = None
+    
+    if completed_at_gte:
+        try:
+            filter_gte = datetime.fromisoformat(completed_at_gte.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"Invalid date format: {completed_at_gte}. Use ISO format (e.g., 2025-09-29 or 2025-09-29T00:00:00)")
+    
+    if completed_at_lt:
+        try:
+            filter_lt = datetime.fromisoformat(completed_at_lt.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"Invalid date format: {completed_at_lt}. Use ISO format (e.g., 2025-09-29 or 2025-09-29T00:00:00)")
+    
+    filtered_tasks = []
+    
+    for task in tasks:
+        # If filtering by completed_at, only include tasks that have been completed
+        if filter_gte or filter_lt:
+            # Only include completed tasks with valid completed_at
+            if task.status != 'done' or not task.completed_at:
+                continue  # Skip tasks that aren't completed or have null completed_at
+            
+            # Parse task completion date
+            try:
+                task_completed = datetime.fromisoformat(task.completed_at.replace('Z', '+00:00'))
+            except ValueError:
+                continue  # Skip tasks with invalid completed_at
+                
+            # Apply completed_at_gte filter (greater than or equal)
+            if filter_gte and task_completed < filter_gte:
+                continue
+                
+            # Apply completed_at_lt filter (less than)
+            if filter_lt and task_completed >= filter_lt:
+                continue
+                
+            filtered_tasks.append(task)
+        else:
+            # No completed_at filtering, include all tasks
+            filtered_tasks.append(task)
+    
+    return filtered_tasks
+
+
+def convert_period_to_date_range(period: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Convert a period string to date range (gte, lt)
+    
+    Args:
+        period: Period string (this_week, this_month, last_week, last_month, last_7_days, last_30_days)
+        
+    Returns:
+        Tuple of (completed_at_gte, completed_at_lt) ISO date strings
+    """
+    now = datetime.now()
+    today = now.date()
+    
+    if period == "this_week":
+        # Start of this week (Monday)
+        days_since_monday = today.weekday()
+        start_of_week = today - timedelta(days=days_since_monday)
+        return start_of_week.isoformat(), None
+    
+    elif period == "this_month":
+        # Start of this month
+        start_of_month = today.replace(day=1)
+        return start_of_month.isoformat(), None
+    
+    elif period == "last_week":
+        # Start and end of last week
+        days_since_monday = today.weekday()
+        start_of_this_week = today - timedelta(days=days_since_monday)
+        start_of_last_week = start_of_this_week - timedelta(days=7)
+        end_of_last_week = start_of_this_week - timedelta(days=1)
+        return start_of_last_week.isoformat(), end_of_last_week.isoformat()
+    
+    elif period == "last_month":
+        # Start and end of last month
+        if today.month == 1:
+            start_of_last_month = today.replace(year=today.year - 1, month=12, day=1)
+        else:
+            start_of_last_month = today.replace(month=today.month - 1, day=1)
+        
+        start_of_this_month = today.replace(day=1)
+        end_of_last_month = start_of_this_month - timedelta(days=1)
+        return start_of_last_month.isoformat(), end_of_last_month.isoformat()
+    
+    elif period == "last_7_days":
+        # 7 days ago to now
+        seven_days_ago = today - timedelta(days=7)
+        return seven_days_ago.isoformat(), None
+    
+    elif period == "last_30_days":
+        # 30 days ago to now
+        thirty_days_ago = today - timedelta(days=30)
+        return thirty_days_ago.isoformat(), None
+    
+    elif period == "today":
+        # Today only
+        return today.isoformat(), (today + timedelta(days=1)).isoformat()
+    
+    elif period == "yesterday":
+        # Yesterday only
+        yesterday = today - timedelta(days=1)
+        return yesterday.isoformat(), today.isoformat()
+    
+    else:
+        raise ValueError(f"Invalid period: {period}. Valid options: this_week, this_month, last_week, last_month, last_7_days, last_30_days, today, yesterday")
+
+
+def _validate_title(title: str) -> str:
+    title = title.strip()
+    if not title:
+        raise TaskServiceError('Title cannot be empty', 400)
+    if len(title) > 200:
+        raise TaskServiceError('Title too long (max 200 characters)', 400)
+    return title
+
+
+def _task_to_list_dict(task: TaskDB) -> Dict[str, Any]:
+    """Convert task to dict format for list view (excluding description)"""
+    return {
+        'id': task.id,
+        'title': task.title,
+        'status': task.status,
+        'sort_key': task.sort_key,
+        'project': task.project,
+        'categories': task.categories,
+        'created_at': task.created_at,
+        'updated_at': task.updated_at,
+        'started_at': task.started_at,
+        'completed_at': task.completed_at
+        # Note: description is intentionally excluded for list view
+    }
+
+
+class TaskService:
+    """
+    Task operations with the REST API's validation and response payloads
+
+    The method signatures match utils.http_client.APIClient, so agent actions
+    can run against this service in-process or against a remote server over
+    HTTP interchangeably. Failures the API reports as 4xx raise TaskServiceError.
+    """
+
+    def __init__(self, enqueue_classification: bool = True):
+        self.enqueue_classification = enqueue_classification
+
+    def _get_existing(self, task_id: int) -> TaskDB:
+        task = TaskDB.get_by_id(task_id)
+        if not task:
+            raise TaskServiceError('Task not found', 404)
+        return task
+
+    def get_tasks(self, status: Optional[Union[str, List[str]]] = None,
+                  completed_at_gte: Optional[str] = None,
+                  completed_at_lt: Optional[str] = None,
+                  completed_at_period: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get tasks grouped by status with optional filtering
+
+        Args:
+            status: Single status, list of statuses or comma-separated string
+            completed_at_gte: ISO date - only include tasks completed on or after this date
+            completed_at_lt: ISO date - only include tasks completed before this date
+            completed_at_period: Period string (this_week, this_month, last_week, last_month, last_7_days, last_30_days, today, yesterday)
+        """
+        # Parse status filter
+        status_filters = None
+        if status:
+            if isinstance(status, list):
+                status_filters = [s.strip() for s in status]
+            else:
+                status_filters = [s.strip() for s in status.split(',')]
+
+            # Validate status filters
+            for status_value in status_filters:
+                if status_value not in VALID_STATUSES:
+                    raise TaskServiceError(f"Invalid status filter: {status_value}. Valid options: {', '.join(VALID_STATUSES)}", 400)
+
+        # Validate date formats if provided (ISO format)
+        if completed_at_gte:
+            try:
+                datetime.fromisoformat(completed_at_gte.replace('Z', '+00:00'))
+            except ValueError:
+                raise TaskServiceError("Invalid completed_at_gte format. Use ISO format (e.g., 2025-09-29 or 2025-09-29T00:00:00)", 400)
+
+        if completed_at_lt:
+            try:
+                datetime.fromisoformat(completed_at_lt.replace('Z', '+00:00'))
+            except ValueError:
+                raise TaskServiceError("Invalid completed_at_lt format. Use ISO format (e.g., 2025-09-29 or 2025-09-29T00:00:00)", 400)
+
+        # Handle completed_at_period parameter
+        if completed_at_period:
+            try:
+                # Override any existing date filters with period-based ones
+                completed_at_gte, completed_at_lt = convert_period_to_date_range(completed_at_period)
+            except ValueError as e:
+                raise TaskServiceError(str(e), 400)
+
+        # Get all tasks
+        open_tasks, in_progress_tasks, done_tasks = TaskDB.get_by_status()
+
+        # Apply status filtering if specified
+        if status_filters:
+            open_tasks = open_tasks if 'open' in status_filters else []
+            in_progress_tasks = in_progress_tasks if 'in_progress' in status_filters else []
+            done_tasks = done_tasks if 'done' in status_filters else []
+
+        # Apply completed_at filtering to done tasks
+        if completed_at_gte or completed_at_lt:
+            done_tasks = filter_tasks_by_completed_at(done_tasks, completed_at_gte, completed_at_lt)
+
+            # Only return done tasks when completed_at filtering is applied without status filter
+            if not status_filters:
+                in_progress_tasks = []
+                open_tasks = []
+
+        ui_tasks = {
+            'in_progress': [_task_to_list_dict(task) for task in in_progress_tasks],
+            'open': [_task_to_list_dict(task) for task in open_tasks],
+            'done': [_task_to_list_dict(task) for task in done_tasks]
+        }
+
+        # Calculate counts for sidebar
+        today_count = len(in_progress_tasks) + len(open_tasks)
+
+        # Count completed tasks for today and yesterday
+        today_date = datetime.now().strftime('%Y-%m-%d')
+        yesterday_date = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+
+        completed_today_tasks = [
+            task for task in done_tasks
+            if task.completed_at and task.completed_at.startswith(today_date)
+        ]
+        completed_yesterday_count = sum(1 for task in done_tasks if task.completed_at and task.completed_at.startswith(yesterday_date))
+
+        response_data = {
+            'tasks': ui_tasks,
+            'counts': {
+                'today': today_count,
+                'completed_today': len(completed_today_tasks),
+                'completed_yesterday': completed_yesterday_count
+            },
+            'completed_today_tasks': [
+                {
+                    'id': task.id,
+                    'title': task.title,
+                    'categories': task.categories or []
+                }
+                for task in completed_today_tasks
+            ],
+            'today_date': datetime.now().strftime('Today - %A %b %d')
+        }
+
+        # Add filtering info to response if filters were applied
+        if completed_at_gte or completed_at_lt:
+            response_data['filters'] = {
+                'completed_at_gte': completed_at_gte,
+                'completed_at_lt': completed_at_lt,
+                'filtered_done_count': len(done_tasks)
+            }
+
+        return _success("Tasks loaded successfully", response_data)
+
+    def get_task(self, task_id: int) -> Dict[str, Any]:
+        """Get a specific task by ID"""
+        task = self._get_existing(task_id)
+        return _success("Task retrieved successfully", {'task': task.to_dict()})
+
+    def create_task(self, title: str, description: str = "",
+                    project: Optional[str] = None,
+                    categories: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Create a new task and enqueue it for classification"""
+        title = _validate_title(title)
+        categories = [] if categories is None else categories
+
+        # Validate categories
+        if not isinstance(categories, list):
+            raise TaskServiceError('Categories must be a list', 400)
+
+        task = TaskDB.create(title, (description or '').strip(), project, categories)
+
+        if self.enqueue_classification:
+            _enqueue_classification(task)
+
+        return _success(f'Created: {title}', {'task': task.to_dict()})
+
+    def update_task(self, task_id: int, title: Optional[str] = None,
+                    description: Optional[str] = None,
+                    project: Optional[str] = None,
+                    categories: Optional[List[str]] = None,
+                    completed_at: Optional[str] = None,
+                    started_at: Optional[str] = None) -> Dict[str, Any]:
+        """Update the given (non-None) task fields"""
+        changes = {
+            'title': title, 'description': description, 'project': project,
+            'categories': categories, 'completed_at': completed_at, 'started_at': started_at
+        }
+        return self.apply_update(task_id, {k: v for k, v in changes.items() if v is not None})
+
+    def apply_update(self, task_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Update a task from a dict of changed fields, as sent to PUT /api/tasks/<id>
+
+        Fields absent from data are left unchanged; an empty or "null"
+        completed_at/started_at clears the date. Title or description changes
+        are enqueued for classification unless data has `_debounced` set.
+        """
+        task = self._get_existing(task_id)
+
+        if not data:
+            raise TaskServiceError('No data provided', 400)
+
+        # Update fields
+        if 'title' in data:
+            task.title = _validate_title(data['title'])
+
+        if 'description' in data:
+            task.description = data['description'].strip()
+
+        if 'project' in data:
+            task.project = data['project']
+
+        if 'categories' in data:
+            categories = data['categories']
+            if not isinstance(categories, list):
+                raise TaskServiceError('Categories must be a list', 400)
+            task.categories = categories
+
+        # Handle date fields
+        if 'completed_at' in data:
+            completed_at = data['completed_at']
+            if completed_at == "" or completed_at.lower() == "null":
+                # Clear completion date
+                task.completed_at = None
+                if task.status == 'done':
+                    task.status = 'open'  # Reset status if clearing completion
+            else:
+                try:
+                    parsed_date = datetime.fromisoformat(completed_at.replace('Z', '+00:00'))
+                except ValueError:
+                    raise TaskServiceError(f"Invalid completed_at format: {completed_at}. Use ISO format (e.g., 2025-01-15T14:30:00)", 400)
+                task.completed_at = parsed_date.isoformat()
+                # If setting completion date, mark as done
+                if task.status != 'done':
+                    task.status = 'done'
+
+        if 'started_at' in data:
+            started_at = data['started_at']
+            if started_at == "" or started_at.lower() == "null":
+                # Clear start date
+                task.started_at = None
+            else:
+                try:
+                    parsed_date = datetime.fromisoformat(started_at.replace('Z', '+00:00'))
+                except ValueError:
+                    raise TaskServiceError(f"Invalid started_at format: {started_at}. Use ISO format (e.g., 2025-01-15T14:30:00)", 400)
+                task.started_at = parsed_date.isoformat()
+                # If setting start date, mark as in progress
+                if task.status == 'open':
+                    task.status = 'in_progress'
+
+        # Save changes
+        task.save()
+
+        # Enqueue for classification if title or description changed
+        # But skip classification for debounced updates (real-time auto-saves)
+        if self.enqueue_classification and ('title' in data or 'description' in data) and not data.get('_debounced', False):
+            _enqueue_classification(task)
+
+        return _success('Task updated', {'task': task.to_dict()})
+
+    def update_task_status(self, task_id: int, status: str) -> Dict[str, Any]:
+        """Update task status"""
+        task = self._get_existing(task_id)
+
+        if status not in VALID_STATUSES:
+            raise TaskServiceError('Invalid status. Must be: open, in_progress, or done', 400)
+
+        if status == 'done':
+            task.mark_done()
+        elif status == 'in_progress':
+            task.mark_in_progress()
+        elif status == 'open':
+            task.mark_open()
+
+        return _success(f'Status updated to {status}', {'task': task.to_dict()})
+
+    def delete_task(self, task_id: int) -> Dict[str, Any]:
+        """Delete a task"""
+        self._get_existing(task_id).delete()
+        return _success('Task deleted')
+
+    def reorder_tasks(self, task_ids: List[int]) -> Dict[str, Any]:
+        """Reorder tasks by updating their sort_key values"""
+        if not isinstance(task_ids, list):
+            raise TaskServiceError('task_ids must be an array', 400)
+
+        if not task_ids:
+            raise TaskServiceError('task_ids cannot be empty', 400)
+
+        # Validate that all task IDs exist
+        for task_id in task_ids:
+            if not isinstance(task_id, int):
+                raise TaskServiceError(f'All task_ids must be integers, got {type(task_id)}', 400)
+            if not TaskDB.get_by_id(task_id):
+                raise TaskServiceError(f'Task {task_id} not found', 404)
+
+        if not TaskDB.reorder_tasks(task_ids):
+            raise TaskServiceError('Failed to reorder tasks', 500)
+
+        return _success(f'Reordered {len(task_ids)} tasks')
+
+    def health_check(self) -> bool:
+        """Always available in-process (APIClient compatibility)"""
+        return True
+
+
+# Global task service instance
+task_service = TaskService()
@@ -0,0 +1,310 @@
+"""
+Token accounting for LLM calls: Ollama's own counts first, a model-matched tokenizer otherwise
+
+Ollama reports what it actually processed: prompt_eval_count, eval_count
+and their durations on native /api responses, and input/output tokens in
+usage_metadata on OpenAI-compatible /v1 responses. Those are recorded
+per call site and model. Tokens are only counted locally when nothing
+was reported, e.g. budgeting a prompt before it is sent. Local counts
+use the model's own tokenizer when the optional `tokenizers` package can
+load it from the local Hugging Face cache, then tiktoken's cl100k_base,
+then ~4 characters per token.
+
+Tokenizers load once per model, on first use rather than at import, and
+are never downloaded on that path, since the first use is usually a chat
+turn. Counts are memoized per (tokenizer, text): conversation context that
+is re-counted on every turn costs a dict lookup instead of an encode.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.prometheus import LLM_BUCKETS, registry
+
+logger = logging.getLogger(__name__)
+
+# Memoized (tokenizer, text) counts
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("GISKARD_TOKEN_COUNT_CACHE_SIZE", "4096"))
+
+# Hugging Face tokenizers by Ollama model family (the model name before ":")
+MODEL_TOKENIZERS = {
+    "gemma3": "unsloth/gemma-3-4b-it",
+    "gemma2": "unsloth/gemma-2-9b-it",
+    "qwen2.5": "Qwen/Qwen2.5-7B-Instruct",
+    "qwen3": "Qwen/Qwen3-8B",
+    "llama3.2": "unsloth/Llama-3.2-3B-Instruct",
+    "llama3.1": "unsloth/Meta-Llama-3.1-8B-Instruct",
+    "mistral": "mistralai/Mistral-7B-Instruct-v0.3",
+    "phi3": "microsoft/Phi-3-mini-4k-instruct",
+}
+
+# Overhead of the chat template per message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+HEURISTIC = "chars/4"
+
+tokens_total = registry.counter(
+    "llm_tokens", "Tokens processed by LLM calls, as reported by Ollama", ("model", "call", "kind")
+)
+generation_rate = registry.histogram(
+    "llm_generation_tokens_per_second", "Generated tokens per second of eval time", ("model",),
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300)
+)
+prompt_eval_seconds = registry.histogram(
+    "llm_prompt_eval_duration_seconds", "Time Ollama spent evaluating prompts", ("model",), buckets=LLM_BUCKETS
+)
+load_seconds = registry.histogram(
+    "llm_load_duration_seconds", "Time Ollama spent loading the model for a call", ("model",), buckets=LLM_BUCKETS
+)
+
+
+def _ms(nanoseconds: Optional[int]) -> Optional[float]:
+    return nanoseconds / 1e6 if nanoseconds is not None else None
+
+
+@dataclass
+class CallUsage:
+    """Tokens and timings of one LLM call (durations in milliseconds, None when not reported)"""
+    prompt_tokens: int
+    completion_tokens: int
+    source: str = "reported"  # or "estimated"
+    load_ms: Optional[float] = None
+    prompt_eval_ms: Optional[float] = None
+    eval_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Generation speed over eval time only, excluding load and prompt evaluation"""
+        if not self.eval_ms or not self.completion_tokens:
+            return None
+        return self.completion_tokens / (self.eval_ms / 1000)
+
+    def as_dict(self) -> Dict[str, Any]:
+        tokens_per_second = self.tokens_per_second
+        return dict(asdict(self), tokens_per_second=round(tokens_per_second, 1) if tokens_per_second else None)
+
+
+def usage_from_ollama(result: Dict[str, Any]) -> Optional[CallUsage]:
+    """
+    Usage from a final native /api/generate or /api/chat response
+
+    prompt_eval_count is omitted when the whole prompt came from the KV
+    cache; /api/generate's `context` then still gives the prompt size.
+    """
+    if not result or ('eval_count' not in result and 'prompt_eval_count' not in result):
+        return None
+    completion_tokens = result.get('eval_count') or 0
+    prompt_tokens = result.get('prompt_eval_count') or 0
+    if result.get('context'):
+        prompt_tokens = max(len(result['context']) - completion_tokens, prompt_tokens)
+    return CallUsage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        load_ms=_ms(result.get('load_duration')),
+        prompt_eval_ms=_ms(result.get('prompt_eval_duration')),
+        eval_ms=_ms(result.get('eval_duration')),
+        total_ms=_ms(result.get('total_duration'))
+    )
+
+
+def usage_from_metadata(usage_metadata: Optional[Dict[str, Any]]) -> Optional[CallUsage]:
+    """Usage from LangChain usage_metadata of an OpenAI-compatible call (counts only, no timings)"""
+    if not usage_metadata or usage_metadata.get('input_tokens') is None:
+        return None
+    return CallUsage(prompt_tokens=usage_metadata['input_tokens'],
+                     completion_tokens=usage_metadata.get('output_tokens') or 0)
+
+
+def _model_family(model: Optional[str]) -> str:
+    return (model or "").split(":")[0].lower()
+
+
+class TokenCounter:
+    """Local token counts with a tokenizer matched to the model, loaded once and memoized"""
+
+    def __init__(self, cache_size: int = TOKEN_COUNT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._encoders: Dict[str, Tuple[str, Optional[Callable[[str], int]]]] = {}
+        self._tiktoken: Optional[Tuple[str, Optional[Callable[[str], int]]]] = None
+        self._counts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Held while a tokenizer loads, so memoized counts don't wait on it
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_hf(self, family: str) -> Optional[Tuple[str, Callable[[str], int]]]:
+        repo = MODEL_TOKENIZERS.get(family)
+        if not repo:
+            return None
+        try:
+            from huggingface_hub import hf_hub_download
+            from tokenizers import Tokenizer
+        except ImportError:
+            return None
+        try:
+            path = hf_hub_download(repo, "tokenizer.json", local_files_only=True)
+        except Exception:
+            logger.info(f"The {repo} tokenizer is not in the local Hugging Face cache; "
+                        f"fetch it with `huggingface-cli download {repo} tokenizer.json`")
+            return None
+        try:
+            tokenizer = Tokenizer.from_file(path)
+        except Exception as e:
+            logger.warning(f"Failed to load the {repo} tokenizer: {e}")
+            return None
+        return f"hf:{repo}", lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def _load_tiktoken(self) -> Tuple[str, Optional[Callable[[str], int]]]:
+        if self._tiktoken is None:
+            try:
+                import tiktoken
+                # cl100k_base (GPT-4) is a reasonable approximation for other models
+                encoding = tiktoken.get_encoding("cl100k_base")
+                self._tiktoken = ("tiktoken:cl100k_base", lambda text: len(encoding.encode(text)))
+            except Exception as e:
+                logger.warning(f"Failed to load tiktoken encoder: {e}")
+                self._tiktoken = (HEURISTIC, None)
+        return self._tiktoken
+
+    def _encoder(self, model: Optional[str]) -> Tuple[str, Optional[Callable[[str], int]]]:
+        family = _model_family(model)
+        encoder = self._encoders.get(family)
+        if encoder is None:
+            with self._load_lock:
+                encoder = self._encoders.get(family)
+                if encoder is None:
+                    encoder = self._load_hf(family) or self._load_tiktoken()
+                    self._encoders[family] = encoder
+                    logger.info(f"Counting {model or 'default'} tokens with {encoder[0]}")
+        return encoder
+
+    def tokenizer_name(self, model: Optional[str] = None) -> str:
+        """The tokenizer used for a model: hf:<repo>, tiktoken:cl100k_base or chars/4"""
+        return self._encoder(model)[0]
+
+    def has_tokenizer(self, model: Optional[str] = None) -> bool:
+        """Whether counts for the model come from a real tokenizer rather than the character heuristic"""
+        return self._encoder(model)[1] is not None
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        """Tokens in text for a model"""
+        if not text:
+            return 0
+        name, encode = self._encoder(model)
+        if encode is None:
+            return (len(text) + 3) // 4
+        key = (name, text)
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+                self.hits += 1
+                return count
+            self.misses += 1
+        try:
+            count = encode(text)
+        except Exception as e:
+            logger.warning(f"Failed to count tokens: {e}")
+            return (len(text) + 3) // 4
+        with self._lock:
+            self._counts[key] = count
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return count
+
+    def count_messages(self, messages: list, model: Optional[str] = None) -> int:
+        """Tokens in LangChain messages, with the per-message chat template overhead"""
+        total = 0
+        for msg in messages:
+            content = msg.content if hasattr(msg, 'content') else str(msg)
+            total += self.count(content, model) + MESSAGE_OVERHEAD_TOKENS
+        return total
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tokenizers": {family or "default": name for family, (name, _) in self._encoders.items()},
+                "cached_counts": len(self._counts),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+class TokenAccounting:
+    """Per call site tokens, generation speed, prompt-eval and load time of LLM calls"""
+
+    def __init__(self, max_history: int = 100):
+        self.max_history = max_history
+        self._lock = threading.Lock()
+        self.reset_metrics()
+
+    def record(self, call: str, model: str, usage: CallUsage):
+        """Record one LLM call's usage"""
+        tokens_total.labels(model=model, call=call, kind="prompt").inc(usage.prompt_tokens)
+        tokens_total.labels(model=model, call=call, kind="completion").inc(usage.completion_tokens)
+        tokens_per_second = usage.tokens_per_second
+        if tokens_per_second:
+            generation_rate.labels(model=model).observe(tokens_per_second)
+        if usage.prompt_eval_ms is not None:
+            prompt_eval_seconds.labels(model=model).observe(usage.prompt_eval_ms / 1000)
+        if usage.load_ms is not None:
+            load_seconds.labels(model=model).observe(usage.load_ms / 1000)
+
+        with self._lock:
+            stats = self.calls[call]
+            stats['calls'] += 1
+            stats[usage.source] += 1
+            stats['prompt_tokens'] += usage.prompt_tokens
+            stats['completion_tokens'] += usage.completion_tokens
+            if tokens_per_second:
+                stats['timed_completion_tokens'] += usage.completion_tokens
+                stats['eval_ms_total'] += usage.eval_ms
+            if usage.total_ms is not None:
+                stats['timed_calls'] += 1
+                stats['prompt_eval_ms_total'] += usage.prompt_eval_ms or 0.0
+                stats['load_ms_total'] += usage.load_ms or 0.0
+            self.recent.append({'call': call, 'model': model, **usage.as_dict(),
+                                'timestamp': datetime.now().isoformat()})
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get tokens, tokens/sec and prompt-eval and load time per call site, plus the most recent calls"""
+        with self._lock:
+            by_call = {}
+            for call, stats in self.calls.items():
+                eval_seconds = stats['eval_ms_total'] / 1000
+                timed_calls = stats['timed_calls']
+                by_call[call] = {
+                    'calls': stats['calls'],
+                    'reported': stats['reported'],
+                    'estimated': stats['estimated'],
+                    'prompt_tokens': stats['prompt_tokens'],
+                    'completion_tokens': stats['completion_tokens'],
+                    'tokens_per_second': round(stats['timed_completion_tokens'] / eval_seconds, 1) if eval_seconds else None,
+                    'average_prompt_eval_ms': round(stats['prompt_eval_ms_total'] / timed_calls, 1) if timed_calls else None,
+                    'average_load_ms': round(stats['load_ms_total'] / timed_calls, 1) if timed_calls else None
+                }
+            recent: List[Dict[str, Any]] = list(self.recent)
+        return {'calls': by_call, 'recent': recent, 'counter': token_counter.get_status(), 'last_reset': self.last_reset}
+
+    def reset_metrics(self):
+        """Reset all metrics"""
+        with self._lock:
+            self.calls = defaultdict(lambda: {
+                'calls': 0, 'reported': 0, 'estimated': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                'timed_calls': 0, 'timed_completion_tokens': 0, 'eval_ms_total': 0.0, 'prompt_eval_ms_total': 0.0, 'load_ms_total': 0.0
+            })
+            self.recent = deque(maxlen=self.max_history)
+            self.last_reset = datetime.now().isoformat()
+
+
+# Global token counter instance
+token_counter = TokenCounter()
+
+# Global token accounting instance
+token_accounting = TokenAccounting()
@@ -0,0 +1,291 @@
+"""
+Lightweight local tracing: where a turn spends its time, without an external service
+
+Spans are OpenTelemetry spans from a tracer provider of our own, so they
+never mix with Langfuse's. They nest through a context variable: a span
+started inside another (in the same thread or asyncio task, or in work
+handed off with asyncio.to_thread) becomes its child. Finished spans are
+exported in the background to the sink chosen with GISKARD_TRACING_SINK:
+
+- "jsonl": one JSON object per span, appended to GISKARD_TRACING_PATH
+  (default data/traces.jsonl)
+- "sqlite": a `spans` table in GISKARD_TRACING_PATH (default data/traces.db)
+- "otlp": OTLP/HTTP to OTEL_EXPORTER_OTLP_TRACES_ENDPOINT (or
+  OTEL_EXPORTER_OTLP_ENDPOINT), e.g. a local Jaeger or collector
+
+Unset, tracing is off and spans cost a context-manager call.
+scripts/trace_flamegraph.py turns a JSONL or SQLite sink into folded
+stacks for flame graph tools.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import INVALID_SPAN, Span, Status, StatusCode, format_span_id, format_trace_id
+
+logger = logging.getLogger(__name__)
+
+TRACING_SINK = os.getenv("GISKARD_TRACING_SINK", "").lower()
+TRACING_PATH = os.getenv("GISKARD_TRACING_PATH")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+DEFAULT_PATHS = {
+    "jsonl": os.path.join(DATA_DIR, 'traces.jsonl'),
+    "sqlite": os.path.join(DATA_DIR, 'traces.db'),
+}
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("giskard_span", default=None)
+
+
+def span_record(span: ReadableSpan) -> Dict[str, Any]:
+    """A finished span as a JSON-serializable dict, with OTLP field names"""
+    return {
+        "trace_id": format_trace_id(span.context.trace_id),
+        "span_id": format_span_id(span.context.span_id),
+        "parent_span_id": format_span_id(span.parent.span_id) if span.parent else None,
+        "name": span.name,
+        "start_time_unix_nano": span.start_time,
+        "end_time_unix_nano": span.end_time,
+        "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+    }
+
+
+class JsonlSpanExporter(SpanExporter):
+    """Appends finished spans to a JSONL file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(span_record(span), default=str) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            logger.warning(f"Failed to write spans to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+
+class SqliteSpanExporter(SpanExporter):
+    """Inserts finished spans into a `spans` table of their own SQLite file"""
+
+    COLUMNS = ("trace_id", "span_id", "parent_span_id", "name", "start_time_unix_nano",
+               "end_time_unix_nano", "duration_ms", "status", "attributes")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS spans (
+                trace_id TEXT NOT NULL,
+                span_id TEXT PRIMARY KEY,
+                parent_span_id TEXT,
+                name TEXT NOT NULL,
+                start_time_unix_nano INTEGER NOT NULL,
+                end_time_unix_nano INTEGER NOT NULL,
+                duration_ms REAL NOT NULL,
+                status TEXT NOT NULL,
+                attributes TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_trace_id ON spans(trace_id)")
+        self._conn.commit()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        rows = []
+        for span in spans:
+            record = span_record(span)
+            record["attributes"] = json.dumps(record["attributes"], default=str)
+            rows.append(tuple(record[column] for column in self.COLUMNS))
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO spans ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                    rows
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write spans to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_span_exporter(sink: str, path: Optional[str] = None) -> SpanExporter:
+    """Exporter for a sink name: jsonl, sqlite or otlp"""
+    if sink == "jsonl":
+        return JsonlSpanExporter(path or DEFAULT_PATHS["jsonl"])
+    if sink == "sqlite":
+        return SqliteSpanExporter(path or DEFAULT_PATHS["sqlite"])
+    if sink == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=path) if path else OTLPSpanExporter()
+    raise ValueError(f"Unknown tracing sink: {sink}. Valid options: jsonl, sqlite, otlp")
+
+
+class SpanTracer:
+    """Starts nested spans and exports them to the configured sink"""
+
+    def __init__(self, sink: str = TRACING_SINK, path: Optional[str] = TRACING_PATH):
+        self._provider: Optional[TracerProvider] = None
+        self._tracer = None
+        self.sink = None
+        self.path = None
+        if sink and sink not in ("0", "off", "false", "none"):
+            self.configure(sink, path)
+
+    @property
+    def enabled(self) -> bool:
+        return self._tracer is not None
+
+    def configure(self, sink: Optional[str], path: Optional[str] = None, **processor_options):
+        """Switch to a sink (None turns tracing off), flushing spans of the previous one"""
+        self.shutdown()
+        if not sink:
+            return
+        try:
+            exporter = create_span_exporter(sink, path)
+        except Exception as e:
+            logger.error(f"Failed to set up {sink} tracing: {e}")
+            return
+        provider = TracerProvider(resource=Resource.create({"service.name": "giskard"}))
+        provider.add_span_processor(BatchSpanProcessor(exporter, **processor_options))
+        self._provider = provider
+        self._tracer = provider.get_tracer("giskard")
+        self.sink = sink
+        self.path = getattr(exporter, "path", path)
+        logger.info(f"Local tracing to {sink}{f' ({self.path})' if self.path else ''}")
+
+    def current_span(self) -> Optional[Span]:
+        """The innermost open span of this thread or task, to parent work started elsewhere"""
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes) -> Iterator[Span]:
+        """
+        Time a block as a span, nested under `parent` or the current span
+
+        Exceptions raised in the block mark the span as failed. Attributes
+        can be added to the yielded span with set_attribute().
+        """
+        tracer = self._tracer
+        if tracer is None:
+            yield INVALID_SPAN
+            return
+        parent = parent if parent is not None else _current_span.get()
+        context = trace.set_span_in_context(parent, Context()) if parent else Context()
+        current = tracer.start_span(name, context=context,
+                                    attributes={k: v for k, v in attributes.items() if v is not None})
+        token = _current_span.set(current)
+        try:
+            yield current
+        except Exception as e:
+            current.record_exception(e)
+            current.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            _current_span.reset(token)
+            current.end()
+
+    def force_flush(self, timeout_millis: int = 5000) -> bool:
+        """Export finished spans now"""
+        return self._provider.force_flush(timeout_millis) if self._provider else True
+
+    def shutdown(self):
+        """Flush and close the current sink"""
+        if self._provider:
+            self._provider.shutdown()
+        self._provider = None
+        self._tracer = None
+        self.sink = None
+        self.path = None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "sink": self.sink, "path": self.path}
+
+
+def traced(name: Optional[str] = None, **attributes) -> Callable:
+    """Decorator timing each call of a function (sync or async) as a span"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span_tracer.span(span_name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not span_tracer.enabled:
+                return func(*args, **kwargs)
+            with span_tracer.span(span_name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    """Span records from a JSONL or SQLite sink file"""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute("SELECT * FROM spans ORDER BY start_time_unix_nano").fetchall()
+    finally:
+        conn.close()
+    return [dict(row, attributes=json.loads(row["attributes"] or "{}")) for row in rows]
+
+
+def folded_stacks(spans: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Self time in milliseconds per call stack ("root;child;grandchild")
+
+    The format flamegraph.pl, speedscope and inferno read. A span's self
+    time is its duration minus its children's.
+    """
+    by_id = {span["span_id"]: span for span in spans}
+    child_ms: Dict[str, float] = {}
+    for span in spans:
+        if span.get("parent_span_id") in by_id:
+            child_ms[span["parent_span_id"]] = child_ms.get(span["parent_span_id"], 0.0) + span["duration_ms"]
+
+    stacks: Dict[str, float] = {}
+    for span in spans:
+        names, node = [], span
+        while node is not None:
+            names.append(node["name"])
+            node = by_id.get(node.get("parent_span_id"))
+        stack = ";".join(reversed(names))
+        self_ms = max(span["duration_ms"] - child_ms.get(span["span_id"], 0.0), 0.0)
+        stacks[stack] = stacks.get(stack, 0.0) + self_ms
+    return stacks
+
+
+# Global span tracer instance
+span_tracer = SpanTracer()